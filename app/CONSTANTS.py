@@ -10,6 +10,7 @@ DATA_DIR = ROOT / "data"
 RAW_JSON = DATA_DIR / "DPR_Handball_001.json"
 CLEAN_CSV = DATA_DIR / "handball_courts_clean.csv"
 TENNIS_CSV = DATA_DIR / "tennis_courts_clean.csv"
+TENNIS_RAW_JSON = DATA_DIR / "DPR_Tennis_001.json"
 
 # Geo
 EARTH_RADIUS_KM = 6371.0088
@@ -17,3 +18,67 @@ EARTH_RADIUS_KM = 6371.0088
 # Geocoding
 GEOCODER_USER_AGENT = "tennis-practice"
 GEOCODER_MIN_DELAY_SEC = 1.0
+
+# Approximate borough centres, used as a last-resort geocoding fallback
+BOROUGH_CENTROIDS = {
+    "manhattan": (40.7831, -73.9712),
+    "brooklyn": (40.6782, -73.9442),
+    "queens": (40.7282, -73.7949),
+    "bronx": (40.8448, -73.8648),
+    "staten island": (40.5795, -74.1502),
+}
+
+# Walking distance re-ranking (app/walking.py)
+# Rough outlines (lat, lon) of the island landmasses (Randall's Island includes
+# Wards Island); anything else is the
+# Bronx mainland north of WALK_BRONX_MIN_LAT or Brooklyn/Queens (Long Island).
+WALK_MANHATTAN_OUTLINE = (
+    (40.700, -74.019), (40.711, -74.017), (40.740, -74.012), (40.760, -74.004),
+    (40.790, -73.985), (40.830, -73.958), (40.850, -73.948), (40.873, -73.932),
+    (40.880, -73.925), (40.873, -73.911), (40.850, -73.929), (40.835, -73.932),
+    (40.818, -73.932), (40.806, -73.929), (40.798, -73.927), (40.785, -73.940),
+    (40.775, -73.942), (40.760, -73.956), (40.745, -73.969), (40.730, -73.972),
+    (40.712, -73.977), (40.708, -73.996), (40.702, -74.010),
+)
+WALK_STATEN_ISLAND_OUTLINE = (
+    (40.652, -74.080), (40.645, -74.180), (40.640, -74.205), (40.560, -74.255),
+    (40.495, -74.260), (40.495, -74.235), (40.540, -74.140), (40.575, -74.095),
+    (40.600, -74.055), (40.625, -74.070), (40.645, -74.069),
+)
+WALK_RANDALLS_ISLAND_OUTLINE = (
+    (40.800, -73.931), (40.800, -73.912), (40.781, -73.912), (40.779, -73.931),
+)
+WALK_BRONX_MIN_LAT = 40.799
+
+# Street grid bearing per landmass, degrees east of true north. Manhattan's
+# avenues run ~29 degrees off north; elsewhere an axis-aligned grid is used,
+# whose L1 distance averages 4/pi ~ 1.27x the straight line, in line with
+# typical street network circuity.
+WALK_GRID_BEARING_DEG = {"manhattan": 29.0, "bronx": 0.0, "long_island": 0.0, "staten_island": 0.0, "randalls_island": 0.0}
+
+# Walkable crossings between landmasses:
+# (name, land A, (lat, lon) A, land B, (lat, lon) B, cost in walking km)
+# The Staten Island Ferry cost is the walking-equivalent of the ride and wait.
+WALK_CROSSINGS = (
+    ("Brooklyn Bridge", "manhattan", (40.7116, -74.0036), "long_island", (40.7003, -73.9905), 1.8),
+    ("Manhattan Bridge", "manhattan", (40.7143, -73.9957), "long_island", (40.6997, -73.9867), 2.1),
+    ("Williamsburg Bridge", "manhattan", (40.7180, -73.9867), "long_island", (40.7103, -73.9612), 2.2),
+    ("Queensboro Bridge", "manhattan", (40.7603, -73.9626), "long_island", (40.7514, -73.9421), 1.8),
+    ("Wards Island Bridge (103rd St)", "manhattan", (40.7855, -73.9420), "randalls_island", (40.7860, -73.9300), 0.7),
+    ("RFK Bridge (Manhattan span)", "manhattan", (40.8010, -73.9300), "randalls_island", (40.7990, -73.9250), 0.6),
+    ("RFK Bridge (Queens span)", "randalls_island", (40.7850, -73.9215), "long_island", (40.7785, -73.9175), 1.0),
+    ("RFK Bridge (Bronx span)", "randalls_island", (40.7990, -73.9190), "bronx", (40.8045, -73.9160), 0.7),
+    ("Willis Ave Bridge", "manhattan", (40.8030, -73.9320), "bronx", (40.8060, -73.9280), 0.4),
+    ("Third Ave Bridge", "manhattan", (40.8080, -73.9350), "bronx", (40.8100, -73.9300), 0.4),
+    ("Madison Ave Bridge", "manhattan", (40.8140, -73.9360), "bronx", (40.8165, -73.9290), 0.3),
+    ("145th St Bridge", "manhattan", (40.8200, -73.9370), "bronx", (40.8215, -73.9300), 0.3),
+    ("Macombs Dam Bridge", "manhattan", (40.8280, -73.9370), "bronx", (40.8290, -73.9320), 0.5),
+    ("High Bridge", "manhattan", (40.8420, -73.9320), "bronx", (40.8430, -73.9270), 0.6),
+    ("Washington Bridge", "manhattan", (40.8455, -73.9325), "bronx", (40.8470, -73.9250), 0.4),
+    ("University Heights Bridge", "manhattan", (40.8615, -73.9215), "bronx", (40.8630, -73.9130), 0.3),
+    ("Broadway Bridge", "manhattan", (40.8730, -73.9130), "bronx", (40.8750, -73.9100), 0.3),
+    ("Staten Island Ferry", "manhattan", (40.7013, -74.0132), "staten_island", (40.6437, -74.0736), 3.0),
+)
+
+# NYC bounding box (lat_min, lat_max, lon_min, lon_max), used by coverage analytics
+NYC_BBOX = (40.49, 40.92, -74.26, -73.70)
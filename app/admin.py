@@ -0,0 +1,99 @@
+'''
+Admin API for editing courts at runtime (add, edit, close, reopen).
+
+Edits go to the LiveIndex on app.state and are visible immediately to
+/nearest (walking re-ranking included), /nearest/group, /courts, neighbours
+and the agent tools; coverage and the geocoding gazetteer follow after the
+next background compaction. Nothing is written back to the CSVs.
+
+Every endpoint needs "Authorization: Bearer <ADMIN_TOKEN>"; with ADMIN_TOKEN
+unset the admin API answers 404.
+'''
+
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+
+from app.live_index import CourtConflict, CourtNotFound, LiveIndex
+from app.pydantic_models import CourtIn, CourtPatch
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _require_admin(authorization: Optional[str] = Header(None)) -> None:
+    token = get_settings().admin_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, given = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(given.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(_require_admin)], include_in_schema=False)
+
+
+def _index(request: Request, sport: str) -> LiveIndex:
+    s = (sport or "").strip().lower()
+    if s not in {"handball", "tennis"}:
+        raise HTTPException(status_code=400, detail="Invalid sport. Use handball or tennis.")
+    return getattr(request.app.state, f"{s}_idx")
+
+
+def _apply(fn, *args):
+    try:
+        return fn(*args)
+    except CourtNotFound:
+        raise HTTPException(status_code=404, detail="Court not found")
+    except CourtConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/courts/{sport}", status_code=201)
+def add_court(sport: str, court: CourtIn, request: Request):
+    idx = _index(request, sport)
+    row = _apply(idx.insert, court.model_dump())
+    logger.info("admin add court sport=%s id=%s", sport, court.Court_Id)
+    return {"court": row[0], "index": idx.stats()}
+
+
+@router.patch("/courts/{sport}/{court_id}")
+def edit_court(sport: str, court_id: str, patch: CourtPatch, request: Request, name: Optional[str] = Query(None)):
+    idx = _index(request, sport)
+    changes = patch.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to change")
+    rows = _apply(idx.update, court_id, changes, name)
+    logger.info("admin edit court sport=%s id=%s fields=%s", sport, court_id, sorted(changes))
+    return {"courts": rows, "index": idx.stats()}
+
+
+@router.delete("/courts/{sport}/{court_id}")
+def close_court(sport: str, court_id: str, request: Request, name: Optional[str] = Query(None)):
+    idx = _index(request, sport)
+    rows = _apply(idx.close, court_id, name)
+    logger.info("admin close court sport=%s id=%s rows=%d", sport, court_id, len(rows))
+    return {"closed": rows, "index": idx.stats()}
+
+
+@router.post("/courts/{sport}/{court_id}/restore")
+def restore_court(sport: str, court_id: str, request: Request, name: Optional[str] = Query(None)):
+    idx = _index(request, sport)
+    rows = _apply(idx.restore, court_id, name)
+    logger.info("admin restore court sport=%s id=%s rows=%d", sport, court_id, len(rows))
+    return {"restored": rows, "index": idx.stats()}
+
+
+@router.post("/compact")
+def compact(request: Request):
+    state = request.app.state
+    compacted = {sport: getattr(state, f"{sport}_idx").compact() for sport in ("handball", "tennis")}
+    return {"compacted": compacted, "index": index_stats(request)}
+
+
+@router.get("/index")
+def index_stats(request: Request):
+    state = request.app.state
+    return {sport: getattr(state, f"{sport}_idx").stats() for sport in ("handball", "tennis")}
@@ -0,0 +1,199 @@
+'''
+Admission control for expensive endpoints (POST /agent).
+
+At most max_concurrency requests run at once; the rest wait in a bounded
+queue with one FIFO per client, and a freed slot goes to the next client in
+round-robin order, so one client sending a burst only delays its own
+requests. Requests are turned away up front, with Retry-After, instead of
+piling up:
+
+    429 client_queue_full - this client already has max_per_client waiting
+    503 queue_full        - max_queue requests are waiting in total
+    503 deadline          - the estimated wait (queue length / concurrency x
+                            mean service time) leaves less than
+                            min_service_sec before the request's deadline,
+                            or the request waited until that point
+
+The mean service time is an exponentially weighted average of the time
+requests held a slot. Everything runs on the event loop, so the queues need
+no lock.
+'''
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from app.metrics import counter, gauge, histogram
+
+ADMISSION_QUEUED = gauge("admission_queue_depth", "Requests waiting for an admission slot.", ("queue",))
+ADMISSION_ACTIVE = gauge("admission_active", "Requests holding an admission slot.", ("queue",))
+ADMISSION_ADMITTED = counter("admission_admitted_total", "Requests admitted.", ("queue",))
+ADMISSION_SHED = counter("admission_shed_total", "Requests turned away by admission control.", ("queue", "reason"))
+ADMISSION_WAIT = histogram(
+    "admission_wait_seconds", "Time admitted requests spent queued.", ("queue",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Weight of the latest request in the mean service time
+EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    '''
+    Attributes:
+        status_code (int): 429 or 503.
+        reason (str): client_queue_full, queue_full or deadline.
+        retry_after (int): Seconds the client should wait before retrying.
+    '''
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionQueue:
+    '''
+    Attributes:
+        name (str): Metrics label.
+        max_concurrency (int): Requests allowed to run at once.
+        max_queue (int): Requests allowed to wait in total.
+        max_per_client (int): Requests one client may have waiting.
+        min_service_sec (float): Time a request needs left once admitted to
+                                 be worth running.
+        service_sec (float): Current mean service time estimate.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        max_per_client: int,
+        min_service_sec: float,
+        initial_service_sec: float,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_per_client = max(1, max_per_client)
+        self.min_service_sec = min_service_sec
+        self.service_sec = initial_service_sec
+        self._active = 0
+        self._queued = 0
+        # Client -> its waiters; iteration order is the round-robin order
+        self._clients: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        ADMISSION_ACTIVE.set(0, queue=name)
+        ADMISSION_QUEUED.set(0, queue=name)
+
+    def estimated_wait(self, position: int) -> float:
+        return position / self.max_concurrency * self.service_sec
+
+    def _shed(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        ADMISSION_SHED.inc(queue=self.name, reason=reason)
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    @asynccontextmanager
+    async def slot(self, client: str, deadline: float) -> AsyncIterator[float]:
+        '''
+        Hold an admission slot for the body of the with block.
+        Inputs:
+            client: str - Fairness key (client address).
+            deadline: float - time.monotonic() by which the request must finish.
+        Yields:
+            float - Seconds spent queued.
+        Raises:
+            AdmissionRejected - Without having taken a slot.
+        '''
+
+        queued_at = time.monotonic()
+        await self._acquire(client, deadline)
+        started = time.monotonic()
+        waited = started - queued_at
+        ADMISSION_ADMITTED.inc(queue=self.name)
+        ADMISSION_WAIT.observe(waited, queue=self.name)
+        try:
+            yield waited
+        finally:
+            self._release(time.monotonic() - started)
+
+    async def _acquire(self, client: str, deadline: float) -> None:
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            ADMISSION_ACTIVE.set(self._active, queue=self.name)
+            return
+
+        waiters = self._clients.get(client)
+        if waiters is not None and len(waiters) >= self.max_per_client:
+            raise self._shed(429, "client_queue_full", self.estimated_wait(len(waiters)))
+        if self._queued >= self.max_queue:
+            raise self._shed(503, "queue_full", self.estimated_wait(self._queued))
+        now = time.monotonic()
+        wait_budget = deadline - self.min_service_sec - now
+        if self.estimated_wait(self._queued + 1) > wait_budget:
+            raise self._shed(503, "deadline", self.estimated_wait(self._queued + 1))
+
+        fut = asyncio.get_running_loop().create_future()
+        if waiters is None:
+            waiters = self._clients[client] = deque()
+        waiters.append(fut)
+        self._queued += 1
+        ADMISSION_QUEUED.set(self._queued, queue=self.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=max(0.0, wait_budget))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self._release(None)
+            else:
+                fut.cancel()
+                self._forget(client, fut)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._shed(503, "deadline", self.estimated_wait(self._queued)) from None
+
+    def _forget(self, client: str, fut: asyncio.Future) -> None:
+        waiters = self._clients.get(client)
+        if waiters is None or fut not in waiters:
+            return
+        waiters.remove(fut)
+        if not waiters:
+            del self._clients[client]
+        self._queued -= 1
+        ADMISSION_QUEUED.set(self._queued, queue=self.name)
+
+    def _release(self, service_sec) -> None:
+        if service_sec is not None:
+            self.service_sec += EWMA_ALPHA * (service_sec - self.service_sec)
+        # Hand the slot to the next client in round-robin order
+        while self._clients:
+            client, waiters = next(iter(self._clients.items()))
+            fut = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._clients.move_to_end(client)
+            else:
+                del self._clients[client]
+            if not fut.done():
+                fut.set_result(None)
+                ADMISSION_QUEUED.set(self._queued, queue=self.name)
+                return
+        self._active -= 1
+        ADMISSION_ACTIVE.set(self._active, queue=self.name)
+        ADMISSION_QUEUED.set(self._queued, queue=self.name)
+
+    def status(self) -> Dict[str, float]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "clients_waiting": len(self._clients),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "service_sec": round(self.service_sec, 3),
+        }
@@ -1,17 +1,26 @@
 import os
 import json
+import time
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import pandas as pd
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI
+from fastapi import APIRouter, HTTPException, Request
 
-from app.CONSTANTS import CLEAN_CSV, TENNIS_CSV
-from app.nearest import NearestIndex
+from app.admission import AdmissionQueue, AdmissionRejected
+from app.court_info import has_filters, info_mask, info_values, nearest_matching
+from app.live_index import LiveIndex
+from app.nearest import GROUP_OBJECTIVES
 from app.pydantic_models import AgentRequest
 from app.geocode import geocode_forward
+from app.settings import get_settings
+from app.metrics import span
+from app.tool_encoding import compact_tool_result, has_table
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -39,11 +48,25 @@ def _extract_output_text(resp) -> str:
                         parts.append(t)
     return "\n".join(parts).strip()
 
-def _get_client() -> OpenAI:
+def _get_client() -> "OpenAI":
     api_key = os.getenv("NYCPLACES_OPENAI_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Missing NYCPLACES_OPENAI_API_KEY")
-    return OpenAI(api_key=api_key)
+    # Optional override, e.g. to point at benchmarks/mock_openai.py
+    base_url = os.getenv("NYCPLACES_OPENAI_BASE_URL") or None
+    return _openai_client(api_key, base_url)
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: str, base_url: Optional[str]) -> "OpenAI":
+    # One client per process: building one costs ~25 ms of CPU (TLS context,
+    # connection pool), and sharing it keeps upstream connections alive.
+    # It is thread-safe, so all agent threads use it. The OpenAI SDK is a slow
+    # import; load it with the first agent request (or the startup warm-up)
+    # rather than with the app
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, base_url=base_url)
 
 
 @lru_cache(maxsize=1)
@@ -56,70 +79,93 @@ def _normalize_sport(sport: Optional[str]) -> Optional[str]:
     return None
 
 
-@lru_cache(maxsize=2)
-def _load_df(sport: str) -> pd.DataFrame:
-    if sport == "handball":
-        path = CLEAN_CSV
-    elif sport == "tennis":
-        path = TENNIS_CSV
-    else:
-        raise RuntimeError(f"Unsupported sport for CSV load: {sport}")
+# The app's live court indexes per sport (app.state.<sport>_idx), admin edits included
+Indexes = Dict[str, LiveIndex]
+
+
+def _indexes(app) -> Indexes:
+    return {sport: getattr(app.state, f"{sport}_idx") for sport in ("handball", "tennis")}
+
 
-    if not path.exists():
-        raise RuntimeError(f"CSV not found at: {path}")
-    df = pd.read_csv(path)
+def warm_up() -> None:
+    '''
+    Load what the first /agent request would otherwise wait for: the OpenAI
+    SDK. The tools query the app's court indexes, loaded by the "courts" step.
+    '''
 
-    if "Lat" in df.columns:
-        df["Lat"] = pd.to_numeric(df["Lat"], errors="coerce")
-    if "Lon" in df.columns:
-        df["Lon"] = pd.to_numeric(df["Lon"], errors="coerce")
-    if "Num_Of_Courts" in df.columns:
-        df["Num_Of_Courts"] = pd.to_numeric(df["Num_Of_Courts"], errors="coerce").fillna(0).astype(int)
+    import openai  # noqa: F401
 
-    df = df.dropna(subset=["Lat", "Lon"]).reset_index(drop=True)
-    return df
+MONTH_ABBR = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
 
 
-@lru_cache(maxsize=2)
-def _nearest_index(sport: str) -> NearestIndex:
-    return NearestIndex(_load_df(sport))
+def _info_fields(r: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Compact Info fields for a tool result row (tennis): lessons, permit,
+    indoor as "Oct-Apr:10" (season and bubbled courts) and url. Rows without
+    them get None, which the tool encoding prunes.
+    '''
 
-# Tools (CSV-backed)
-def tool_dataset_summary(sport: str = "handball") -> Dict[str, Any]:
+    info = info_values(r)
+    if not info:
+        return {}
+    indoor = None
+    if info["Indoor_Courts"]:
+        start, end = info["Indoor_From_Month"], info["Indoor_To_Month"]
+        season = f"{MONTH_ABBR[start - 1]}-{MONTH_ABBR[end - 1]}" if start and end else "?"
+        indoor = f"{season}:{info['Indoor_Courts']}"
+    return {
+        "Lessons": info["Lessons"],
+        "Permit_Required": info["Permit_Required"],
+        "Indoor": indoor,
+        "Booking_Url": info["Booking_Url"] or None,
+    }
+
+
+# Tools (backed by the live court indexes)
+def tool_dataset_summary(sport: str = "handball", *, indexes: Indexes) -> Dict[str, Any]:
     sport_norm = _normalize_sport(sport)
     if not sport_norm:
         return {"error": "sport must be handball, tennis, or both"}
     if sport_norm == "both":
         return {
-            "handball": tool_dataset_summary("handball"),
-            "tennis": tool_dataset_summary("tennis"),
+            "handball": tool_dataset_summary("handball", indexes=indexes),
+            "tennis": tool_dataset_summary("tennis", indexes=indexes),
         }
 
-    df = _load_df(sport_norm)
+    df = indexes[sport_norm].df
     locations = int(len(df))
     total_courts = int(df["Num_Of_Courts"].sum()) if "Num_Of_Courts" in df.columns else locations
     boroughs = sorted([b for b in df["Borough"].dropna().unique()]) if "Borough" in df.columns else []
-    return {
+    summary = {
         "sport": sport_norm,
         "locations": locations,
         "total_courts": total_courts,
         "boroughs": boroughs,
         "columns": list(df.columns),
     }
+    if "Lessons" in df.columns:
+        # Locations per filterable Info field
+        summary["with"] = {
+            "lessons": int(info_mask(df, lessons=True).sum()),
+            "permit": int(info_mask(df, permit=True).sum()),
+            "indoor": int(info_mask(df, indoor=True).sum()),
+            "booking_url": int((df["Booking_Url"].fillna("") != "").sum()),
+        }
+    return summary
 
 
-def tool_courts_by_borough(borough: str, sport: str = "handball") -> Dict[str, Any]:
+def tool_courts_by_borough(borough: str, sport: str = "handball", *, indexes: Indexes) -> Dict[str, Any]:
     sport_norm = _normalize_sport(sport)
     if not sport_norm:
         return {"error": "sport must be handball, tennis, or both"}
     if sport_norm == "both":
         return {
             "borough": borough,
-            "handball": tool_courts_by_borough(borough, "handball"),
-            "tennis": tool_courts_by_borough(borough, "tennis"),
+            "handball": tool_courts_by_borough(borough, "handball", indexes=indexes),
+            "tennis": tool_courts_by_borough(borough, "tennis", indexes=indexes),
         }
 
-    df = _load_df(sport_norm)
+    df = indexes[sport_norm].df
     if "Borough" not in df.columns:
         return {"error": "CSV does not contain Borough column."}
 
@@ -147,17 +193,26 @@ def tool_courts_by_borough(borough: str, sport: str = "handball") -> Dict[str, A
     return {"sport": sport_norm, "borough": borough, "locations": locations, "total_courts": total_courts}
 
 
-def tool_search_courts(name_contains: str, limit: int = 10, sport: str = "handball") -> Dict[str, Any]:
+def tool_search_courts(
+    name_contains: str,
+    limit: int = 10,
+    sport: str = "handball",
+    lessons: Optional[bool] = None,
+    indoor: Optional[bool] = None,
+    indoor_month: Optional[int] = None,
+    *,
+    indexes: Indexes,
+) -> Dict[str, Any]:
     sport_norm = _normalize_sport(sport)
     if not sport_norm:
         return {"error": "sport must be handball, tennis, or both"}
     if sport_norm == "both":
-        h = tool_search_courts(name_contains, limit, "handball")
-        t = tool_search_courts(name_contains, limit, "tennis")
+        h = tool_search_courts(name_contains, limit, "handball", lessons, indoor, indoor_month, indexes=indexes)
+        t = tool_search_courts(name_contains, limit, "tennis", lessons, indoor, indoor_month, indexes=indexes)
         merged = (h.get("results", []) + t.get("results", []))[: max(1, min(int(limit), 25))]
         return {"query": name_contains, "count": len(merged), "results": merged}
 
-    df = _load_df(sport_norm)
+    df = indexes[sport_norm].df
     if "Name" not in df.columns:
         return {"error": "CSV does not contain Name column."}
 
@@ -165,7 +220,10 @@ def tool_search_courts(name_contains: str, limit: int = 10, sport: str = "handba
     if not q:
         return {"error": "name_contains is required"}
 
-    sub = df[df["Name"].astype(str).str.lower().str.contains(q, na=False)].head(max(1, min(int(limit), 25)))
+    sub = df[df["Name"].astype(str).str.lower().str.contains(q, na=False)]
+    if has_filters(lessons, None, indoor, indoor_month):
+        sub = sub[info_mask(sub, lessons=lessons, indoor=indoor, indoor_month=indoor_month)]
+    sub = sub.head(max(1, min(int(limit), 25)))
     results = []
     for _, r in sub.iterrows():
         results.append({
@@ -174,26 +232,42 @@ def tool_search_courts(name_contains: str, limit: int = 10, sport: str = "handba
             "Num_Of_Courts": int(r.get("Num_Of_Courts")) if "Num_Of_Courts" in df.columns else None,
             "Lat": float(r.get("Lat")),
             "Lon": float(r.get("Lon")),
+            **_info_fields(r),
             "Sport": sport_norm,
         })
     return {"query": name_contains, "count": len(results), "results": results}
 
 
-def tool_nearest_courts(lat: float, lon: float, limit: int = 5, sport: str = "handball") -> Dict[str, Any]:
+def tool_nearest_courts(
+    lat: float,
+    lon: float,
+    limit: int = 5,
+    sport: str = "handball",
+    lessons: Optional[bool] = None,
+    indoor: Optional[bool] = None,
+    indoor_month: Optional[int] = None,
+    *,
+    indexes: Indexes,
+) -> Dict[str, Any]:
     sport_norm = _normalize_sport(sport)
     if not sport_norm:
         return {"error": "sport must be handball, tennis, or both"}
 
     k = max(1, min(int(limit), 10))
     if sport_norm == "both":
-        h = tool_nearest_courts(lat, lon, limit, "handball")
-        t = tool_nearest_courts(lat, lon, limit, "tennis")
+        h = tool_nearest_courts(lat, lon, limit, "handball", lessons, indoor, indoor_month, indexes=indexes)
+        t = tool_nearest_courts(lat, lon, limit, "tennis", lessons, indoor, indoor_month, indexes=indexes)
         merged = (h.get("results", []) + t.get("results", []))
         merged = sorted(merged, key=lambda r: r.get("distance_km", 0.0))[:k]
         return {"lat": lat, "lon": lon, "count": len(merged), "results": merged}
 
-    idx = _nearest_index(sport_norm)
-    rows = idx.query_k(lat=float(lat), lon=float(lon), k=k)
+    idx = indexes[sport_norm]
+    query = lambda n: idx.query_k(lat=float(lat), lon=float(lon), k=n)
+    if has_filters(lessons, None, indoor, indoor_month):
+        mask = lambda rows: info_mask(rows, lessons=lessons, indoor=indoor, indoor_month=indoor_month)
+        rows = nearest_matching(query, k, len(idx), mask)
+    else:
+        rows = query(k)
     out = []
     for _, r in rows.iterrows():
         out.append({
@@ -203,12 +277,22 @@ def tool_nearest_courts(lat: float, lon: float, limit: int = 5, sport: str = "ha
             "Lat": float(r.get("Lat")),
             "Lon": float(r.get("Lon")),
             "distance_km": float(r.get("distance_km", 0.0)),
+            **_info_fields(r),
             "Sport": sport_norm,
         })
     return {"lat": lat, "lon": lon, "count": len(out), "results": out}
 
 
-def tool_nearest_to_address(address: str, limit: int = 5, sport: str = "handball") -> Dict[str, Any]:
+def tool_nearest_to_address(
+    address: str,
+    limit: int = 5,
+    sport: str = "handball",
+    lessons: Optional[bool] = None,
+    indoor: Optional[bool] = None,
+    indoor_month: Optional[int] = None,
+    *,
+    indexes: Indexes,
+) -> Dict[str, Any]:
     geo = geocode_forward(address)
     if not geo:
         return {
@@ -218,10 +302,72 @@ def tool_nearest_to_address(address: str, limit: int = 5, sport: str = "handball
     return {
         "address": address,
         "display_name": geo.get("display_name"),
-        **tool_nearest_courts(lat=geo["lat"], lon=geo["lon"], limit=limit, sport=sport),
+        **tool_nearest_courts(
+            lat=geo["lat"], lon=geo["lon"], limit=limit, sport=sport, lessons=lessons, indoor=indoor, indoor_month=indoor_month,
+            indexes=indexes,
+        ),
     }
 
 
+def tool_group_meeting_point(
+    addresses: Optional[List[str]] = None,
+    points: Optional[List[Dict[str, float]]] = None,
+    limit: int = 3,
+    sport: str = "handball",
+    objective: str = "sum",
+    *,
+    indexes: Indexes,
+) -> Dict[str, Any]:
+    sport_norm = _normalize_sport(sport)
+    if not sport_norm:
+        return {"error": "sport must be handball, tennis, or both"}
+    if objective not in GROUP_OBJECTIVES:
+        return {"error": "objective must be sum or max"}
+
+    lats, lons, unresolved = [], [], []
+    for p in points or []:
+        try:
+            lats.append(float(p["lat"]))
+            lons.append(float(p["lon"]))
+        except (KeyError, TypeError, ValueError):
+            return {"error": "points must be objects with lat and lon"}
+    for address in addresses or []:
+        geo = geocode_forward(address)
+        if geo:
+            lats.append(geo["lat"])
+            lons.append(geo["lon"])
+        else:
+            unresolved.append(address)
+    if len(lats) < 2:
+        return {"error": "Need at least two locations", "unresolved": unresolved}
+
+    k = max(1, min(int(limit), 10))
+    sports = ["handball", "tennis"] if sport_norm == "both" else [sport_norm]
+    out = []
+    for s in sports:
+        rows = indexes[s].query_group(lats, lons, k=k, objective=objective)
+        for _, r in rows.iterrows():
+            out.append({
+                "Name": r.get("Name"),
+                "Borough": r.get("Borough"),
+                "Lat": float(r.get("Lat")),
+                "Lon": float(r.get("Lon")),
+                "total_km": float(r["total_km"]),
+                "max_km": float(r["max_km"]),
+                "Sport": s,
+            })
+    out = sorted(out, key=lambda r: r["total_km"] if objective == "sum" else r["max_km"])[:k]
+    return {"objective": objective, "locations": len(lats), "unresolved": unresolved, "count": len(out), "results": out}
+
+
+# Tennis-only filters on the fields parsed from the Info text
+# Explained once in AGENT_SYSTEM_PROMPT rather than per tool: every model call carries the schema
+INFO_FILTER_PARAMS = {
+    "lessons": {"type": "boolean"},
+    "indoor": {"type": "boolean"},
+    "indoor_month": {"type": "integer", "minimum": 1, "maximum": 12},
+}
+
 TOOLS = [
     {
         "type": "function",
@@ -258,6 +404,7 @@ TOOLS = [
                 "name_contains": {"type": "string"},
                 "limit": {"type": "integer", "minimum": 1, "maximum": 25},
                 "sport": {"type": "string", "enum": ["handball", "tennis", "both"]},
+                **INFO_FILTER_PARAMS,
             },
             "required": ["name_contains"],
         },
@@ -273,6 +420,7 @@ TOOLS = [
                 "lon": {"type": "number"},
                 "limit": {"type": "integer", "minimum": 1, "maximum": 10},
                 "sport": {"type": "string", "enum": ["handball", "tennis", "both"]},
+                **INFO_FILTER_PARAMS,
             },
             "required": ["lat", "lon"],
         },
@@ -287,111 +435,261 @@ TOOLS = [
                 "address": {"type": "string"},
                 "limit": {"type": "integer", "minimum": 1, "maximum": 10},
                 "sport": {"type": "string", "enum": ["handball", "tennis", "both"]},
+                **INFO_FILTER_PARAMS,
             },
             "required": ["address"],
         },
     },
+    {
+        "type": "function",
+        "name": "group_meeting_point",
+        "description": "Find courts that are convenient for a group of people starting from different places. "
+        "objective 'sum' minimizes total travel, 'max' minimizes the longest trip.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "addresses": {"type": "array", "items": {"type": "string"}},
+                "points": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"lat": {"type": "number"}, "lon": {"type": "number"}},
+                        "required": ["lat", "lon"],
+                    },
+                },
+                "limit": {"type": "integer", "minimum": 1, "maximum": 10},
+                "sport": {"type": "string", "enum": ["handball", "tennis", "both"]},
+                "objective": {"type": "string", "enum": ["sum", "max"]},
+            },
+            "required": [],
+        },
+    },
 ]
 
 
-def _run_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+TOOL_NAMES = {t["name"] for t in TOOLS}
+
+
+def _run_tool(name: str, args: Dict[str, Any], indexes: Indexes) -> Dict[str, Any]:
     if name == "dataset_summary":
-        return tool_dataset_summary()
+        return tool_dataset_summary(**args, indexes=indexes)
     if name == "courts_by_borough":
-        return tool_courts_by_borough(**args)
+        return tool_courts_by_borough(**args, indexes=indexes)
     if name == "search_courts":
-        return tool_search_courts(**args)
+        return tool_search_courts(**args, indexes=indexes)
     if name == "nearest_courts":
-        return tool_nearest_courts(**args)
+        return tool_nearest_courts(**args, indexes=indexes)
     if name == "nearest_to_address":
-        return tool_nearest_to_address(**args)
+        return tool_nearest_to_address(**args, indexes=indexes)
+    if name == "group_meeting_point":
+        return tool_group_meeting_point(**args, indexes=indexes)
     return {"error": f"Unknown tool: {name}"}
 
 
 @router.get("/agent_health")
-def agent_health():
-    _ = _load_df("handball")
-    _ = _load_df("tennis")
-    return {"status": "ok"}
+def agent_health(request: Request):
+    courts = {sport: len(idx) for sport, idx in _indexes(request.app).items()}
+    return {"status": "ok", "courts": courts, "admission": _admission().status()}
+
+
+AGENT_SYSTEM_PROMPT = (
+    "You are an assistant for a NYC Handball + Tennis Courts web app. "
+    "Answer using the dataset tools when relevant. "
+    "Be concise, correct, and include numbers when asked. "
+    "If the user says 'courts' without specifying sport, ask: "
+    "'Do you mean handball courts to practice against a wall, or tennis courts?' "
+    "If the user doesn't specify sport but wants court results, default to sport=both. "
+    "If the user's request is ambiguous, ask a brief follow-up question. "
+    "If the user asks something unrelated to the dataset, say you can only answer court/dataset questions and suggest a relevant example. "
+    "Tennis filters: lessons offered, indoor (bubbled courts in winter), indoor_month (indoor courts open that month)."
+)
+
+# Explains the compact encoding produced by app.tool_encoding; sent only once a
+# tool result holds a table, so answers without one don't pay for it
+TOOL_TABLE_HINT = (
+    "Row lists in tool results are tables: 'cols' names the fields of each row, "
+    "'const' holds values shared by all rows, 'truncated' counts omitted rows."
+)
+
+FINAL_INSTRUCTIONS = "Answer the user clearly and concisely. Use the tool results. Do not mention tool call IDs."
+
+SPORT_TOOLS = {
+    "dataset_summary",
+    "courts_by_borough",
+    "search_courts",
+    "nearest_courts",
+    "nearest_to_address",
+    "group_meeting_point",
+}
+
+
+def _function_calls(resp) -> List[Any]:
+    return [item for item in (getattr(resp, "output", None) or []) if getattr(item, "type", None) == "function_call"]
+
+
+def _tool_outputs(calls: List[Any], ambiguous_sport: bool, token_budget: int, indexes: Indexes) -> List[Dict[str, Any]]:
+    """
+    Execute the model's function calls and encode their results compactly.
+
+    Inputs:
+        calls: (list) function_call items from a model response
+        ambiguous_sport: (bool) default missing sport args to "both"
+        token_budget: (int) per-result token budget for the compact encoding
+        indexes: (dict) the app's live court index per sport
+
+    Returns:
+        (list) function_call_output items to append to the model input
+    """
+    outputs = []
+    for item in calls:
+        try:
+            args = json.loads(item.arguments or "{}")
+        except json.JSONDecodeError:
+            args = None
+        if not isinstance(args, dict):
+            result = {"error": "Tool arguments must be a JSON object."}
+        else:
+            if ambiguous_sport and "sport" not in args and item.name in SPORT_TOOLS:
+                args["sport"] = "both"
+            try:
+                with span(f"agent.tool.{item.name}" if item.name in TOOL_NAMES else "agent.tool.unknown"):
+                    result = _run_tool(item.name, args, indexes)
+            except TypeError as e:
+                result = {"error": f"Invalid arguments for {item.name}: {e}"}
+        if isinstance(result, dict) and result.get("error"):
+            logger.info("agent tool error name=%s error=%s", item.name, result.get("error"))
+
+        outputs.append(
+            {
+                "type": "function_call_output",
+                "call_id": item.call_id,
+                "output": compact_tool_result(result, token_budget),
+            }
+        )
+    return outputs
+
+
+def _create_response(client: "OpenAI", model: str, input_list: List[Any], timeout: float, final: bool):
+    kwargs: Dict[str, Any] = {"model": model, "tools": TOOLS, "input": input_list}
+    if final:
+        kwargs["tool_choice"] = "none"
+        kwargs["instructions"] = FINAL_INSTRUCTIONS
+    with span("agent.model"):
+        # timeout is what is left of the request deadline: no SDK retries,
+        # which would each get the full timeout again
+        return client.with_options(timeout=timeout, max_retries=0).responses.create(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def _admission() -> AdmissionQueue:
+    settings = get_settings()
+    return AdmissionQueue(
+        "agent",
+        max_concurrency=settings.agent_max_concurrency,
+        max_queue=settings.agent_max_queue,
+        max_per_client=settings.agent_max_queued_per_client,
+        min_service_sec=settings.agent_min_service_sec,
+        initial_service_sec=settings.agent_service_sec,
+    )
+
+
+@lru_cache(maxsize=1)
+def _executor() -> ThreadPoolExecutor:
+    # Own threads, one per admission slot: blocking model calls never take the
+    # shared thread pool that the cheap endpoints run on. Created on first use
+    # so pre-forked workers each start their own.
+    return ThreadPoolExecutor(max_workers=_admission().max_concurrency, thread_name_prefix="agent")
 
 
 @router.post("/agent")
-async def agent(request: AgentRequest):
+async def agent(request: AgentRequest, http_request: Request):
     query = (request.query or "").strip()
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
 
+    settings = get_settings()
+    deadline = time.monotonic() + settings.agent_deadline_sec
+    client = http_request.client.host if http_request.client else "unknown"
+    try:
+        async with _admission().slot(client, deadline):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_executor(), _run_agent, query, deadline, _indexes(http_request.app))
+    except AdmissionRejected as e:
+        logger.debug("agent: shed reason=%s client=%s retry_after=%s", e.reason, client, e.retry_after)
+        detail = (
+            "Too many assistant requests from this client. Please retry shortly."
+            if e.status_code == 429
+            else "Assistant is busy. Please retry shortly."
+        )
+        raise HTTPException(status_code=e.status_code, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def _run_agent(query: str, deadline: float, indexes: Indexes) -> Dict[str, str]:
+    """
+    The model/tool loop for one query. Blocking (sync OpenAI client, pandas
+    tools, geocoding), so it runs on the agent executor.
+
+    Inputs:
+        query: (str) the user's question
+        deadline: (float) time.monotonic() by which to answer; time spent
+                  queued for admission has already been taken from it
+        indexes: (dict) the app's live court index per sport, so tool
+                 results include admin edits
+
+    Returns:
+        (dict) {"text": answer}
+    """
     q_lower = query.lower()
     ambiguous_sport = ("court" in q_lower) and ("handball" not in q_lower) and ("tennis" not in q_lower)
 
+    settings = get_settings()
     client = _get_client()
 
-    input_list: List[Dict[str, Any]] = [
-        {
-            "role": "system",
-            "content": (
-                "You are an assistant for a NYC Handball + Tennis Courts web app. "
-                "Answer using the dataset tools when relevant. "
-                "Be concise, correct, and include numbers when asked. "
-                "If the user says 'courts' without specifying sport, ask: "
-                "'Do you mean handball courts to practice against a wall, or tennis courts?' "
-                "If the user doesn't specify sport but wants court results, default to sport=both. "
-                "If the user's request is ambiguous, ask a brief follow-up question. "
-                "If the user asks something unrelated to the dataset, say you can only answer court/dataset questions and suggest a relevant example."
-            ),
-        },
+    input_list: List[Any] = [
+        {"role": "system", "content": AGENT_SYSTEM_PROMPT},
         {"role": "user", "content": query},
     ]
 
-    # Ask model
-    try:
-        resp = client.responses.create(
-            model="gpt-5-mini",
-            tools=TOOLS,
-            input=input_list,
-        )
-    except Exception as e:
-        logger.exception("agent: initial model call failed")
-        raise HTTPException(status_code=503, detail="Assistant is temporarily unavailable. Please try again.") from e
-
-    # Add model output to the running input list
-    input_list += resp.output
-
-    # Execute any tool calls
-    for item in resp.output:
-        if getattr(item, "type", None) == "function_call":
-            args = json.loads(item.arguments or "{}")
-            if ambiguous_sport and "sport" not in args and item.name in {
-                "dataset_summary",
-                "courts_by_borough",
-                "search_courts",
-                "nearest_courts",
-                "nearest_to_address",
-            }:
-                args["sport"] = "both"
-            result = _run_tool(item.name, args)
-            if isinstance(result, dict) and result.get("error"):
-                logger.info("agent tool error name=%s error=%s", item.name, result.get("error"))
-
-            input_list.append(
-                {
-                    "type": "function_call_output",
-                    "call_id": item.call_id,
-                    "output": json.dumps(result),
-                }
-            )
-
-    # Ask model again to produce final user-facing answer
-    try:
-        final = client.responses.create(
-            model="gpt-5-mini",
-            tools=TOOLS,
-            input=input_list,
-            instructions="Answer the user clearly and concisely. Use the tool results. Do not mention tool call IDs.",
-        )
-    except Exception as e:
-        logger.exception("agent: final model call failed")
-        raise HTTPException(status_code=503, detail="Assistant is temporarily unavailable. Please try again.") from e
+    # Let the model call tools for up to agent_max_steps rounds; when it is
+    # still calling tools after that (or the deadline is hit) one more,
+    # tool-free call makes it answer with what it has.
+    max_steps = max(0, settings.agent_max_steps)
+    final = None
+    hinted = False
+    for step in range(max_steps):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            resp = _create_response(client, settings.agent_model, input_list, remaining, final=False)
+        except Exception as e:
+            logger.exception("agent: model call failed step=%s", step)
+            raise HTTPException(status_code=503, detail="Assistant is temporarily unavailable. Please try again.") from e
+
+        calls = _function_calls(resp)
+        if not calls:
+            final = resp
+            break
+
+        # Add model output and tool results to the running input list
+        outputs = _tool_outputs(calls, ambiguous_sport, settings.agent_tool_token_budget, indexes)
+        input_list += resp.output
+        input_list += outputs
+        if not hinted and any(has_table(o["output"]) for o in outputs):
+            input_list.append({"role": "system", "content": TOOL_TABLE_HINT})
+            hinted = True
+
+    if final is None:
+        # Out of steps or time: one last tool-free call to produce the answer
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning("agent: deadline exceeded before final answer")
+            raise HTTPException(status_code=504, detail="Assistant took too long to respond. Please try again.")
+        try:
+            final = _create_response(client, settings.agent_model, input_list, remaining, final=True)
+        except Exception as e:
+            logger.exception("agent: final model call failed")
+            raise HTTPException(status_code=503, detail="Assistant is temporarily unavailable. Please try again.") from e
 
     text = _extract_output_text(final)
     if not text:
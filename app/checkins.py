@@ -0,0 +1,206 @@
+'''
+"I'm here" check-ins and a decayed crowding estimate per court.
+
+Every court gets a slot in two preallocated arrays of shape (slots, buckets):
+counts holds check-ins per time bucket and epochs the bucket number each
+entry was written for, so together they form one ring buffer per court. A
+check-in is a handful of array writes (reset the entry if it belongs to an
+older lap of the ring, then add), with no per-event objects.
+
+Occupancy is the sum of bucket counts weighted by 0.5 ** (age / half_life),
+i.e. players are assumed to leave with a constant hazard. Readers never take
+the store lock: a read that races a write can be off by the in-flight
+check-in, which is fine for a crowding signal and keeps /nearest from
+waiting on check-in traffic.
+
+The arrays are snapshotted to disk periodically and reloaded at start, so a
+restart does not reset the signal.
+'''
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from app.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+CHECKINS = counter("checkins_total", "Court check-ins received.", ("sport",))
+CHECKIN_COURTS = gauge("checkin_courts", "Courts with a check-in slot.")
+
+# Players per court above which a court counts as busy / crowded
+CROWDING_LEVELS = ((1.0, "quiet"), (3.0, "busy"), (float("inf"), "crowded"))
+
+
+def crowding_level(players_per_court: float) -> str:
+    for limit, label in CROWDING_LEVELS:
+        if players_per_court < limit:
+            return label
+    return CROWDING_LEVELS[-1][1]
+
+
+class CheckinStore:
+    '''
+    Attributes:
+        bucket_sec (float): Width of one time bucket.
+        buckets (int): Buckets kept per court; older check-ins are dropped.
+        half_life_sec (float): Time for a check-in's weight to halve.
+        snapshot_path (Path): Where snapshots are written (None disables them).
+    '''
+
+    def __init__(
+        self,
+        bucket_sec: float = 60.0,
+        buckets: int = 60,
+        half_life_sec: float = 900.0,
+        snapshot_path: Optional[Path] = None,
+        capacity: int = 1024,
+    ):
+        self.bucket_sec = bucket_sec
+        self.buckets = buckets
+        self.half_life_sec = half_life_sec
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+
+        self._slots: Dict[str, int] = {}
+        self._counts = np.zeros((capacity, buckets), dtype=np.uint32)
+        self._epochs = np.full((capacity, buckets), -1, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._snapshotter = None
+        self._stop = threading.Event()
+
+    def _slot(self, key: str) -> int:
+        '''Slot for a court key, allocated on first use (call with the lock held).'''
+
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        slot = len(self._slots)
+        if slot == len(self._counts):
+            # Grow by doubling; readers keep the old arrays until they re-read them
+            self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+            self._epochs = np.concatenate([self._epochs, np.full_like(self._epochs, -1)])
+        self._slots[key] = slot
+        CHECKIN_COURTS.set(len(self._slots))
+        return slot
+
+    def checkin(self, key: str, players: int = 1, now: Optional[float] = None) -> None:
+        '''
+        Record players arriving at a court.
+        Inputs:
+            key: str - Court key ("<sport>:<Court_Id>").
+            players: int - Number of players checking in together.
+            now: float - Unix time, defaults to the current time.
+        '''
+
+        bucket = int((time.time() if now is None else now) // self.bucket_sec)
+        col = bucket % self.buckets
+        with self._lock:
+            slot = self._slot(key)
+            if self._epochs[slot, col] != bucket:
+                self._epochs[slot, col] = bucket
+                self._counts[slot, col] = 0
+            self._counts[slot, col] += players
+        CHECKINS.inc(sport=key.split(":", 1)[0])
+
+    def occupancy(self, keys: Iterable[str], now: Optional[float] = None) -> np.ndarray:
+        '''
+        Decayed number of players currently at each court.
+        Inputs:
+            keys: iterable of str - Court keys.
+            now: float - Unix time, defaults to the current time.
+        Returns:
+            np.ndarray[float] - One estimate per key (0 for courts without check-ins).
+        '''
+
+        slots = np.array([self._slots.get(k, -1) for k in keys], dtype=np.intp)
+        out = np.zeros(len(slots))
+        known = slots >= 0
+        if not known.any():
+            return out
+
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_sec)
+        counts, epochs = self._counts, self._epochs
+        age = bucket - epochs[slots[known]]
+        live = (age >= 0) & (age < self.buckets)
+        # Age measured from the middle of each bucket
+        weight = np.where(live, 0.5 ** ((age + 0.5) * self.bucket_sec / self.half_life_sec), 0.0)
+        out[known] = (counts[slots[known]] * weight).sum(axis=1)
+        return out
+
+    # Snapshots
+
+    def save(self) -> None:
+        '''Write the store to snapshot_path atomically.'''
+
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            n = len(self._slots)
+            keys = np.array(list(self._slots), dtype=str)
+            counts = self._counts[:n].copy()
+            epochs = self._epochs[:n].copy()
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temp name: several prefork workers may save at once
+        tmp = self.snapshot_path.with_suffix(f".{os.getpid()}.tmp.npz")
+        np.savez(tmp, keys=keys, counts=counts, epochs=epochs, bucket_sec=self.bucket_sec)
+        os.replace(tmp, self.snapshot_path)
+
+    def load(self) -> bool:
+        '''
+        Restore a snapshot written by save(). Snapshots taken with a different
+        bucket width or ring size are ignored.
+        Returns:
+            bool - True if a snapshot was loaded.
+        '''
+
+        if not self.snapshot_path or not self.snapshot_path.exists():
+            return False
+        try:
+            with np.load(self.snapshot_path) as snap:
+                keys, counts, epochs = snap["keys"], snap["counts"], snap["epochs"]
+                bucket_sec = float(snap["bucket_sec"])
+        except Exception:
+            logger.exception("checkin snapshot unreadable path=%s", self.snapshot_path)
+            return False
+        if bucket_sec != self.bucket_sec or counts.shape[1:] != (self.buckets,):
+            logger.warning("checkin snapshot layout changed, ignoring path=%s", self.snapshot_path)
+            return False
+
+        with self._lock:
+            for key, c, e in zip(keys, counts, epochs):
+                slot = self._slot(str(key))
+                self._counts[slot] = c
+                self._epochs[slot] = e
+        logger.info("checkin snapshot loaded courts=%d path=%s", len(keys), self.snapshot_path)
+        return True
+
+    def start_snapshots(self, interval_sec: float) -> None:
+        '''Save a snapshot every interval_sec seconds in a background thread.'''
+
+        if not self.snapshot_path or interval_sec <= 0 or self._snapshotter is not None:
+            return
+
+        def _run():
+            while not self._stop.wait(interval_sec):
+                try:
+                    self.save()
+                except Exception:
+                    logger.exception("checkin snapshot failed path=%s", self.snapshot_path)
+
+        self._snapshotter = threading.Thread(target=_run, name="checkin-snapshots", daemon=True)
+        self._snapshotter.start()
+
+    def stop(self) -> None:
+        '''Stop the snapshot thread and write a final snapshot.'''
+
+        self._stop.set()
+        if self._snapshotter is not None:
+            self.save()
@@ -0,0 +1,153 @@
+'''
+Circuit breaker for calls to flaky upstream services.
+
+The breaker watches a rolling window of recent calls. When too many of them
+fail or are slow it opens and callers fail fast for open_sec seconds; after
+that a few probe calls are let through (half-open) and, depending on how
+they go, the breaker closes again or re-opens.
+'''
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+from app.metrics import counter, gauge
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge values for circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = gauge("circuit_state", "Circuit breaker state (0=closed, 1=half-open, 2=open).", ("circuit",))
+CIRCUIT_TRANSITIONS = counter("circuit_transitions_total", "Circuit breaker state changes.", ("circuit", "state"))
+CIRCUIT_REJECTED = counter("circuit_rejected_total", "Calls rejected because the circuit was open.", ("circuit",))
+
+
+class CircuitBreaker:
+    '''
+    Rolling-window circuit breaker.
+
+    Attributes:
+        name (str): Label used in metrics and logs.
+        window (int): Number of recent calls considered.
+        min_calls (int): Calls needed in the window before the breaker can open.
+        failure_rate (float): Share of failed calls that opens the circuit.
+        slow_call_sec (float): Calls slower than this count as slow.
+        slow_rate (float): Share of slow calls that opens the circuit.
+        open_sec (float): How long the circuit stays open before probing.
+        half_open_probes (int): Successful probes needed to close again.
+
+    Example:
+        if breaker.allow():
+            start = time.monotonic()
+            try:
+                result = call()
+            except Exception:
+                breaker.record(False, time.monotonic() - start)
+                raise
+            breaker.record(True, time.monotonic() - start)
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_sec: float = 3.0,
+        slow_rate: float = 0.5,
+        open_sec: float = 30.0,
+        half_open_probes: int = 2,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_sec = slow_call_sec
+        self.slow_rate = slow_rate
+        self.open_sec = open_sec
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window)  # (ok, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED], circuit=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], circuit=self.name)
+        CIRCUIT_TRANSITIONS.inc(circuit=self.name, state=state)
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state in (HALF_OPEN, CLOSED):
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._calls.clear()
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_sec:
+            self._transition(HALF_OPEN)
+
+    def allow(self) -> bool:
+        '''
+        Ask whether a call may go upstream now.
+        Returns:
+            bool - False when the caller should fail fast. Every True must be
+            followed by exactly one record() call.
+        '''
+
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            CIRCUIT_REJECTED.inc(circuit=self.name)
+            return False
+
+    def record(self, ok: bool, duration_sec: float) -> None:
+        '''
+        Report the outcome of an allowed call.
+        Inputs:
+            ok: bool - False if the call raised or the upstream errored.
+            duration_sec: float - How long the call took.
+        '''
+
+        slow = duration_sec >= self.slow_call_sec
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                return
+
+            self._calls.append((ok, slow))
+            n = len(self._calls)
+            if n < self.min_calls:
+                return
+            failures = sum(1 for c_ok, _ in self._calls if not c_ok)
+            slows = sum(1 for _, c_slow in self._calls if c_slow)
+            if failures / n >= self.failure_rate or slows / n >= self.slow_rate:
+                self._transition(OPEN)
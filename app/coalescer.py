@@ -0,0 +1,104 @@
+'''
+Micro-batching for /nearest.
+
+Requests that arrive within a short window are collected per group (sport)
+and answered by one call to run_batch in the thread pool, so N concurrent
+requests cost one vectorized BallTree query and one DataFrame slice instead
+of N of each. A batch is flushed when its window expires or when it reaches
+max_batch requests, so the extra latency a request can see is bounded by
+the window (plus the batch's own run time). A request that finds no batch of
+its group running is sent straight away: waiting only pays off when
+requests are already queueing behind one another, so an idle server adds no
+latency.
+
+Everything except run_batch happens on the event loop, so the pending lists
+need no lock.
+'''
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import counter, histogram
+
+COALESCED_BATCHES = counter("nearest_batches_total", "Coalesced /nearest batches run.", ("sport", "trigger"))
+COALESCED_SIZE = histogram(
+    "nearest_batch_size", "Requests per coalesced /nearest batch.", ("sport",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+# (lat, lon, k) for one request
+Item = Tuple[float, float, int]
+
+
+class Coalescer:
+    '''
+    Attributes:
+        run_batch (callable): (group, items) -> one result per item, called
+                              in the thread pool.
+        window_sec (float): How long the first request of a batch waits for
+                            others.
+        max_batch (int): Batch size that triggers an immediate flush.
+    '''
+
+    def __init__(self, run_batch: Callable[[str, Sequence[Item]], List[Any]], window_ms: float = 1.0, max_batch: int = 64):
+        self.run_batch = run_batch
+        self.window_sec = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[str, List[Tuple[Item, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Dict[str, int] = {}
+
+    async def submit(self, group: str, lat: float, lon: float, k: int) -> Any:
+        '''
+        Queue one lookup and wait for its batch.
+        Inputs:
+            group: str - Batch key (the sport); only items of one group share a batch.
+            lat, lon: float - Query point.
+            k: int - Number of results wanted.
+        Returns:
+            The result run_batch produced for this item.
+        '''
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(group, [])
+        batch.append(((lat, lon, k), fut))
+        if len(batch) >= self.max_batch:
+            self._flush(group, "size")
+        elif not self._running.get(group):
+            self._flush(group, "idle")
+        elif len(batch) == 1:
+            self._timers[group] = loop.call_later(self.window_sec, self._flush, group, "window")
+        return await fut
+
+    def _flush(self, group: str, trigger: str) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        if batch:
+            COALESCED_BATCHES.inc(sport=group, trigger=trigger)
+            COALESCED_SIZE.observe(len(batch), sport=group)
+            # Counted here rather than in _run so a request later in this same
+            # loop iteration already sees the batch as running
+            self._running[group] = self._running.get(group, 0) + 1
+            asyncio.ensure_future(self._run(group, batch))
+
+    async def _run(self, group: str, batch: List[Tuple[Item, asyncio.Future]]) -> None:
+        try:
+            results = await run_in_threadpool(self.run_batch, group, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._running[group] -= 1
+        for (_, fut), result in zip(batch, results):
+            # A client that disconnected has had its future cancelled
+            if not fut.done():
+                fut.set_result(result)
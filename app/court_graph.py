@@ -0,0 +1,111 @@
+'''
+Precomputed k-nearest-neighbour graph over all courts, across sports.
+
+Built once per dataset load with a single batched BallTree query and stored as
+compact arrays, so "courts near this court" is an O(k) lookup.
+
+Court_Id is a parks department property id, not a court id: the same id shows
+up in both sports and, for a couple of parks, on more than one handball row.
+Nodes are therefore keyed by "<sport>:<Court_Id>"; a key that matches several
+rows resolves to the first, and rows sharing the key are never listed as each
+other's neighbours.
+'''
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+
+
+def court_key(sport: str, court_id) -> str:
+    return f"{sport}:{court_id}"
+
+
+class CourtGraph:
+    '''
+    Attributes:
+        k (int): Neighbours stored per court.
+        frames (dict): Sport -> court DataFrame the node rows point into.
+        sports (np.ndarray): Sport names, indexed by node_sport.
+        node_sport (np.ndarray[int8]): Sport of each node.
+        node_row (np.ndarray[int32]): Row of each node in its sport's DataFrame.
+        neighbors (np.ndarray[int32]): (nodes, k) neighbour node ids, nearest first, -1 padded.
+        distances_km (np.ndarray[float32]): (nodes, k) matching distances.
+    '''
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], k: int = 10):
+        self.k = k
+        self.frames = frames
+        self.sports = np.array(list(frames))
+
+        coords, node_sport, node_row, keys = [], [], [], []
+        for s, (sport, df) in enumerate(frames.items()):
+            coords.append(df[["Lat", "Lon"]].to_numpy(dtype=float))
+            node_sport.append(np.full(len(df), s, dtype=np.int8))
+            node_row.append(np.arange(len(df), dtype=np.int32))
+            keys += [court_key(sport, cid) for cid in df["Court_Id"].astype(str)]
+        coords_rad = np.radians(np.concatenate(coords))
+        self.node_sport = np.concatenate(node_sport)
+        self.node_row = np.concatenate(node_row)
+
+        self.key_to_node: Dict[str, int] = {}
+        for node, key in enumerate(keys):
+            self.key_to_node.setdefault(key, node)
+        # Nodes sharing a key share a group id, so they can be excluded together
+        group = np.array([self.key_to_node[key] for key in keys], dtype=np.int32)
+
+        n = len(group)
+        extra = int(np.bincount(group).max()) if n else 1
+        kq = min(n, k + extra)
+        self.neighbors = np.full((n, k), -1, dtype=np.int32)
+        self.distances_km = np.full((n, k), np.nan, dtype=np.float32)
+        if not n:
+            return
+
+        from sklearn.neighbors import BallTree
+
+        dist, idx = BallTree(coords_rad, metric="haversine").query(coords_rad, k=kq)
+        keep = group[idx] != group[:, None]
+        # Stable compaction of the kept columns to the left of each row
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :k]
+        filled = np.take_along_axis(keep, order, axis=1)
+        cols = order.shape[1]
+        self.neighbors[:, :cols] = np.where(filled, np.take_along_axis(idx, order, axis=1), -1)
+        self.distances_km[:, :cols] = np.where(filled, np.take_along_axis(dist, order, axis=1) * EARTH_RADIUS_KM, np.nan)
+
+    def find(self, court_id: str, sport: Optional[str] = None) -> Tuple[Optional[int], List[str]]:
+        '''
+        Resolve a court id to a node.
+        Inputs:
+            court_id: str - Court_Id as shown in results.
+            sport: str - Optional sport, needed when the id exists in several sports.
+        Returns:
+            (node, sports) - node is None when the id is unknown or ambiguous;
+            sports lists the sports the id was found in.
+        '''
+
+        sports = [s for s in self.sports if court_key(s, court_id) in self.key_to_node]
+        if sport:
+            sports = [s for s in sports if s == sport]
+        if len(sports) != 1:
+            return None, sports
+        return self.key_to_node[court_key(sports[0], court_id)], sports
+
+    def row(self, node: int) -> Tuple[str, pd.Series]:
+        sport = str(self.sports[self.node_sport[node]])
+        return sport, self.frames[sport].iloc[int(self.node_row[node])]
+
+    def neighbors_of(self, node: int, limit: int) -> List[Tuple[int, float]]:
+        '''
+        Neighbours of a node, nearest first.
+        Returns:
+            list of (node, distance_km)
+        '''
+
+        nbrs = self.neighbors[node, :limit]
+        dists = self.distances_km[node, :limit]
+        return [(int(j), float(d)) for j, d in zip(nbrs, dists) if j >= 0]
@@ -0,0 +1,233 @@
+'''
+Typed fields extracted from the tennis Info column.
+
+Info is free-form HTML from NYC Parks ("Lessons Offered", indoor bubble
+seasons, booking links). The ETL (app/data_prep.py) parses it once into
+columns stored in the clean CSV, so filters and the agent read small typed
+values instead of scanning or shipping the HTML:
+
+    Lessons            bool  - lessons are mentioned
+    Permit_Required    bool  - a Parks tennis permit is mentioned
+    Indoor_Courts      int   - courts bubbled or rentable in the indoor
+                               season (0 if none)
+    Indoor_From_Month  int   - first and last month (1-12) of the indoor
+    Indoor_To_Month          season; empty if there is none. Holidays
+                               count as their month (Columbus Day ->
+                               October)
+    Booking_Url        str   - first absolute link (booking or the
+                               operator's site); empty if none
+'''
+
+from __future__ import annotations
+
+import html
+import re
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+INFO_COLUMNS = ("Lessons", "Permit_Required", "Indoor_Courts", "Indoor_From_Month", "Indoor_To_Month", "Booking_Url")
+
+MONTHS = {
+    name: i + 1
+    for i, names in enumerate((
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+        ("july", "jul"), ("august", "aug"), ("september", "sept", "sep"), ("october", "oct"), ("november", "nov"),
+        ("december", "dec"),
+    ))
+    for name in names
+}
+HOLIDAY_MONTHS = {"memorial day": 5, "labor day": 9, "columbus day": 10, "thanksgiving": 11}
+NUMBER_WORDS = {
+    w: i for i, w in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+        "sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+
+_TAG = re.compile(r"<[^>]+>")
+_HREF = re.compile(r"""href\s*=\s*["']?\s*([^"'\s>]+)""", re.I)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_SEASON = re.compile(r"indoor season\s*\(([^)]*)\)", re.I)
+_MONTH_OR_HOLIDAY = re.compile(r"\b(" + "|".join(sorted(list(MONTHS) + list(HOLIDAY_MONTHS), key=len, reverse=True)) + r")\b", re.I)
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+# "10 courts are bubbled", "11 bubbled courts", "11 courts are available to rent"
+_INDOOR_COURTS = re.compile(_NUMBER + r"\s+(?:bubbled\s+)?courts\b(?=[^.]*\b(?:bubbled|rent))", re.I)
+
+
+def info_text(info) -> str:
+    '''Info as plain text: tags removed, entities decoded, spaces collapsed.'''
+
+    if not isinstance(info, str):
+        return ""
+    return " ".join(html.unescape(_TAG.sub(" ", info)).split())
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token.lower()]
+
+
+def extract_info(info) -> dict:
+    '''
+    Parse one Info value.
+    Inputs:
+        info: str or NaN - Raw Info HTML.
+    Returns:
+        dict - One value per INFO_COLUMNS entry (None for an unknown month).
+    '''
+
+    text = info_text(info)
+    out = {
+        "Lessons": bool(re.search(r"\blessons?\b", text, re.I)),
+        "Permit_Required": bool(re.search(r"\bpermit\b", text, re.I)),
+        "Indoor_Courts": 0,
+        "Indoor_From_Month": None,
+        "Indoor_To_Month": None,
+        "Booking_Url": "",
+    }
+    urls = [u.strip() for u in _HREF.findall(info if isinstance(info, str) else "") if u.lower().startswith(("http://", "https://"))]
+    if urls:
+        out["Booking_Url"] = urls[0]
+
+    for sentence in _SENTENCE.split(text):
+        if "indoor season" not in sentence.lower():
+            continue
+        season = _SEASON.search(sentence)
+        if season:
+            months = [MONTHS.get(m.lower()) or HOLIDAY_MONTHS[m.lower()] for m in _MONTH_OR_HOLIDAY.findall(season.group(1))]
+            if months:
+                out["Indoor_From_Month"], out["Indoor_To_Month"] = months[0], months[-1]
+        courts = _INDOOR_COURTS.search(sentence)
+        if courts:
+            out["Indoor_Courts"] = _number(courts.group(1))
+        break
+    return out
+
+
+def add_info_columns(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    df with the INFO_COLUMNS parsed from its Info column (replacing any
+    already there). Months use the nullable Int64 dtype.
+    '''
+
+    parsed = pd.DataFrame([extract_info(v) for v in (df["Info"] if "Info" in df.columns else [None] * len(df))], index=df.index)
+    if parsed.empty:
+        parsed = pd.DataFrame({c: pd.Series(dtype=object) for c in INFO_COLUMNS}, index=df.index)
+    out = df.drop(columns=[c for c in INFO_COLUMNS if c in df.columns])
+    for col in INFO_COLUMNS:
+        values = parsed[col]
+        if col in ("Indoor_From_Month", "Indoor_To_Month"):
+            values = values.astype("Int64")
+        elif col in ("Lessons", "Permit_Required"):
+            values = values.astype(bool)
+        elif col == "Indoor_Courts":
+            values = values.astype(np.int64)
+        out[col] = values
+    return out
+
+
+def _value(col: str, v):
+    # JSON-ready: NaN / NA (courts without the fields) -> None
+    if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if col == "Booking_Url":
+        return str(v)
+    if col in ("Lessons", "Permit_Required"):
+        return bool(v)
+    return int(v)
+
+
+def info_values(r: dict) -> dict:
+    '''A row dict's INFO_COLUMNS as Court fields; {} if it has none.'''
+
+    return {col: _value(col, r[col]) for col in INFO_COLUMNS if col in r}
+
+
+def info_arrays(rows: pd.DataFrame) -> dict:
+    '''
+    rows' INFO_COLUMNS as object arrays of Python values (None where
+    missing), which msgpack and Arrow encode as nullable columns.
+    '''
+
+    return {
+        col: np.array([_value(col, v) for v in rows[col].tolist()], dtype=object)
+        for col in INFO_COLUMNS if col in rows.columns
+    }
+
+
+def has_filters(lessons: Optional[bool] = None, permit: Optional[bool] = None, indoor: Optional[bool] = None, indoor_month: Optional[int] = None) -> bool:
+    return any(v is not None for v in (lessons, permit, indoor, indoor_month))
+
+
+def info_mask(
+    rows: pd.DataFrame,
+    lessons: Optional[bool] = None,
+    permit: Optional[bool] = None,
+    indoor: Optional[bool] = None,
+    indoor_month: Optional[int] = None,
+) -> np.ndarray:
+    '''
+    Rows matching every given filter; None means "any". Rows without the
+    columns (handball, or courts added through the admin API) only match
+    filters asking for False.
+    Inputs:
+        lessons: bool - Lessons offered (or not).
+        permit: bool - Parks permit mentioned (or not).
+        indoor: bool - Has an indoor season with courts (or not).
+        indoor_month: int - 1-12; the indoor season covers this month
+                            (seasons may wrap the new year).
+    Returns:
+        np.ndarray[bool]
+    '''
+
+    def flag(col: str) -> np.ndarray:
+        if col not in rows.columns:
+            return np.zeros(len(rows), dtype=bool)
+        return rows[col].fillna(False).to_numpy().astype(bool)
+
+    mask = np.ones(len(rows), dtype=bool)
+    if lessons is not None:
+        mask &= flag("Lessons") == lessons
+    if permit is not None:
+        mask &= flag("Permit_Required") == permit
+    has_indoor = (
+        pd.to_numeric(rows["Indoor_Courts"], errors="coerce").fillna(0).to_numpy() > 0
+        if "Indoor_Courts" in rows.columns else np.zeros(len(rows), dtype=bool)
+    )
+    if indoor is not None:
+        mask &= has_indoor == indoor
+    if indoor_month is not None:
+        if "Indoor_From_Month" in rows.columns:
+            start = pd.to_numeric(rows["Indoor_From_Month"], errors="coerce").to_numpy(dtype=float)
+            end = pd.to_numeric(rows["Indoor_To_Month"], errors="coerce").to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                covers = np.where(start <= end, (start <= indoor_month) & (indoor_month <= end), (indoor_month >= start) | (indoor_month <= end))
+            mask &= has_indoor & covers & ~np.isnan(start)
+        else:
+            mask &= False
+    return mask
+
+
+def nearest_matching(query_k: Callable[[int], pd.DataFrame], k: int, total: int, mask_fn: Callable[[pd.DataFrame], np.ndarray]) -> pd.DataFrame:
+    '''
+    The k nearest rows that pass a filter: query_k(n) is asked for 4x more
+    candidates at a time until k pass or every court has been seen.
+    Inputs:
+        query_k: callable - n -> the n nearest rows, nearest first.
+        k: int - Rows wanted.
+        total: int - Courts in the index.
+        mask_fn: callable - rows -> boolean mask of rows to keep.
+    Returns:
+        pd.DataFrame - At most k rows, nearest first.
+    '''
+
+    n = min(max(k, 1), total)
+    while True:
+        rows = query_k(n)
+        kept = rows[mask_fn(rows)]
+        if len(kept) >= k or n >= total:
+            out = kept.head(k).reset_index(drop=True)
+            out.attrs.update(rows.attrs)
+            return out
+        n = min(total, n * 4)
@@ -0,0 +1,335 @@
+'''
+Coverage analytics: distance to the nearest court over a lat/lon grid of NYC.
+
+The grid is processed in bands of rows to bound memory. Within a band, cells
+are grouped into square blocks; one batched BallTree query finds the court
+nearest to each block centre (distance d0), and every court that can be the
+nearest for some cell of the block lies within d0 + 2 * half-diagonal of the
+centre, so a batched query_radius gives a short candidate list per block and
+the exact haversine minimum is taken over those candidates only. Millions of
+cells take seconds instead of one tree query per cell.
+
+Cells are assigned to the borough of the nearest court of any sport. Cells
+whose landmass (app.walking.classify_land) disagrees with that borough, or
+that are more than max_km from any court, are treated as outside the city
+(water, New Jersey) and excluded.
+
+Usage (offline job):
+    python -m app.coverage --sport tennis --cell-m 100 --out data/coverage_tennis
+'''
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import CLEAN_CSV, EARTH_RADIUS_KM, NYC_BBOX, TENNIS_CSV
+from app.walking import LANDS, classify_land
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import BallTree
+
+    from app.nearest import NearestIndex
+
+BLOCK = 32
+BAND_ROWS = 256
+# uint16 metres in the binary grid; this value marks cells outside the city
+NO_DATA = np.iinfo(np.uint16).max
+# Cell sizes served to API clients; any requested size is snapped to one of
+# these, so clients cannot make the cache compute a new grid per value
+CELL_SIZES_M = (25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0)
+BOROUGH_LAND = {
+    "Manhattan": "manhattan",
+    "Bronx": "bronx",
+    "Brooklyn": "long_island",
+    "Queens": "long_island",
+    "Staten Island": "staten_island",
+}
+
+
+def snap_cell_m(cell_m: float) -> float:
+    '''
+    The CELL_SIZES_M entry closest to cell_m (by ratio, so 70 m -> 50 m and
+    80 m -> 100 m).
+    '''
+
+    return min(CELL_SIZES_M, key=lambda size: abs(np.log(cell_m / size)))
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    '''
+    Regular lat/lon grid. Cell (r, c) is centred on
+    (lat_min + (r + 0.5) * lat_step, lon_min + (c + 0.5) * lon_step);
+    row 0 is the southernmost.
+    '''
+
+    lat_min: float
+    lon_min: float
+    lat_step: float
+    lon_step: float
+    rows: int
+    cols: int
+    cell_m: float
+
+    @classmethod
+    def for_cell(cls, cell_m: float, bbox=NYC_BBOX) -> "GridSpec":
+        lat_min, lat_max, lon_min, lon_max = bbox
+        lat_step = cell_m / 110_570.0
+        lon_step = cell_m / (111_320.0 * np.cos(np.radians((lat_min + lat_max) / 2)))
+        rows = int(np.ceil((lat_max - lat_min) / lat_step))
+        cols = int(np.ceil((lon_max - lon_min) / lon_step))
+        return cls(lat_min, lon_min, lat_step, lon_step, rows, cols, float(cell_m))
+
+    def lats(self, start: int = 0, stop: int = None) -> np.ndarray:
+        return self.lat_min + (np.arange(start, self.rows if stop is None else stop) + 0.5) * self.lat_step
+
+    def lons(self) -> np.ndarray:
+        return self.lon_min + (np.arange(self.cols) + 0.5) * self.lon_step
+
+
+def _haversine_min(cells: np.ndarray, courts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    dlat = courts[None, :, 0] - cells[:, None, 0]
+    dlon = courts[None, :, 1] - cells[:, None, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(cells[:, None, 0]) * np.cos(courts[None, :, 0]) * np.sin(dlon / 2) ** 2
+    j = np.argmin(h, axis=1)
+    return 2 * np.arcsin(np.sqrt(np.clip(h[np.arange(len(cells)), j], 0.0, 1.0))), j
+
+
+def nearest_on_grid(tree: BallTree, coords_rad: np.ndarray, spec: GridSpec, block: int = BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Distance to, and index of, the nearest point for every grid cell.
+    Inputs:
+        tree: BallTree - Haversine tree over coords_rad.
+        coords_rad: np.ndarray - (n, 2) court coordinates in radians.
+        spec: GridSpec - Grid to evaluate.
+        block: int - Cells per block side.
+    Returns:
+        (dist_km, idx) - float32 and int32 arrays of shape (rows, cols).
+    '''
+
+    dist_km = np.empty((spec.rows, spec.cols), dtype=np.float32)
+    nearest = np.empty((spec.rows, spec.cols), dtype=np.int32)
+    lons_rad = np.radians(spec.lons())
+    band = max(block, BAND_ROWS // block * block)
+
+    for r0 in range(0, spec.rows, band):
+        lats_rad = np.radians(spec.lats(r0, min(spec.rows, r0 + band)))
+        blocks = [(br, bc) for br in range(0, len(lats_rad), block) for bc in range(0, len(lons_rad), block)]
+
+        # Block centres and the half-diagonal (radians) of each block
+        centres, half_diag = [], []
+        for br, bc in blocks:
+            la, lo = lats_rad[br:br + block], lons_rad[bc:bc + block]
+            centres.append(((la[0] + la[-1]) / 2, (lo[0] + lo[-1]) / 2))
+            corner = np.array([[la[0], lo[0]]])
+            half_diag.append(_haversine_min(corner, np.array([centres[-1]]))[0][0])
+        centres = np.array(centres)
+        half_diag = np.array(half_diag)
+
+        d0, _ = tree.query(centres, k=1)
+        candidates = tree.query_radius(centres, r=d0[:, 0] + 2 * half_diag + 1e-12)
+
+        for (br, bc), cand in zip(blocks, candidates):
+            la, lo = lats_rad[br:br + block], lons_rad[bc:bc + block]
+            cells = np.column_stack([np.repeat(la, len(lo)), np.tile(lo, len(la))])
+            d, j = _haversine_min(cells, coords_rad[cand])
+            dist_km[r0 + br:r0 + br + len(la), bc:bc + len(lo)] = (d * EARTH_RADIUS_KM).reshape(len(la), len(lo))
+            nearest[r0 + br:r0 + br + len(la), bc:bc + len(lo)] = cand[j].reshape(len(la), len(lo))
+    return dist_km, nearest
+
+
+class CoverageGrid:
+    '''
+    Borough assignment and city mask for one grid, shared by all sports.
+
+    Attributes:
+        spec (GridSpec): The grid.
+        boroughs (list of str): Borough names, indexed by borough_code.
+        borough_code (np.ndarray[uint8]): Borough per cell; len(boroughs) marks cells outside the city.
+    '''
+
+    def __init__(self, spec: GridSpec, frames: Dict[str, pd.DataFrame], max_km: float):
+        self.spec = spec
+        courts = pd.concat([df[["Lat", "Lon", "Borough"]] for df in frames.values()], ignore_index=True)
+        coords_rad = np.radians(courts[["Lat", "Lon"]].to_numpy(dtype=float))
+        from sklearn.neighbors import BallTree
+
+        dist_km, nearest = nearest_on_grid(BallTree(coords_rad, metric="haversine"), coords_rad, spec)
+
+        self.boroughs = sorted(b for b in courts["Borough"].dropna().unique() if b in BOROUGH_LAND)
+        court_code = courts["Borough"].map({b: i for i, b in enumerate(self.boroughs)}).fillna(len(self.boroughs)).to_numpy(np.uint8)
+        code = court_code[nearest]
+
+        # Cells must sit on the landmass their borough is on
+        land_of_code = np.array([LANDS.index(BOROUGH_LAND[b]) for b in self.boroughs] + [-1])
+        cell_land = np.empty(code.shape, dtype=np.int64)
+        lons = spec.lons()
+        for r0 in range(0, spec.rows, BAND_ROWS):
+            lats = spec.lats(r0, min(spec.rows, r0 + BAND_ROWS))
+            cell_land[r0:r0 + len(lats)] = classify_land(np.repeat(lats, len(lons)), np.tile(lons, len(lats))).reshape(len(lats), len(lons))
+        outside = (land_of_code[code] != cell_land) | (dist_km > max_km)
+        code[outside] = len(self.boroughs)
+        self.borough_code = code
+
+
+def summarize(dist_km: np.ndarray, grid: CoverageGrid, thresholds=(0.5, 1.0, 2.0)) -> Dict[str, dict]:
+    '''
+    Per-borough distance statistics over the cells inside the city.
+    Returns:
+        dict - Borough -> {cells, mean_km, p50_km, p90_km, max_km, worst, share_over_<t>km}
+        plus an "all" entry.
+    '''
+
+    def _stats(mask: np.ndarray) -> dict:
+        d = dist_km[mask]
+        if not len(d):
+            return {"cells": 0}
+        worst = np.unravel_index(np.argmax(np.where(mask, dist_km, -1)), dist_km.shape)
+        out = {
+            "cells": int(len(d)),
+            "mean_km": round(float(d.mean()), 3),
+            "p50_km": round(float(np.percentile(d, 50)), 3),
+            "p90_km": round(float(np.percentile(d, 90)), 3),
+            "max_km": round(float(d.max()), 3),
+            "worst": {"lat": round(float(grid.spec.lats()[worst[0]]), 5), "lon": round(float(grid.spec.lons()[worst[1]]), 5)},
+        }
+        for t in thresholds:
+            out[f"share_over_{t:g}km"] = round(float((d > t).mean()), 4)
+        return out
+
+    summary = {b: _stats(grid.borough_code == i) for i, b in enumerate(grid.boroughs)}
+    summary["all"] = _stats(grid.borough_code < len(grid.boroughs))
+    return summary
+
+
+def to_uint16_m(dist_km: np.ndarray, grid: CoverageGrid) -> np.ndarray:
+    metres = np.minimum(np.round(dist_km * 1000), NO_DATA - 1).astype(np.uint16)
+    metres[grid.borough_code >= len(grid.boroughs)] = NO_DATA
+    return metres
+
+
+class CoverageCache:
+    '''
+    Cache of computed coverage results keyed by (sport, cell_m). A new cache
+    is created with every dataset load, so results never outlive their data.
+    The default maxsize holds a result for every sport ("both" included) at
+    every CELL_SIZES_M size, so snapped requests are computed at most once.
+    '''
+
+    def __init__(self, indexes: Dict[str, "NearestIndex"], max_km: float, maxsize: int = 3 * len(CELL_SIZES_M)):
+        self.indexes = indexes
+        self.max_km = max_km
+        self.maxsize = maxsize
+        self._grids: "OrderedDict[float, CoverageGrid]" = OrderedDict()
+        self._results: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One computation at a time: they are CPU bound and the results are shared
+        self._compute_lock = threading.Lock()
+
+    def _put(self, store: OrderedDict, key, value) -> None:
+        with self._lock:
+            store[key] = value
+            while len(store) > self.maxsize:
+                store.popitem(last=False)
+
+    def _grid(self, cell_m: float) -> CoverageGrid:
+        grid = self._grids.get(cell_m)
+        if grid is None:
+            frames = {sport: idx.df for sport, idx in self.indexes.items()}
+            grid = CoverageGrid(GridSpec.for_cell(cell_m), frames, self.max_km)
+            self._put(self._grids, cell_m, grid)
+        return grid
+
+    def get(self, sport: str, cell_m: float) -> dict:
+        '''
+        Coverage for a sport ("handball", "tennis" or "both") at a cell size.
+        Returns:
+            dict - {"spec", "grid", "dist_km", "summary", "compute_ms"}
+        '''
+
+        key = (sport, float(cell_m))
+        with self._lock:
+            hit = self._results.get(key)
+        if hit is not None:
+            return hit
+        with self._compute_lock:
+            hit = self._results.get(key)
+            if hit is not None:
+                return hit
+            start = time.perf_counter()
+            grid = self._grid(float(cell_m))
+            sports = list(self.indexes) if sport == "both" else [sport]
+            dist_km = None
+            for s in sports:
+                idx = self.indexes[s]
+                d, _ = nearest_on_grid(idx.tree, idx.coords_rad, grid.spec)
+                dist_km = d if dist_km is None else np.minimum(dist_km, d)
+            result = {
+                "spec": grid.spec,
+                "grid": grid,
+                "dist_km": dist_km,
+                "summary": summarize(dist_km, grid),
+                "compute_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+            self._put(self._results, key, result)
+            return result
+
+
+def to_geojson(result: dict) -> dict:
+    '''GeoJSON FeatureCollection with one polygon per cell inside the city.'''
+
+    spec, grid, dist_km = result["spec"], result["grid"], result["dist_km"]
+    lats, lons = spec.lats(), spec.lons()
+    features = []
+    for r, c in zip(*np.nonzero(grid.borough_code < len(grid.boroughs))):
+        s, w = lats[r] - spec.lat_step / 2, lons[c] - spec.lon_step / 2
+        n, e = s + spec.lat_step, w + spec.lon_step
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[w, s], [e, s], [e, n], [w, n], [w, s]]]},
+            "properties": {"distance_km": round(float(dist_km[r, c]), 3), "borough": grid.boroughs[grid.borough_code[r, c]]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _load_frames() -> Dict[str, pd.DataFrame]:
+    frames = {}
+    for sport, path in (("handball", CLEAN_CSV), ("tennis", TENNIS_CSV)):
+        df = pd.read_csv(path)
+        df["Lat"] = pd.to_numeric(df["Lat"], errors="coerce")
+        df["Lon"] = pd.to_numeric(df["Lon"], errors="coerce")
+        frames[sport] = df.dropna(subset=["Lat", "Lon"]).reset_index(drop=True)
+    return frames
+
+
+def main() -> None:
+    from app.nearest import NearestIndex
+    from app.settings import get_settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sport", choices=("handball", "tennis", "both"), default="both")
+    parser.add_argument("--cell-m", type=float, default=get_settings().coverage_cell_m)
+    parser.add_argument("--out", type=Path, required=True, help="output prefix; writes <out>.u16 and <out>.json")
+    args = parser.parse_args()
+
+    cache = CoverageCache({s: NearestIndex(df) for s, df in _load_frames().items()}, get_settings().coverage_max_km)
+    result = cache.get(args.sport, args.cell_m)
+    to_uint16_m(result["dist_km"], result["grid"]).tofile(f"{args.out}.u16")
+    meta = {"sport": args.sport, "grid": asdict(result["spec"]), "no_data": int(NO_DATA), "dtype": "<u2 metres, row 0 = south",
+            "summary": result["summary"], "compute_ms": result["compute_ms"]}
+    Path(f"{args.out}.json").write_text(json.dumps(meta, indent=2))
+    print(f"{result['spec'].rows}x{result['spec'].cols} cells in {result['compute_ms']:.0f} ms -> {args.out}.u16, {args.out}.json")
+
+
+if __name__ == "__main__":
+    main()
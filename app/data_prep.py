@@ -1,14 +1,59 @@
 '''
 Clean raw data and prepare it for analysis.
+
+One pipeline for every sport: each raw NYC Parks (DPR) JSON file is mapped
+to its clean CSV by a SportSchema (raw key -> CSV column). Raw files are
+streamed, a bounded number of records at a time, so they can be far larger
+than memory, and CSVs are written to a temporary file and renamed into place.
+
+Rebuilds are incremental. A manifest (data/etl_manifest.json) records, per
+sport, the SHA-256 of the raw file and of the schema, the output's hash,
+row counts and timings. A sport is rebuilt only when its raw file or schema
+changed or its CSV is missing or was edited; unchanged files are recognised
+by size and mtime without being read again. Sports that need rebuilding are
+processed in parallel, one process each.
+
+Tennis Info (free-form HTML) is also parsed into typed columns (lessons,
+permit, indoor season, booking link; see app/court_info.py) while cleaning,
+so nothing downstream has to parse it per request.
+
+Usage:
+    python -m app.data_prep [--sports handball,tennis] [--force] [--jobs 2] [--raw-dir data] [--out-dir data]
 '''
 
 
 from __future__ import annotations
+
+import argparse
+import codecs
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import pandas as pd
-# from pathlib import Path
-# from typing import Tuple
-from app.CONSTANTS import RAW_JSON, CLEAN_CSV
 
+from app.CONSTANTS import CLEAN_CSV, DATA_DIR, RAW_JSON, TENNIS_CSV, TENNIS_RAW_JSON
+from app.court_info import INFO_COLUMNS, add_info_columns
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "etl_manifest.json"
+MANIFEST_VERSION = 1
+# Bump when cleaning rules change, so every sport is rebuilt
+PIPELINE_VERSION = 2
+# Records cleaned and written per batch; bounds memory whatever the file size
+CHUNK_ROWS = 50_000
+READ_BYTES = 1 << 20
+_SPACE = re.compile(r"[ \t\n\r]*")
+# Whitespace, an optional comma, whitespace: what may sit between records
+_SEPARATOR = re.compile(r"[ \t\n\r]*(,)?[ \t\n\r]*")
 
 BOROUGH_PREFIXES = {
     "X": "Bronx",
@@ -19,6 +64,49 @@ BOROUGH_PREFIXES = {
 }
 
 
+@dataclass(frozen=True)
+class SportSchema:
+    '''
+    Attributes:
+        raw (str): Raw DPR JSON file name.
+        out (str): Clean CSV file name.
+        columns (tuple): (raw key, CSV column) pairs in output order. Raw
+                         keys are matched case-insensitively.
+        info_fields (bool): Append the INFO_COLUMNS parsed from the Info
+                            column.
+    '''
+
+    raw: str
+    out: str
+    columns: Tuple[Tuple[str, str], ...]
+    info_fields: bool = False
+
+    def out_columns(self) -> List[str]:
+        return [col for _, col in self.columns] + (list(INFO_COLUMNS) if self.info_fields else [])
+
+
+SPORT_SCHEMAS: Dict[str, SportSchema] = {
+    "handball": SportSchema(
+        raw=RAW_JSON.name,
+        out=CLEAN_CSV.name,
+        columns=(
+            ("prop_id", "Court_Id"), ("name", "Name"), ("borough", "Borough"), ("location", "Location"),
+            ("num_of_courts", "Num_Of_Courts"), ("lat", "Lat"), ("lon", "Lon"),
+        ),
+    ),
+    "tennis": SportSchema(
+        raw=TENNIS_RAW_JSON.name,
+        out=TENNIS_CSV.name,
+        columns=(
+            ("prop_id", "Court_Id"), ("name", "Name"), ("borough", "Borough"), ("location", "Location"),
+            ("courts", "Num_Of_Courts"), ("indoor_outdoor", "Indoor_Outdoor"), ("tennis_type", "Tennis_Type"),
+            ("accessible", "Accessible"), ("info", "Info"), ("lat", "Lat"), ("lon", "Lon"),
+        ),
+        info_fields=True,
+    ),
+}
+
+
 def infer_borough(prop_id):
     '''
     Infer borough from Prop_ID prefix.
@@ -31,32 +119,106 @@ def infer_borough(prop_id):
         infer_borough("X12345") -> "Bronx"
     '''
 
-    if not prop_id:
+    if not prop_id or not isinstance(prop_id, str):
         return ""
-    
+
     return BOROUGH_PREFIXES.get(prop_id.strip()[0:1].upper(), "")
 
 
-def build_clean_csv(raw_json, out_csv):
+def schema_hash(schema: SportSchema) -> str:
+    payload = json.dumps({"pipeline": PIPELINE_VERSION, "schema": asdict(schema)}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(READ_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def iter_json_records(path: Path, hasher=None, read_bytes: int = READ_BYTES) -> Iterator[dict]:
     '''
-    Build a clean CSV from raw JSON data.
+    Stream the objects of a top-level JSON array without loading the file.
     Inputs:
-        raw_json: Path - Path to the raw JSON file.
-        out_csv: Path - Path to save the cleaned CSV.
-    Returns:
-        pd.DataFrame - Cleaned DataFrame with columns: court_id, name, borough, lat, lon.
+        path: Path - JSON file holding [{...}, {...}, ...].
+        hasher: hashlib object, optional - Fed every byte read, so the file is
+                                           hashed in the same pass.
+        read_bytes: int - Read size.
+    Yields:
+        dict - One array element at a time.
     Raises:
-        FileNotFoundError - If the raw JSON file does not exist.
-        ValueError - If expected columns are missing in the raw JSON.   
+        ValueError - If the file is not an array of objects.
     '''
 
-    if not raw_json.exists():
-        raise FileNotFoundError(f"Raw JSON not found at {raw_json}")
+    scan_once = json.JSONDecoder().scan_once
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buf, pos, eof = "", 0, False
+
+    with open(path, "rb") as fh:
+        def fill() -> None:
+            nonlocal buf, pos, eof
+            block = fh.read(read_bytes)
+            if hasher is not None:
+                hasher.update(block)
+            eof = not block
+            buf = buf[pos:] + utf8.decode(block, final=eof)
+            pos = 0
+
+        while not eof and not buf[pos:].strip():
+            fill()
+        m = _SPACE.match(buf, pos)
+        if m.end() == len(buf) or buf[m.end()] != "[":
+            raise ValueError(f"{path} is not a JSON array of records")
+        pos = m.end() + 1
+        count = 0
+        while True:
+            m = _SEPARATOR.match(buf, pos)
+            start = m.end()
+            if start == len(buf):
+                if eof:
+                    raise ValueError(f"{path} ends inside the JSON array")
+                fill()
+                continue
+            if buf[start] == "]" and not m.group(1):
+                break
+            if bool(m.group(1)) != bool(count):
+                raise ValueError(f"{path}: expected ',' between records")
+            try:
+                # An object only decodes once its closing brace is in the buffer
+                record, end = scan_once(buf, start)
+            except (StopIteration, json.JSONDecodeError):
+                if eof:
+                    raise ValueError(f"{path}: invalid JSON after record {count}") from None
+                fill()
+                continue
+            if not isinstance(record, dict):
+                raise ValueError(f"{path} is not a JSON array of records")
+            pos = end
+            count += 1
+            yield record
+        if hasher is not None:
+            # Hash whatever follows the array too
+            while not eof:
+                fill()
 
-    df = pd.read_json(raw_json)
+
+def clean_chunk(records: List[dict], schema: SportSchema) -> Tuple[pd.DataFrame, int]:
+    '''
+    Clean one batch of raw records.
+    Returns:
+        (pd.DataFrame, int) - Clean rows with the schema's columns, and the
+        number of records dropped for missing coordinates.
+    Raises:
+        ValueError - If the records have no lat/lon.
+    '''
+
+    df = pd.DataFrame.from_records(records)
 
     # Normalize columns
-    df.columns = [c.strip().lower() for c in df.columns]
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
 
     # Ensure numeric lat/lon
     for col in ["lat", "lon"]:
@@ -65,44 +227,272 @@ def build_clean_csv(raw_json, out_csv):
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
     # Drop rows without coordinates
-    df = df.dropna(subset=["lat", "lon"]).copy()
+    before = len(df)
+    df = df.dropna(subset=["lat", "lon"])
 
-    #  Extract borough from Prop_ID
-    if "borough" not in df.columns:
-        df["borough"] = df.get("prop_id", "").apply(infer_borough)
+    # Extract borough from Prop_ID where the raw data has none (vectorized infer_borough)
+    if "prop_id" in df.columns and pd.api.types.is_object_dtype(df["prop_id"]):
+        prefix = df["prop_id"].str.strip().str[:1].str.upper()
+        inferred = prefix.map(BOROUGH_PREFIXES).fillna("")
+    else:
+        inferred = pd.Series("", index=df.index)
+    df = df.assign(borough=df["borough"].fillna(inferred) if "borough" in df.columns else inferred)
 
+    # Clean schema; a key missing from every record in the batch becomes empty
+    clean = df.reindex(columns=[raw for raw, _ in schema.columns])
+    clean.columns = [col for _, col in schema.columns]
+    if schema.info_fields:
+        clean = add_info_columns(clean)
+    return clean.reset_index(drop=True), before - len(df)
 
-    # Clean schema
-    clean = df[["prop_id", "name", "borough", "location", "num_of_courts", "lat", "lon"]].copy()
-    clean = clean.rename(columns={"prop_id": "court_id"})
-    clean.columns = [col.title() for col in clean.columns]
 
-    # Save to csv
-    clean.to_csv(out_csv, index=False)
+def build_sport(sport: str, raw_json: Path, out_csv: Path, chunk_rows: int = CHUNK_ROWS) -> dict:
+    '''
+    Stream one raw file into its clean CSV.
+    Inputs:
+        sport: str - Key of SPORT_SCHEMAS.
+        raw_json: Path - Raw DPR JSON file.
+        out_csv: Path - CSV to (re)write.
+        chunk_rows: int - Records cleaned per batch.
+    Returns:
+        dict - Manifest entry: hashes, sizes, rows, dropped and seconds.
+    Raises:
+        FileNotFoundError - If the raw JSON file does not exist.
+        ValueError - If the raw JSON is malformed or has no lat/lon.
+    '''
 
-    return clean
+    if not raw_json.exists():
+        raise FileNotFoundError(f"Raw JSON not found at {raw_json}")
+    schema = SPORT_SCHEMAS[sport]
+    start = time.perf_counter()
+    raw_hash, out_hash = hashlib.sha256(), hashlib.sha256()
+    rows = dropped = 0
+    tmp = out_csv.with_name(out_csv.name + ".tmp")
+
+    with open(tmp, "wb") as fh:
+        def write(batch: List[dict], header: bool) -> None:
+            nonlocal rows, dropped
+            clean, lost = clean_chunk(batch, schema) if batch else (pd.DataFrame(columns=schema.out_columns()), 0)
+            data = clean.to_csv(index=False, header=header).encode("utf-8")
+            fh.write(data)
+            out_hash.update(data)
+            rows += len(clean)
+            dropped += lost
+
+        batch: List[dict] = []
+        header = True
+        for record in iter_json_records(raw_json, hasher=raw_hash):
+            batch.append(record)
+            if len(batch) >= chunk_rows:
+                write(batch, header)
+                batch, header = [], False
+        if batch or header:
+            write(batch, header)
+    os.replace(tmp, out_csv)
+
+    raw_stat, out_stat = raw_json.stat(), out_csv.stat()
+    entry = {
+        "raw": raw_json.name,
+        "raw_sha256": raw_hash.hexdigest(),
+        "raw_size": raw_stat.st_size,
+        "raw_mtime_ns": raw_stat.st_mtime_ns,
+        "schema_sha256": schema_hash(schema),
+        "output": out_csv.name,
+        "output_sha256": out_hash.hexdigest(),
+        "output_size": out_stat.st_size,
+        "output_mtime_ns": out_stat.st_mtime_ns,
+        "rows": rows,
+        "dropped": dropped,
+        "seconds": round(time.perf_counter() - start, 3),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    logger.info("etl built sport=%s rows=%d dropped=%d sec=%.2f", sport, rows, dropped, entry["seconds"])
+    return entry
+
+
+def _unchanged(entry: Optional[dict], schema: SportSchema, raw_json: Path, out_csv: Path) -> bool:
+    '''
+    True when entry (the last build) still describes raw_json and out_csv.
+    Files whose size and mtime match are taken as unchanged; otherwise they
+    are hashed, and a touched but identical file updates the entry in place.
+    '''
+
+    if not entry or entry.get("schema_sha256") != schema_hash(schema) or not out_csv.exists():
+        return False
+    for path, key in ((raw_json, "raw"), (out_csv, "output")):
+        st = path.stat()
+        if st.st_size == entry[f"{key}_size"] and st.st_mtime_ns == entry[f"{key}_mtime_ns"]:
+            continue
+        if st.st_size != entry[f"{key}_size"] or file_hash(path) != entry[f"{key}_sha256"]:
+            return False
+        entry[f"{key}_mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+def read_manifest(out_dir: Path) -> dict:
+    try:
+        manifest = json.loads((out_dir / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "sports": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "sports": {}}
+    return manifest
+
+
+def run_pipeline(
+    sports: Optional[List[str]] = None,
+    raw_dir: Path = DATA_DIR,
+    out_dir: Path = DATA_DIR,
+    force: bool = False,
+    jobs: Optional[int] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> dict:
+    '''
+    Rebuild the clean CSVs whose inputs changed and update the manifest.
+    Inputs:
+        sports: list of str, optional - Sports to consider (default: all).
+        raw_dir: Path - Directory of the raw DPR JSON files.
+        out_dir: Path - Directory for the CSVs and the manifest.
+        force: bool - Rebuild even if nothing changed.
+        jobs: int, optional - Worker processes (default: one per sport to
+                              build, at most the CPU count).
+        chunk_rows: int - Records cleaned per batch.
+    Returns:
+        dict - The manifest, with this run's summary under "last_run".
+    Raises:
+        ValueError - For an unknown sport.
+    '''
+
+    start = time.perf_counter()
+    sports = list(sports or SPORT_SCHEMAS)
+    unknown = [s for s in sports if s not in SPORT_SCHEMAS]
+    if unknown:
+        raise ValueError(f"Unknown sport(s): {', '.join(unknown)}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(out_dir)
+    entries = manifest["sports"]
 
+    todo, skipped, missing = [], [], []
+    for sport in sports:
+        schema = SPORT_SCHEMAS[sport]
+        raw_json, out_csv = raw_dir / schema.raw, out_dir / schema.out
+        if not raw_json.exists():
+            # Keep the existing CSV; there is nothing to build it from
+            missing.append(sport)
+            logger.warning("etl raw file missing sport=%s path=%s", sport, raw_json)
+        elif not force and _unchanged(entries.get(sport), schema, raw_json, out_csv):
+            skipped.append(sport)
+        else:
+            todo.append(sport)
 
-def load_or_build():
+    failed: Dict[str, str] = {}
+    workers = min(len(todo), jobs or os.cpu_count() or 1)
+    args = [(s, raw_dir / SPORT_SCHEMAS[s].raw, out_dir / SPORT_SCHEMAS[s].out, chunk_rows) for s in todo]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {sport: pool.submit(build_sport, *a) for sport, a in zip(todo, args)}
+            results = {}
+            for sport, fut in futures.items():
+                try:
+                    results[sport] = fut.result()
+                except Exception as e:
+                    failed[sport] = str(e)
+    else:
+        results = {}
+        for sport, a in zip(todo, args):
+            try:
+                results[sport] = build_sport(*a)
+            except Exception as e:
+                failed[sport] = str(e)
+    for sport, err in failed.items():
+        logger.error("etl failed sport=%s error=%s", sport, err)
+    entries.update(results)
+
+    manifest["last_run"] = {
+        "built": list(results),
+        "skipped": skipped,
+        "missing": missing,
+        "failed": failed,
+        "workers": max(workers, 1) if todo else 0,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    tmp = out_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, out_dir / MANIFEST)
+    return manifest
+
+
+def build_clean_csv(raw_json, out_csv, sport="handball"):
+    '''
+    Build a clean CSV from raw JSON data.
+    Inputs:
+        raw_json: Path - Path to the raw JSON file.
+        out_csv: Path - Path to save the cleaned CSV.
+        sport: str - Schema to apply (key of SPORT_SCHEMAS).
+    Returns:
+        pd.DataFrame - Cleaned DataFrame with the sport's columns.
+    Raises:
+        FileNotFoundError - If the raw JSON file does not exist.
+        ValueError - If expected columns are missing in the raw JSON.
+    '''
+
+    build_sport(sport, Path(raw_json), Path(out_csv))
+    return pd.read_csv(out_csv)
+
+
+def load_or_build(sport="handball"):
     '''
     Load cleaned CSV if it exists, otherwise build it from raw JSON
+    Inputs:
+        sport: str - Key of SPORT_SCHEMAS.
     Returns:
-        pd.DataFrame - Cleaned DataFrame with columns: court_id, name, borough, lat, lon.
+        pd.DataFrame - Cleaned DataFrame with the sport's columns.
     Raises:
         FileNotFoundError - If the raw JSON file does not exist.
         ValueError - If expected columns are missing in the raw JSON..
     '''
 
-    if CLEAN_CSV.exists():
-        return pd.read_csv(CLEAN_CSV)
-    
-    return build_clean_csv(RAW_JSON, CLEAN_CSV)
+    schema = SPORT_SCHEMAS[sport]
+    out_csv = DATA_DIR / schema.out
+    if out_csv.exists():
+        df = pd.read_csv(out_csv)
+        if schema.info_fields and not set(INFO_COLUMNS) <= set(df.columns):
+            # A CSV from before the Info fields; parse them in memory
+            df = add_info_columns(df)
+        return df
+
+    return build_clean_csv(DATA_DIR / schema.raw, out_csv, sport)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the clean court CSVs from the raw DPR JSON files.")
+    parser.add_argument("--sports", default=",".join(SPORT_SCHEMAS), help="comma-separated sports")
+    parser.add_argument("--raw-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--out-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild even if nothing changed")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s %(message)s")
+
+    manifest = run_pipeline(
+        [s.strip() for s in args.sports.split(",") if s.strip()],
+        args.raw_dir, args.out_dir, args.force, args.jobs, args.chunk_rows,
+    )
+    run = manifest["last_run"]
+    for sport in run["built"]:
+        entry = manifest["sports"][sport]
+        print(f"{sport}: built {entry['rows']} rows ({entry['dropped']} dropped) in {entry['seconds']:.2f}s")
+    for key in ("skipped", "missing"):
+        for sport in run[key]:
+            print(f"{sport}: {'unchanged' if key == 'skipped' else 'raw file missing, kept existing CSV'}")
+    for sport, err in run["failed"].items():
+        print(f"{sport}: failed: {err}")
+    print(f"done in {run['seconds']:.2f}s with {run['workers']} worker(s)")
+    if run["failed"]:
+        raise SystemExit(1)
 
 
 # Run script
 if __name__ == "__main__":
-    try:
-        df = load_or_build()
-        print(f"Cleaned data loaded with {len(df)} records.")
-    except Exception as e:
-        print(f"Error: {e}")    
\ No newline at end of file
+    main()
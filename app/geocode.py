@@ -1,27 +1,150 @@
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-from app.CONSTANTS import GEOCODER_USER_AGENT, GEOCODER_MIN_DELAY_SEC
+from app.CONSTANTS import GEOCODER_USER_AGENT, BOROUGH_CENTROIDS
+from app.circuit_breaker import CircuitBreaker
+from app.metrics import counter, gauge, span
+from app.settings import get_settings
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple, Tuple
 import logging
+import queue
+import threading
+import time
 
-_geolocator = Nominatim(user_agent=GEOCODER_USER_AGENT, timeout=10)
+import numpy as np
+
+_settings = get_settings()
 logger = logging.getLogger(__name__)
 
-_forward = RateLimiter(
-    _geolocator.geocode,
-    min_delay_seconds=GEOCODER_MIN_DELAY_SEC,
-    max_retries=2,
-    error_wait_seconds=1.5,
-    swallow_exceptions=False,
-)
 
-_reverse = RateLimiter(
-    _geolocator.reverse,
-    min_delay_seconds=GEOCODER_MIN_DELAY_SEC,
-    max_retries=2,
-    error_wait_seconds=1.5,
-    swallow_exceptions=False,
+class _Clients(NamedTuple):
+    forward: Callable[..., Any]
+    reverse: Callable[..., Any]
+    # geopy errors that mean Nominatim is unavailable rather than a bug
+    unavailable: Tuple[type, ...]
+
+
+# Time this thread has spent in upstream HTTP calls during the current _call()
+_upstream = threading.local()
+
+
+def _timed(fn: Callable[..., Any]) -> Callable[..., Any]:
+    '''fn, adding the time each call takes to this thread's upstream time.'''
+
+    def call(*args, **kwargs):
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _upstream.sec = getattr(_upstream, "sec", 0.0) + time.monotonic() - start
+
+    return call
+
+
+@lru_cache(maxsize=1)
+def geocoder_clients() -> _Clients:
+    '''
+    Rate-limited Nominatim clients, built on first use so importing geopy
+    stays off the startup path (the startup warm-up calls this early).
+    '''
+
+    from geopy.geocoders import Nominatim
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+
+    geolocator = Nominatim(
+        user_agent=GEOCODER_USER_AGENT,
+        timeout=_settings.geocoder_timeout_sec,
+        domain=_settings.geocoder_domain,
+        scheme=_settings.geocoder_scheme,
+    )
+    # The limiter queues callers for their slot; only the wrapped calls are
+    # timed, so that wait never counts as upstream latency
+    limits = dict(
+        min_delay_seconds=_settings.geocoder_min_delay_sec,
+        max_retries=_settings.geocoder_max_retries,
+        error_wait_seconds=1.5,
+        swallow_exceptions=False,
+    )
+    return _Clients(
+        forward=RateLimiter(_timed(geolocator.geocode), **limits),
+        reverse=RateLimiter(_timed(geolocator.reverse), **limits),
+        unavailable=(GeocoderTimedOut, GeocoderUnavailable),
+    )
+
+
+# Calls slower than half the timeout count against the breaker, so a degraded
+# Nominatim trips it before every request waits out the full timeout.
+_forward_breaker = CircuitBreaker(
+    "geocoder_forward",
+    slow_call_sec=_settings.geocoder_timeout_sec / 2,
+    open_sec=_settings.geocoder_breaker_open_sec,
 )
+_reverse_breaker = CircuitBreaker(
+    "geocoder_reverse",
+    slow_call_sec=_settings.geocoder_timeout_sec / 2,
+    open_sec=_settings.geocoder_breaker_open_sec,
+)
+
+GEOCODE_RESULTS = counter("geocode_results_total", "Geocoding answers by operation and source.", ("op", "source"))
+GEOCODE_QUEUE_DEPTH = gauge("geocode_queue_depth", "Addresses waiting in the shared batch geocoding queue.")
+GEOCODE_CANCELLED = counter("geocode_queue_cancelled_total", "Queued batch lookups dropped because every requester went away.")
+
+
+class _TTLCache:
+    '''
+    Thread-safe LRU cache whose entries go stale after ttl seconds. Stale
+    entries are kept (until evicted) so they can still be served as a
+    fallback when the upstream geocoder is down.
+    '''
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, allow_stale: bool = False):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if not allow_stale and time.monotonic() - stored_at > self.ttl:
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_forward_cache = _TTLCache(4096, _settings.geocode_cache_ttl_sec)
+_reverse_cache = _TTLCache(4096, _settings.geocode_cache_ttl_sec)
+
+# Local gazetteer (court names and coordinates) for approximate answers
+_places = {"names": [], "labels": [], "coords": np.empty((0, 2))}
+
+
+def register_local_places(frames) -> None:
+    '''
+    Register court datasets used for approximate answers while Nominatim is unavailable.
+    Inputs:
+        frames: list of pd.DataFrame - Court datasets with Name, Borough, Lat, Lon columns.
+    '''
+
+    names, labels, coords = [], [], []
+    for df in frames:
+        for name, borough, lat, lon in df[["Name", "Borough", "Lat", "Lon"]].itertuples(index=False):
+            names.append(str(name).strip().lower())
+            labels.append(f"{name}, {borough}" if isinstance(borough, str) and borough else str(name))
+            coords.append((float(lat), float(lon)))
+    _places.update(names=names, labels=labels, coords=np.array(coords, dtype=float).reshape(-1, 2))
+
 
 def _normalize_address(address: str) -> str:
     a = (address or "").strip()
@@ -33,31 +156,219 @@ def _normalize_address(address: str) -> str:
         a = f"{a}, New York, NY"
     return a
 
-def geocode_forward(address: str):
+
+def _call(breaker: CircuitBreaker, fn, stage: str, *args, **kwargs):
+    '''
+    Call the geocoder through the circuit breaker. The breaker sees the time
+    spent in HTTP calls to Nominatim, not the time queued for a rate-limit
+    slot or waiting between retries.
+    Returns:
+        (ok, location) - ok is False when the circuit is open or the call failed.
+    '''
+
+    if not breaker.allow():
+        logger.warning("%s circuit open, failing fast", breaker.name)
+        return False, None
+
+    _upstream.sec = 0.0
     try:
-        q = _normalize_address(address)
-        loc = _forward(q)
+        with span(stage):
+            loc = fn(*args, **kwargs)
+    except geocoder_clients().unavailable as e:
+        breaker.record(False, _upstream.sec)
+        # Expected while Nominatim is down; no traceback per request
+        logger.warning("%s geocoder unavailable: %s: %s", stage, type(e).__name__, e)
+        return False, None
+    except Exception:
+        breaker.record(False, _upstream.sec)
+        logger.exception("%s unexpected error", stage)
+        return False, None
+
+    breaker.record(True, _upstream.sec)
+    return True, loc
+
+
+def _local_forward(q: str):
+    lower = q.lower()
+    best = None
+    for i, name in enumerate(_places["names"]):
+        if len(name) >= 5 and name in lower and (best is None or len(name) > len(_places["names"][best])):
+            best = i
+    if best is not None:
+        lat, lon = _places["coords"][best]
+        return {"lat": float(lat), "lon": float(lon), "display_name": f"{_places['labels'][best]}, New York (approximate)"}
+
+    for borough, (lat, lon) in BOROUGH_CENTROIDS.items():
+        if borough in lower:
+            return {"lat": lat, "lon": lon, "display_name": f"{borough.title()}, New York (approximate)"}
+    return None
+
+
+def _local_reverse(lat: float, lon: float):
+    coords = _places["coords"]
+    if not len(coords):
+        return None
+    # Equirectangular distance is plenty to pick the closest court within NYC
+    d2 = (coords[:, 0] - lat) ** 2 + ((coords[:, 1] - lon) * np.cos(np.radians(lat))) ** 2
+    i = int(np.argmin(d2))
+    return {"lat": lat, "lon": lon, "display_name": f"Near {_places['labels'][i]}, New York (approximate)"}
+
+
+def geocode_forward(address: str):
+    q = _normalize_address(address)
+    if not q:
+        return None
+    key = q.lower()
+
+    hit = _forward_cache.get(key)
+    if hit:
+        GEOCODE_RESULTS.inc(op="forward", source="cache")
+        return {**hit, "source": "cache"}
+
+    ok, loc = _call(_forward_breaker, geocoder_clients().forward, "geocode.forward", q)
+    if ok:
         if not loc:
             logger.warning("geocode_forward no result address=%s", q)
             return None
-        return {"lat": loc.latitude, "lon": loc.longitude, "display_name": loc.address}
-    except (GeocoderTimedOut, GeocoderUnavailable):
-        logger.exception("geocode_forward geocoder unavailable address=%s", address)
-        return None
-    except Exception:
-        logger.exception("geocode_forward unexpected error address=%s", address)
-        return None
+        result = {"lat": loc.latitude, "lon": loc.longitude, "display_name": loc.address}
+        _forward_cache.put(key, result)
+        GEOCODE_RESULTS.inc(op="forward", source="nominatim")
+        return {**result, "source": "nominatim"}
+
+    # Nominatim failed or the circuit is open: stale cache, then local best effort
+    stale = _forward_cache.get(key, allow_stale=True)
+    if stale:
+        GEOCODE_RESULTS.inc(op="forward", source="stale")
+        return {**stale, "source": "stale"}
+    local = _local_forward(q)
+    if local:
+        GEOCODE_RESULTS.inc(op="forward", source="approximate")
+        return {**local, "source": "approximate"}
+    logger.warning("geocode_forward unavailable and no fallback address=%s", address)
+    return None
+
 
 def geocode_reverse(lat: float, lon: float):
-    try:
-        loc = _reverse((lat, lon), language="en")
+    key = (round(lat, 4), round(lon, 4))
+
+    hit = _reverse_cache.get(key)
+    if hit:
+        GEOCODE_RESULTS.inc(op="reverse", source="cache")
+        return {"lat": lat, "lon": lon, "display_name": hit, "source": "cache"}
+
+    ok, loc = _call(_reverse_breaker, geocoder_clients().reverse, "geocode.reverse", (lat, lon), language="en")
+    if ok:
         if not loc:
             logger.warning("geocode_reverse no result lat=%s lon=%s", lat, lon)
             return None
-        return {"lat": lat, "lon": lon, "display_name": loc.address}
-    except (GeocoderTimedOut, GeocoderUnavailable):
-        logger.exception("geocode_reverse geocoder unavailable lat=%s lon=%s", lat, lon)
-        return None
-    except Exception:
-        logger.exception("geocode_reverse unexpected error lat=%s lon=%s", lat, lon)
+        _reverse_cache.put(key, loc.address)
+        GEOCODE_RESULTS.inc(op="reverse", source="nominatim")
+        return {"lat": lat, "lon": lon, "display_name": loc.address, "source": "nominatim"}
+
+    stale = _reverse_cache.get(key, allow_stale=True)
+    if stale:
+        GEOCODE_RESULTS.inc(op="reverse", source="stale")
+        return {"lat": lat, "lon": lon, "display_name": stale, "source": "stale"}
+    local = _local_reverse(lat, lon)
+    if local:
+        GEOCODE_RESULTS.inc(op="reverse", source="approximate")
+        return {**local, "source": "approximate"}
+    logger.warning("geocode_reverse unavailable and no fallback lat=%s lon=%s", lat, lon)
+    return None
+
+
+def geocode_cached(address: str):
+    '''
+    Look up a forward geocode in the cache only, never calling Nominatim.
+    Inputs:
+        address: str - Raw address as typed by the user.
+    Returns:
+        dict or None - Same shape as geocode_forward() with source "cache".
+    '''
+
+    q = _normalize_address(address)
+    hit = _forward_cache.get(q.lower()) if q else None
+    if not hit:
         return None
+    GEOCODE_RESULTS.inc(op="forward", source="cache")
+    return {**hit, "source": "cache"}
+
+
+class GeocodeQueue:
+    '''
+    Single background worker that resolves forward geocodes one at a time, so
+    batch traffic shares the Nominatim rate limit instead of competing for it.
+    Concurrent submissions of the same normalized address share one lookup;
+    once every submitter has released it (e.g. their clients disconnected) a
+    lookup still waiting in the queue is cancelled and skipped.
+    '''
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        # normalized address -> [future, submitters still waiting]
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, address: str) -> Future:
+        '''
+        Queue an address for geocoding.
+        Inputs:
+            address: str - Raw address.
+        Returns:
+            Future - Resolves to the geocode_forward() result (or None). Pass
+            it to release() if the result is no longer wanted.
+        '''
+
+        key = _normalize_address(address).lower()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[1] += 1
+                return entry[0]
+            fut = Future()
+            self._pending[key] = [fut, 1]
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="geocode-queue", daemon=True)
+                self._worker.start()
+        self._queue.put((key, address, fut))
+        GEOCODE_QUEUE_DEPTH.set(self._queue.qsize())
+        return fut
+
+    def release(self, address: str, fut: Future) -> None:
+        '''
+        Give up on a submitted lookup. It is cancelled when no other submitter
+        is waiting for it and the worker has not started it yet.
+        '''
+
+        key = _normalize_address(address).lower()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None or entry[0] is not fut:
+                return
+            entry[1] -= 1
+            if entry[1] > 0 or not fut.cancel():
+                return
+            del self._pending[key]
+        GEOCODE_CANCELLED.inc()
+
+    def _run(self) -> None:
+        while True:
+            key, address, fut = self._queue.get()
+            GEOCODE_QUEUE_DEPTH.set(self._queue.qsize())
+            # False when every submitter released it while it was queued
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(geocode_forward(address))
+            except Exception as e:
+                logger.exception("geocode queue error address=%s", address)
+                fut.set_exception(e)
+            finally:
+                with self._lock:
+                    entry = self._pending.get(key)
+                    if entry is not None and entry[0] is fut:
+                        del self._pending[key]
+
+
+batch_queue = GeocodeQueue()
@@ -0,0 +1,523 @@
+'''
+Mutable court index: a NearestIndex plus in-memory edits, without rebuilding
+the BallTree on every change.
+
+State is an immutable view swapped atomically on every edit, so queries never
+take a lock:
+    base   - NearestIndex over the courts as of the last compaction
+    dead   - tombstone bitmap (np.packbits) over base rows that were closed or
+             replaced by an edit
+    delta  - small buffer of court rows (dicts) added or edited since,
+             searched by brute force alongside the tree
+
+Queries over-fetch n_dead extra rows from the tree, drop tombstoned ones and
+merge in the delta on exact haversine distances, so results match a freshly
+built index. A background compactor folds the delta and tombstones into a new
+base once edits settle or pile up, and hands the new base to on_compact so
+derived structures (walking reranker, neighbour graph, coverage) are rebuilt
+from it. Until then the walking reranker and /courts/{id}/neighbors answer
+from the live view (query_k, rows_for) whenever edits are pending.
+
+Edits live in memory only; the CSVs on disk are not touched.
+'''
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+from app.metrics import counter, gauge, span
+from app.nearest import NearestIndex, _group_score, _haversine_rad, _origins_rad, group_rows
+
+logger = logging.getLogger(__name__)
+
+INDEX_MUTATIONS = counter("index_mutations_total", "Admin edits applied to the live court index.", ("sport", "op"))
+INDEX_PENDING = gauge("index_pending_changes", "Delta rows plus tombstones waiting for compaction.", ("sport",))
+INDEX_COMPACTIONS = counter("index_compactions_total", "Live index compactions.", ("sport",))
+
+
+class CourtNotFound(KeyError):
+    pass
+
+
+class CourtConflict(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class _View:
+    base: NearestIndex
+    dead: np.ndarray
+    n_dead: int
+    base_ids: Dict[str, np.ndarray]
+    delta: Tuple[dict, ...] = ()
+    delta_rad: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    closed: Dict[str, Tuple[dict, ...]] = field(default_factory=dict)
+    version: int = 0
+
+    @property
+    def pending(self) -> int:
+        return self.n_dead + len(self.delta)
+
+    @property
+    def size(self) -> int:
+        return len(self.base.df) - self.n_dead + len(self.delta)
+
+    @cached_property
+    def delta_df(self) -> pd.DataFrame:
+        # Built on first use; every edit makes a new view, so it never goes stale
+        return _frame(self.base.df, self.delta)
+
+
+def _is_dead(dead: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    return ((dead[idx >> 3] >> (7 - (idx & 7))) & 1).astype(bool)
+
+
+def _ids_of(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    ids = df["Court_Id"].astype(str).to_numpy()
+    order = np.argsort(ids, kind="stable")
+    keys, starts = np.unique(ids[order], return_index=True)
+    return dict(zip(keys, np.split(order, starts[1:])))
+
+
+def _fresh_view(base: NearestIndex, closed: Dict[str, Tuple[dict, ...]], version: int) -> _View:
+    return _View(
+        base=base,
+        dead=np.zeros((len(base.df) + 7) // 8, dtype=np.uint8),
+        n_dead=0,
+        base_ids=_ids_of(base.df),
+        closed=closed,
+        version=version,
+    )
+
+
+def _py(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _base_records(df: pd.DataFrame, idx: np.ndarray) -> List[dict]:
+    cols = {col: df[col].to_numpy() for col in df.columns}
+    return [{col: _py(values[i]) for col, values in cols.items()} for i in idx]
+
+
+def _frame(like: pd.DataFrame, rows: Tuple[dict, ...]) -> pd.DataFrame:
+    '''DataFrame of delta rows with the base's columns and dtypes.'''
+    df = pd.DataFrame(list(rows), columns=like.columns)
+    return df.astype(like.dtypes.to_dict(), errors="ignore") if len(df) else like.iloc[:0]
+
+
+class LiveIndex:
+    '''
+    Attributes:
+        sport (str): Sport label used in metrics and logs.
+        on_compact (callable): Called with the new base NearestIndex after each
+                               compaction.
+        compact_delay_sec (float): Quiet period after the last edit before the
+                                   background compactor runs; negative disables
+                                   background compaction.
+        max_pending (int): Pending delta rows + tombstones that trigger an
+                           immediate compaction.
+    '''
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        sport: str,
+        on_compact: Optional[Callable[[NearestIndex], None]] = None,
+        compact_delay_sec: float = 5.0,
+        max_pending: int = 256,
+    ):
+        self.sport = sport
+        self.on_compact = on_compact
+        self.compact_delay_sec = compact_delay_sec
+        self.max_pending = max_pending
+
+        self._view = _fresh_view(NearestIndex(df), {}, 0)
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._replay: Optional[List[Tuple[str, tuple]]] = None
+        self._wake = threading.Event()
+        self._compactor = None
+        self._last_edit = 0.0
+        self.last_compaction: Dict[str, float] = {}
+
+    # Read side
+
+    @property
+    def base(self) -> NearestIndex:
+        '''Index as of the last compaction; derived structures are built from it.'''
+        return self._view.base
+
+    @property
+    def df(self) -> pd.DataFrame:
+        '''Live courts: base rows that are not tombstoned, then the delta.'''
+        return self._live_df(self._view)
+
+    @property
+    def version(self) -> int:
+        '''Bumped by every edit.'''
+        return self._view.version
+
+    @property
+    def pending(self) -> int:
+        '''Delta rows plus tombstones waiting for compaction (0 when base is the live data).'''
+        return self._view.pending
+
+    def __len__(self) -> int:
+        return self._view.size
+
+    def __contains__(self, court_id) -> bool:
+        '''True if a live (not closed) court has this Court_Id.'''
+        v = self._view
+        court_id = str(court_id)
+        base = v.base_ids.get(court_id)
+        if base is not None and not _is_dead(v.dead, base).all():
+            return True
+        return any(r["Court_Id"] == court_id for r in v.delta)
+
+    def rows_for(self, court_id) -> pd.DataFrame:
+        '''Live rows with this Court_Id, base rows first, then the delta (empty if none).'''
+
+        v = self._view
+        court_id = str(court_id)
+        base = v.base_ids.get(court_id, np.empty(0, dtype=np.intp))
+        base = base[~_is_dead(v.dead, base)]
+        delta = [j for j, r in enumerate(v.delta) if r["Court_Id"] == court_id]
+        if not delta:
+            return v.base.df.iloc[base].reset_index(drop=True)
+        return pd.concat([v.base.df.iloc[base], v.delta_df.iloc[delta]], ignore_index=True)
+
+    def query_k(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+        '''
+        Same contract as NearestIndex.query_k, over the live courts.
+        '''
+
+        return self._query_k(self._view, lat, lon, k)
+
+    def query_k_many(self, lats, lons, k: int = 10) -> pd.DataFrame:
+        '''
+        query_k for many points at once (used by the /nearest coalescer).
+        Returns:
+            pd.DataFrame - min(k, len(self)) rows per point, point i's courts
+            first, in the order of the points, nearest first.
+        '''
+
+        v = self._view
+        if not v.pending:
+            dist_km, idx = v.base.query_idx_many(lats, lons, k)
+            return v.base.rows(idx.ravel(), dist_km.ravel())
+        # Edits waiting for compaction are rare; answer point by point against the same view
+        frames = [self._query_k(v, lat, lon, k) for lat, lon in zip(lats, lons)]
+        return pd.concat(frames, ignore_index=True)
+
+    def _query_k(self, v: _View, lat: float, lon: float, k: int) -> pd.DataFrame:
+        if not v.pending:
+            return v.base.query_k(lat, lon, k)
+
+        k = min(k, v.size)
+        if k <= 0:
+            return v.base.rows(np.empty(0, dtype=np.intp), np.empty(0))
+        dist_km, idx = v.base.query_idx(lat, lon, min(len(v.base.df), k + v.n_dead))
+        keep = ~_is_dead(v.dead, idx)
+        dist_km, idx = dist_km[keep][:k], idx[keep][:k]
+        if not v.delta:
+            return v.base.rows(idx, dist_km)
+
+        delta_km = _haversine_rad(np.radians([[lat, lon]]), v.delta_rad)[0] * EARTH_RADIUS_KM
+        order = np.argsort(np.concatenate([dist_km, delta_km]), kind="stable")[:k]
+        from_delta = order >= len(idx)
+        if not from_delta.any():
+            return v.base.rows(idx[order], dist_km[order])
+        return self._merge(v, idx, dist_km, delta_km, order, from_delta)
+
+    def query_group(self, lats, lons, k: int = 10, objective: str = "sum") -> pd.DataFrame:
+        '''
+        Same contract as NearestIndex.query_group, over the live courts.
+        '''
+
+        v = self._view
+        if not v.pending:
+            return v.base.query_group(lats, lons, k, objective)
+
+        k = min(k, v.size)
+        if k <= 0:
+            return group_rows(v.base.df.iloc[:0], np.empty((len(lats), 0)))
+        idx, dist_km = v.base.query_group_idx(lats, lons, min(len(v.base.df), k + v.n_dead), objective)
+        keep = ~_is_dead(v.dead, idx)
+        idx, dist_km = idx[keep][:k], dist_km[:, keep][:, :k]
+
+        delta_km = _haversine_rad(_origins_rad(lats, lons), v.delta_rad) * EARTH_RADIUS_KM
+        dist_km = np.concatenate([dist_km, delta_km], axis=1)
+        order = np.argsort(_group_score(dist_km, objective), kind="stable")[:k]
+        from_delta = order >= len(idx)
+        rows = pd.concat(
+            [v.base.df.iloc[idx[order[~from_delta]]], v.delta_df.iloc[order[from_delta] - len(idx)]],
+            ignore_index=True,
+        )
+        # Back to objective order: base picks first, then delta picks
+        positions = np.argsort(np.argsort(from_delta, kind="stable"), kind="stable")
+        return group_rows(rows.iloc[positions], dist_km[:, order])
+
+    @staticmethod
+    def _merge(v: _View, idx, dist_km, delta_km, order, from_delta) -> pd.DataFrame:
+        picks = order[from_delta] - len(idx)
+        rows = pd.concat(
+            [v.base.df.iloc[idx[order[~from_delta]]], v.delta_df.iloc[picks]],
+            ignore_index=True,
+        )
+        positions = np.argsort(np.argsort(from_delta, kind="stable"), kind="stable")
+        rows = rows.iloc[positions].reset_index(drop=True)
+        rows["distance_km"] = np.round(np.concatenate([dist_km, delta_km])[order], 2)
+        return rows
+
+    def stats(self) -> dict:
+        v = self._view
+        return {
+            "sport": self.sport,
+            "version": v.version,
+            "courts": v.size,
+            "base_rows": len(v.base.df),
+            "tombstones": v.n_dead,
+            "delta_rows": len(v.delta),
+            "closed": sum(len(rows) for rows in v.closed.values()),
+            "last_compaction": self.last_compaction or None,
+        }
+
+    # Write side
+
+    def insert(self, court: dict) -> dict:
+        '''
+        Add a court.
+        Inputs:
+            court: dict - Column values; Court_Id, Name, Lat and Lon are required.
+        Returns:
+            dict - The stored row.
+        Raises:
+            CourtConflict - A live court with the same Court_Id and Name exists.
+        '''
+
+        return self._mutate("insert", court)
+
+    def update(self, court_id: str, changes: dict, name: Optional[str] = None) -> List[dict]:
+        '''
+        Edit a live court in place (its old row is tombstoned, the edited row
+        goes to the delta). Court_Id is not a unique key, so when several live
+        rows with different names share it, name picks one.
+        Returns:
+            list of dict - The edited rows.
+        Raises:
+            CourtNotFound, CourtConflict
+        '''
+
+        return self._mutate("update", court_id, changes, name)
+
+    def close(self, court_id: str, name: Optional[str] = None) -> List[dict]:
+        '''
+        Soft-delete a court. Its rows are kept so restore() can bring it back.
+        Returns:
+            list of dict - The closed rows.
+        Raises:
+            CourtNotFound, CourtConflict
+        '''
+
+        return self._mutate("close", court_id, name)
+
+    def restore(self, court_id: str, name: Optional[str] = None) -> List[dict]:
+        '''
+        Reopen a court closed with close().
+        Returns:
+            list of dict - The restored rows.
+        Raises:
+            CourtNotFound, CourtConflict
+        '''
+
+        return self._mutate("restore", court_id, name)
+
+    def _mutate(self, op: str, *args):
+        with self._write_lock:
+            v, result = getattr(self, f"_apply_{op}")(self._view, *args)
+            self._view = replace(v, version=self._view.version + 1)
+            if self._replay is not None:
+                self._replay.append((op, args))
+            self._last_edit = time.monotonic()
+        INDEX_MUTATIONS.inc(sport=self.sport, op=op)
+        INDEX_PENDING.set(v.pending, sport=self.sport)
+        logger.info("live index %s sport=%s args=%s pending=%d", op, self.sport, args[:1], v.pending)
+        self._schedule(v.pending)
+        return result
+
+    def _row(self, v: _View, court: dict) -> dict:
+        row = {col: _py(court.get(col)) for col in v.base.df.columns}
+        row["Court_Id"] = str(row["Court_Id"])
+        row["Lat"], row["Lon"] = float(row["Lat"]), float(row["Lon"])
+        if "Num_Of_Courts" in row:
+            row["Num_Of_Courts"] = int(row["Num_Of_Courts"] or 0)
+        return row
+
+    def _find(self, v: _View, court_id: str, name: Optional[str]) -> Tuple[np.ndarray, List[int]]:
+        '''Live base positions and delta positions of a court.'''
+
+        court_id = str(court_id)
+        names = v.base.df["Name"].to_numpy()
+        base = v.base_ids.get(court_id, np.empty(0, dtype=np.intp))
+        base = base[~_is_dead(v.dead, base)]
+        delta = [j for j, r in enumerate(v.delta) if r["Court_Id"] == court_id]
+        if name is not None:
+            base = base[names[base] == name]
+            delta = [j for j in delta if v.delta[j]["Name"] == name]
+        if not len(base) and not delta:
+            raise CourtNotFound(court_id)
+        found = set(names[base]) | {v.delta[j]["Name"] for j in delta}
+        if len(found) > 1:
+            raise CourtConflict(f"Court id {court_id} matches several courts ({', '.join(sorted(map(str, found)))}); pass name.")
+        return base, delta
+
+    def _remove(self, v: _View, base: np.ndarray, delta: List[int]) -> Tuple[_View, List[dict]]:
+        removed = _base_records(v.base.df, base) + [v.delta[j] for j in delta]
+        dead = np.unpackbits(v.dead, count=len(v.base.df))
+        dead[base] = 1
+        keep = np.ones(len(v.delta), dtype=bool)
+        keep[delta] = False
+        v = replace(
+            v,
+            dead=np.packbits(dead),
+            n_dead=v.n_dead + len(base),
+            delta=tuple(r for r, kept in zip(v.delta, keep) if kept),
+            delta_rad=v.delta_rad[keep],
+        )
+        return v, removed
+
+    def _append(self, v: _View, rows: List[dict]) -> _View:
+        rad = np.radians([[r["Lat"], r["Lon"]] for r in rows])
+        return replace(v, delta=v.delta + tuple(rows), delta_rad=np.concatenate([v.delta_rad, rad]))
+
+    def _apply_insert(self, v: _View, court: dict):
+        row = self._row(v, court)
+        try:
+            self._find(v, row["Court_Id"], row["Name"])
+        except CourtNotFound:
+            return self._append(v, [row]), [dict(row)]
+        raise CourtConflict(f"Court {row['Court_Id']} ({row['Name']}) already exists.")
+
+    def _apply_update(self, v: _View, court_id: str, changes: dict, name: Optional[str]):
+        base, delta = self._find(v, court_id, name)
+        v, old = self._remove(v, base, delta)
+        edited = [self._row(v, {**r, **changes, "Court_Id": r["Court_Id"]}) for r in old]
+        return self._append(v, edited), [dict(r) for r in edited]
+
+    def _apply_close(self, v: _View, court_id: str, name: Optional[str]):
+        base, delta = self._find(v, court_id, name)
+        v, removed = self._remove(v, base, delta)
+        key = str(court_id)
+        closed = dict(v.closed)
+        closed[key] = closed.get(key, ()) + tuple(removed)
+        return replace(v, closed=closed), [dict(r) for r in removed]
+
+    def _apply_restore(self, v: _View, court_id: str, name: Optional[str]):
+        key = str(court_id)
+        rows = v.closed.get(key, ())
+        picked = [r for r in rows if name is None or r["Name"] == name]
+        if not picked:
+            raise CourtNotFound(court_id)
+        if len({r["Name"] for r in picked}) > 1:
+            raise CourtConflict(f"Several closed courts share id {court_id}; pass name.")
+        try:
+            self._find(v, key, picked[0]["Name"])
+        except CourtNotFound:
+            pass
+        else:
+            raise CourtConflict(f"Court {key} ({picked[0]['Name']}) is open.")
+        closed = dict(v.closed)
+        left = tuple(r for r in rows if r not in picked)
+        if left:
+            closed[key] = left
+        else:
+            del closed[key]
+        return replace(self._append(v, picked), closed=closed), [dict(r) for r in picked]
+
+    # Compaction
+
+    def compact(self) -> bool:
+        '''
+        Fold the delta and tombstones into a new base index. The tree is built
+        without holding the write lock; edits made meanwhile are replayed onto
+        the new base before it is swapped in.
+        Returns:
+            bool - False when there was nothing to compact.
+        '''
+
+        with self._compact_lock:
+            with self._write_lock:
+                if not self._view.pending:
+                    return False
+                snapshot = self._view
+                self._replay = []
+
+            start = time.perf_counter()
+            try:
+                with span("index.compact"):
+                    base = NearestIndex(self._live_df(snapshot))
+            except Exception:
+                with self._write_lock:
+                    self._replay = None
+                raise
+
+            with self._write_lock:
+                v = _fresh_view(base, snapshot.closed, self._view.version)
+                for op, args in self._replay:
+                    v, _ = getattr(self, f"_apply_{op}")(v, *args)
+                self._view = v
+                self._replay = None
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        INDEX_COMPACTIONS.inc(sport=self.sport)
+        INDEX_PENDING.set(v.pending, sport=self.sport)
+        self.last_compaction = {"at": time.time(), "ms": round(elapsed_ms, 2), "rows": len(base.df), "folded": snapshot.pending}
+        logger.info("live index compacted sport=%s rows=%d folded=%d ms=%.1f", self.sport, len(base.df), snapshot.pending, elapsed_ms)
+        if self.on_compact:
+            try:
+                self.on_compact(base)
+            except Exception:
+                logger.exception("live index on_compact failed sport=%s", self.sport)
+        return True
+
+    @staticmethod
+    def _live_df(v: _View) -> pd.DataFrame:
+        if not v.pending:
+            return v.base.df
+        alive = ~_is_dead(v.dead, np.arange(len(v.base.df)))
+        return pd.concat([v.base.df[alive], v.delta_df], ignore_index=True)
+
+    def _schedule(self, pending: int) -> None:
+        if self.compact_delay_sec < 0:
+            return  # background compaction disabled; call compact() directly
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._run_compactor, name=f"compact-{self.sport}", daemon=True)
+            self._compactor.start()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def _run_compactor(self) -> None:
+        while True:
+            self._wake.wait(timeout=self.compact_delay_sec)
+            woken = self._wake.is_set()
+            self._wake.clear()
+            if not self._view.pending:
+                continue
+            # Let a burst of edits settle unless the delta has grown too large
+            if not woken and time.monotonic() - self._last_edit < self.compact_delay_sec:
+                continue
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("live index compaction failed sport=%s", self.sport)
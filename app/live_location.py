@@ -0,0 +1,133 @@
+'''
+Per-connection state for live-location tracking over a WebSocket.
+
+The client streams positions; the session decides whether the nearest courts
+need recomputing and, when they do, turns the new result list into a diff
+against what the client already shows:
+
+    added     - courts to draw (full Court objects with a "key")
+    removed   - keys of courts to drop
+    order     - keys in rank order, only when the ranking changed
+    distances - key -> Distance_Km for kept courts whose distance changed
+
+Positions closer than min_move_m to the last computed one are ignored, as
+GPS jitter while standing still would otherwise recompute on every fix.
+'''
+
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+from app.metrics import counter, gauge
+
+LIVE_SESSIONS = gauge("live_sessions", "Open live-location WebSocket sessions.")
+LIVE_UPDATES = counter("live_updates_total", "Live-location position updates by outcome.", ("outcome",))
+LIVE_BYTES = counter("live_bytes_total", "Bytes pushed to live-location sessions.")
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    return float(2 * EARTH_RADIUS_KM * 1000 * np.arcsin(np.sqrt(a)))
+
+
+def court_keys(courts: List[dict]) -> List[str]:
+    '''
+    Stable keys for a result list. Court_Id is shared by rows of the same park
+    (and across sports), so the key includes sport and name, and repeats of an
+    identical row get an occurrence suffix.
+    '''
+
+    seen: Dict[str, int] = {}
+    keys = []
+    for c in courts:
+        key = f"{c.get('Sport')}:{c.get('Court_Id')}:{c.get('Name')}"
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        keys.append(key if not n else f"{key}#{n}")
+    return keys
+
+
+class NearestSession:
+    '''
+    Attributes:
+        compute (callable): (lat, lon, limit, sport) -> list of court dicts,
+                            nearest first.
+        min_move_m (float): Movement below which a position is ignored.
+    '''
+
+    def __init__(self, compute: Callable[[float, float, int, str], List[dict]], min_move_m: float = 25.0):
+        self.compute = compute
+        self.min_move_m = min_move_m
+        self.seq = 0
+        self._pos = None
+        self._params = None
+        self._shown: Dict[str, dict] = {}
+        self._order: List[str] = []
+
+    @property
+    def limit(self) -> int:
+        return self._params[0] if self._params else 10
+
+    @property
+    def sport(self) -> str:
+        return self._params[1] if self._params else "handball"
+
+    def needs_update(self, lat: float, lon: float, limit: int, sport: str) -> bool:
+        if self._pos is None or self._params != (limit, sport):
+            return True
+        return _distance_m(self._pos[0], self._pos[1], lat, lon) >= self.min_move_m
+
+    def update(self, lat: float, lon: float, limit: int, sport: str) -> Optional[dict]:
+        '''
+        Handle one position update.
+        Returns:
+            dict or None - The diff message to send, or None when nothing on
+            the client needs to change.
+        '''
+
+        if not self.needs_update(lat, lon, limit, sport):
+            LIVE_UPDATES.inc(outcome="skipped")
+            return None
+
+        reset = self._params != (limit, sport)
+        courts = self.compute(lat, lon, limit, sport)
+        self._pos = (lat, lon)
+        self._params = (limit, sport)
+
+        keys = court_keys(courts)
+        current = dict(zip(keys, courts))
+        if reset:
+            self._shown, self._order = {}, []
+
+        added = [{**c, "key": k} for k, c in current.items() if k not in self._shown]
+        removed = [k for k in self._shown if k not in current]
+        distances = {
+            k: c.get("Distance_Km")
+            for k, c in current.items()
+            if k in self._shown and self._shown[k].get("Distance_Km") != c.get("Distance_Km")
+        }
+        order_changed = keys != self._order
+        self._shown, self._order = current, keys
+
+        if not (added or removed or distances or order_changed or reset):
+            LIVE_UPDATES.inc(outcome="unchanged")
+            return None
+
+        LIVE_UPDATES.inc(outcome="diff")
+        self.seq += 1
+        msg = {"type": "diff", "seq": self.seq, "lat": lat, "lon": lon}
+        if reset:
+            msg["reset"] = True
+        if added:
+            msg["added"] = added
+        if removed:
+            msg["removed"] = removed
+        if order_changed:
+            msg["order"] = keys
+        if distances:
+            msg["distances"] = distances
+        return msg
@@ -0,0 +1,397 @@
+'''
+Asynchronous, structured logging.
+
+configure_logging() gives the root logger one handler that only puts records
+on a bounded queue. A background thread (logging.handlers.QueueListener)
+formats them, tracebacks included, and writes them to stderr, so request
+threads never wait on formatting or on the terminal/pipe. On the calling
+thread, before anything is queued:
+
+    sampling  - INFO and lower records are kept with LOG_INFO_SAMPLE_RATE;
+                access records with LOG_ACCESS_SAMPLE_RATE, except errors
+                and slow requests, which are always kept. Sampled records
+                carry "sample_rate"
+    dedupe    - WARNING and higher records with the same logger, message
+                template and exception type are written once per
+                LOG_DEDUPE_WINDOW_SEC; the next one written carries
+                "repeated": <records suppressed meanwhile>
+    overflow  - when the queue (LOG_QUEUE_SIZE) is full the record is
+                dropped rather than blocking the request
+
+log_records_total{outcome} counts written, sampled_out, deduplicated and
+dropped records. LOG_FORMAT=json (the default) writes one JSON object per
+line (ts, level, logger, msg, then any structured fields, exc); text writes
+classic lines.
+
+AccessLogMiddleware writes one "app.access" record per HTTP request with
+method, route, path, status, ms, bytes and the time spent in each
+metrics.span() stage during the request.
+
+The prefork launcher forks after the app is built, so forked children get a
+fresh queue and listener thread (os.register_at_fork).
+'''
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from app import metrics
+
+ACCESS_LOGGER = "app.access"
+# Dedupe keys kept before the oldest are forgotten
+MAX_DEDUPE_KEYS = 4096
+# Record attributes that are not structured fields (uvicorn adds color_message)
+_STANDARD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "color_message"}
+
+LOG_RECORDS = metrics.counter(
+    "log_records_total",
+    "Log records by outcome: written, sampled_out, deduplicated or dropped (queue full).",
+    ("outcome",),
+)
+
+_access_log = logging.getLogger(ACCESS_LOGGER)
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    # Structured fields: the "fields" dict plus any other extra= attributes
+    out = dict(getattr(record, "fields", None) or {})
+    for key, value in record.__dict__.items():
+        if key not in _STANDARD_ATTRS and key != "fields":
+            out[key] = value
+    return out
+
+
+class JsonFormatter(logging.Formatter):
+    '''One JSON object per record: ts, level, logger, msg, fields..., exc.'''
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update(_extra_fields(record))
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        if record.stack_info:
+            out["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(out, default=str, separators=(",", ":"), ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    '''Classic lines, with structured fields appended as key=value.'''
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        fields = _extra_fields(record)
+        line = super().formatMessage(record)
+        return line + "".join(f" {key}={value}" for key, value in fields.items()) if fields else line
+
+
+class SamplingFilter(logging.Filter):
+    '''
+    Keep INFO and lower records with probability rate. Access records are
+    sampled by AccessLogMiddleware instead, which knows status and latency.
+    '''
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO or record.name == ACCESS_LOGGER:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        LOG_RECORDS.inc(outcome="sampled_out")
+        return False
+
+
+class DedupeFilter(logging.Filter):
+    '''
+    Write WARNING and higher records once per window per (logger, level,
+    message template, exception type); count the rest and report the count
+    on the next record written for the key.
+    Attributes:
+        window_sec (float): Suppression window; <= 0 disables.
+    '''
+
+    def __init__(self, window_sec: float, clock=time.monotonic):
+        super().__init__()
+        self.window_sec = window_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [time last written, records suppressed since]
+        self._seen: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window_sec <= 0 or record.levelno < logging.WARNING:
+            return True
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else ""
+        # The template, not the formatted message: "failed address=%s" floods differ only in args
+        key = (record.name, record.levelno, str(record.msg), exc_type)
+        now = self._clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window_sec:
+                entry[1] += 1
+                suppressed = True
+            else:
+                suppressed = False
+                repeated = entry[1] if entry is not None else 0
+                self._seen[key] = [now, 0]
+                if len(self._seen) > MAX_DEDUPE_KEYS:
+                    for old in sorted(self._seen, key=lambda k: self._seen[k][0])[:MAX_DEDUPE_KEYS // 4]:
+                        del self._seen[old]
+        if suppressed:
+            LOG_RECORDS.inc(outcome="deduplicated")
+            return False
+        if repeated:
+            record.repeated = repeated
+        return True
+
+    def pending(self) -> Dict[Tuple, int]:
+        '''Keys with records suppressed since they were last written.'''
+
+        with self._lock:
+            return {key: entry[1] for key, entry in self._seen.items() if entry[1]}
+
+
+class _Flush:
+    '''Queue marker, set once the listener has written everything before it.'''
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AsyncHandler(QueueHandler):
+    '''
+    QueueHandler that leaves formatting to the listener thread: only the
+    message is resolved here (its args may change after the call). Records
+    beyond max_size queued are dropped instead of blocking.
+    '''
+
+    def __init__(self, q: queue.SimpleQueue, max_size: int):
+        super().__init__(q)
+        self.max_size = max_size
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue (C, lock-free put) is unbounded; qsize() is a cheap bound
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS.inc(outcome="dropped")
+            return
+        self.queue.put_nowait(record)
+
+
+class _Listener(QueueListener):
+    def handle(self, record) -> None:
+        if isinstance(record, _Flush):
+            record.done.set()
+            return
+        super().handle(record)
+        LOG_RECORDS.inc(outcome="written")
+
+
+class LogPipeline:
+    '''
+    The root handler, its filters and the listener thread.
+    Attributes:
+        handler (AsyncHandler): Installed on the root logger.
+        listener (QueueListener): Writes records on a background thread.
+        dedupe (DedupeFilter): Shared dedupe state, for pending().
+    '''
+
+    def __init__(self, stream=None, fmt: str = "json", queue_size: int = 10_000, info_sample_rate: float = 1.0, dedupe_window_sec: float = 60.0):
+        self.output = logging.StreamHandler(stream or sys.stderr)
+        self.output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        self.handler = AsyncHandler(queue.SimpleQueue(), queue_size)
+        self.dedupe = DedupeFilter(dedupe_window_sec)
+        self.handler.addFilter(SamplingFilter(info_sample_rate))
+        self.handler.addFilter(self.dedupe)
+        self.listener = _Listener(self.handler.queue, self.output, respect_handler_level=False)
+        self.listener.start()
+
+    def flush(self, timeout_sec: float = 5.0) -> bool:
+        '''Wait until the listener has written every queued record.'''
+
+        done = True
+        if self.listener._thread is not None:
+            marker = _Flush()
+            self.handler.queue.put(marker)
+            done = marker.done.wait(timeout_sec)
+        self.output.flush()
+        return done
+
+    def stop(self) -> None:
+        '''Write what is queued, report pending dedupe counts and stop the thread.'''
+
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for (name, levelno, msg, exc_type), count in self.dedupe.pending().items():
+            self.output.handle(logging.makeLogRecord({
+                "name": name, "levelno": levelno, "levelname": logging.getLevelName(levelno),
+                "msg": msg if not exc_type else f"{msg} ({exc_type})", "repeated": count,
+            }))
+        self.output.flush()
+
+    def _after_fork(self) -> None:
+        # The parent's listener thread does not exist here, and its queue may
+        # hold records the parent writes itself: start over
+        self.handler.queue = queue.SimpleQueue()
+        self.listener.queue = self.handler.queue
+        self.listener._thread = None
+        self.listener.start()
+
+
+def lean_records() -> None:
+    '''
+    Stop collecting record attributes neither formatter writes (caller
+    file/line, thread, process); findCaller() walks the stack on every call.
+    See "Optimization" in the logging HOWTO.
+    '''
+
+    logging._srcfile = None
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+
+
+_pipeline: Optional[LogPipeline] = None
+_lock = threading.Lock()
+
+
+def _after_fork_in_child() -> None:
+    if _pipeline is not None:
+        _pipeline._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def configure_logging(settings) -> LogPipeline:
+    '''
+    Route all logging through the asynchronous pipeline, replacing any
+    root handlers (e.g. basicConfig's). Calling it again replaces the
+    previous pipeline.
+    Inputs:
+        settings: Settings - log_level, log_format, log_queue_size,
+                             log_info_sample_rate, log_dedupe_window_sec.
+    Returns:
+        LogPipeline
+    '''
+
+    global _pipeline
+    with _lock:
+        root = logging.getLogger()
+        old = _pipeline
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        lean_records()
+        _pipeline = LogPipeline(
+            fmt=settings.log_format,
+            queue_size=settings.log_queue_size,
+            info_sample_rate=settings.log_info_sample_rate,
+            dedupe_window_sec=settings.log_dedupe_window_sec,
+        )
+        root.addHandler(_pipeline.handler)
+        root.setLevel(settings.log_level.upper())
+        if old is not None:
+            old.stop()
+    return _pipeline
+
+
+def flush(timeout_sec: float = 5.0) -> bool:
+    return _pipeline.flush(timeout_sec) if _pipeline is not None else True
+
+
+def shutdown() -> None:
+    '''Write what is queued and stop; also run at interpreter exit.'''
+
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            logging.getLogger().removeHandler(_pipeline.handler)
+            _pipeline.stop()
+            _pipeline = None
+
+
+# The listener is a daemon thread: without this, records still queued at exit are lost
+atexit.register(shutdown)
+
+
+class AccessLogMiddleware:
+    '''
+    ASGI middleware writing one structured "app.access" record per HTTP
+    request: method, route (template), path, status, ms, bytes and stages
+    ({span stage: ms} for metrics.span() blocks run during the request).
+    Attributes:
+        sample_rate (float): Share of ordinary requests logged.
+        slow_ms (float): Requests at least this slow are always logged, as
+                         are 5xx responses.
+    '''
+
+    def __init__(self, app, sample_rate: float = 1.0, slow_ms: float = 1000.0):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500, "bytes": 0}
+        stages: Dict[str, float] = {}
+        token = metrics.collect_stages(stages)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                status["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.stop_collecting(token)
+            ms = (time.perf_counter() - start) * 1000
+            sampled = status["code"] < 500 and ms < self.slow_ms and self.sample_rate < 1.0
+            if sampled and random.random() >= self.sample_rate:
+                LOG_RECORDS.inc(outcome="sampled_out")
+            elif _access_log.isEnabledFor(logging.INFO):
+                route = getattr(scope.get("route"), "path", None)
+                fields = {
+                    "method": scope.get("method", ""),
+                    "route": route,
+                    "path": scope.get("path", ""),
+                    "status": status["code"],
+                    "ms": round(ms, 3),
+                    "bytes": status["bytes"],
+                }
+                if stages:
+                    fields["stages"] = {stage: round(sec * 1000, 3) for stage, sec in stages.items()}
+                if sampled:
+                    fields["sample_rate"] = self.sample_rate
+                _access_log.info("%s %s %d", fields["method"], fields["path"], status["code"], extra={"fields": fields})
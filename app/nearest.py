@@ -1,9 +1,13 @@
 import numpy as np
 import pandas as pd
-from sklearn.neighbors import BallTree
 from typing import Tuple
 from app.CONSTANTS import EARTH_RADIUS_KM
 
+# Objectives for NearestIndex.query_group
+GROUP_OBJECTIVES = ("sum", "max")
+# Below this many origin x court pairs a full distance matrix beats pruning
+GROUP_FULL_SCAN_CELLS = 1 << 18
+
 
 class NearestIndex:
     def __init__(self, df: pd.DataFrame):
@@ -11,14 +15,162 @@ class NearestIndex:
         self.df = df.reset_index(drop=True).copy()
         coords = self.df[["Lat", "Lon"]].to_numpy(dtype=float)
         self.coords_rad = np.radians(coords)
+        # Imported here: sklearn (and scipy with it) is the slowest import on the startup path
+        from sklearn.neighbors import BallTree
+
         # BallTree(X, leaf_size, metric, **kwargs) where X = (n_samples, n_features)            
         self.tree = BallTree(self.coords_rad, metric="haversine")
 
-    def query_k(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+    def query_idx(self, lat: float, lon: float, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Raw k-NN lookup.
+        Returns:
+            (distance_km, idx) - Distances in km and row positions in self.df, nearest first.
+        '''
+
         k = min(k, len(self.df))
-        q = np.radians([[lat, lon]])                     
-        dist_rad, idx = self.tree.query(q, k=k)  # distance and indices of 10 nearest courts
-        dist_km = (dist_rad[0] * EARTH_RADIUS_KM)
-        rows = self.df.iloc[idx[0]].copy().reset_index(drop=True)
+        q = np.radians([[lat, lon]])
+        dist_rad, idx = self.tree.query(q, k=k)  # distance and indices of k nearest courts
+        return dist_rad[0] * EARTH_RADIUS_KM, idx[0]
+
+    def query_idx_many(self, lats, lons, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        k-NN lookup for many points in one BallTree query.
+        Returns:
+            (distance_km, idx) - (points, k) arrays, nearest first in each row.
+        '''
+
+        k = min(k, len(self.df))
+        dist_rad, idx = self.tree.query(_origins_rad(lats, lons), k=k)
+        return dist_rad * EARTH_RADIUS_KM, idx
+
+    def rows(self, idx: np.ndarray, dist_km: np.ndarray) -> pd.DataFrame:
+        rows = self.df.iloc[idx].copy().reset_index(drop=True)
         rows["distance_km"] = np.round(dist_km, 2)
         return rows
+
+    def query_k(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+        dist_km, idx = self.query_idx(lat, lon, k)
+        return self.rows(idx, dist_km)
+
+    def query_group(self, lats, lons, k: int = 10, objective: str = "sum") -> pd.DataFrame:
+        '''
+        Find the courts that best serve a group of origins.
+        Inputs:
+            lats, lons: sequences of float - Origin coordinates (same length).
+            k: int - Number of courts to return.
+            objective: str - "sum" minimizes total distance, "max" the
+                             distance of the farthest origin.
+        Returns:
+            pd.DataFrame - Court rows ordered by the objective, with total_km,
+            max_km and distances_km (one entry per origin) columns.
+        '''
+
+        idx, dist_km = self.query_group_idx(lats, lons, k, objective)
+        return group_rows(self.df.iloc[idx], dist_km)
+
+    def query_group_idx(self, lats, lons, k: int = 10, objective: str = "sum") -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Raw group lookup behind query_group().
+        Returns:
+            (idx, dist_km) - Row positions ordered by the objective, and the
+            (origins, k) matrix of distances in km.
+        '''
+
+        if objective not in GROUP_OBJECTIVES:
+            raise ValueError(f"objective must be one of {', '.join(GROUP_OBJECTIVES)}")
+        origins = _origins_rad(lats, lons)
+        n = len(self.df)
+        k = min(k, n)
+
+        if n * len(origins) <= GROUP_FULL_SCAN_CELLS:
+            idx = np.arange(n)
+        else:
+            # Score the courts closest to the group's centre to get an upper bound
+            # on the k-th best score, then collect every court that could beat it.
+            _, near = self.tree.query(_spherical_centroid(origins)[None, :], k=min(n, max(4 * k, 64)))
+            scores = _group_score(_haversine_rad(origins, self.coords_rad[near[0]]), objective)
+            bound = np.partition(scores, k - 1)[k - 1]
+            idx = self._group_candidates(origins, bound, objective)
+
+        dist = _haversine_rad(origins, self.coords_rad[idx])
+        scores = _group_score(dist, objective)
+        top = np.argpartition(scores, k - 1)[:k] if k < len(idx) else np.arange(len(idx))
+        top = top[np.argsort(scores[top], kind="stable")]
+        return idx[top], dist[:, top] * EARTH_RADIUS_KM
+
+    def _group_candidates(self, origins: np.ndarray, bound: float, objective: str) -> np.ndarray:
+        '''
+        Indices of every court whose group score can be <= bound.
+
+        Branch and bound over the BallTree nodes: a court inside a node with
+        centre q and radius r is at least max(0, d(o, q) - r) from origin o, so
+        a node whose best possible score exceeds the bound is pruned whole.
+        '''
+
+        _, idx_array, node_data, node_bounds = self.tree.get_arrays()
+        centres = np.asarray(node_bounds)[0]
+        radius = node_data["radius"]
+        is_leaf = node_data["is_leaf"].astype(bool)
+        bound = bound * (1 + 1e-9) + 1e-12
+
+        leaves = []
+        frontier = np.array([0])
+        while len(frontier):
+            gap = np.maximum(_haversine_rad(origins, centres[frontier]) - radius[frontier], 0.0)
+            frontier = frontier[_group_score(gap, objective) <= bound]
+            leaves.append(frontier[is_leaf[frontier]])
+            inner = frontier[~is_leaf[frontier]]
+            # Nodes are stored as an implicit binary heap
+            frontier = np.concatenate([2 * inner + 1, 2 * inner + 2])
+
+        leaves = np.concatenate(leaves)
+        if not len(leaves):
+            return np.empty(0, dtype=np.intp)
+        spans = [np.arange(node_data["idx_start"][i], node_data["idx_end"][i]) for i in leaves]
+        return np.asarray(idx_array)[np.concatenate(spans)]
+
+
+def group_rows(rows: pd.DataFrame, dist_km: np.ndarray) -> pd.DataFrame:
+    '''
+    Attach group distance columns (total_km, max_km, distances_km) to court rows.
+    Inputs:
+        rows: pd.DataFrame - Courts, in the column order of dist_km.
+        dist_km: np.ndarray - (origins, courts) distances in km.
+    '''
+
+    rows = rows.copy().reset_index(drop=True)
+    rows["total_km"] = np.round(dist_km.sum(axis=0), 2)
+    rows["max_km"] = np.round(dist_km.max(axis=0), 2)
+    rows["distances_km"] = [list(np.round(col, 2)) for col in dist_km.T]
+    return rows
+
+
+def _origins_rad(lats, lons) -> np.ndarray:
+    return np.radians(np.column_stack([np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)]))
+
+
+def _haversine_rad(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    '''
+    Pairwise great-circle distances in radians between (lat, lon) radian arrays.
+    Inputs:
+        a: np.ndarray - Shape (n, 2).
+        b: np.ndarray - Shape (m, 2).
+    Returns:
+        np.ndarray - Shape (n, m).
+    '''
+
+    dlat = b[None, :, 0] - a[:, None, 0]
+    dlon = b[None, :, 1] - a[:, None, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[:, None, 0]) * np.cos(b[None, :, 0]) * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _group_score(dist: np.ndarray, objective: str) -> np.ndarray:
+    return dist.sum(axis=0) if objective == "sum" else dist.max(axis=0)
+
+
+def _spherical_centroid(points_rad: np.ndarray) -> np.ndarray:
+    lat, lon = points_rad[:, 0], points_rad[:, 1]
+    xyz = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]).mean(axis=0)
+    return np.array([np.arctan2(xyz[2], np.hypot(xyz[0], xyz[1])), np.arctan2(xyz[1], xyz[0])])
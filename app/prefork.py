@@ -0,0 +1,287 @@
+'''
+Pre-fork launcher for production.
+
+The parent process loads the datasets and builds every index once, freezes
+the garbage collector's view of those objects and then forks the workers.
+Each worker runs its own uvicorn server on the shared listening socket and
+reads the parent's indexes through copy-on-write pages, so N workers cost
+roughly one copy of the court data plus their per-request working set, and
+adding or recycling a worker takes milliseconds instead of a full reload.
+
+Following the gc module's advice for fork-without-exec servers, collection
+is disabled while the app loads (no freed holes scattered through the
+pages that will be shared) and gc.freeze() runs right before forking, so
+collections in the workers never write to the parent's objects.
+
+The parent only supervises:
+    - workers that exit (crash, or recycling after max_requests) are
+      replaced by a fresh fork of the loaded parent
+    - SIGTERM / SIGINT stop the workers gracefully (uvicorn drains in-flight
+      requests), then kill whatever is left after graceful_timeout_sec
+    - SIGUSR1 logs a memory report for every worker
+
+State that changes at runtime (check-ins, admin index edits and the
+/courts/snapshot version, metrics) lives in each worker separately, so more
+than one worker is only safe for read-only deployments; see the README.
+'''
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after being forked is restarted with a delay
+CRASH_LOOP_SEC = 1.0
+
+
+def memory_report(pids: Iterable[int]) -> List[Dict[str, Any]]:
+    '''
+    Memory use of processes from /proc/<pid>/smaps_rollup (Linux only).
+    Inputs:
+        pids: iterable of int - Processes to report.
+    Returns:
+        list of dict - pid, rss_mb, pss_mb (private pages plus a fair share of
+        the shared ones) and uss_mb (pages only this process holds); processes
+        that cannot be read are left out.
+    '''
+
+    report = []
+    for pid in pids:
+        try:
+            text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        except OSError:
+            continue
+        kb = {}
+        for line in text.splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                kb[parts[0].rstrip(":")] = int(parts[1])
+        report.append({
+            "pid": pid,
+            "rss_mb": round(kb.get("Rss", 0) / 1024, 1),
+            "pss_mb": round(kb.get("Pss", 0) / 1024, 1),
+            "uss_mb": round((kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)) / 1024, 1),
+        })
+    return report
+
+
+class Prefork:
+    '''
+    Attributes:
+        load_app (callable): Builds the ASGI app; called once, in the parent.
+        workers (int): Number of worker processes.
+        host, port: Address to listen on.
+        max_requests (int): Requests after which a worker exits and is
+                            replaced (0 keeps workers forever).
+        max_requests_jitter (int): Random extra requests per worker, so
+                                   workers do not all recycle at once.
+        graceful_timeout_sec (float): Time workers get to finish in-flight
+                                      requests on shutdown.
+        access_log (bool): Keep uvicorn's own access log (off when the app
+                           writes one; see app.log_pipeline).
+    '''
+
+    def __init__(
+        self,
+        load_app: Callable[[], Any],
+        workers: int = 1,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        graceful_timeout_sec: float = 30.0,
+        log_level: str = "info",
+        access_log: bool = True,
+    ):
+        self.load_app = load_app
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout_sec = graceful_timeout_sec
+        self.log_level = log_level
+        self.access_log = access_log
+
+        self._children: Dict[int, float] = {}
+        self._ready: set = set()
+        self._stopping = False
+        self._report_requested = False
+
+    def run(self) -> None:
+        '''Load the app, fork the workers and supervise them until stopped.'''
+
+        start = time.perf_counter()
+        gc.disable()
+        app = self.load_app()
+        load_sec = time.perf_counter() - start
+        sock = self._bind()
+        ready_r, ready_w = os.pipe()
+        os.set_blocking(ready_r, False)
+        logger.info("prefork app loaded load_sec=%.2f workers=%d", load_sec, self.workers)
+
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGUSR1, self._on_report)
+
+        fork_start = time.perf_counter()
+        for _ in range(self.workers):
+            self._spawn(app, sock, ready_w)
+
+        all_ready = False
+        while not self._stopping:
+            self._reap(app, sock, ready_w)
+            self._read_ready(ready_r)
+            if not all_ready and self._ready >= set(self._children):
+                all_ready = True
+                logger.info(
+                    "prefork ready workers=%d startup_sec=%.2f fork_to_ready_sec=%.2f",
+                    len(self._children), time.perf_counter() - start, time.perf_counter() - fork_start,
+                )
+                self._log_memory()
+            if self._report_requested:
+                self._report_requested = False
+                self._log_memory()
+            time.sleep(0.05)
+
+        self._shutdown()
+        sock.close()
+
+    # Parent side
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, app, sock: socket.socket, ready_w: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._worker(app, sock, ready_w)
+                code = 0
+            except BaseException:
+                logger.exception("prefork worker failed pid=%d", os.getpid())
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        logger.info("prefork worker started pid=%d", pid)
+
+    def _reap(self, app, sock: socket.socket, ready_w: int) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            self._ready.discard(pid)
+            if started is None or self._stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            logger.info("prefork worker exited pid=%d code=%d", pid, code)
+            if time.monotonic() - started < CRASH_LOOP_SEC:
+                time.sleep(CRASH_LOOP_SEC)
+            self._spawn(app, sock, ready_w)
+
+    def _read_ready(self, ready_r: int) -> None:
+        try:
+            data = os.read(ready_r, 4096)
+        except BlockingIOError:
+            return
+        for (pid,) in struct.iter_unpack("<i", data[: len(data) // 4 * 4]):
+            self._ready.add(pid)
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_report(self, signum, frame) -> None:
+        self._report_requested = True
+
+    def _shutdown(self) -> None:
+        logger.info("prefork stopping workers=%d", len(self._children))
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout_sec + 1.0
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self._children.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in list(self._children):
+            logger.warning("prefork killing worker after graceful timeout pid=%d", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._children.clear()
+
+    def _log_memory(self) -> None:
+        report = memory_report([os.getpid(), *self._children])
+        if not report:
+            return
+        parent, workers = report[0], report[1:]
+        for row in workers:
+            logger.info("prefork memory pid=%d rss_mb=%.1f pss_mb=%.1f uss_mb=%.1f", row["pid"], row["rss_mb"], row["pss_mb"], row["uss_mb"])
+        logger.info(
+            "prefork memory total_pss_mb=%.1f parent_pss_mb=%.1f workers=%d",
+            sum(r["pss_mb"] for r in report), parent["pss_mb"], len(workers),
+        )
+
+    # Worker side
+
+    def _worker(self, app, sock: socket.socket, ready_w: int) -> None:
+        import uvicorn
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+            signal.signal(sig, signal.SIG_DFL)
+        gc.enable()
+
+        limit: Optional[int] = None
+        if self.max_requests > 0:
+            limit = self.max_requests + random.randint(0, max(0, self.max_requests_jitter))
+        config = uvicorn.Config(
+            app,
+            log_level=self.log_level,
+            # uvicorn's records propagate to the root logger the app configured
+            log_config=None,
+            access_log=self.access_log,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=int(self.graceful_timeout_sec),
+        )
+        server = uvicorn.Server(config)
+
+        def _notify_ready():
+            while not server.started and not server.should_exit:
+                time.sleep(0.01)
+            if server.started:
+                os.write(ready_w, struct.pack("<i", os.getpid()))
+
+        threading.Thread(target=_notify_ready, name="prefork-ready", daemon=True).start()
+        server.run(sockets=[sock])
@@ -2,8 +2,8 @@
 Pydantic models for the API endpoints
 '''
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import List, Literal, Optional
 
 
 class GeocodeReq(BaseModel):
@@ -31,18 +31,49 @@ class GeocodeResp(BaseModel):
         lat (float): Latitude of the geocoded address.
         lon (float): Longitude of the geocoded address.
         display_name (str): A human-readable description of the location.
+        source (Optional[str]): Where the answer came from: "nominatim", "cache",
+                                "stale" (expired cache entry served while the
+                                geocoder is unavailable) or "approximate"
+                                (local best-effort match).
 
     Example:
         {
             "lat": 40.7128,
             "lon": -74.0060,
-            "display_name": "New York, NY, USA"
+            "display_name": "New York, NY, USA",
+            "source": "nominatim"
         }
     '''
 
     lat: float
     lon: float
     display_name: str
+    source: Optional[str] = None
+
+
+class GeocodeBatchReq(BaseModel):
+    '''
+    Request model for geocoding many addresses in one call.
+
+    Attributes:
+        addresses (List[str]): Addresses to geocode (1 to 500). Duplicates after
+                               normalization are geocoded once.
+        nearest (int): If above 0, attach this many nearest courts to each
+                       resolved address. Defaults to 0.
+        sport (str): Sport used for the nearest courts ("handball", "tennis"
+                     or "both"). Defaults to "handball".
+
+    Example:
+        {
+            "addresses": ["399 Park Ave", "1 Atlantic Ave, Brooklyn"],
+            "nearest": 3,
+            "sport": "tennis"
+        }
+    '''
+
+    addresses: List[str] = Field(..., min_length=1, max_length=500)
+    nearest: int = Field(0, ge=0, le=50)
+    sport: str = "handball"
 
 
 class ReverseReq(BaseModel):
@@ -75,8 +106,24 @@ class Court(BaseModel):
         lat (float): Latitude of the court location.
         lon (float): Longitude of the court location.
         distance_km (Optional[float]): Distance from a given point in kilometers. Defaults to None.
+        walking_km (Optional[float]): Approximate walking distance in kilometers, only set
+                                      when results are ranked by walking distance.
+        crowding (Optional[float]): Estimated players at the court right now, from
+                                    recent check-ins. Only set when requested.
+        crowding_level (Optional[str]): "quiet", "busy" or "crowded".
+        lessons (Optional[bool]): Tennis only, like the fields below (parsed
+                                  from the Parks Info text, app/court_info.py):
+                                  lessons are offered.
+        permit_required (Optional[bool]): Courts are for Parks tennis permit holders.
+        indoor_courts (Optional[int]): Courts bubbled or rentable in the indoor season.
+        indoor_from_month (Optional[int]): First month (1-12) of the indoor season.
+        indoor_to_month (Optional[int]): Last month (1-12) of the indoor season.
+        booking_url (Optional[str]): Booking or operator website, "" if none.
         sport (Optional[str]): Sport type (e.g., "handball", "tennis").
 
+    JSON responses leave out fields that are None, as the WebSocket and
+    binary formats do.
+
     Example:
         {
             "court_id": 101,
@@ -97,6 +144,15 @@ class Court(BaseModel):
     Num_Of_Courts: Optional[int] = None
     Location: Optional[str] = ""
     Distance_Km: Optional[float] = None
+    Walking_Km: Optional[float] = None
+    Crowding: Optional[float] = None
+    Crowding_Level: Optional[str] = None
+    Lessons: Optional[bool] = None
+    Permit_Required: Optional[bool] = None
+    Indoor_Courts: Optional[int] = None
+    Indoor_From_Month: Optional[int] = None
+    Indoor_To_Month: Optional[int] = None
+    Booking_Url: Optional[str] = None
     Sport: Optional[str] = None
 
 
@@ -136,6 +192,200 @@ class NearestResp(BaseModel):
     results: List[Court]
 
 
+class CourtsResp(BaseModel):
+    '''
+    Response model for a page of the court listing.
+
+    Attributes:
+        count (int): Number of courts in this page.
+        total (int): Number of courts matching the filters.
+        offset (int): Position of the first court of this page.
+        results (List[Court]): The courts, handball first, in dataset order.
+    '''
+
+    count: int
+    total: int
+    offset: int
+    results: List[Court]
+
+
+class CourtNeighborsResp(BaseModel):
+    '''
+    Response model for the courts near a given court.
+
+    Attributes:
+        court (Court): The court that was looked up.
+        count (int): Number of neighbours returned.
+        results (List[Court]): Nearby courts of any sport, nearest first, with
+                               Distance_Km measured from the court.
+    '''
+
+    court: Court
+    count: int
+    results: List[Court]
+
+
+class CheckinReq(BaseModel):
+    '''
+    Request model for checking in at a court.
+
+    Attributes:
+        players (int): Players arriving together (1 to 20). Defaults to 1.
+    '''
+
+    players: int = Field(1, ge=1, le=20)
+
+
+class CheckinResp(BaseModel):
+    '''
+    Response model for a check-in.
+
+    Attributes:
+        court_id (str): Court checked in at.
+        sport (str): Sport of the court.
+        crowding (float): Estimated players at the court now, including this check-in.
+        crowding_level (str): "quiet", "busy" or "crowded".
+    '''
+
+    court_id: str
+    sport: str
+    crowding: float
+    crowding_level: str
+
+
+class Origin(BaseModel):
+    '''
+    A single starting point for a group query.
+
+    Attributes:
+        lat (float): Latitude.
+        lon (float): Longitude.
+    '''
+
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class NearestGroupReq(BaseModel):
+    '''
+    Request model for finding courts that suit a whole group of players.
+
+    Attributes:
+        origins (List[Origin]): Where each player starts from (1 to 100).
+        limit (int): Number of courts to return (1 to 50). Defaults to 5.
+        sport (str): "handball", "tennis" or "both". Defaults to "handball".
+        objective (str): "sum" minimizes the total distance travelled, "max"
+                         the distance of the player who is farthest away.
+                         Defaults to "sum".
+
+    Example:
+        {
+            "origins": [{"lat": 40.73, "lon": -73.99}, {"lat": 40.68, "lon": -73.97}],
+            "limit": 3,
+            "sport": "tennis",
+            "objective": "max"
+        }
+    '''
+
+    origins: List[Origin] = Field(..., min_length=1, max_length=100)
+    limit: int = Field(5, ge=1, le=50)
+    sport: str = "handball"
+    objective: Literal["sum", "max"] = "sum"
+
+
+class GroupCourt(Court):
+    '''
+    Court scored for a group. Distance_Km holds the objective value (total or
+    maximum distance).
+
+    Attributes:
+        Total_Km (float): Sum of distances from all origins.
+        Max_Km (float): Distance from the farthest origin.
+        Distances_Km (List[float]): Distance from each origin, in request order.
+    '''
+
+    Total_Km: float
+    Max_Km: float
+    Distances_Km: List[float]
+
+
+class NearestGroupResp(BaseModel):
+    '''
+    Response model for the group nearest search.
+
+    Attributes:
+        count (int): Number of courts returned.
+        objective (str): Objective the courts are ordered by.
+        results (List[GroupCourt]): Best courts first.
+    '''
+
+    count: int
+    objective: str
+    results: List[GroupCourt]
+
+
+class CourtIn(BaseModel):
+    '''
+    Request model for adding a court through the admin API. Other dataset
+    columns (e.g. tennis Info) may be passed as extra fields.
+
+    Attributes:
+        Court_Id (str): Parks property id, e.g. "B051".
+        Name (str): Court name.
+        Borough (str): Borough name.
+        Lat (float): Latitude.
+        Lon (float): Longitude.
+        Num_Of_Courts (int): Number of courts at the location. Defaults to 1.
+        Location (str): Street description.
+
+    Example:
+        {
+            "Court_Id": "B900",
+            "Name": "Example Playground",
+            "Borough": "Brooklyn",
+            "Lat": 40.68,
+            "Lon": -73.95,
+            "Num_Of_Courts": 2
+        }
+    '''
+
+    model_config = ConfigDict(extra="allow")
+
+    Court_Id: str = Field(..., min_length=1)
+    Name: str = Field(..., min_length=1)
+    Borough: str = ""
+    Lat: float = Field(..., ge=-90, le=90, allow_inf_nan=False)
+    Lon: float = Field(..., ge=-180, le=180, allow_inf_nan=False)
+    Num_Of_Courts: int = Field(1, ge=0)
+    Location: str = ""
+
+
+class CourtPatch(BaseModel):
+    '''
+    Request model for editing a court through the admin API. Only the fields
+    that are set are changed; Court_Id cannot be changed. The fields below
+    may be left out but not set to null (422).
+    '''
+
+    model_config = ConfigDict(extra="allow")
+
+    Name: Optional[str] = Field(None, min_length=1)
+    Borough: Optional[str] = None
+    Lat: Optional[float] = Field(None, ge=-90, le=90, allow_inf_nan=False)
+    Lon: Optional[float] = Field(None, ge=-180, le=180, allow_inf_nan=False)
+    Num_Of_Courts: Optional[int] = Field(None, ge=0)
+    Location: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _no_nulls(cls, data):
+        if isinstance(data, dict):
+            nulls = sorted(k for k in cls.model_fields if k in data and data[k] is None)
+            if nulls:
+                raise ValueError(f"{', '.join(nulls)} cannot be null; leave a field out to keep it")
+        return data
+
+
 class AgentRequest(BaseModel):
     '''
     Request model for AI agent queries.
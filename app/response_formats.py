@@ -0,0 +1,195 @@
+'''
+Binary response formats for bulk API clients.
+
+/nearest, /regions/nearest and /courts pick the response format from the
+Accept header:
+
+    application/json (default)           - the pydantic response models
+    application/msgpack                  - a MessagePack map: the JSON
+                                           model's scalar fields plus
+                                           "columns", {field: [values]}
+    application/vnd.apache.arrow.stream  - an Arrow IPC stream with one
+                                           record batch, one column per
+                                           field; scalar fields go in the
+                                           schema metadata
+
+Binary bodies are built from the result DataFrame's column arrays, without
+a pydantic model per court. Columns are named after the Court fields and
+appear only when the JSON would carry them (Walking_Km, Crowding, ...).
+msgpack and pyarrow are optional; a format whose package is not installed
+is never chosen, and JSON is used whenever nothing else matches.
+'''
+
+from __future__ import annotations
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from starlette.responses import Response
+
+from app.court_info import INFO_COLUMNS, info_arrays
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack is never negotiated without it
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: Arrow is never negotiated without it
+    pa = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+ARROW = "arrow"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    MSGPACK: "application/msgpack",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+# Accept media ranges -> format
+_ACCEPTED = {
+    "application/json": JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/vnd.apache.arrow.stream": ARROW,
+}
+
+
+def available_formats() -> List[str]:
+    return [JSON] + ([MSGPACK] if msgpack is not None else []) + ([ARROW] if pa is not None else [])
+
+
+def negotiate(accept: Optional[str]) -> str:
+    '''
+    Response format for an Accept header.
+    Inputs:
+        accept: str - Accept header value (may be empty).
+    Returns:
+        str - JSON, MSGPACK or ARROW: the available format with the highest
+              q-value, earlier entries winning ties; JSON if none matches.
+    '''
+
+    available = available_formats()
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        fmt = _ACCEPTED.get(media.lower())
+        if fmt is None or fmt not in available:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def courts_table(rows: pd.DataFrame, sport: str) -> pd.DataFrame:
+    '''
+    Index result rows as columns named after the Court fields, with the same
+    conversions as the server's per-row _court_from_row.
+    Inputs:
+        rows: pd.DataFrame - Rows from an index (Court_Id, Name, ..., and
+                             distance_km / walking_km when ranked).
+        sport: str - Value of the Sport column.
+    Returns:
+        pd.DataFrame - Court_Id, Name, Borough, Lat, Lon, Num_Of_Courts (if
+        known), Location, Distance_Km (if ranked), Walking_Km (if ranked by
+        walking), the Info fields (tennis; app.court_info) and Sport.
+    '''
+
+    n = len(rows)
+    out = {
+        "Court_Id": rows["Court_Id"].astype(str).to_numpy(),
+        "Name": rows["Name"].astype(str).to_numpy(),
+        "Borough": rows["Borough"].astype(str).to_numpy() if "Borough" in rows else np.full(n, "", dtype=object),
+        "Lat": rows["Lat"].to_numpy(dtype=float),
+        "Lon": rows["Lon"].to_numpy(dtype=float),
+    }
+    if "Num_Of_Courts" in rows:
+        out["Num_Of_Courts"] = rows["Num_Of_Courts"].to_numpy().astype(np.int64)
+    out["Location"] = rows["Location"].astype(str).to_numpy() if "Location" in rows else np.full(n, "", dtype=object)
+    if "distance_km" in rows:
+        out["Distance_Km"] = rows["distance_km"].to_numpy(dtype=float)
+    if "walking_km" in rows:
+        out["Walking_Km"] = rows["walking_km"].to_numpy(dtype=float)
+    out.update(info_arrays(rows))
+    out["Sport"] = np.full(n, sport, dtype=object)
+    return pd.DataFrame(out)
+
+
+def concat_tables(tables: List[pd.DataFrame]) -> pd.DataFrame:
+    '''
+    courts_table results for several sports as one table; Info fields are
+    None (not NaN) for the sports without them, and Sport stays last.
+    '''
+
+    if len(tables) == 1:
+        return tables[0]
+    table = pd.concat(tables, ignore_index=True)
+    info = [c for c in INFO_COLUMNS if c in table.columns]
+    if info:
+        table[info] = table[info].astype(object).where(table[info].notna(), None)
+        table = table[[c for c in table.columns if c != "Sport"] + ["Sport"]]
+    return table
+
+
+def _columns(table: pd.DataFrame) -> Dict[str, list]:
+    # tolist() turns numpy scalars into Python ones in C
+    return {name: table[name].to_numpy().tolist() for name in table.columns}
+
+
+def encode_msgpack(table: pd.DataFrame, meta: Dict[str, object]) -> bytes:
+    return msgpack.packb({**meta, "columns": _columns(table)}, use_bin_type=True)
+
+
+def encode_arrow(table: pd.DataFrame, meta: Dict[str, object]) -> bytes:
+    batch = pa.RecordBatch.from_pandas(table, preserve_index=False)
+    # Replace the pandas metadata (index, dtypes) with the response's scalar fields
+    batch = batch.replace_schema_metadata({key: json.dumps(value) for key, value in meta.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_table(fmt: str, table: pd.DataFrame, meta: Dict[str, object]) -> Response:
+    '''
+    Binary response for a result table.
+    Inputs:
+        fmt: str - MSGPACK or ARROW (as returned by negotiate()).
+        table: pd.DataFrame - Rows with Court field columns.
+        meta: dict - Scalar fields of the JSON response model (count, ...).
+    Returns:
+        Response - With Vary: Accept.
+    '''
+
+    body = encode_msgpack(table, meta) if fmt == MSGPACK else encode_arrow(table, meta)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers={"Vary": "Accept"})
+
+
+def decode_msgpack(body: bytes) -> Tuple[Dict[str, object], pd.DataFrame]:
+    '''Client side: (scalar fields, DataFrame of the columns).'''
+
+    obj = msgpack.unpackb(body, raw=False)
+    return {k: v for k, v in obj.items() if k != "columns"}, pd.DataFrame(obj["columns"])
+
+
+def decode_arrow(body: bytes) -> Tuple[Dict[str, object], "pa.Table"]:
+    '''Client side: (scalar fields, pyarrow Table); .to_pandas() for a DataFrame.'''
+
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    meta = {k.decode(): json.loads(v) for k, v in (table.schema.metadata or {}).items()}
+    return meta, table
@@ -1,40 +1,92 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import Depends, FastAPI, Query, HTTPException, Request, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from typing import List, Optional
+import numpy as np
 import pandas as pd
+from dataclasses import asdict
+import asyncio
+from pathlib import Path
+import json
 import logging
 
 from app.settings import get_settings
 from app.data_prep import load_or_build
-from app.nearest import NearestIndex
-from app.pydantic_models import Court, NearestResp
-from app.geocode import geocode_forward, geocode_reverse
-from app.pydantic_models import GeocodeReq, GeocodeResp, ReverseReq
-from app.agent import router as agent_router
-from app.CONSTANTS import TENNIS_CSV
+from app.live_index import LiveIndex
+from app.walking import WalkingReranker
+from app.court_graph import CourtGraph, court_key
+from app.checkins import CheckinStore, crowding_level
+from app.live_location import LIVE_BYTES, LIVE_SESSIONS, NearestSession
+from app.snapshot import SnapshotCache
+from app.static_assets import StaticAssets
+from app.shards import open_sharded
+from app.response_formats import JSON, concat_tables, courts_table, encode_table, negotiate
+from app.court_info import has_filters, info_mask, info_values, nearest_matching
+from app.coalescer import Coalescer
+from app.coverage import CoverageCache, NO_DATA, snap_cell_m, to_geojson, to_uint16_m
+from app.pydantic_models import Court, CourtsResp, NearestResp, CheckinReq, CheckinResp, CourtNeighborsResp, NearestGroupReq, NearestGroupResp, GroupCourt
+from app.geocode import geocode_forward, geocode_reverse, geocode_cached, geocoder_clients, register_local_places, batch_queue, _normalize_address
+from app.pydantic_models import GeocodeReq, GeocodeResp, GeocodeBatchReq, ReverseReq
+from app.agent import router as agent_router, warm_up as agent_warm_up
+from app.admin import router as admin_router
+from app import log_pipeline, metrics
+from app.metrics import MetricsMiddleware, span
+from app.warmup import Warmup, WarmupError
 
 
 def create_app():
-    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    # Structured records, formatted and written off the request path; see app.log_pipeline
+    log_pipeline.configure_logging(settings)
     logger = logging.getLogger(__name__)
 
-    settings = get_settings()
     app = FastAPI(title=settings.app_name)
 
-    # Serve static files
-    app.mount("/static", StaticFiles(directory="app/static"), name="static")
+    # Fingerprinted, precompressed static files; see app.static_assets
+    assets = StaticAssets(settings.static_dir, settings.static_build_dir, auto_reload=settings.debug)
+    app.state.static_assets = assets
+
+    def _static(request: Request, name: str) -> Response:
+        # Served from memory, so on the event loop rather than the threadpool
+        resp = assets.response(name, request.headers.get("accept-encoding", ""), request.headers.get("if-none-match", ""))
+        if resp is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return resp
 
     # Serve the homepage
-    @app.get("/", include_in_schema=False)
-    def home():
-        return FileResponse("app/static/index.html")
+    @app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+    async def home(request: Request):
+        return _static(request, "index.html")
+
+    @app.api_route("/static/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def static_file(request: Request, name: str):
+        return _static(request, name)
+
+    # Court data and slow imports load in the background; see app.warmup
+    warmup = Warmup()
+    app.state.warmup = warmup
+
+    async def _courts_ready() -> None:
+        '''Dependency for routes that need the court data: waits for the warm-up.'''
+
+        if warmup.is_ready("courts"):
+            return
+        try:
+            ok = await run_in_threadpool(warmup.wait, "courts", settings.warmup_wait_sec)
+        except WarmupError:
+            raise HTTPException(status_code=503, detail="Court data failed to load")
+        if not ok:
+            raise HTTPException(status_code=503, detail="Court data is still loading", headers={"Retry-After": "1"})
+
+    courts_ready = [Depends(_courts_ready)]
 
     # API routers
-    app.include_router(agent_router)
+    # The agent tools query the live court indexes on app.state
+    app.include_router(agent_router, dependencies=courts_ready)
+    app.include_router(admin_router, dependencies=courts_ready)
 
-    def _load_csv(path: str) -> pd.DataFrame:
-        df = pd.read_csv(path)
+    def _clean(df: pd.DataFrame) -> pd.DataFrame:
         if "Lat" in df.columns:
             df["Lat"] = pd.to_numeric(df["Lat"], errors="coerce")
         if "Lon" in df.columns:
@@ -52,21 +104,84 @@ def create_app():
             return "both"
         raise HTTPException(status_code=400, detail="Invalid sport. Use handball, tennis, or both.")
 
-    # Load data + build indexes
-    handball_df = load_or_build()
-    if handball_df is None or handball_df.empty:
-        raise RuntimeError("Failed to load handball courts dataset.")
-    tennis_df = _load_csv(str(TENNIS_CSV))
-    if tennis_df is None or tennis_df.empty:
-        raise RuntimeError("Failed to load tennis courts dataset.")
+    def _load_datasets() -> None:
+        '''
+        Load both datasets and (re)build everything derived from them. Any
+        dataset reload goes through here so indexes, rerankers, the geocoding
+        gazetteer and the neighbour graph stay in sync.
+        '''
+
+        handball_df = load_or_build()
+        if handball_df is None or handball_df.empty:
+            raise RuntimeError("Failed to load handball courts dataset.")
+        handball_df = _clean(handball_df)
+        tennis_df = _clean(load_or_build("tennis"))
+        if tennis_df is None or tennis_df.empty:
+            raise RuntimeError("Failed to load tennis courts dataset.")
+
+        live = {
+            sport: LiveIndex(
+                df,
+                sport,
+                compact_delay_sec=settings.index_compact_delay_sec,
+                max_pending=settings.index_compact_max_pending,
+            )
+            for sport, df in (("handball", handball_df), ("tennis", tennis_df))
+        }
+
+        app.state.handball_df = handball_df
+        app.state.tennis_df = tennis_df
+        app.state.handball_idx = live["handball"]
+        app.state.tennis_idx = live["tennis"]
+        _build_derived()
+        for idx in live.values():
+            idx.on_compact = lambda _base: _build_derived()
+
+    def _build_derived() -> None:
+        '''
+        Rebuild the structures derived from the court indexes. They are built
+        from each LiveIndex's compacted base; until the next compaction the
+        walking reranker and /courts/{id}/neighbors read pending admin edits
+        from the live indexes, while the gazetteer and coverage catch up at
+        compaction.
+        '''
 
-    handball_idx = NearestIndex(handball_df)
-    tennis_idx = NearestIndex(tennis_df)
+        handball_idx = app.state.handball_idx.base
+        tennis_idx = app.state.tennis_idx.base
+        register_local_places([handball_idx.df, tennis_idx.df])
+        app.state.handball_walk = WalkingReranker(handball_idx, settings.walk_rerank_candidates, live=app.state.handball_idx)
+        app.state.tennis_walk = WalkingReranker(tennis_idx, settings.walk_rerank_candidates, live=app.state.tennis_idx)
+        app.state.court_graph = CourtGraph({"handball": handball_idx.df, "tennis": tennis_idx.df}, k=settings.neighbor_graph_k)
+        app.state.coverage = CoverageCache({"handball": handball_idx, "tennis": tennis_idx}, settings.coverage_max_km)
 
-    app.state.handball_df = handball_df
-    app.state.tennis_df = tennis_df
-    app.state.handball_idx = handball_idx
-    app.state.tennis_idx = tennis_idx
+    warmup.add("courts", _load_datasets, required=True)
+    warmup.add("geocoder", geocoder_clients)
+    warmup.add("agent", agent_warm_up)
+
+    # Courts beyond NYC: region shards built with python -m app.shards; only
+    # their manifests are read here, shards load on first use
+    app.state.regions = {}
+
+    def _open_regions() -> None:
+        app.state.regions = open_sharded(Path(settings.shard_dir), settings.shard_memory_mb)
+        logger.info("region shards opened sports=%s", ",".join(app.state.regions) or "none")
+
+    if settings.shard_dir:
+        warmup.add("regions", _open_regions)
+
+    # Check-ins outlive dataset reloads; keyed by "<sport>:<Court_Id>"
+    checkins = CheckinStore(
+        bucket_sec=settings.checkin_bucket_sec,
+        buckets=settings.checkin_buckets,
+        half_life_sec=settings.checkin_half_life_sec,
+        snapshot_path=settings.checkin_snapshot_path or None,
+    )
+    checkins.load()
+    # Started per process at startup: under the prefork launcher the app is
+    # built before the workers fork, and threads do not survive a fork
+    app.add_event_handler("startup", lambda: checkins.start_snapshots(settings.checkin_snapshot_sec))
+    app.add_event_handler("shutdown", checkins.stop)
+    app.state.checkins = checkins
 
     app.add_middleware(
         CORSMiddleware,
@@ -76,9 +191,34 @@ def create_app():
         allow_headers=settings.cors_allow_headers,
     )
 
+    # Per-route latency; added last so it wraps everything, including CORS
+    metrics.configure(settings.metrics_enabled)
+    app.add_middleware(MetricsMiddleware)
+    if settings.log_access:
+        app.add_middleware(
+            log_pipeline.AccessLogMiddleware, sample_rate=settings.log_access_sample_rate, slow_ms=settings.log_slow_ms,
+        )
+    app.add_event_handler("shutdown", log_pipeline.flush)
+
     @app.get("/health")
-    def health():
-        return {"status": "ok"}
+    def health(response: Response):
+        '''
+        Readiness: 200 once the court data is loaded, 503 while it is still
+        loading or if loading failed, with the state of every warm-up task.
+        '''
+
+        tasks = warmup.status()
+        if warmup.ready:
+            return {"status": "ok", "warmup": tasks}
+        response.status_code = 503
+        failed = any(t["state"] == "failed" and t["required"] for t in tasks.values())
+        return {"status": "failed" if failed else "starting", "warmup": tasks}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        if not metrics.is_enabled():
+            raise HTTPException(status_code=404, detail="Metrics are disabled")
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
     @app.post("/geocodeForward", response_model=GeocodeResp)
     def forward(req: GeocodeReq):
@@ -98,50 +238,635 @@ def create_app():
             raise HTTPException(status_code=503, detail="Geocoding service unavailable")
         return GeocodeResp(**result)
 
-    @app.get("/nearest", response_model=NearestResp)
-    def nearest(
+    def _court_from_row(r, sport_name: str) -> Court:
+        return Court(
+            Court_Id=str(r.get("Court_Id")),
+            Name=str(r.get("Name")),
+            Borough=str(r.get("Borough", "")),
+            Lat=float(r.get("Lat")),
+            Lon=float(r.get("Lon")),
+            Num_Of_Courts=int(r.get("Num_Of_Courts")) if "Num_Of_Courts" in r else None,
+            Location=str(r.get("Location", "")),
+            Distance_Km=float(r.get("distance_km", 0.0)),
+            Walking_Km=float(r["walking_km"]) if "walking_km" in r else None,
+            **info_values(r),
+            Sport=sport_name,
+        )
+
+    def _rows_to_results(rows: pd.DataFrame, sport_name: str):
+        # Row dicts are several times cheaper to build than iterrows() Series
+        return [_court_from_row(r, sport_name) for r in rows.to_dict("records")]
+
+    def _attach_crowding(results: List[Court]) -> None:
+        occupancy = app.state.checkins.occupancy([court_key(c.Sport, c.Court_Id) for c in results])
+        for court, players in zip(results, occupancy):
+            court.Crowding = round(float(players), 1)
+            court.Crowding_Level = crowding_level(players / max(1, court.Num_Of_Courts or 1))
+
+    def _nearest_frames(
+        lat: float, lon: float, limit: int, sport_norm: str, walking: bool, timings: dict, quiet: bool, filters: dict = None,
+    ):
+        '''
+        Index rows per sport for a /nearest query: list of (rows, sport).
+        filters (app.court_info.info_mask keywords) keep only matching courts,
+        still the nearest ones.
+        '''
+
+        sports = ["handball", "tennis"] if sport_norm == "both" else [sport_norm]
+        # Ranking by crowding re-orders a wider pool of nearby courts
+        k = min(50, max(3 * limit, 30)) if quiet else limit
+        frames = []
+        for sport_name in sports:
+            if walking:
+                walker = app.state.handball_walk if sport_name == "handball" else app.state.tennis_walk
+                query, total = (lambda n: walker.query_k(lat, lon, k=n)), len(walker.live)
+            else:
+                idx = app.state.handball_idx if sport_name == "handball" else app.state.tennis_idx
+                query, total = (lambda n: idx.query_k(lat, lon, k=n)), len(idx)
+            with span("nearest.rerank" if walking else "nearest.query"):
+                if filters:
+                    rows = nearest_matching(query, k, total, lambda rows: info_mask(rows, **filters))
+                else:
+                    rows = query(k)
+            if walking and timings is not None:
+                timings["rerank"] = timings.get("rerank", 0.0) + rows.attrs["rerank_ms"]
+            frames.append((rows, sport_name))
+        return frames
+
+    def _nearest_courts(
+        lat: float,
+        lon: float,
+        limit: int,
+        sport_norm: str,
+        walking: bool = False,
+        timings: dict = None,
+        crowding: bool = False,
+        quiet: bool = False,
+        filters: dict = None,
+    ):
+        frames = _nearest_frames(lat, lon, limit, sport_norm, walking, timings, quiet, filters)
+        with span("nearest.serialize"):
+            results = [c for rows, sport_name in frames for c in _rows_to_results(rows, sport_name)]
+            if crowding or quiet:
+                _attach_crowding(results)
+            if len(frames) == 1 and not quiet:
+                return results
+            key = (lambda r: r.Walking_Km) if walking else (lambda r: r.Distance_Km if r.Distance_Km is not None else 0.0)
+            if quiet:
+                # Each player per court costs as much as crowding_penalty_km of extra travel
+                base_key = key
+                key = lambda r: base_key(r) + settings.crowding_penalty_km * r.Crowding / max(1, r.Num_Of_Courts or 1)
+            return sorted(results, key=key)[:limit]
+
+    def _nearest_table(
+        lat: float,
+        lon: float,
+        limit: int,
+        sport_norm: str,
+        walking: bool = False,
+        timings: dict = None,
+        crowding: bool = False,
+        quiet: bool = False,
+        filters: dict = None,
+    ) -> pd.DataFrame:
+        '''
+        _nearest_courts as one table with Court field columns, for the binary
+        response formats: same rows and order, no per-court models.
+        '''
+
+        frames = _nearest_frames(lat, lon, limit, sport_norm, walking, timings, quiet, filters)
+        with span("nearest.serialize"):
+            tables = [courts_table(rows, sport_name) for rows, sport_name in frames]
+            table = concat_tables(tables)
+            if crowding or quiet:
+                players = app.state.checkins.occupancy((table["Sport"] + ":" + table["Court_Id"]).tolist())
+                courts = np.maximum(1, table["Num_Of_Courts"].to_numpy()) if "Num_Of_Courts" in table else np.ones(len(table))
+                table["Crowding"] = np.round(players, 1)
+                table["Crowding_Level"] = [crowding_level(p) for p in players / courts]
+            if len(tables) == 1 and not quiet:
+                return table
+            key = table["Walking_Km"].to_numpy() if walking else table["Distance_Km"].to_numpy()
+            if quiet:
+                key = key + settings.crowding_penalty_km * table["Crowding"].to_numpy() / courts
+            return table.iloc[np.argsort(key, kind="stable")[:limit]].reset_index(drop=True)
+
+    def _nearest_batch(sport_name: str, items) -> List[List[Court]]:
+        '''
+        Answer a coalesced batch of distance-ranked lookups for one sport with
+        one index query and one row conversion.
+        Inputs:
+            sport_name: str - handball or tennis.
+            items: list of (lat, lon, limit).
+        Returns:
+            list - One result list per item, in item order.
+        '''
+
+        idx = app.state.handball_idx if sport_name == "handball" else app.state.tennis_idx
+        lats, lons, limits = zip(*items)
+        with span("nearest.batch"):
+            rows = idx.query_k_many(lats, lons, max(limits))
+        with span("nearest.serialize"):
+            courts = _rows_to_results(rows, sport_name)
+        k = len(courts) // len(items)
+        return [courts[i * k:i * k + min(limit, k)] for i, limit in enumerate(limits)]
+
+    # Opt-in: NEAREST_BATCH_WINDOW_MS > 0 coalesces concurrent /nearest calls
+    coalescer = None
+    if settings.nearest_batch_window_ms > 0:
+        coalescer = Coalescer(_nearest_batch, settings.nearest_batch_window_ms, settings.nearest_batch_max)
+    app.state.nearest_coalescer = coalescer
+
+    async def _nearest_coalesced(lat: float, lon: float, limit: int, sport_norm: str) -> List[Court]:
+        sports = ["handball", "tennis"] if sport_norm == "both" else [sport_norm]
+        parts = await asyncio.gather(*(coalescer.submit(sport_name, lat, lon, limit) for sport_name in sports))
+        results = [c for part in parts for c in part]
+        if len(parts) > 1:
+            results = sorted(results, key=lambda r: r.Distance_Km)[:limit]
+        return results
+
+    @app.get("/nearest", response_model=NearestResp, response_model_exclude_none=True, dependencies=courts_ready)
+    async def nearest(
+        request: Request,
+        response: Response,
         lat: float = Query(..., ge=-90, le=90),
         lon: float = Query(..., ge=-180, le=180),
         limit: int = Query(10, ge=1, le=50),
         sport: str = Query("handball"),
+        rank: str = Query("distance", pattern="^(distance|walking|quiet)$"),
+        crowding: bool = Query(False),
+        lessons: Optional[bool] = Query(None),
+        permit: Optional[bool] = Query(None),
+        indoor: Optional[bool] = Query(None),
+        indoor_month: Optional[int] = Query(None, ge=1, le=12),
+    ):
+        '''
+        Nearest courts. lessons, permit, indoor and indoor_month filter on
+        the fields parsed from the tennis Info text (app/court_info.py);
+        courts without them (handball) only match filters set to false.
+        '''
+
+        sport_norm = _normalize_sport(sport)
+        filters = {"lessons": lessons, "permit": permit, "indoor": indoor, "indoor_month": indoor_month}
+        filters = {key: value for key, value in filters.items() if value is not None}
+        fmt = negotiate(request.headers.get("accept"))
+        response.headers["Vary"] = "Accept"
+        if fmt != JSON:
+            # Binary formats skip the per-court models (and micro-batching, which builds them)
+            timings = {}
+            table = await run_in_threadpool(
+                _nearest_table, lat, lon, limit, sport_norm,
+                walking=rank == "walking", timings=timings, crowding=crowding, quiet=rank == "quiet", filters=filters,
+            )
+            resp = encode_table(fmt, table, {"count": len(table)})
+            if "rerank" in timings:
+                resp.headers["Server-Timing"] = f"rerank;dur={timings['rerank']:.3f}"
+            return resp
+
+        if coalescer is not None and rank == "distance" and not filters:
+            results = await _nearest_coalesced(lat, lon, limit, sport_norm)
+            if crowding:
+                _attach_crowding(results)
+            return NearestResp(count=len(results), results=results)
+
+        timings = {}
+        results = await run_in_threadpool(
+            _nearest_courts, lat, lon, limit, sport_norm,
+            walking=rank == "walking", timings=timings, crowding=crowding, quiet=rank == "quiet", filters=filters,
+        )
+        if "rerank" in timings:
+            response.headers["Server-Timing"] = f"rerank;dur={timings['rerank']:.3f}"
+        return NearestResp(count=len(results), results=results)
+
+    def _regions() -> dict:
+        if not settings.shard_dir:
+            raise HTTPException(status_code=404, detail="Region shards are not configured (SHARD_DIR).")
+        try:
+            ready = warmup.wait("regions", settings.warmup_wait_sec)
+        except WarmupError:
+            ready = False
+        if not ready or not warmup.is_ready("regions"):
+            raise HTTPException(status_code=503, detail="Region shards are not available", headers={"Retry-After": "1"})
+        return app.state.regions
+
+    @app.get("/regions/nearest", response_model=NearestResp, response_model_exclude_none=True)
+    def regions_nearest(
+        request: Request,
+        response: Response,
+        lat: float = Query(..., ge=-90, le=90),
+        lon: float = Query(..., ge=-180, le=180),
+        limit: int = Query(10, ge=1, le=50),
+        sport: str = Query("handball"),
+    ):
+        '''
+        Nearest courts from the region-sharded index (SHARD_DIR), covering
+        every city in the shards rather than only NYC. Distance ranking only.
+        '''
+
+        regions = _regions()
+        sport_norm = _normalize_sport(sport)
+        sports = [s for s in ("handball", "tennis") if s in regions] if sport_norm == "both" else [sport_norm]
+        if not sports or any(s not in regions for s in sports):
+            raise HTTPException(status_code=404, detail=f"No region shards for {sport_norm}.")
+        frames = []
+        for sport_name in sports:
+            with span("regions.query"):
+                frames.append((regions[sport_name].query_k(lat, lon, k=limit), sport_name))
+        fmt = negotiate(request.headers.get("accept"))
+        response.headers["Vary"] = "Accept"
+        if fmt != JSON:
+            table = concat_tables([courts_table(rows, sport_name) for rows, sport_name in frames])
+            table = table.iloc[np.argsort(table["Distance_Km"].to_numpy(), kind="stable")[:limit]].reset_index(drop=True)
+            return encode_table(fmt, table, {"count": len(table)})
+        results = [c for rows, sport_name in frames for c in _rows_to_results(rows, sport_name)]
+        results.sort(key=lambda c: c.Distance_Km)
+        results = results[:limit]
+        return NearestResp(count=len(results), results=results)
+
+    @app.get("/regions")
+    def regions_status():
+        '''Shard counts and LRU cache state per sport.'''
+
+        return {sport: index.status() for sport, index in _regions().items()}
+
+    @app.get("/courts", response_model=CourtsResp, response_model_exclude_none=True, dependencies=courts_ready)
+    def courts_list(
+        request: Request,
+        response: Response,
+        sport: str = Query("both"),
+        borough: Optional[str] = Query(None),
+        offset: int = Query(0, ge=0),
+        limit: int = Query(1000, ge=1, le=100_000),
+        lessons: Optional[bool] = Query(None),
+        permit: Optional[bool] = Query(None),
+        indoor: Optional[bool] = Query(None),
+        indoor_month: Optional[int] = Query(None, ge=1, le=12),
     ):
+        '''
+        Court listing for bulk clients: every live court (admin edits
+        included), handball first, optionally one borough and the /nearest
+        Info filters, paged with offset/limit. Negotiates JSON, MessagePack
+        or Arrow (see app.response_formats).
+        '''
+
         sport_norm = _normalize_sport(sport)
+        sports = ["handball", "tennis"] if sport_norm == "both" else [sport_norm]
+        with span("courts.list"):
+            tables = []
+            for sport_name in sports:
+                df = getattr(app.state, f"{sport_name}_idx").df
+                if borough:
+                    df = df[df["Borough"].astype(str).str.lower() == borough.strip().lower()]
+                if has_filters(lessons, permit, indoor, indoor_month):
+                    df = df[info_mask(df, lessons, permit, indoor, indoor_month)]
+                tables.append(courts_table(df, sport_name))
+            table = concat_tables(tables)
+            total = len(table)
+            table = table.iloc[offset:offset + limit].reset_index(drop=True)
+        meta = {"count": len(table), "total": total, "offset": offset}
+
+        fmt = negotiate(request.headers.get("accept"))
+        response.headers["Vary"] = "Accept"
+        if fmt != JSON:
+            return encode_table(fmt, table, meta)
+        with span("courts.serialize"):
+            results = [Court(**r) for r in table.to_dict("records")]
+        return CourtsResp(results=results, **meta)
+
+    @app.websocket("/nearest/live")
+    async def nearest_live(ws: WebSocket):
+        '''
+        Live-location mode. The client sends {"lat", "lon", "sport"?, "limit"?}
+        whenever its position changes; the server answers only when the nearest
+        courts changed, with a diff (see app.live_location) instead of the full
+        list. Positions within LIVE_MIN_MOVE_M of the last computed one are
+        ignored.
+        '''
+
+        def _compute(lat: float, lon: float, limit: int, sport_norm: str):
+            return [c.model_dump(exclude_none=True) for c in _nearest_courts(lat, lon, limit, sport_norm)]
+
+        try:
+            await _courts_ready()
+        except HTTPException:
+            await ws.close(code=1013)  # try again later
+            return
+        session = NearestSession(_compute, settings.live_min_move_m)
+        await ws.accept()
+        LIVE_SESSIONS.inc()
+        try:
+            while True:
+                try:
+                    msg = await ws.receive_json()
+                    lat, lon = float(msg["lat"]), float(msg["lon"])
+                    # sport and limit are sticky: omitted fields keep the session's values
+                    limit = int(msg.get("limit", session.limit))
+                    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 1 <= limit <= 50):
+                        raise ValueError("out of range")
+                    sport_norm = _normalize_sport(msg.get("sport", session.sport))
+                except WebSocketDisconnect:
+                    raise
+                except (KeyError, TypeError, ValueError, HTTPException):
+                    await ws.send_json({"type": "error", "detail": "Send {lat, lon, sport?, limit?} with valid values."})
+                    continue
+
+                if session.needs_update(lat, lon, limit, sport_norm):
+                    diff = await run_in_threadpool(session.update, lat, lon, limit, sport_norm)
+                else:
+                    diff = session.update(lat, lon, limit, sport_norm)  # cheap: recorded as skipped
+                if diff is not None:
+                    body = json.dumps(diff)
+                    LIVE_BYTES.inc(len(body))
+                    await ws.send_text(body)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            LIVE_SESSIONS.dec()
+
+    @app.post("/courts/{court_id}/checkin", response_model=CheckinResp, dependencies=courts_ready)
+    def checkin(court_id: str, req: Optional[CheckinReq] = None, sport: Optional[str] = Query(None)):
+        '''
+        Record players arriving at a court. Only touches the check-in store,
+        so it never waits on index queries or dataset reloads.
+        '''
 
-        def _rows_to_results(rows: pd.DataFrame, sport_name: str):
+        sport_norm = _normalize_sport(sport) if sport else "both"
+        sports = [s for s in ("handball", "tennis") if sport_norm in ("both", s) and court_id in getattr(app.state, f"{s}_idx")]
+        if not sports:
+            raise HTTPException(status_code=404, detail="Court not found")
+        if len(sports) > 1:
+            raise HTTPException(status_code=400, detail=f"Court id {court_id} exists for {', '.join(sports)}; pass sport.")
+
+        key = court_key(sports[0], court_id)
+        store = app.state.checkins
+        store.checkin(key, players=req.players if req else 1)
+        players = float(store.occupancy([key])[0])
+        courts = _court_count(sports[0], court_id)
+        return CheckinResp(
+            court_id=court_id,
+            sport=sports[0],
+            crowding=round(players, 1),
+            crowding_level=crowding_level(players / courts),
+        )
+
+    def _court_count(sport_name: str, court_id: str) -> int:
+        rows = _live_idx(sport_name).rows_for(court_id)
+        if rows.empty or "Num_Of_Courts" not in rows.columns:
+            return 1
+        return max(1, int(rows["Num_Of_Courts"].iloc[0] or 1))
+
+    def _live_idx(sport_name: str) -> LiveIndex:
+        return app.state.handball_idx if sport_name == "handball" else app.state.tennis_idx
+
+    snapshots = SnapshotCache(settings.snapshot_ttl_sec)
+
+    @app.get("/courts/snapshot", dependencies=courts_ready)
+    def courts_snapshot(request: Request, v: Optional[str] = Query(None)):
+        '''
+        All courts in the compact binary encoding of app.snapshot, for nearest
+        search in the browser. The unversioned URL must be revalidated (ETag);
+        /courts/snapshot?v=<X-Snapshot-Version> is immutable and cacheable for
+        a year, and answers 404 once the data has changed.
+        '''
+
+        h, t = app.state.handball_idx, app.state.tennis_idx
+        with span("snapshot.encode"):
+            entry = snapshots.get((id(h), h.version, id(t), t.version), lambda: {"handball": h.df, "tennis": t.df})
+        if v is not None and v != entry["version"]:
+            raise HTTPException(status_code=404, detail="Snapshot version is no longer current")
+
+        gz = "gzip" in request.headers.get("accept-encoding", "").lower()
+        headers = {
+            # Strong ETags differ per content-coding
+            "ETag": f'"{entry["etag"]}{"-gz" if gz else ""}"',
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "public, max-age=31536000, immutable" if v else "public, no-cache",
+            "X-Snapshot-Version": entry["version"],
+        }
+        inm = request.headers.get("if-none-match", "")
+        tags = {tag.strip().removeprefix("W/").strip('"') for tag in inm.split(",") if tag.strip()}
+        if "*" in tags or tags & {entry["etag"], entry["etag"] + "-gz"}:
+            return Response(status_code=304, headers=headers)
+        if gz:
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=entry["gzip"] if gz else entry["raw"], media_type="application/octet-stream", headers=headers)
+
+    @app.get("/courts/{court_id}/neighbors", response_model=CourtNeighborsResp, response_model_exclude_none=True, dependencies=courts_ready)
+    def court_neighbors(
+        court_id: str,
+        sport: Optional[str] = Query(None),
+        limit: int = Query(5, ge=1, le=50),
+    ):
+        graph = app.state.court_graph
+        sport_norm = _normalize_sport(sport) if sport else None
+        if sport_norm == "both":
+            sport_norm = None
+        live = {s: _live_idx(s) for s in ("handball", "tennis")}
+        if any(idx.pending or graph.frames[s] is not idx.base.df for s, idx in live.items()):
+            # Admin edits wait for compaction: the graph is stale, ask the live indexes
+            with span("neighbors.serialize"):
+                return _live_neighbors(live, court_id, sport_norm, limit)
+
+        node, found = graph.find(court_id, sport_norm)
+        if node is None:
+            _neighbors_not_found(court_id, found)
+
+        with span("neighbors.serialize"):
+            court = _court_from_row(*graph.row(node)[::-1])
+            court.Distance_Km = None
             results = []
-            for _, r in rows.iterrows():
-                results.append(
-                    Court(
-                        Court_Id=str(r.get("Court_Id")),
-                        Name=str(r.get("Name")),
-                        Borough=str(r.get("Borough", "")),
-                        Lat=float(r.get("Lat")),
-                        Lon=float(r.get("Lon")),
-                        Num_Of_Courts=int(r.get("Num_Of_Courts")) if "Num_Of_Courts" in rows.columns else None,
-                        Location=str(r.get("Location", "")),
-                        Distance_Km=float(r.get("distance_km", 0.0)),
-                        Sport=sport_name,
-                    )
+            for j, dist_km in graph.neighbors_of(node, limit):
+                nbr = _court_from_row(*graph.row(j)[::-1])
+                nbr.Distance_Km = round(dist_km, 2)
+                results.append(nbr)
+        return CourtNeighborsResp(court=court, count=len(results), results=results)
+
+    def _neighbors_not_found(court_id: str, found: List[str]) -> None:
+        if len(found) > 1:
+            raise HTTPException(status_code=400, detail=f"Court id {court_id} exists for {', '.join(found)}; pass sport.")
+        raise HTTPException(status_code=404, detail="Court not found")
+
+    def _live_neighbors(live: dict, court_id: str, sport_norm: Optional[str], limit: int) -> CourtNeighborsResp:
+        '''
+        court_neighbors over the live indexes, with the graph's rules: the
+        court's own rows (same sport and id) are never its neighbours.
+        '''
+
+        found = [s for s, idx in live.items() if sport_norm in (None, s) and court_id in idx]
+        if len(found) != 1:
+            _neighbors_not_found(court_id, found)
+        sport_name = found[0]
+        own = live[sport_name].rows_for(court_id)
+        r = own.iloc[0]
+        candidates = []
+        for s, idx in live.items():
+            rows = idx.query_k(float(r["Lat"]), float(r["Lon"]), k=limit + (len(own) if s == sport_name else 0))
+            if s == sport_name:
+                rows = rows[rows["Court_Id"].astype(str) != str(court_id)]
+            candidates += [(row["distance_km"], _court_from_row(row, s)) for row in rows.to_dict("records")]
+        candidates.sort(key=lambda c: c[0])
+
+        court = _court_from_row(r.to_dict(), sport_name)
+        court.Distance_Km = None
+        results = [nbr for _, nbr in candidates[:limit]]
+        return CourtNeighborsResp(court=court, count=len(results), results=results)
+
+    @app.get("/analytics/coverage", dependencies=courts_ready)
+    def coverage(
+        sport: str = Query("both"),
+        cell_m: Optional[float] = Query(None, ge=25, le=5000),
+        format: str = Query("json", pattern="^(json|binary|geojson)$"),
+    ):
+        '''
+        Distance to the nearest court over a grid covering NYC, with per-borough
+        summaries. format=binary returns the grid as little-endian uint16 metres
+        (row 0 = south, NO_DATA outside the city) with the grid spec in the
+        X-Coverage-Grid header; format=geojson returns one polygon per cell.
+        cell_m is snapped to the nearest of app.coverage.CELL_SIZES_M; the
+        size used is in the grid spec.
+        '''
+
+        sport_norm = _normalize_sport(sport)
+        cell = snap_cell_m(cell_m) if cell_m else settings.coverage_cell_m
+        with span("coverage.compute"):
+            result = app.state.coverage.get(sport_norm, cell)
+        spec = result["spec"]
+
+        if format == "binary":
+            with span("coverage.serialize"):
+                body = to_uint16_m(result["dist_km"], result["grid"]).tobytes()
+            headers = {"X-Coverage-Grid": json.dumps(asdict(spec)), "X-Coverage-No-Data": str(int(NO_DATA))}
+            return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+        if format == "geojson":
+            cells = int(result["summary"]["all"]["cells"])
+            if cells > settings.coverage_geojson_max_cells:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{cells} cells is too many for GeoJSON; use a larger cell_m or format=binary.",
                 )
-            return results
+            with span("coverage.serialize"):
+                return to_geojson(result)
 
-        if sport_norm == "handball":
-            nearest_df = app.state.handball_idx.query_k(lat, lon, k=limit)
-            results = _rows_to_results(nearest_df, "handball")
-            return NearestResp(count=len(results), results=results)
+        return {
+            "sport": sport_norm,
+            "grid": asdict(spec),
+            "compute_ms": result["compute_ms"],
+            "boroughs": result["summary"],
+        }
 
-        if sport_norm == "tennis":
-            nearest_df = app.state.tennis_idx.query_k(lat, lon, k=limit)
-            results = _rows_to_results(nearest_df, "tennis")
-            return NearestResp(count=len(results), results=results)
+    @app.post("/nearest/group", response_model=NearestGroupResp, response_model_exclude_none=True, dependencies=courts_ready)
+    def nearest_group(req: NearestGroupReq):
+        sport_norm = _normalize_sport(req.sport)
+        sports = ["handball", "tennis"] if sport_norm == "both" else [sport_norm]
+        lats = [o.lat for o in req.origins]
+        lons = [o.lon for o in req.origins]
+        score_col = "total_km" if req.objective == "sum" else "max_km"
+
+        results = []
+        for sport_name in sports:
+            idx = app.state.handball_idx if sport_name == "handball" else app.state.tennis_idx
+            with span("nearest.group_query"):
+                rows = idx.query_group(lats, lons, k=req.limit, objective=req.objective)
+            with span("nearest.serialize"):
+                rows["distance_km"] = rows[score_col]
+                for court, (_, r) in zip(_rows_to_results(rows, sport_name), rows.iterrows()):
+                    results.append(
+                        GroupCourt(
+                            **court.model_dump(),
+                            Total_Km=float(r["total_km"]),
+                            Max_Km=float(r["max_km"]),
+                            Distances_Km=[float(d) for d in r["distances_km"]],
+                        )
+                    )
+        results = sorted(results, key=lambda c: c.Distance_Km)[: req.limit]
+        return NearestGroupResp(count=len(results), objective=req.objective, results=results)
+
+    @app.post("/geocode/batch")
+    async def geocode_batch(req: GeocodeBatchReq, request: Request):
+        '''
+        Geocode many addresses, streaming one NDJSON line per unique address as
+        soon as it resolves, followed by a summary line. Cache hits are sent
+        first; misses go through the shared rate-limited geocoding queue. If
+        the client disconnects, its lookups still waiting in the queue are
+        dropped so they stop holding the shared rate limit.
+        '''
+
+        sport_norm = _normalize_sport(req.sport) if req.nearest else None
+        if sport_norm:
+            await _courts_ready()
+
+        # Dedupe on the normalized address, remembering which inputs map to it
+        groups = {}
+        for i, address in enumerate(req.addresses):
+            key = _normalize_address(address).lower()
+            if not key:
+                continue
+            groups.setdefault(key, {"address": address, "inputs": []})["inputs"].append(i)
+        logger.info("geocode/batch request addresses=%d unique=%d", len(req.addresses), len(groups))
+
+        def _line(group: dict, result) -> bytes:
+            item = {"inputs": group["inputs"], "address": group["address"], "result": result}
+            if result and sport_norm:
+                courts = _nearest_courts(result["lat"], result["lon"], req.nearest, sport_norm)
+                item["nearest"] = [c.model_dump(exclude_none=True) for c in courts]
+            return (json.dumps(item) + "\n").encode()
+
+        # Lookups this request queued, released when it ends or the client leaves
+        owned = []
+
+        def _release() -> None:
+            # Runs on disconnect and again when the stream ends; release each lookup once
+            while owned:
+                batch_queue.release(*owned.pop())
+
+        async def _watch_disconnect() -> None:
+            # The body has been read, so the next message is the disconnect
+            while (await request.receive())["type"] != "http.disconnect":
+                pass
+            _release()
+
+        async def _resolve(group: dict, fut):
+            try:
+                return group, await asyncio.wrap_future(fut)
+            except asyncio.CancelledError:
+                if fut.cancelled():
+                    return group, None  # released after the client went away
+                raise
+            except Exception:
+                return group, None
+
+        async def _stream():
+            watcher = asyncio.create_task(_watch_disconnect())
+            try:
+                summary = {"done": True, "total": len(req.addresses), "unique": len(groups), "cached": 0, "resolved": 0, "failed": 0}
+                misses = []
+                for group in groups.values():
+                    hit = geocode_cached(group["address"])
+                    if hit:
+                        summary["cached"] += 1
+                        summary["resolved"] += 1
+                        # Nearest-court lookups run off the event loop
+                        yield await run_in_threadpool(_line, group, hit)
+                    else:
+                        # Submit now so queue order follows request order
+                        fut = batch_queue.submit(group["address"])
+                        owned.append((group["address"], fut))
+                        misses.append(_resolve(group, fut))
 
-        handball_df = app.state.handball_idx.query_k(lat, lon, k=limit)
-        tennis_df = app.state.tennis_idx.query_k(lat, lon, k=limit)
-        merged = _rows_to_results(handball_df, "handball") + _rows_to_results(tennis_df, "tennis")
-        merged = sorted(merged, key=lambda r: r.Distance_Km if r.Distance_Km is not None else 0.0)[:limit]
+                for next_done in asyncio.as_completed(misses):
+                    group, result = await next_done
+                    if watcher.done():
+                        return  # client gone
+                    summary["resolved" if result else "failed"] += 1
+                    yield await run_in_threadpool(_line, group, result)
+                yield (json.dumps(summary) + "\n").encode()
+            finally:
+                watcher.cancel()
+                _release()
 
-        return NearestResp(count=len(merged), results=merged)
+        return StreamingResponse(_stream(), media_type="application/x-ndjson")
 
+    warmup.start(background=settings.startup_warmup != "eager")
     return app
 
 
@@ -7,6 +7,8 @@ from functools import lru_cache
 from pathlib import Path
 from typing import List
 
+from app.CONSTANTS import GEOCODER_MIN_DELAY_SEC
+
 
 def env_bool(key, default = False):
     """
@@ -42,6 +44,26 @@ def env_list(key, default=None):
     return [x.strip() for x in val.split(",") if x.strip()]
 
 
+def env_float(key, default):
+    """
+    Parse an environment variable into a float.
+
+    Inputs:
+        key: (str) environment variable key
+        default: (float) default float value if env var is not set
+
+    Returns:
+        (float) parsed float value
+    """
+    val = os.getenv(key)
+    if val is None:
+        return default
+    try:
+        return float(val)
+    except ValueError:
+        return default
+
+
 def env_int(key, default):
     """
     Parse an environment variable into an integer.
@@ -75,10 +97,63 @@ class Settings:
     port: int
     debug: bool
     static_dir: Path
+    static_build_dir: Path
     data_dir: Path
     allowed_origins: List[str]
     cors_allow_credentials: bool
     cors_allow_headers: List[str]
+    agent_model: str
+    agent_max_steps: int
+    agent_deadline_sec: float
+    agent_tool_token_budget: int
+    agent_max_concurrency: int
+    agent_max_queue: int
+    agent_max_queued_per_client: int
+    agent_min_service_sec: float
+    agent_service_sec: float
+    metrics_enabled: bool
+    geocoder_domain: str
+    geocoder_scheme: str
+    geocoder_min_delay_sec: float
+    geocoder_timeout_sec: float
+    geocoder_max_retries: int
+    geocoder_breaker_open_sec: float
+    geocode_cache_ttl_sec: float
+    walk_rerank_candidates: int
+    neighbor_graph_k: int
+    coverage_cell_m: float
+    coverage_max_km: float
+    coverage_geojson_max_cells: int
+    admin_token: str
+    index_compact_delay_sec: float
+    index_compact_max_pending: int
+    checkin_bucket_sec: float
+    checkin_buckets: int
+    checkin_half_life_sec: float
+    checkin_snapshot_path: str
+    checkin_snapshot_sec: float
+    crowding_penalty_km: float
+    live_min_move_m: float
+    snapshot_ttl_sec: float
+    nearest_batch_window_ms: float
+    nearest_batch_max: int
+    web_workers: int
+    worker_max_requests: int
+    worker_max_requests_jitter: int
+    graceful_timeout_sec: float
+    startup_warmup: str
+    warmup_wait_sec: float
+    shard_dir: str
+    shard_memory_mb: float
+    shard_cell_deg: float
+    log_level: str
+    log_format: str
+    log_queue_size: int
+    log_access: bool
+    log_access_sample_rate: float
+    log_info_sample_rate: float
+    log_slow_ms: float
+    log_dedupe_window_sec: float
 
     def is_prod(self):
         """
@@ -105,9 +180,62 @@ def get_settings():
         host=os.getenv("HOST", "0.0.0.0"),
         port=env_int("PORT", 8000),
         debug=env_bool("DEBUG", True),
-        static_dir=Path(os.getenv("STATIC_DIR", str(root / "static"))),
+        static_dir=Path(os.getenv("STATIC_DIR", str(root / "app" / "static"))),
+        static_build_dir=Path(os.getenv("STATIC_BUILD_DIR", str(root / "build" / "static"))),
         data_dir=Path(os.getenv("DATA_DIR", str(root / "data"))),
         allowed_origins=env_list("ALLOWED_ORIGINS", ["*"]),
         cors_allow_credentials=env_bool("CORS_ALLOW_CREDENTIALS", False),
         cors_allow_headers=env_list("CORS_ALLOW_HEADERS", ["*"]),
-    )
\ No newline at end of file
+        agent_model=os.getenv("AGENT_MODEL", "gpt-5-mini"),
+        agent_max_steps=env_int("AGENT_MAX_STEPS", 4),
+        agent_deadline_sec=env_float("AGENT_DEADLINE_SEC", 45.0),
+        agent_tool_token_budget=env_int("AGENT_TOOL_TOKEN_BUDGET", 600),
+        agent_max_concurrency=env_int("AGENT_MAX_CONCURRENCY", 8),
+        agent_max_queue=env_int("AGENT_MAX_QUEUE", 32),
+        agent_max_queued_per_client=env_int("AGENT_MAX_QUEUED_PER_CLIENT", 4),
+        agent_min_service_sec=env_float("AGENT_MIN_SERVICE_SEC", 5.0),
+        agent_service_sec=env_float("AGENT_SERVICE_SEC", 3.0),
+        metrics_enabled=env_bool("METRICS_ENABLED", True),
+        geocoder_domain=os.getenv("GEOCODER_DOMAIN", "nominatim.openstreetmap.org"),
+        geocoder_scheme=os.getenv("GEOCODER_SCHEME", "https"),
+        geocoder_min_delay_sec=env_float("GEOCODER_MIN_DELAY_SEC", GEOCODER_MIN_DELAY_SEC),
+        geocoder_timeout_sec=env_float("GEOCODER_TIMEOUT_SEC", 5.0),
+        geocoder_max_retries=env_int("GEOCODER_MAX_RETRIES", 1),
+        geocoder_breaker_open_sec=env_float("GEOCODER_BREAKER_OPEN_SEC", 30.0),
+        geocode_cache_ttl_sec=env_float("GEOCODE_CACHE_TTL_SEC", 24 * 3600.0),
+        walk_rerank_candidates=env_int("WALK_RERANK_CANDIDATES", 40),
+        neighbor_graph_k=env_int("NEIGHBOR_GRAPH_K", 20),
+        coverage_cell_m=env_float("COVERAGE_CELL_M", 250.0),
+        coverage_max_km=env_float("COVERAGE_MAX_KM", 3.0),
+        coverage_geojson_max_cells=env_int("COVERAGE_GEOJSON_MAX_CELLS", 50000),
+        admin_token=os.getenv("ADMIN_TOKEN", ""),
+        index_compact_delay_sec=env_float("INDEX_COMPACT_DELAY_SEC", 5.0),
+        index_compact_max_pending=env_int("INDEX_COMPACT_MAX_PENDING", 256),
+        checkin_bucket_sec=env_float("CHECKIN_BUCKET_SEC", 60.0),
+        checkin_buckets=env_int("CHECKIN_BUCKETS", 60),
+        checkin_half_life_sec=env_float("CHECKIN_HALF_LIFE_SEC", 900.0),
+        checkin_snapshot_path=os.getenv("CHECKIN_SNAPSHOT_PATH", str(root / "data" / "checkins.npz")),
+        checkin_snapshot_sec=env_float("CHECKIN_SNAPSHOT_SEC", 60.0),
+        crowding_penalty_km=env_float("CROWDING_PENALTY_KM", 0.5),
+        live_min_move_m=env_float("LIVE_MIN_MOVE_M", 25.0),
+        snapshot_ttl_sec=env_float("SNAPSHOT_TTL_SEC", 600.0),
+        nearest_batch_window_ms=env_float("NEAREST_BATCH_WINDOW_MS", 0.0),
+        nearest_batch_max=env_int("NEAREST_BATCH_MAX", 64),
+        web_workers=env_int("WEB_WORKERS", 1),
+        worker_max_requests=env_int("WORKER_MAX_REQUESTS", 0),
+        worker_max_requests_jitter=env_int("WORKER_MAX_REQUESTS_JITTER", 0),
+        graceful_timeout_sec=env_float("GRACEFUL_TIMEOUT_SEC", 30.0),
+        startup_warmup=os.getenv("STARTUP_WARMUP", "background").strip().lower(),
+        warmup_wait_sec=env_float("WARMUP_WAIT_SEC", 30.0),
+        shard_dir=os.getenv("SHARD_DIR", ""),
+        shard_memory_mb=env_float("SHARD_MEMORY_MB", 512.0),
+        shard_cell_deg=env_float("SHARD_CELL_DEG", 1.0),
+        log_level=os.getenv("LOG_LEVEL", "INFO").strip().upper(),
+        log_format=os.getenv("LOG_FORMAT", "json").strip().lower(),
+        log_queue_size=env_int("LOG_QUEUE_SIZE", 10_000),
+        log_access=env_bool("LOG_ACCESS", True),
+        log_access_sample_rate=env_float("LOG_ACCESS_SAMPLE_RATE", 1.0),
+        log_info_sample_rate=env_float("LOG_INFO_SAMPLE_RATE", 1.0),
+        log_slow_ms=env_float("LOG_SLOW_MS", 1000.0),
+        log_dedupe_window_sec=env_float("LOG_DEDUPE_WINDOW_SEC", 60.0),
+    )
@@ -0,0 +1,327 @@
+'''
+Region-sharded nearest-court index, for datasets too large (many cities) to
+load whole.
+
+Courts are partitioned into cells of a lat/lon grid (cell_deg degrees, 1 by
+default, so a city sits in one or a few cells) and each cell is written as
+one shard file: the pickled NearestIndex, BallTree included, so loading a
+shard is one unpickle rather than a tree build. A manifest lists every shard
+with the bounding box of its courts; only the manifest is read up front.
+Shard files are trusted input (pickle), like the rest of the data directory.
+
+A query visits shards best-first by the great-circle distance from the query
+point to each shard's bounding box, a lower bound on the distance to any
+court in it, and stops once that bound is larger than the k-th best
+distance found so far. Results are therefore exactly those of one index over
+all courts, including near cell borders and across the antimeridian; usually
+one or two shards are visited.
+
+Shards are loaded on first use into an LRU cache kept under a memory budget
+(the estimated size of each shard's DataFrame plus its BallTree). A shard in
+use by a query is never evicted from under it, since the query holds a
+reference.
+
+Build:
+    python -m app.shards build --csv courts.csv --out data/shards/handball [--cell-deg 1.0]
+'''
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import logging
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+from app.metrics import counter, gauge, histogram
+from app.nearest import NearestIndex
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+# Bounds are shrunk by this much so rounding never prunes a shard that holds a tie
+BOUND_SLACK_KM = 1e-6
+
+SHARD_LOADS = counter("shard_loads_total", "Shards loaded from disk.", ("index",))
+SHARD_EVICTIONS = counter("shard_evictions_total", "Shards evicted to stay within the memory budget.", ("index",))
+SHARD_CACHE_BYTES = gauge("shard_cache_bytes", "Estimated memory held by loaded shards.", ("index",))
+SHARD_CACHE_SHARDS = gauge("shard_cache_shards", "Shards currently loaded.", ("index",))
+SHARDS_VISITED = histogram(
+    "shard_query_shards", "Shards searched per query.", ("index",), buckets=(1, 2, 3, 4, 6, 8, 16, 32),
+)
+
+
+def cell_of(lat, lon, cell_deg: float) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Grid cell (row, col) of each point; columns start at the antimeridian.
+    '''
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    row = np.floor((lat + 90.0) / cell_deg).astype(np.int64)
+    col = np.floor((((lon + 180.0) % 360.0)) / cell_deg).astype(np.int64)
+    return row, col
+
+
+def _haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bbox_distance_km(lat: float, lon: float, boxes: np.ndarray) -> np.ndarray:
+    '''
+    Great-circle distance from a point to the nearest point of each lat/lon box.
+    Inputs:
+        lat, lon: float - Query point.
+        boxes: (n, 4) array - lat_min, lat_max, lon_min, lon_max (no box
+                              crosses the antimeridian).
+    Returns:
+        (n,) array of km, 0 for boxes containing the point.
+
+    Inside a box's longitude range the nearest point is straight north or
+    south. Otherwise it lies on the box's nearer meridian edge (along any
+    parallel, distance grows with the longitude gap), at the latitude where
+    that meridian passes closest to the point, or at an end of the edge.
+    '''
+
+    lat_min, lat_max, lon_min, lon_max = boxes.T
+    inside_lon = (lon >= lon_min) & (lon <= lon_max)
+    out = np.abs(lat - np.clip(lat, lat_min, lat_max)) * (np.pi / 180.0) * EARTH_RADIUS_KM
+
+    # Longitude gap to each edge, wrapped to [0, 180]
+    gap_min = np.abs((lon - lon_min + 180.0) % 360.0 - 180.0)
+    gap_max = np.abs((lon - lon_max + 180.0) % 360.0 - 180.0)
+    edge_lon = np.where(gap_min <= gap_max, lon_min, lon_max)
+    gap = np.radians(np.minimum(gap_min, gap_max))
+    phi = np.radians(lat)
+    closest = np.degrees(np.arctan2(np.sin(phi), np.cos(phi) * np.cos(gap)))
+    candidates = np.stack([np.clip(closest, lat_min, lat_max), lat_min, lat_max])
+    edge = _haversine_km(lat, lon, candidates, edge_lon).min(axis=0)
+    return np.where(inside_lon, out, edge)
+
+
+def build_shards(df: pd.DataFrame, out_dir: Path, cell_deg: float = 1.0) -> dict:
+    '''
+    Partition courts into grid-cell shards and write them with a manifest.
+    Inputs:
+        df: pd.DataFrame - Courts with Lat and Lon columns.
+        out_dir: Path - Output directory (replaced).
+        cell_deg: float - Cell size in degrees.
+    Returns:
+        dict - The manifest.
+    '''
+
+    df = df.dropna(subset=["Lat", "Lon"]).reset_index(drop=True)
+    row, col = cell_of(df["Lat"].to_numpy(), df["Lon"].to_numpy(), cell_deg)
+    cells = row * 1_000_000 + col
+    order = np.argsort(cells, kind="stable")
+    bounds = np.flatnonzero(np.diff(cells[order])) + 1
+
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    shards = []
+    for part in np.split(order, bounds):
+        if not len(part):
+            continue
+        shard = df.iloc[part].reset_index(drop=True)
+        key = f"r{row[part[0]]}c{col[part[0]]}"
+        with open(tmp / f"{key}.pkl", "wb") as fh:
+            pickle.dump(NearestIndex(shard), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        shards.append({
+            "key": key,
+            "file": f"{key}.pkl",
+            "rows": len(shard),
+            "bbox": [float(shard["Lat"].min()), float(shard["Lat"].max()), float(shard["Lon"].min()), float(shard["Lon"].max())],
+        })
+    manifest = {"version": MANIFEST_VERSION, "cell_deg": cell_deg, "rows": len(df), "columns": list(df.columns), "shards": shards}
+    (tmp / MANIFEST).write_text(json.dumps(manifest))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp.rename(out_dir)
+    return manifest
+
+
+def _index_bytes(index: NearestIndex) -> int:
+    # DataFrame (with strings) plus the BallTree's copy of the coordinates,
+    # its index array and the query-side radians
+    n = len(index.df)
+    return int(index.df.memory_usage(deep=True).sum()) + 3 * index.coords_rad.nbytes + 8 * n
+
+
+class ShardedIndex:
+    '''
+    Attributes:
+        shard_dir (Path): Directory written by build_shards.
+        memory_budget_bytes (int): Loaded shards are evicted, least recently
+                                   used first, above this estimate.
+        name (str): Metrics label.
+    '''
+
+    def __init__(self, shard_dir: Path, memory_budget_mb: float = 512.0, name: str = "default"):
+        self.shard_dir = Path(shard_dir)
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.name = name
+        manifest = json.loads((self.shard_dir / MANIFEST).read_text())
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"unsupported shard manifest version in {self.shard_dir}")
+        self.manifest = manifest
+        self._shards = manifest["shards"]
+        self._boxes = np.array([s["bbox"] for s in self._shards], dtype=float).reshape(-1, 4)
+        self._cache: "OrderedDict[int, Tuple[NearestIndex, int]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return int(self.manifest["rows"])
+
+    def _get(self, i: int) -> NearestIndex:
+        with self._lock:
+            entry = self._cache.get(i)
+            if entry is not None:
+                self._cache.move_to_end(i)
+                self.hits += 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(i, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._cache.get(i)
+                if entry is not None:
+                    self._cache.move_to_end(i)
+                    self.hits += 1
+                    return entry[0]
+            start = time.perf_counter()
+            with open(self.shard_dir / self._shards[i]["file"], "rb") as fh:
+                index: NearestIndex = pickle.load(fh)
+            size = _index_bytes(index)
+            with self._lock:
+                self._cache[i] = (index, size)
+                self._cache_bytes += size
+                self.loads += 1
+                # Evict the least recently used shards, but keep the one just loaded
+                while self._cache_bytes > self.memory_budget_bytes and len(self._cache) > 1:
+                    _, (_, old_size) = self._cache.popitem(last=False)
+                    self._cache_bytes -= old_size
+                    SHARD_EVICTIONS.inc(index=self.name)
+                SHARD_CACHE_BYTES.set(self._cache_bytes, index=self.name)
+                SHARD_CACHE_SHARDS.set(len(self._cache), index=self.name)
+            SHARD_LOADS.inc(index=self.name)
+            logger.debug("shard loaded index=%s key=%s rows=%d ms=%.1f", self.name, self._shards[i]["key"], len(index.df), (time.perf_counter() - start) * 1000)
+            return index
+
+    def _search(self, lat: float, lon: float, k: int) -> Tuple[List[Tuple[float, int, int]], Dict[int, NearestIndex]]:
+        k = min(k, len(self))
+        if k <= 0 or not len(self._shards):
+            return [], {}
+        lower = bbox_distance_km(lat, lon, self._boxes) - BOUND_SLACK_KM
+        best: List[Tuple[float, int, int]] = []  # max-heap of (-dist, shard, row)
+        used: Dict[int, NearestIndex] = {}
+        for i in np.argsort(lower, kind="stable").tolist():
+            if len(best) == k and lower[i] > -best[0][0]:
+                break
+            index = used[i] = self._get(i)
+            dist_km, idx = index.query_idx(lat, lon, k)
+            for d, j in zip(dist_km.tolist(), idx.tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (-d, i, j))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, i, j))
+        SHARDS_VISITED.observe(len(used), index=self.name)
+        return sorted((-d, i, j) for d, i, j in best), used
+
+    def query_idx(self, lat: float, lon: float, k: int = 10) -> List[Tuple[float, int, int]]:
+        '''
+        Exact k-NN across shards.
+        Returns:
+            list of (distance_km, shard, row) - Nearest first.
+        '''
+
+        return self._search(lat, lon, k)[0]
+
+    def query_k(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+        '''
+        Returns:
+            pd.DataFrame - The k nearest courts with a distance_km column,
+            nearest first (same shape as NearestIndex.query_k).
+        '''
+
+        hits, used = self._search(lat, lon, k)
+        if not hits:
+            return pd.DataFrame(columns=self.manifest["columns"] + ["distance_km"])
+        dist_km = np.array([d for d, _, _ in hits])
+        shard_of = np.array([i for _, i, _ in hits])
+        row_of = np.array([j for _, _, j in hits])
+        if (shard_of == shard_of[0]).all():
+            # Usually every hit is in one shard
+            return used[int(shard_of[0])].rows(row_of, dist_km)
+        # Rows grouped by shard, then put back in distance order
+        groups = [np.flatnonzero(shard_of == i) for i in dict.fromkeys(shard_of.tolist())]
+        parts = [used[int(shard_of[g[0]])].df.iloc[row_of[g]] for g in groups]
+        order = np.argsort(np.concatenate(groups), kind="stable")
+        out = pd.concat(parts, ignore_index=True).iloc[order].reset_index(drop=True)
+        out["distance_km"] = np.round(dist_km, 2)
+        return out
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "shards": len(self._shards),
+                "rows": len(self),
+                "cell_deg": self.manifest["cell_deg"],
+                "loaded": len(self._cache),
+                "loaded_mb": round(self._cache_bytes / 1024 / 1024, 1),
+                "budget_mb": round(self.memory_budget_bytes / 1024 / 1024, 1),
+                "loads": self.loads,
+                "hits": self.hits,
+            }
+
+
+def open_sharded(root: Path, memory_budget_mb: float) -> Dict[str, ShardedIndex]:
+    '''
+    One ShardedIndex per sport subdirectory of root that has a manifest; the
+    memory budget is split evenly between them.
+    '''
+
+    dirs = sorted(p for p in Path(root).iterdir() if (p / MANIFEST).exists()) if Path(root).is_dir() else []
+    share = memory_budget_mb / max(1, len(dirs))
+    return {p.name: ShardedIndex(p, share, name=p.name) for p in dirs}
+
+
+def main() -> None:
+    from app.settings import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Build region shards for the sharded nearest-court index.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="partition a courts CSV into shards")
+    build.add_argument("--csv", type=Path, required=True)
+    build.add_argument("--out", type=Path, required=True, help="output directory, e.g. $SHARD_DIR/handball")
+    build.add_argument("--cell-deg", type=float, default=settings.shard_cell_deg)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = build_shards(pd.read_csv(args.csv), args.out, args.cell_deg)
+    sizes = [s["rows"] for s in manifest["shards"]]
+    print(
+        f"wrote {manifest['rows']} courts in {len(sizes)} shards to {args.out} "
+        f"(rows per shard median {int(np.median(sizes)) if sizes else 0}, max {max(sizes, default=0)}) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
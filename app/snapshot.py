@@ -0,0 +1,164 @@
+'''
+Compact binary snapshot of every court, for nearest-court search in the
+browser (GET /courts/snapshot).
+
+Layout (little-endian):
+    magic    4 bytes  b"NYCC"
+    version  uint16   SNAPSHOT_FORMAT
+    reserved uint16
+    count    uint32   number of courts
+    metalen  uint32   length of the JSON header that follows
+    meta     JSON     columns, string dictionaries, data version, ttl
+    columns  one typed array per column, each starting on a 4-byte boundary
+
+Coordinates are int32 micro-degrees (~0.1 m). Text columns are uint16 indexes
+into a per-column string dictionary in the header, with 65535 meaning
+missing. Free-text columns too long to be useful on a map (tennis Info) are
+left out.
+'''
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+
+SNAPSHOT_MAGIC = b"NYCC"
+SNAPSHOT_FORMAT = 1
+COORD_SCALE = 1_000_000
+MISSING = 0xFFFF
+EXCLUDED_COLUMNS = ("Info",)
+
+
+def _pad4(n: int) -> int:
+    return -n % 4
+
+
+def encode_snapshot(frames: Dict[str, pd.DataFrame], ttl_sec: float) -> bytes:
+    '''
+    Encode courts of every sport into one snapshot.
+    Inputs:
+        frames: dict - Sport -> court DataFrame (Lat, Lon, Num_Of_Courts and text columns).
+        ttl_sec: float - How long clients may use the snapshot before refreshing.
+    Returns:
+        bytes - The uncompressed snapshot.
+    '''
+
+    df = pd.concat([f.assign(Sport=sport) for sport, f in frames.items()], ignore_index=True)
+    n = len(df)
+
+    columns, arrays, dicts = [], [], {}
+    lat = np.round(df["Lat"].to_numpy(dtype=float) * COORD_SCALE).astype("<i4")
+    lon = np.round(df["Lon"].to_numpy(dtype=float) * COORD_SCALE).astype("<i4")
+    columns += [{"name": "Lat", "type": "int32", "scale": COORD_SCALE}, {"name": "Lon", "type": "int32", "scale": COORD_SCALE}]
+    arrays += [lat, lon]
+    if "Num_Of_Courts" in df.columns:
+        counts = pd.to_numeric(df["Num_Of_Courts"], errors="coerce").fillna(0).clip(0, MISSING - 1)
+        columns.append({"name": "Num_Of_Courts", "type": "uint16"})
+        arrays.append(counts.to_numpy().astype("<u2"))
+
+    text_cols = ["Sport"] + [c for c in df.columns if df[c].dtype == object and c not in EXCLUDED_COLUMNS and c != "Sport"]
+    for col in text_cols:
+        values = df[col].where(df[col].notna(), None).to_numpy()
+        present = values != None  # noqa: E711 - elementwise on an object array
+        # First-appearance order keeps codes mostly increasing, which gzips far better than sorted
+        codes, table = pd.factorize(values[present].astype(str))
+        if len(table) >= MISSING:
+            raise ValueError(f"column {col} has too many distinct values for a uint16 dictionary")
+        idx = np.full(n, MISSING, dtype="<u2")
+        idx[present] = codes
+        columns.append({"name": col, "type": "dict16"})
+        dicts[col] = list(table)
+        arrays.append(idx)
+
+    body = b"".join(a.tobytes() + b"\0" * _pad4(a.nbytes) for a in arrays)
+    meta = {
+        "count": n,
+        "columns": columns,
+        "dicts": dicts,
+        "missing": MISSING,
+        "earth_radius_km": EARTH_RADIUS_KM,
+        "data_version": hashlib.sha256(body + json.dumps(dicts, sort_keys=True).encode()).hexdigest()[:16],
+        "ttl_sec": ttl_sec,
+    }
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    meta_bytes += b" " * _pad4(len(meta_bytes))
+    header = SNAPSHOT_MAGIC + struct.pack("<HHII", SNAPSHOT_FORMAT, 0, n, len(meta_bytes))
+    return header + meta_bytes + body
+
+
+def decode_snapshot(blob: bytes) -> Tuple[dict, Dict[str, np.ndarray]]:
+    '''
+    Decode a snapshot (used by the benchmark and for checking the encoding).
+    Returns:
+        (meta, columns) - Text columns come back as object arrays with None for missing.
+    '''
+
+    if blob[:4] != SNAPSHOT_MAGIC:
+        raise ValueError("not a court snapshot")
+    fmt, _, n, meta_len = struct.unpack_from("<HHII", blob, 4)
+    if fmt != SNAPSHOT_FORMAT:
+        raise ValueError(f"unsupported snapshot format {fmt}")
+    offset = 16
+    meta = json.loads(blob[offset:offset + meta_len])
+    offset += meta_len
+
+    out = {}
+    for col in meta["columns"]:
+        dtype = {"int32": "<i4", "uint16": "<u2", "dict16": "<u2"}[col["type"]]
+        arr = np.frombuffer(blob, dtype=dtype, count=n, offset=offset)
+        offset += arr.nbytes + _pad4(arr.nbytes)
+        if col["type"] == "dict16":
+            table = np.array(meta["dicts"][col["name"]] + [None], dtype=object)
+            arr = table[np.where(arr == MISSING, len(table) - 1, arr)]
+        elif "scale" in col:
+            arr = arr / col["scale"]
+        out[col["name"]] = arr
+    return meta, out
+
+
+class SnapshotCache:
+    '''
+    Holds the encoded snapshot (plain and gzipped) for the current court data
+    and rebuilds it when the data version key changes.
+    '''
+
+    def __init__(self, ttl_sec: float):
+        self.ttl_sec = ttl_sec
+        self._current: Optional[Tuple[object, dict]] = None
+        self._lock = threading.Lock()
+
+    def get(self, key, frames_fn) -> dict:
+        '''
+        Inputs:
+            key: hashable - Changes whenever the court data changes.
+            frames_fn: callable - Returns the frames to encode (only called on rebuild).
+        Returns:
+            dict - raw, gzip (bytes), etag (strong, without quotes, for the
+            uncompressed body) and version.
+        '''
+
+        current = self._current
+        if current is not None and current[0] == key:
+            return current[1]
+        with self._lock:
+            if self._current is not None and self._current[0] == key:
+                return self._current[1]
+            raw = encode_snapshot(frames_fn(), self.ttl_sec)
+            version = decode_snapshot(raw)[0]["data_version"]
+            entry = {
+                "raw": raw,
+                "gzip": gzip.compress(raw, compresslevel=9, mtime=0),
+                "etag": f"v{SNAPSHOT_FORMAT}-{version}",
+                "version": version,
+            }
+            self._current = (key, entry)
+            return entry
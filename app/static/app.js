@@ -110,22 +110,16 @@ function clearCourts() {
   courtMarkers = [];
 }
 
-function addCourts(list) {
-  clearCourts();
-  const bounds = [];
-
-  list.forEach((c) => {
-    const sport = (c.Sport || "handball").toLowerCase();
-    const sportLabel = sport ? sport.charAt(0).toUpperCase() + sport.slice(1) : "";
-    const name = c.Name ?? "";
-    const borough = c.Borough ?? "";
-    const rawDist = c.Distance_Km;
-    const dist =
-      typeof rawDist === "number" ? `${rawDist.toFixed(2)} km` : rawDist ?? "";
-    const lat = c.Lat;
-    const lon = c.Lon;
-
-    const html = `
+function courtPopupHtml(c) {
+  const sport = (c.Sport || "handball").toLowerCase();
+  const sportLabel = sport ? sport.charAt(0).toUpperCase() + sport.slice(1) : "";
+  const name = c.Name ?? "";
+  const borough = c.Borough ?? "";
+  const rawDist = c.Distance_Km;
+  const dist =
+    typeof rawDist === "number" ? `${rawDist.toFixed(2)} km` : rawDist ?? "";
+
+  return `
       <div style="font-size:12px;line-height:1.3">
         <b>${name}</b><br>
         ${sportLabel ? `Sport: ${sportLabel}<br>` : ""}
@@ -133,22 +127,155 @@ function addCourts(list) {
         ${dist ? `${dist}<br>` : ""}
         ${c.Num_Of_Courts ? `Number of Courts: ${c.Num_Of_Courts}<br>` : ""}
       </div>`;
+}
 
-    const icon = sportIcons[sport] || sportIcons.handball;
-    const m = L.marker([lat, lon], { icon }).addTo(map).bindPopup(html);
-    courtMarkers.push(m);
-    bounds.push([lat, lon]);
+function courtMarker(c) {
+  const sport = (c.Sport || "handball").toLowerCase();
+  const icon = sportIcons[sport] || sportIcons.handball;
+  return L.marker([c.Lat, c.Lon], { icon }).addTo(map).bindPopup(courtPopupHtml(c));
+}
+
+function fitToCourts(latLngs) {
+  if (!latLngs.length) return;
+  const bounds = latLngs.slice();
+  if (userMarker) bounds.push(userMarker.getLatLng());
+  map.fitBounds(bounds, { padding: [30, 30] });
+}
+
+function addCourts(list) {
+  clearCourts();
+  const bounds = [];
+
+  list.forEach((c) => {
+    courtMarkers.push(courtMarker(c));
+    bounds.push([c.Lat, c.Lon]);
   });
 
-  if (bounds.length) {
-    if (userMarker) bounds.push(userMarker.getLatLng());
-    map.fitBounds(bounds, { padding: [30, 30] });
+  fitToCourts(bounds);
+}
+
+// -------------------- Offline nearest --------------------
+// The court snapshot (GET /courts/snapshot, encoded by app/snapshot.py) is
+// decoded into typed arrays so nearest searches run in the browser. The
+// server is used instead while the snapshot is missing, unreadable or older
+// than its ttl_sec; a fresh copy is then fetched in the background (the
+// ETag makes an unchanged snapshot a cheap 304).
+
+const SNAPSHOT_FORMAT = 1;
+const courtSnapshot = { data: null, loadedAt: 0, loading: null };
+
+function decodeCourtSnapshot(buf) {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "NYCC" || view.getUint16(4, true) !== SNAPSHOT_FORMAT) {
+    throw new Error("Unsupported court snapshot");
   }
+  const count = view.getUint32(8, true);
+  const metaLen = view.getUint32(12, true);
+  const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 16, metaLen)));
+
+  // Columns start on 4-byte boundaries; typed arrays read them in place
+  // (little-endian, like every browser platform).
+  const cols = {};
+  let offset = 16 + metaLen;
+  meta.columns.forEach((col) => {
+    const Typed = col.type === "int32" ? Int32Array : Uint16Array;
+    const arr = new Typed(buf, offset, count);
+    offset += arr.byteLength + ((4 - (arr.byteLength % 4)) % 4);
+    cols[col.name] = col.scale ? Float64Array.from(arr, (x) => x / col.scale) : arr;
+  });
+
+  const toRad = Math.PI / 180;
+  const latRad = Float64Array.from(cols.Lat, (x) => x * toRad);
+  return {
+    meta,
+    count,
+    cols,
+    latRad,
+    lonRad: Float64Array.from(cols.Lon, (x) => x * toRad),
+    cosLat: Float64Array.from(latRad, Math.cos),
+  };
 }
 
+function refreshCourtSnapshot() {
+  if (courtSnapshot.loading) return courtSnapshot.loading;
+  courtSnapshot.loading = fetch(`${API_BASE}/courts/snapshot`)
+    .then((res) => {
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      return res.arrayBuffer();
+    })
+    .then((buf) => {
+      courtSnapshot.data = decodeCourtSnapshot(buf);
+      courtSnapshot.loadedAt = Date.now();
+    })
+    .catch((e) => console.warn("Court snapshot unavailable, using the server.", e))
+    .finally(() => {
+      courtSnapshot.loading = null;
+    });
+  return courtSnapshot.loading;
+}
+
+function snapshotCourt(snap, i, distKm) {
+  const court = { Distance_Km: Math.round(distKm * 100) / 100 };
+  snap.meta.columns.forEach((col) => {
+    const raw = snap.cols[col.name][i];
+    if (col.type === "dict16") {
+      court[col.name] = raw === snap.meta.missing ? null : snap.meta.dicts[col.name][raw];
+    } else {
+      court[col.name] = raw;
+    }
+  });
+  return court;
+}
+
+function nearestLocal(snap, lat, lon, sport, limit) {
+  const sportCode = sport === "both" ? null : snap.meta.dicts.Sport.indexOf(sport);
+  if (sportCode === -1) return [];
+  const toRad = Math.PI / 180;
+  const lat1 = lat * toRad;
+  const lon1 = lon * toRad;
+  const cos1 = Math.cos(lat1);
+  const twoR = 2 * snap.meta.earth_radius_km;
+
+  // A few hundred courts: a linear haversine scan takes well under a millisecond
+  const hits = [];
+  for (let i = 0; i < snap.count; i++) {
+    if (sportCode !== null && snap.cols.Sport[i] !== sportCode) continue;
+    const sinLat = Math.sin((snap.latRad[i] - lat1) / 2);
+    const sinLon = Math.sin((snap.lonRad[i] - lon1) / 2);
+    const a = sinLat * sinLat + cos1 * snap.cosLat[i] * sinLon * sinLon;
+    hits.push([twoR * Math.asin(Math.sqrt(a)), i]);
+  }
+  hits.sort((x, y) => x[0] - y[0]);
+  return hits.slice(0, limit).map(([d, i]) => snapshotCourt(snap, i, d));
+}
+
+function nearestFromSnapshot(lat, lon, sport, limit) {
+  const snap = courtSnapshot.data;
+  if (!snap || Date.now() - courtSnapshot.loadedAt > snap.meta.ttl_sec * 1000) {
+    refreshCourtSnapshot();
+    return null;
+  }
+  try {
+    return nearestLocal(snap, lat, lon, sport, limit);
+  } catch (e) {
+    console.error(e);
+    return null;
+  }
+}
+
+refreshCourtSnapshot();
+
 // Fetch nearest courts
 async function fetchNearest(lat, lon) {
   const sport = (sportSelect && sportSelect.value) || "handball";
+  const local = nearestFromSnapshot(lat, lon, sport, 10);
+  if (local) {
+    setText(statusEl, "", "status");
+    addCourts(local);
+    return;
+  }
+
   const url = `${API_BASE}/nearest?lat=${encodeURIComponent(lat)}&lon=${encodeURIComponent(
     lon
   )}&limit=10&sport=${encodeURIComponent(sport)}`;
@@ -190,6 +317,7 @@ async function reverseGeocode(lat, lon) {
 
 // Geolocate and drop a marker + load nearest + label
 document.getElementById("btnLocate").addEventListener("click", () => {
+  if (liveWatchId !== null) stopFollow();
   if (!navigator.geolocation) {
     alert("Geolocation not supported by your browser.");
     return;
@@ -255,6 +383,7 @@ async function geocodeForwardWithRetry(address, attempts = 2) {
 async function onSearch() {
   const address = document.getElementById("address").value.trim();
   if (!address) return;
+  if (liveWatchId !== null) stopFollow();
 
   setText(statusEl, "Searching address…", "status");
 
@@ -280,12 +409,139 @@ async function onSearch() {
 
 if (sportSelect) {
   sportSelect.addEventListener("change", () => {
-    if (lastCoords) {
+    if (liveSocket) {
+      sendLivePosition(true);
+    } else if (lastCoords) {
       fetchNearest(lastCoords.lat, lastCoords.lon);
     }
   });
 }
 
+// -------------------- Follow me (live location) --------------------
+// Streams GPS fixes to /nearest/live and applies the server's diffs to the
+// markers, instead of refetching and redrawing the full list on every move.
+// The server ignores fixes that moved less than a few metres.
+
+const followBtn = document.getElementById("btnFollow");
+let liveSocket = null;
+let liveWatchId = null;
+let liveRetry = null;
+let liveFitted = false;
+const liveMarkers = new Map(); // key -> { marker, court }
+
+function moveUserMarker(lat, lon) {
+  if (userMarker) {
+    userMarker.setLatLng([lat, lon]);
+  } else {
+    userMarker = L.marker([lat, lon], { icon: redIcon }).addTo(map).bindPopup("You are here");
+  }
+  lastCoords = { lat, lon };
+}
+
+function clearLiveMarkers() {
+  liveMarkers.forEach((entry) => entry.marker.remove());
+  liveMarkers.clear();
+}
+
+function sendLivePosition(force = false) {
+  if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN || !lastCoords) return;
+  const sport = (sportSelect && sportSelect.value) || "handball";
+  liveSocket.send(JSON.stringify({ lat: lastCoords.lat, lon: lastCoords.lon, sport, limit: 10 }));
+  if (force) liveFitted = false;
+}
+
+function applyLiveDiff(msg) {
+  if (msg.reset) {
+    clearLiveMarkers();
+    liveFitted = false;
+  }
+  (msg.removed || []).forEach((key) => {
+    const entry = liveMarkers.get(key);
+    if (entry) {
+      entry.marker.remove();
+      liveMarkers.delete(key);
+    }
+  });
+  (msg.added || []).forEach((c) => {
+    liveMarkers.set(c.key, { marker: courtMarker(c), court: c });
+  });
+  Object.entries(msg.distances || {}).forEach(([key, dist]) => {
+    const entry = liveMarkers.get(key);
+    if (!entry) return;
+    entry.court.Distance_Km = dist;
+    entry.marker.setPopupContent(courtPopupHtml(entry.court));
+  });
+  // msg.order is only needed by list views; markers do not depend on rank
+
+  if (!liveFitted && liveMarkers.size) {
+    fitToCourts([...liveMarkers.values()].map((entry) => [entry.court.Lat, entry.court.Lon]));
+    liveFitted = true;
+  }
+}
+
+function openLiveSocket() {
+  const scheme = location.protocol === "https:" ? "wss" : "ws";
+  liveSocket = new WebSocket(`${scheme}://${location.host}${API_BASE}/nearest/live`);
+  liveSocket.addEventListener("open", () => {
+    setText(statusEl, "", "status");
+    sendLivePosition(true);
+  });
+  liveSocket.addEventListener("message", (e) => {
+    const msg = JSON.parse(e.data);
+    if (msg.type === "diff") applyLiveDiff(msg);
+    else if (msg.type === "error") console.error(msg.detail);
+  });
+  liveSocket.addEventListener("close", () => {
+    if (liveWatchId === null) return;
+    // Still following: reconnect, the new session starts from a full list
+    setText(statusEl, "Live updates interrupted, reconnecting…", "status");
+    liveRetry = setTimeout(openLiveSocket, 2000);
+  });
+}
+
+function startFollow() {
+  if (!navigator.geolocation || !("WebSocket" in window)) {
+    alert("Live location is not supported by your browser.");
+    return;
+  }
+  clearCourts();
+  liveWatchId = navigator.geolocation.watchPosition(
+    (pos) => {
+      const { latitude, longitude } = pos.coords;
+      const first = !lastCoords;
+      moveUserMarker(latitude, longitude);
+      if (first) map.setView([latitude, longitude], 14);
+      sendLivePosition();
+    },
+    (err) => {
+      console.error(err);
+      setText(statusEl, "Could not get your location.", "status");
+    },
+    { enableHighAccuracy: true, maximumAge: 5000, timeout: 20000 }
+  );
+  openLiveSocket();
+  followBtn.classList.remove("ghost");
+  followBtn.setAttribute("aria-pressed", "true");
+  followBtn.textContent = "Stop following";
+}
+
+function stopFollow() {
+  if (liveWatchId !== null) navigator.geolocation.clearWatch(liveWatchId);
+  liveWatchId = null;
+  clearTimeout(liveRetry);
+  if (liveSocket) liveSocket.close();
+  liveSocket = null;
+  clearLiveMarkers();
+  followBtn.classList.add("ghost");
+  followBtn.setAttribute("aria-pressed", "false");
+  followBtn.textContent = "Follow me";
+  if (lastCoords) fetchNearest(lastCoords.lat, lastCoords.lon);
+}
+
+if (followBtn) {
+  followBtn.addEventListener("click", () => (liveWatchId === null ? startFollow() : stopFollow()));
+}
+
 // -------------------- Agent --------------------
 
 async function askAgent() {
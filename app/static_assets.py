@@ -0,0 +1,359 @@
+'''
+Fingerprinted, precompressed static assets.
+
+Build step (python -m app.static_assets, run in the Dockerfile): every file
+under STATIC_DIR is written to STATIC_BUILD_DIR as name.<hash>.ext, hash
+being the start of the SHA-256 of its content, together with a .gz copy and,
+when the optional brotli package is installed, a .br copy, both at maximum
+compression. HTML pages keep their names (they are the entry points), but
+their /static/<name> references are rewritten to the fingerprinted names.
+manifest.json records the source hashes the build was made from.
+
+Serving (StaticAssets): all assets are held in memory with their compressed
+variants. A request picks br, gzip or identity from Accept-Encoding, so no
+compression happens per request. Fingerprinted names never change content
+and are sent with "Cache-Control: immutable" for a year; HTML pages and the
+plain names are sent with "no-cache" and a strong ETag, so repeat visits
+revalidate with a 304. When the build is missing or older than the sources,
+the same build runs in memory at startup instead.
+'''
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip alone is served without it
+    brotli = None
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+HASH_LEN = 12
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# Compressed copies that do not save at least this fraction are dropped (images, fonts)
+MIN_SAVING = 0.1
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+ETAG_SUFFIX = {"identity": "", "br": "-br", "gzip": "-gz"}
+
+
+@dataclass
+class Asset:
+    '''
+    One servable file.
+    Attributes:
+        media_type (str): Content type.
+        etag (str): Content hash of the identity body, without quotes.
+        immutable (bool): True for fingerprinted names.
+        bodies (dict): Content-coding ("identity", "gzip", "br") -> bytes.
+    '''
+
+    media_type: str
+    etag: str
+    immutable: bool
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _fingerprint(name: str, digest: str) -> str:
+    stem, dot, ext = name.rpartition(".")
+    if not dot:
+        return f"{name}.{digest[:HASH_LEN]}"
+    return f"{stem}.{digest[:HASH_LEN]}.{ext}"
+
+
+def _is_page(name: str) -> bool:
+    return name.endswith((".html", ".htm"))
+
+
+def _compress(raw: bytes) -> Dict[str, bytes]:
+    out = {}
+    variants = {"gzip": lambda b: gzip.compress(b, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = lambda b: brotli.compress(b, quality=11)
+    for coding, fn in variants.items():
+        packed = fn(raw)
+        if len(packed) <= len(raw) * (1 - MIN_SAVING):
+            out[coding] = packed
+    return out
+
+
+def _media_type(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _source_files(src_dir: Path) -> Dict[str, bytes]:
+    return {
+        p.relative_to(src_dir).as_posix(): p.read_bytes()
+        for p in sorted(src_dir.rglob("*"))
+        if p.is_file() and not p.name.startswith(".")
+    }
+
+
+def build_assets(src_dir: Path) -> Dict[str, dict]:
+    '''
+    Fingerprint and compress every file under src_dir.
+    Inputs:
+        src_dir: Path - Source static directory.
+    Returns:
+        dict - Source name -> {"name": built name, "source_sha256",
+        "media_type", "bodies": coding -> bytes}.
+    '''
+
+    sources = _source_files(src_dir)
+    built, renames = {}, {}
+    for name, raw in sources.items():
+        if _is_page(name):
+            continue
+        built[name] = {"name": _fingerprint(name, _sha256(raw)), "source_sha256": _sha256(raw), "raw": raw}
+        renames[name] = built[name]["name"]
+
+    if renames:
+        refs = re.compile(r"/static/(" + "|".join(re.escape(n) for n in sorted(renames, key=len, reverse=True)) + r")(?=[\"'?#)\s])")
+    for name, raw in sources.items():
+        if not _is_page(name):
+            continue
+        page = raw
+        if renames:
+            page = refs.sub(lambda m: "/static/" + renames[m.group(1)], raw.decode("utf-8")).encode("utf-8")
+        built[name] = {"name": name, "source_sha256": _sha256(raw), "raw": page}
+
+    for name, entry in built.items():
+        raw = entry.pop("raw")
+        entry["media_type"] = _media_type(name)
+        entry["bodies"] = {"identity": raw, **_compress(raw)}
+    return built
+
+
+def write_build(built: Dict[str, dict], out_dir: Path) -> None:
+    '''
+    Write a build to out_dir (replaced whole) with its manifest. Compressed
+    copies sit next to each file as <name>.gz / <name>.br, the layout that
+    nginx gzip_static / brotli_static and most CDNs understand.
+    '''
+
+    tmp = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    manifest = {"version": MANIFEST_VERSION, "files": {}}
+    for source, entry in built.items():
+        for coding, body in entry["bodies"].items():
+            path = tmp / (entry["name"] + ENCODING_SUFFIX.get(coding, ""))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(body)
+        manifest["files"][source] = {
+            "name": entry["name"],
+            "source_sha256": entry["source_sha256"],
+            "media_type": entry["media_type"],
+            "encodings": sorted(entry["bodies"]),
+        }
+    tmp.mkdir(parents=True, exist_ok=True)
+    (tmp / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    old = out_dir.with_name(out_dir.name + f".old{os.getpid()}")
+    if out_dir.exists():
+        out_dir.rename(old)
+    tmp.rename(out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_build(src_dir: Path, out_dir: Path) -> Optional[Dict[str, dict]]:
+    '''
+    Load a build from out_dir.
+    Returns:
+        dict in the build_assets format, or None if there is no build or it
+        was made from different sources than those now in src_dir.
+    '''
+
+    try:
+        manifest = json.loads((out_dir / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+    files = manifest.get("files", {})
+    sources = _source_files(src_dir)
+    if manifest.get("version") != MANIFEST_VERSION or set(files) != set(sources):
+        return None
+    if any(files[name]["source_sha256"] != _sha256(raw) for name, raw in sources.items()):
+        return None
+    built = {}
+    try:
+        for source, entry in files.items():
+            bodies = {
+                coding: (out_dir / (entry["name"] + ENCODING_SUFFIX.get(coding, ""))).read_bytes()
+                for coding in entry["encodings"]
+            }
+            built[source] = {**entry, "bodies": bodies}
+    except OSError:
+        return None
+    return built
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    '''
+    Returns:
+        dict - Content-coding (lower case) -> q value.
+    '''
+
+    out = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        out[coding] = q
+    return out
+
+
+def choose_encoding(header: str, available) -> str:
+    '''
+    Best content-coding for an Accept-Encoding header: br, then gzip, then
+    identity. Ties on q are broken by that order, which is also the order of
+    size.
+    '''
+
+    accepted = parse_accept_encoding(header or "")
+    best, best_q = "identity", 0.0
+    for coding in ("br", "gzip"):
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class StaticAssets:
+    '''
+    In-memory table of the built assets, keyed by the name under /static
+    (both fingerprinted and plain names) plus the HTML pages.
+
+    Attributes:
+        src_dir (Path): Source static directory.
+        build_dir (Path): Output of the build step.
+        auto_reload (bool): Rebuild in memory when a source file changes
+                            (development; checked on each request).
+    '''
+
+    def __init__(self, src_dir: Path, build_dir: Path, auto_reload: bool = False):
+        self.src_dir = Path(src_dir)
+        self.build_dir = Path(build_dir)
+        self.auto_reload = auto_reload
+        self.urls: Dict[str, str] = {}
+        self._assets: Dict[str, Asset] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        built = read_build(self.src_dir, self.build_dir)
+        origin = "build"
+        if built is None:
+            origin = "memory"
+            built = build_assets(self.src_dir)
+            logger.info("static assets built in memory (run python -m app.static_assets to prebuild) dir=%s", self.build_dir)
+        assets, urls = {}, {}
+        for source, entry in built.items():
+            bodies = entry["bodies"]
+            etag = _sha256(bodies["identity"])[:HASH_LEN * 2]
+            fingerprinted = entry["name"] != source
+            if fingerprinted:
+                assets[entry["name"]] = Asset(entry["media_type"], etag, True, bodies)
+            assets[source] = Asset(entry["media_type"], etag, False, bodies)
+            urls[source] = entry["name"]
+        self._assets = assets
+        self.urls = urls
+        self._mtimes = self._source_mtimes()
+        logger.info(
+            "static assets loaded from=%s files=%d encodings=%s",
+            origin, len(built), ",".join(sorted({c for e in built.values() for c in e["bodies"]})),
+        )
+
+    def _source_mtimes(self) -> Dict[str, float]:
+        return {p.as_posix(): p.stat().st_mtime for p in self.src_dir.rglob("*") if p.is_file()}
+
+    def _maybe_reload(self) -> None:
+        if self._source_mtimes() == self._mtimes:
+            return
+        with self._lock:
+            if self._source_mtimes() != self._mtimes:
+                self.load()
+
+    def names(self) -> List[str]:
+        return sorted(self._assets)
+
+    def response(self, name: str, accept_encoding: str, if_none_match: str = "") -> Optional[Response]:
+        '''
+        Inputs:
+            name: str - Path under /static, or a page name such as index.html.
+            accept_encoding: str - The request's Accept-Encoding header.
+            if_none_match: str - The request's If-None-Match header.
+        Returns:
+            Response (200 or 304), or None if there is no such asset.
+        '''
+
+        if self.auto_reload:
+            self._maybe_reload()
+        asset = self._assets.get(name)
+        if asset is None:
+            return None
+
+        coding = choose_encoding(accept_encoding, asset.bodies)
+        headers = {
+            # Strong ETags differ per content-coding
+            "ETag": f'"{asset.etag}{ETAG_SUFFIX[coding]}"',
+            "Cache-Control": IMMUTABLE if asset.immutable else REVALIDATE,
+        }
+        if len(asset.bodies) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        tags = {tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",") if tag.strip()}
+        if "*" in tags or tags & {asset.etag + suffix for suffix in ETAG_SUFFIX.values()}:
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=asset.bodies[coding], media_type=asset.media_type, headers=headers)
+
+
+def main() -> None:
+    from app.settings import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets.")
+    parser.add_argument("--src", type=Path, default=settings.static_dir)
+    parser.add_argument("--out", type=Path, default=settings.static_build_dir)
+    args = parser.parse_args()
+
+    built = build_assets(args.src)
+    write_build(built, args.out)
+    for source, entry in sorted(built.items()):
+        sizes = "  ".join(f"{coding} {len(body):>7}" for coding, body in sorted(entry["bodies"].items()))
+        print(f"{source:<20} -> {entry['name']:<28} {sizes}")
+    if brotli is None:
+        print("brotli is not installed: built gzip copies only (pip install brotli for .br)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+'''
+Compact encoding of agent tool results.
+
+Tool outputs are fed back to the model as input tokens, so they are encoded
+as small as possible: row lists become a columnar table, coordinates are
+rounded, empty and constant fields are pruned, and the table is truncated
+to fit a token budget.
+'''
+
+import json
+from typing import Any, Dict, List
+
+# ~4 characters per token is a good approximation for JSON-ish English text
+CHARS_PER_TOKEN = 4
+
+COORD_FIELDS = {"lat", "lon", "Lat", "Lon"}
+COORD_DECIMALS = 4
+DISTANCE_FIELDS = {"distance_km", "Distance_Km", "total_km", "max_km"}
+DISTANCE_DECIMALS = 2
+
+# Short column names understood by the model from context
+COLUMN_ALIASES = {
+    "Name": "name",
+    "Borough": "boro",
+    "Num_Of_Courts": "courts",
+    "Lat": "lat",
+    "Lon": "lon",
+    "distance_km": "km",
+    "Distance_Km": "km",
+    "total_km": "sum_km",
+    "Sport": "sport",
+    "Court_Id": "id",
+    "Lessons": "lessons",
+    "Permit_Required": "permit",
+    "Indoor": "indoor",
+    "Booking_Url": "url",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    '''
+    Estimate the number of model tokens in a string.
+    Inputs:
+        text: str - Text to measure.
+    Returns:
+        int - Approximate token count.
+    '''
+
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _round_value(key: str, value: Any) -> Any:
+    if isinstance(value, float):
+        if key in COORD_FIELDS:
+            return round(value, COORD_DECIMALS)
+        if key in DISTANCE_FIELDS:
+            return round(value, DISTANCE_DECIMALS)
+    return value
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+
+def _tabulate(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Turn a list of homogeneous dicts into {"cols": [...], "rows": [[...]]},
+    hoisting columns that hold the same value in every row into "const".
+    '''
+
+    cols: List[str] = []
+    for r in rows:
+        for k, v in r.items():
+            if k not in cols and not _is_empty(v):
+                cols.append(k)
+
+    const: Dict[str, Any] = {}
+    if len(rows) > 1:
+        for c in cols:
+            first = rows[0].get(c)
+            if all(r.get(c) == first for r in rows):
+                const[COLUMN_ALIASES.get(c, c)] = _round_value(c, first)
+    kept = [c for c in cols if COLUMN_ALIASES.get(c, c) not in const]
+
+    table: Dict[str, Any] = {
+        "cols": [COLUMN_ALIASES.get(c, c) for c in kept],
+        "rows": [[_round_value(c, r.get(c)) for c in kept] for r in rows],
+    }
+    if const:
+        table["const"] = const
+    return table
+
+
+def _compact(obj: Any, key: str = "") -> Any:
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if _is_empty(v):
+                continue
+            if k == "results" and isinstance(v, list) and v and all(isinstance(r, dict) for r in v):
+                out[k] = _tabulate(v)
+            else:
+                out[k] = _compact(v, k)
+        return out
+    if isinstance(obj, list):
+        return [_compact(v, key) for v in obj]
+    return _round_value(key, obj)
+
+
+def _tables(obj: Any) -> List[Dict[str, Any]]:
+    if isinstance(obj, dict):
+        if "cols" in obj and "rows" in obj:
+            return [obj]
+        found = []
+        for v in obj.values():
+            found += _tables(v)
+        return found
+    return []
+
+
+def has_table(text: str) -> bool:
+    '''True if an encoded tool result holds a table (so the model needs the table hint).'''
+
+    return '"cols":[' in text
+
+
+def compact_tool_result(result: Dict[str, Any], token_budget: int) -> str:
+    '''
+    Encode a tool result as compact JSON that fits within a token budget.
+    Inputs:
+        result: dict - Raw tool result.
+        token_budget: int - Maximum approximate tokens for the output (<= 0 disables truncation).
+    Returns:
+        str - Compact JSON string. When rows had to be dropped, each affected
+        table carries "truncated": <number of rows dropped>.
+    '''
+
+    compact = _compact(result)
+    text = _dumps(compact)
+    if token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+
+    # Drop rows from the largest table until the payload fits
+    tables = _tables(compact)
+    while tables and estimate_tokens(text) > token_budget:
+        largest = max(tables, key=lambda t: len(t["rows"]))
+        if len(largest["rows"]) <= 1:
+            break
+        largest["rows"].pop()
+        largest["truncated"] = largest.get("truncated", 0) + 1
+        text = _dumps(compact)
+
+    if estimate_tokens(text) > token_budget:
+        keep = max(0, token_budget * CHARS_PER_TOKEN - 64)
+        text = _dumps({"error": "tool result too large", "preview": text[:keep]})
+    return text
@@ -0,0 +1,269 @@
+'''
+Approximate walking distance, used to re-rank straight-line nearest results.
+
+Within a landmass the distance is L1 in that landmass's street grid frame
+(see WALK_GRID_BEARING_DEG). Trips between landmasses have to use one of the
+walkable crossings in WALK_CROSSINGS, so a court across the East River ranks
+behind one a little farther away on the same side.
+
+The crossing endpoints form a small graph whose all-pairs shortest paths are
+computed once. Each court is snapped to that graph when the reranker is built:
+for every crossing endpoint we cache the shortest walk from it to the court,
+so at query time a cross-river distance is a min over a few endpoints.
+
+The reranker is built from a LiveIndex's compacted base. While admin edits
+wait for compaction, candidates come from the live index instead and are
+snapped on the fly, so closed courts never appear and added or moved ones do.
+'''
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.CONSTANTS import (
+    WALK_BRONX_MIN_LAT,
+    WALK_CROSSINGS,
+    WALK_GRID_BEARING_DEG,
+    WALK_MANHATTAN_OUTLINE,
+    WALK_RANDALLS_ISLAND_OUTLINE,
+    WALK_STATEN_ISLAND_OUTLINE,
+)
+from app.nearest import NearestIndex
+
+if TYPE_CHECKING:
+    from app.live_index import LiveIndex
+
+LANDS = ("manhattan", "bronx", "long_island", "staten_island", "randalls_island")
+
+# Local equirectangular projection around NYC, in km
+_LAT0, _LON0 = 40.7, -73.95
+_KM_PER_DEG_LAT = 110.57
+_KM_PER_DEG_LON = 111.32 * np.cos(np.radians(_LAT0))
+
+
+def _project(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    return np.column_stack([(np.asarray(lon, float) - _LON0) * _KM_PER_DEG_LON, (np.asarray(lat, float) - _LAT0) * _KM_PER_DEG_LAT])
+
+
+def _inside(lat: np.ndarray, lon: np.ndarray, outline) -> np.ndarray:
+    # Even-odd ray casting, vectorized over the points inside the outline's bounding box
+    poly = np.asarray(outline, dtype=float)
+    lat, lon = np.asarray(lat, float), np.asarray(lon, float)
+    out = np.zeros(len(lat), dtype=bool)
+    box = np.flatnonzero((lat >= poly[:, 0].min()) & (lat <= poly[:, 0].max()) & (lon >= poly[:, 1].min()) & (lon <= poly[:, 1].max()))
+    if not len(box):
+        return out
+    y, x = lat[box][:, None], lon[box][:, None]
+    y1, x1 = poly[:, 0][None, :], poly[:, 1][None, :]
+    y2, x2 = np.roll(poly[:, 0], -1)[None, :], np.roll(poly[:, 1], -1)[None, :]
+    crosses = ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / np.where(y2 == y1, 1e-12, y2 - y1) + x1)
+    out[box] = (crosses.sum(axis=1) % 2) == 1
+    return out
+
+
+def classify_land(lat, lon) -> np.ndarray:
+    '''
+    Assign points to a landmass.
+    Inputs:
+        lat, lon: array-like of float - Coordinates.
+    Returns:
+        np.ndarray of int - Index into LANDS for each point.
+    '''
+
+    lat, lon = np.atleast_1d(np.asarray(lat, float)), np.atleast_1d(np.asarray(lon, float))
+    land = np.where(lat >= WALK_BRONX_MIN_LAT, LANDS.index("bronx"), LANDS.index("long_island"))
+    land[_inside(lat, lon, WALK_STATEN_ISLAND_OUTLINE)] = LANDS.index("staten_island")
+    land[_inside(lat, lon, WALK_RANDALLS_ISLAND_OUTLINE)] = LANDS.index("randalls_island")
+    land[_inside(lat, lon, WALK_MANHATTAN_OUTLINE)] = LANDS.index("manhattan")
+    return land
+
+
+def _point_in(lat: float, lon: float, outline) -> bool:
+    inside = False
+    for (y1, x1), (y2, x2) in zip(outline, outline[1:] + outline[:1]):
+        if (y1 > lat) != (y2 > lat) and lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def land_of(lat: float, lon: float) -> int:
+    '''Scalar classify_land() for a single query point; avoids numpy overhead.'''
+
+    if _point_in(lat, lon, WALK_MANHATTAN_OUTLINE):
+        return LANDS.index("manhattan")
+    if _point_in(lat, lon, WALK_RANDALLS_ISLAND_OUTLINE):
+        return LANDS.index("randalls_island")
+    if _point_in(lat, lon, WALK_STATEN_ISLAND_OUTLINE):
+        return LANDS.index("staten_island")
+    return LANDS.index("bronx") if lat >= WALK_BRONX_MIN_LAT else LANDS.index("long_island")
+
+
+# Rotation per landmass that aligns its street grid with the axes
+_ROTATIONS = np.array([
+    [[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]]
+    for t in (np.radians(WALK_GRID_BEARING_DEG[name]) for name in LANDS)
+])
+
+
+def _grid_km(a: np.ndarray, b: np.ndarray, land) -> np.ndarray:
+    '''L1 distance between projected points a and b in the grid frame of land (broadcasts).'''
+
+    diff = (np.asarray(b) - np.asarray(a))[..., None, :]
+    rotated = (diff @ _ROTATIONS[land].swapaxes(-1, -2))[..., 0, :]
+    return np.abs(rotated).sum(axis=-1)
+
+
+class WalkingReranker:
+    '''
+    Re-ranks NearestIndex results by approximate walking distance.
+
+    Attributes:
+        index (NearestIndex): Index whose courts are re-ranked.
+        candidates (int): Straight-line candidates considered per query.
+        live (LiveIndex): Optional live view whose compacted base is index;
+                          queried instead while it has pending edits.
+    '''
+
+    def __init__(self, index: NearestIndex, candidates: int = 40, live: Optional[LiveIndex] = None):
+        self.index = index
+        self.candidates = candidates
+        self.live = live
+
+        # Crossing graph: two endpoints per crossing
+        ends_lat, ends_lon, ends_land = [], [], []
+        for _, land_a, (lat_a, lon_a), land_b, (lat_b, lon_b), _ in WALK_CROSSINGS:
+            ends_lat += [lat_a, lat_b]
+            ends_lon += [lon_a, lon_b]
+            ends_land += [LANDS.index(land_a), LANDS.index(land_b)]
+        self.end_xy = _project(ends_lat, ends_lon)
+        self.end_land = np.array(ends_land)
+
+        n_ends = len(self.end_land)
+        graph = np.full((n_ends, n_ends), np.inf)
+        same = self.end_land[:, None] == self.end_land[None, :]
+        on_land = _grid_km(self.end_xy[:, None, :], self.end_xy[None, :, :], self.end_land[:, None])
+        graph[same] = on_land[same]
+        for i, crossing in enumerate(WALK_CROSSINGS):
+            # Never shorter than the straight line, so walking >= straight-line distance holds
+            span_km = float(np.hypot(*(self.end_xy[2 * i + 1] - self.end_xy[2 * i])))
+            graph[2 * i, 2 * i + 1] = graph[2 * i + 1, 2 * i] = max(crossing[5], span_km)
+        for m in range(n_ends):  # Floyd-Warshall; a few dozen nodes
+            graph = np.minimum(graph, graph[:, m:m + 1] + graph[m:m + 1, :])
+        self.paths = graph
+
+        df = index.df
+        self.court_xy, self.court_land, self.via = self._snap(df["Lat"].to_numpy(), df["Lon"].to_numpy())
+
+    def _snap(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Snap courts to the crossing graph.
+        Returns:
+            (xy, land, via) - Projected points, landmass per court, and
+            via[c, e], the shortest walk from endpoint e to court c entering
+            c's landmass through any endpoint.
+        '''
+
+        xy = _project(lat, lon)
+        court_land = classify_land(lat, lon)
+        via = np.empty((len(xy), len(self.end_land)), dtype=np.float32)
+        for land in range(len(LANDS)):
+            courts = np.flatnonzero(court_land == land)
+            ends = np.flatnonzero(self.end_land == land)
+            if not len(courts):
+                continue
+            if not len(ends):
+                via[courts] = np.inf
+                continue
+            last = _grid_km(self.end_xy[ends][None, :, :], xy[courts][:, None, :], land)
+            via[courts] = (self.paths[:, ends][None, :, :] + last[:, None, :]).min(axis=2)
+        return xy, court_land, via
+
+    def walking_km(self, lat: float, lon: float, idx: np.ndarray) -> np.ndarray:
+        '''
+        Approximate walking distance from a point to the given courts.
+        Inputs:
+            lat, lon: float - Origin.
+            idx: np.ndarray - Row positions in index.df.
+        Returns:
+            np.ndarray - Walking km per court (inf if unreachable on foot).
+        '''
+
+        return self._walk(lat, lon, self.court_xy[idx], self.court_land[idx], lambda rows: self.via[idx[rows]])
+
+    def _walk(self, lat: float, lon: float, xy: np.ndarray, court_land: np.ndarray, via: Callable) -> np.ndarray:
+        # via(rows) -> the snapped via rows for those courts, looked up only for other landmasses
+        origin = _project([lat], [lon])[0]
+        land = land_of(lat, lon)
+        walk = _grid_km(origin[None, :], xy, land)
+        other = court_land != land
+        if other.any():
+            ends = np.flatnonzero(self.end_land == land)
+            if len(ends):
+                first = _grid_km(origin[None, :], self.end_xy[ends], land)
+                walk[other] = (first[None, :] + via(other)[:, ends]).min(axis=1)
+            else:
+                walk[other] = np.inf
+        return walk
+
+    def _candidates(self, lat: float, lon: float, m: int, live: Optional[LiveIndex]):
+        '''
+        The m straight-line nearest courts.
+        Returns:
+            (dist_km, walk_km, rerank_sec, rows) - rows(order) builds the
+            result rows in that order.
+        '''
+
+        if live is None:
+            dist_km, idx = self.index.query_idx(lat, lon, k=m)
+            start = time.perf_counter()
+            walk = self.walking_km(lat, lon, idx)
+            return dist_km, walk, time.perf_counter() - start, lambda order: self.index.rows(idx[order], dist_km[order])
+
+        rows = live.query_k(lat, lon, k=m)
+        start = time.perf_counter()
+        xy, court_land, via = self._snap(rows["Lat"].to_numpy(float), rows["Lon"].to_numpy(float))
+        walk = self._walk(lat, lon, xy, court_land, lambda other: via[other])
+        # distance_km is rounded to 0.01 km; take the rounding off so the stopping test stays exact
+        dist_km = rows["distance_km"].to_numpy(float) - 0.005
+        return dist_km, walk, time.perf_counter() - start, lambda order: rows.iloc[order].reset_index(drop=True)
+
+    def query_k(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+        '''
+        Nearest courts by approximate walking distance.
+
+        Walking distance is never shorter than the straight line, so once the
+        k-th walking distance is within the straight-line distance of the last
+        candidate no other court can beat it; otherwise the candidate pool is
+        widened (up to 8x) before giving up on exactness.
+        Inputs:
+            lat, lon: float - Origin.
+            k: int - Number of courts to return.
+        Returns:
+            pd.DataFrame - Rows as NearestIndex.query_k with an extra walking_km
+            column, ordered by it. rows.attrs["rerank_ms"] holds the time spent
+            re-ranking.
+        '''
+
+        live = self.live
+        if live is not None and not live.pending and live.base is self.index:
+            live = None  # nothing to merge: use the snapped base courts
+        n = len(live) if live is not None else len(self.index.df)
+        k = min(k, n)
+        m = min(n, max(self.candidates, 2 * k))
+        rerank_s = 0.0
+        while True:
+            dist_km, walk, spent, build = self._candidates(lat, lon, m, live)
+            order = np.argsort(walk, kind="stable")[:k]
+            rerank_s += spent
+            if m >= n or m >= 8 * max(self.candidates, 2 * k) or walk[order[-1]] <= dist_km[-1]:
+                break
+            m = min(n, 2 * m)
+
+        rows = build(order)
+        rows["walking_km"] = np.round(walk[order], 2)
+        rows.attrs["rerank_ms"] = rerank_s * 1000
+        return rows
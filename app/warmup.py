@@ -0,0 +1,129 @@
+'''
+Background warm-up of the slow parts of the app.
+
+create_app() only registers routes; the court datasets and indexes, and the
+clients with slow imports (geopy, the OpenAI SDK), are loaded by one
+background thread in the order they were added. The server starts
+listening straight away, /health reports each task, and routes that need a
+task's result wait for it (up to a timeout) instead of failing.
+
+A required task that fails leaves the app unready (/health answers 503) and
+its error is re-raised to anything waiting on it; optional tasks that fail
+are only logged, since their code paths load what they need on first use.
+'''
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = gauge("warmup_seconds", "Time spent in each startup warm-up task.", ("task",))
+
+
+class WarmupError(RuntimeError):
+    pass
+
+
+class _Task:
+    def __init__(self, name: str, fn: Callable[[], None], required: bool):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.state = "pending"
+        self.seconds: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class Warmup:
+    '''
+    Ordered warm-up tasks run once, in the background or inline.
+    '''
+
+    def __init__(self):
+        self._tasks: Dict[str, _Task] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[[], None], required: bool = False) -> None:
+        self._tasks[name] = _Task(name, fn, required)
+
+    def start(self, background: bool = True) -> None:
+        '''
+        Run the tasks. Inline (background=False) a failing required task
+        raises immediately, like an eager startup would.
+        '''
+
+        self.started_at = time.perf_counter()
+        if not background:
+            self._run()
+            for task in self._tasks.values():
+                if task.required and task.error is not None:
+                    raise WarmupError(f"startup task {task.name} failed") from task.error
+            return
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        for task in self._tasks.values():
+            task.state = "running"
+            start = time.perf_counter()
+            try:
+                task.fn()
+                task.state = "ready"
+            except Exception as e:
+                task.state = "failed"
+                task.error = e
+                log = logger.error if task.required else logger.warning
+                log("warmup task failed task=%s error=%r", task.name, e, exc_info=task.required)
+            finally:
+                task.seconds = time.perf_counter() - start
+                WARMUP_SECONDS.set(task.seconds, task=task.name)
+                task.done.set()
+            if task.state == "ready":
+                logger.info("warmup task ready task=%s sec=%.2f", task.name, task.seconds)
+
+    def is_ready(self, name: str) -> bool:
+        return self._tasks[name].state == "ready"
+
+    @property
+    def ready(self) -> bool:
+        '''True once every required task has finished successfully.'''
+
+        return all(t.state == "ready" for t in self._tasks.values() if t.required)
+
+    def wait(self, name: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        '''
+        Block until one task (or, without name, every task) has finished.
+        Returns:
+            bool - False if the timeout expired first.
+        Raises:
+            WarmupError - A required task that was waited on failed.
+        '''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        tasks = [self._tasks[name]] if name else list(self._tasks.values())
+        for task in tasks:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not task.done.wait(remaining):
+                return False
+            if task.required and task.error is not None:
+                raise WarmupError(f"startup task {task.name} failed") from task.error
+        return True
+
+    def status(self) -> Dict[str, dict]:
+        out = {}
+        for task in self._tasks.values():
+            entry = {"state": task.state, "required": task.required}
+            if task.seconds is not None:
+                entry["seconds"] = round(task.seconds, 3)
+            if task.error is not None:
+                entry["error"] = str(task.error)
+            out[task.name] = entry
+        return out
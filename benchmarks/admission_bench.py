@@ -0,0 +1,226 @@
+'''
+Chat spike benchmark: /nearest latency and /agent outcomes while a burst of
+chat requests hits a model upstream of limited capacity.
+
+The mock Responses API (--upstream-capacity calls at once, --latency-ms
+each) and the mock Nominatim run in this process; the app runs under uvicorn
+in a subprocess. For each mode it measures:
+
+    baseline - --probe-concurrency clients calling /nearest, no chat traffic
+    spike    - the same probe while one heavy chat client keeps
+               --heavy-in-flight /agent requests going and --light-clients
+               clients keep one each
+
+Chat clients are told apart by X-Forwarded-For (uvicorn trusts it from
+127.0.0.1). After a 429/503 a client waits for the Retry-After it was given
+(or --retry-pause-sec on other errors) and tries again.
+
+Modes:
+    admission  - AGENT_MAX_CONCURRENCY = --upstream-capacity, default queue
+                 limits (AGENT_MAX_QUEUE, AGENT_MAX_QUEUED_PER_CLIENT)
+    unbounded  - admission limits of 10000, i.e. every request goes straight
+                 to the upstream
+
+Reports /nearest percentiles for both phases (requests slower than
+PROBE_TIMEOUT_SEC count as failed), /agent status counts and
+median latency per client class, and admission_shed_total from /metrics.
+
+Usage:
+    python -m benchmarks.admission_bench [--seconds 15] [--upstream-capacity 8] [--modes admission,unbounded]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import mock_nominatim, mock_openai
+from benchmarks.common import free_port, load_corpus, percentiles, serve_in_thread
+
+ROOT = Path(__file__).resolve().parents[1]
+SHED_LINE = re.compile(r'admission_shed_total\{queue="agent",reason="(\w+)"\} (\S+)')
+PROBE_TIMEOUT_SEC = 5.0
+NEAREST_LINE = re.compile(r'http_request_duration_seconds_(sum|count)\{method="GET",route="/nearest"\} (\S+)')
+
+
+async def _nearest_server_time(client: httpx.AsyncClient) -> Dict[str, float]:
+    text = (await client.get("/metrics")).text
+    return {k: float(v) for k, v in NEAREST_LINE.findall(text)}
+
+
+def _serve(env_extra: Dict[str, str], nominatim_url: str, openai_url: str, deadline_sec: float):
+    port = free_port()
+    env = {
+        **os.environ,
+        "CHECKIN_SNAPSHOT_PATH": "",
+        "INDEX_COMPACT_DELAY_SEC": "-1",
+        "GEOCODER_DOMAIN": nominatim_url.split("://", 1)[1],
+        "GEOCODER_SCHEME": "http",
+        "GEOCODER_MIN_DELAY_SEC": "0",
+        "NYCPLACES_OPENAI_BASE_URL": f"{openai_url}/v1",
+        "NYCPLACES_OPENAI_API_KEY": os.getenv("NYCPLACES_OPENAI_API_KEY", "offline-benchmark"),
+        "AGENT_DEADLINE_SEC": str(deadline_sec),
+        **env_extra,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base}/health").status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+async def _probe(client: httpx.AsyncClient, concurrency: int, stop: float) -> List[float]:
+    '''/nearest latencies in ms; failed or timed out requests count as nan.'''
+
+    rng = random.Random(1)
+    samples: List[float] = []
+
+    async def _one():
+        while time.perf_counter() < stop:
+            params = {
+                "lat": round(rng.uniform(mock_nominatim.LAT_MIN, mock_nominatim.LAT_MAX), 5),
+                "lon": round(rng.uniform(mock_nominatim.LON_MIN, mock_nominatim.LON_MAX), 5),
+                "limit": 10,
+            }
+            t0 = time.perf_counter()
+            try:
+                r = await client.get("/nearest", params=params, timeout=PROBE_TIMEOUT_SEC)
+                r.raise_for_status()
+            except httpx.HTTPError:
+                samples.append(float("nan"))
+                continue
+            samples.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(_one() for _ in range(concurrency)))
+    return samples
+
+
+async def _chat(client: httpx.AsyncClient, who: str, addr: str, queries: List[str], stop: float, pause: float, out: list) -> None:
+    rng = random.Random(addr)
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        retry_after = pause
+        try:
+            r = await client.post("/agent", json={"query": rng.choice(queries)}, headers={"X-Forwarded-For": addr})
+            status = r.status_code
+            retry_after = float(r.headers.get("retry-after", pause))
+        except httpx.HTTPError:
+            status = 0
+        out.append((who, status, (time.perf_counter() - t0) * 1000))
+        if status != 200:
+            await asyncio.sleep(min(retry_after, max(0.0, stop - time.perf_counter())))
+
+
+def _cpu_sec(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _run_mode(base: str, pid: int, args, queries: List[str]) -> dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base, timeout=args.deadline_sec + 30, limits=limits) as client:
+        await _probe(client, 1, time.perf_counter() + 1.0)
+        marks = [await _nearest_server_time(client)]
+        baseline = await _probe(client, args.probe_concurrency, time.perf_counter() + args.seconds)
+        marks.append(await _nearest_server_time(client))
+
+        stop = time.perf_counter() + args.seconds
+        cpu0, bench0 = _cpu_sec(pid), time.process_time()
+        chats: list = []
+        tasks = [_chat(client, "heavy", "10.0.0.1", queries, stop, args.retry_pause_sec, chats) for _ in range(args.heavy_in_flight)]
+        tasks += [_chat(client, "light", f"10.0.1.{i}", queries, stop, args.retry_pause_sec, chats) for i in range(args.light_clients)]
+        spike, *_ = await asyncio.gather(_probe(client, args.probe_concurrency, stop), *tasks)
+        cpu = {"server": _cpu_sec(pid) - cpu0, "bench": time.process_time() - bench0}
+        marks.append(await _nearest_server_time(client))
+        metrics = (await client.get("/metrics")).text
+    # Mean time inside the server (handler and middleware) per /nearest, per phase
+    server_ms = [(b["sum"] - a["sum"]) / max(1.0, b["count"] - a["count"]) * 1000 for a, b in zip(marks, marks[1:])]
+    return {
+        "baseline": baseline, "spike": spike, "chats": chats, "cpu": cpu, "server_ms": server_ms,
+        "shed": dict(SHED_LINE.findall(metrics)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="admission,unbounded")
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    parser.add_argument("--heavy-in-flight", type=int, default=32)
+    parser.add_argument("--light-clients", type=int, default=4)
+    parser.add_argument("--retry-pause-sec", type=float, default=0.5)
+    parser.add_argument("--upstream-capacity", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--deadline-sec", type=float, default=10.0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    queries = [e["query"] for e in corpus]
+    nominatim, nominatim_url = serve_in_thread(mock_nominatim.create_mock_app(mock_nominatim.GeocoderConfig(latency_ms=20)))
+    model_config = mock_openai.MockConfig(latency_ms=args.latency_ms, jitter_ms=50, max_concurrency=args.upstream_capacity)
+    model, openai_url = serve_in_thread(mock_openai.create_mock_app(corpus, model_config))
+
+    modes = {
+        "admission": {"AGENT_MAX_CONCURRENCY": str(args.upstream_capacity)},
+        "unbounded": {"AGENT_MAX_CONCURRENCY": "10000", "AGENT_MAX_QUEUE": "10000", "AGENT_MAX_QUEUED_PER_CLIENT": "10000"},
+    }
+    try:
+        for mode in args.modes.split(","):
+            proc, base = _serve(modes[mode], nominatim_url, openai_url, args.deadline_sec)
+            try:
+                r = asyncio.run(_run_mode(base, proc.pid, args, queries))
+            finally:
+                proc.terminate()
+                proc.wait()
+
+            print(f"\n== {mode}")
+            for phase, server_ms in zip(("baseline", "spike"), r["server_ms"]):
+                ok = [ms for ms in r[phase] if ms == ms]
+                p = percentiles(ok)
+                print(
+                    f"  /nearest {phase:<8} n={len(ok):>6} failed={len(r[phase]) - len(ok)}  p50 {p['p50']:>7.1f} ms  p95 {p['p95']:>7.1f} ms  "
+                    f"p99 {p['p99']:>7.1f} ms  in-server mean {server_ms:>6.2f} ms"
+                )
+            by_who = defaultdict(list)
+            for who, status, ms in r["chats"]:
+                by_who[who].append((status, ms))
+            for who, rows in sorted(by_who.items()):
+                counts = Counter(status for status, _ in rows)
+                ok = [ms for status, ms in rows if status == 200]
+                shed = [ms for status, ms in rows if status in (429, 503)]
+                print(
+                    f"  /agent {who:<6} " + " ".join(f"{s}:{n}" for s, n in sorted(counts.items()))
+                    + (f"  answered p50 {statistics.median(ok):.0f} ms" if ok else "")
+                    + (f"  rejected p50 {statistics.median(shed):.1f} ms" if shed else "")
+                )
+            print(f"  CPU during spike: server {r['cpu']['server']:.1f} s, benchmark process {r['cpu']['bench']:.1f} s")
+            print("  shed: " + (", ".join(f"{k}={float(v):.0f}" for k, v in sorted(r["shed"].items())) or "none"))
+    finally:
+        nominatim.should_exit = True
+        model.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+'''
+Offline load benchmark for POST /agent.
+
+Starts the mock Responses API (benchmarks/mock_openai.py) and, unless --target
+is given, the app itself under uvicorn with the geocoder replaced by the
+corpus's recorded answers. It then replays the corpus queries against /agent
+at the requested concurrency and reports latency percentiles, throughput,
+model calls per query and tool time. Nothing talks to OpenAI or Nominatim.
+
+Usage:
+    python -m benchmarks.agent_bench [--requests 200] [--concurrency 8] [--latency-ms 300] [--json OUT]
+
+To benchmark an already running server (started with NYCPLACES_OPENAI_BASE_URL
+pointing at a mock), pass --target http://host:port --mock-url http://host:port.
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import CORPUS, load_corpus, format_row, percentiles, serve_in_thread
+from benchmarks.mock_openai import MockConfig, create_mock_app
+
+
+def _start_app(corpus: List[Dict[str, Any]], mock_url: str):
+    os.environ["NYCPLACES_OPENAI_BASE_URL"] = f"{mock_url}/v1"
+    os.environ.setdefault("NYCPLACES_OPENAI_API_KEY", "offline-benchmark")
+
+    import app.agent as agent
+    from app.server import create_app
+
+    recorded: Dict[str, Any] = {}
+    for entry in corpus:
+        recorded.update(entry.get("geocode", {}))
+    agent.geocode_forward = lambda address: recorded.get(address)
+
+    return serve_in_thread(create_app())
+
+
+async def _drive(target: str, queries: List[str], concurrency: int, timeout: float) -> List[Dict[str, Any]]:
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        async def one(q: str) -> Dict[str, Any]:
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    r = await client.post("/agent", json={"query": q})
+                    status = r.status_code
+                except httpx.HTTPError:
+                    status = 0
+                return {"query": q, "status": status, "ms": (time.perf_counter() - start) * 1000}
+
+        return await asyncio.gather(*(one(q) for q in queries))
+
+
+def run(
+    corpus: List[Dict[str, Any]],
+    requests: int,
+    concurrency: int,
+    config: MockConfig,
+    target: Optional[str] = None,
+    mock_url: Optional[str] = None,
+    timeout: float = 120.0,
+) -> Dict[str, Any]:
+    servers = []
+    try:
+        if not mock_url:
+            server, mock_url = serve_in_thread(create_mock_app(corpus, config))
+            servers.append(server)
+        if not target:
+            server, target = _start_app(corpus, mock_url)
+            servers.append(server)
+
+        httpx.post(f"{mock_url}/_reset")
+        queries = [corpus[i % len(corpus)]["query"] for i in range(requests)]
+
+        start = time.perf_counter()
+        results = asyncio.run(_drive(target, queries, concurrency, timeout))
+        wall = time.perf_counter() - start
+
+        calls = httpx.get(f"{mock_url}/_stats").json()["calls"]
+    finally:
+        for server in servers:
+            server.should_exit = True
+
+    ok = [r for r in results if r["status"] == 200]
+    tool_ms = [c["tool_ms"] for c in calls if c["tool_ms"] > 0]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(results) - len(ok),
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency_ms": percentiles([r["ms"] for r in ok]),
+        "model_calls_per_query": round(len(calls) / max(1, requests), 3),
+        "input_tokens_per_query": round(sum(c["input_tokens"] for c in calls) / max(1, requests), 1),
+        "model_ms": percentiles([c["model_ms"] for c in calls]),
+        "tool_ms": percentiles(tool_ms),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--target", default=None, help="base URL of a running app (default: start one in-process)")
+    parser.add_argument("--mock-url", default=None, help="base URL of a running mock (default: start one in-process)")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=60)
+    parser.add_argument("--json", type=Path, default=None, help="write the report to this file")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.ms_per_output_token, args.output_tokens)
+    report = run(load_corpus(args.corpus), args.requests, args.concurrency, config, args.target, args.mock_url)
+
+    print(f"requests={report['requests']} concurrency={report['concurrency']} errors={report['errors']}")
+    print(f"throughput={report['throughput_rps']} req/s  wall={report['wall_sec']}s")
+    print(format_row("end-to-end", report["latency_ms"]))
+    print(format_row("model call", report["model_ms"]))
+    print(format_row("tool round", report["tool_ms"]))
+    print(f"model calls/query={report['model_calls_per_query']}  input tokens/query={report['input_tokens_per_query']}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+'''
+Replay a recorded agent corpus and compare tool-output encodings.
+
+Each corpus line holds a user query, the tool calls the model made for it and
+(for address tools) the recorded geocoder answers, so the replay runs offline.
+Two passes, each for the legacy json.dumps encoding ("before") and the
+compact encoding ("after"):
+
+    tokens      - approximate model input tokens across the two model calls
+                  of a single tool round, and local latency (tool execution
+                  + encoding). The compact side pays for TOOL_TABLE_HINT only
+                  when a result holds a table, as app.agent does
+    end-to-end  - POST /agent through the app against the mock Responses API
+                  (benchmarks/mock_openai.py): median wall time per query,
+                  and input tokens and model calls as the mock saw them
+
+Queries where "after" costs more tokens, or is more than 5% and 1 ms slower
+end to end, are listed at the end. Tool schemas are the same on both sides;
+their size per model call is printed separately.
+
+Usage:
+    python -m benchmarks.agent_tokens [--corpus PATH] [--repeat N] [--e2e-repeat N] [--latency-ms 50] [--no-e2e] [--json OUT]
+'''
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import app.agent as agent
+from app.settings import get_settings
+from app.tool_encoding import estimate_tokens, has_table
+from benchmarks.common import CORPUS, load_corpus, serve_in_thread
+from benchmarks.mock_openai import MockConfig, create_mock_app
+
+
+def _legacy_encode(result: Dict[str, Any]) -> str:
+    return json.dumps(result)
+
+
+def _compact_encode(result: Dict[str, Any]) -> str:
+    return agent.compact_tool_result(result, get_settings().agent_tool_token_budget)
+
+
+def _replay(entry: Dict[str, Any], encode: Callable[[Dict[str, Any]], str], repeat: int, indexes: agent.Indexes):
+    '''
+    Run one corpus entry's tool calls and size the resulting model inputs.
+    Returns:
+        dict - input_tokens, tool_output_tokens and median local latency in ms.
+    '''
+
+    recorded = entry.get("geocode", {})
+    agent.geocode_forward = lambda address: recorded.get(address)
+
+    timings = []
+    outputs: List[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [encode(agent._run_tool(c["name"], dict(c["arguments"]), indexes)) for c in entry["tool_calls"]]
+        timings.append((time.perf_counter() - start) * 1000)
+
+    base = estimate_tokens(agent.AGENT_SYSTEM_PROMPT) + estimate_tokens(entry["query"]) + estimate_tokens(json.dumps(agent.TOOLS))
+    calls = sum(estimate_tokens(json.dumps(c["arguments"])) for c in entry["tool_calls"])
+    tool_tokens = sum(estimate_tokens(o) for o in outputs)
+    hint = estimate_tokens(agent.TOOL_TABLE_HINT) if any(has_table(o) for o in outputs) else 0
+    return {
+        # first call sees the prompt; second call sees the prompt, the calls, their outputs and any table hint
+        "input_tokens": base + (base + calls + tool_tokens + hint),
+        "tool_output_tokens": tool_tokens,
+        "latency_ms": statistics.median(timings),
+    }
+
+
+def _app():
+    '''The app, with its court indexes loaded; the tools read them from app.state.'''
+
+    from app.server import create_app
+
+    app = create_app()
+    app.state.warmup.wait()
+    return app
+
+
+def run(corpus: List[Dict[str, Any]], app, repeat: int = 20) -> List[Dict[str, Any]]:
+    indexes = agent._indexes(app)
+    real_geocode = agent.geocode_forward
+    rows = []
+    try:
+        for entry in corpus:
+            rows.append({
+                "query": entry["query"],
+                "before": _replay(entry, _legacy_encode, repeat, indexes),
+                "after": _replay(entry, _compact_encode, repeat, indexes),
+            })
+    finally:
+        agent.geocode_forward = real_geocode
+    return rows
+
+
+def run_e2e(corpus: List[Dict[str, Any]], rows: List[Dict[str, Any]], app, repeat: int = 5, latency_ms: float = 50.0) -> None:
+    '''
+    Time POST /agent per query through the app against the mock Responses
+    API, with the legacy and the compact encoding; adds "e2e" to each row.
+    '''
+
+    mock = create_mock_app(corpus, MockConfig(latency_ms=latency_ms, jitter_ms=0))
+    server, url = serve_in_thread(mock)
+    os.environ["NYCPLACES_OPENAI_BASE_URL"] = f"{url}/v1"
+    os.environ.setdefault("NYCPLACES_OPENAI_API_KEY", "offline-benchmark")
+    from fastapi.testclient import TestClient
+
+    recorded: Dict[str, Any] = {}
+    for entry in corpus:
+        recorded.update(entry.get("geocode", {}))
+    real_geocode, real_encode = agent.geocode_forward, agent.compact_tool_result
+    agent.geocode_forward = lambda address: recorded.get(address)
+    try:
+        with TestClient(app) as client:
+            for row in rows:
+                row["e2e"] = {}
+                for side, encode in (("before", lambda result, budget: json.dumps(result)), ("after", real_encode)):
+                    agent.compact_tool_result = encode
+                    client.post("/agent", json={"query": row["query"]})  # warm caches
+                    mock.state.stats.reset()
+                    timings = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        r = client.post("/agent", json={"query": row["query"]})
+                        timings.append((time.perf_counter() - start) * 1000)
+                        assert r.status_code == 200, (row["query"], r.status_code, r.text)
+                    calls = [c for c in mock.state.stats.snapshot()["calls"] if c["query"] == row["query"]]
+                    row["e2e"][side] = {
+                        "ms": statistics.median(timings),
+                        "input_tokens": sum(c["input_tokens"] for c in calls) // repeat,
+                        "model_calls": len(calls) / repeat,
+                    }
+    finally:
+        agent.geocode_forward, agent.compact_tool_result = real_geocode, real_encode
+        server.should_exit = True
+
+
+def _regressions(rows: List[Dict[str, Any]]) -> List[str]:
+    out = []
+    for r in rows:
+        reasons = []
+        if r["after"]["input_tokens"] > r["before"]["input_tokens"]:
+            reasons.append(f"tokens {r['before']['input_tokens']} -> {r['after']['input_tokens']}")
+        e2e = r.get("e2e")
+        if e2e:
+            b, a = e2e["before"]["ms"], e2e["after"]["ms"]
+            if a > b * 1.05 and a - b > 1.0:
+                reasons.append(f"end-to-end {b:.1f} -> {a:.1f} ms")
+        if reasons:
+            out.append(f"{r['query'][:50]}: {', '.join(reasons)}")
+    return out
+
+
+def _print_report(rows: List[Dict[str, Any]], latency_ms: float) -> None:
+    print(f"tool schemas: {estimate_tokens(json.dumps(agent.TOOLS))} tokens per model call (both sides)\n")
+    print(f"{'query':<50} {'in_tok before':>13} {'in_tok after':>12} {'tool_tok b/a':>13} {'ms b/a':>13}")
+    for r in rows:
+        b, a = r["before"], r["after"]
+        print(
+            f"{r['query'][:50]:<50} {b['input_tokens']:>13} {a['input_tokens']:>12} "
+            f"{b['tool_output_tokens']:>6}/{a['tool_output_tokens']:<6} "
+            f"{b['latency_ms']:>6.2f}/{a['latency_ms']:<6.2f}"
+        )
+    before = sum(r["before"]["input_tokens"] for r in rows)
+    after = sum(r["after"]["input_tokens"] for r in rows)
+    print(f"\ntotal input tokens: before={before} after={after} ({(1 - after / before) * 100:.1f}% fewer)")
+
+    if all("e2e" in r for r in rows):
+        print(f"\nend-to-end POST /agent, mock model {latency_ms:g} ms per call")
+        print(f"{'query':<50} {'ms before':>10} {'ms after':>9} {'mock in_tok b/a':>16} {'calls':>6}")
+        for r in rows:
+            b, a = r["e2e"]["before"], r["e2e"]["after"]
+            print(
+                f"{r['query'][:50]:<50} {b['ms']:>10.1f} {a['ms']:>9.1f} "
+                f"{b['input_tokens']:>8}/{a['input_tokens']:<7} {a['model_calls']:>6.1f}"
+            )
+        before = sum(r["e2e"]["before"]["ms"] for r in rows)
+        after = sum(r["e2e"]["after"]["ms"] for r in rows)
+        print(f"\ntotal end-to-end: before={before:.1f} ms after={after:.1f} ms")
+
+    regressed = _regressions(rows)
+    print("\nregressions: " + ("none" if not regressed else ""))
+    for line in regressed:
+        print(f"  {line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--e2e-repeat", type=int, default=5, help="requests per query and side end to end")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mock model latency per call")
+    parser.add_argument("--no-e2e", action="store_true", help="skip the end-to-end pass")
+    parser.add_argument("--json", type=Path, default=None, help="write per-query results to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    app = _app()
+    rows = run(corpus, app, repeat=args.repeat)
+    if not args.no_e2e:
+        run_e2e(corpus, rows, app, repeat=args.e2e_repeat, latency_ms=args.latency_ms)
+    _print_report(rows, args.latency_ms)
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
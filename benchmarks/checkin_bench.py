@@ -0,0 +1,132 @@
+'''
+Benchmark for the check-in store (POST /courts/{court_id}/checkin).
+
+Measures:
+
+    store writes/s  - CheckinStore.checkin() throughput, single thread and
+                      several writer threads
+    occupancy us    - decayed crowding estimate for a page of nearest results
+    http checkins/s - full endpoint throughput through the ASGI app
+    nearest p50/p99 - /nearest latency alone and while writer threads check in
+                      at --rate check-ins per second, to show the write path
+                      does not hold up nearest queries
+
+Usage:
+    python -m benchmarks.checkin_bench [--writes 200000] [--threads 4] [--rate 5000]
+'''
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app.checkins import CheckinStore
+from benchmarks.common import percentiles
+
+
+def _store_throughput(keys, writes: int, threads: int) -> float:
+    store = CheckinStore()
+    per_thread = writes // threads
+    rng = np.random.default_rng(0)
+    picks = [keys[rng.integers(0, len(keys), per_thread)] for _ in range(threads)]
+
+    def _run(batch):
+        for key in batch:
+            store.checkin(key)
+
+    workers = [threading.Thread(target=_run, args=(batch,)) for batch in picks]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def _nearest_latency(client, points) -> dict:
+    samples = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        client.get("/nearest", params={"lat": lat, "lon": lon, "limit": 10, "crowding": True})
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5000, help="check-ins per second during the nearest run")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ["CHECKIN_SNAPSHOT_PATH"] = os.path.join(tempfile.mkdtemp(), "checkins.npz")
+    from fastapi.testclient import TestClient
+
+    from app.court_graph import court_key
+    from app.server import create_app
+
+    app = create_app()
+    app.state.warmup.wait()
+    df = app.state.handball_idx.df
+    keys = np.array([court_key("handball", cid) for cid in df["Court_Id"].astype(str)])
+
+    print(f"store writes/s   1 thread  {_store_throughput(keys, args.writes, 1):>10.0f}")
+    print(f"store writes/s   {args.threads} threads {_store_throughput(keys, args.writes, args.threads):>10.0f}")
+
+    store = app.state.checkins
+    for key in keys:
+        store.checkin(key)
+    page = keys[:10]
+    start = time.perf_counter()
+    for _ in range(2000):
+        store.occupancy(page)
+    print(f"occupancy us     10 courts {(time.perf_counter() - start) / 2000 * 1e6:>10.1f}")
+
+    rng = np.random.default_rng(1)
+    ids = df["Court_Id"].astype(str).to_numpy()
+    points = np.column_stack([40.70 + rng.normal(0, 0.08, args.queries), -73.95 + rng.normal(0, 0.08, args.queries)])
+    with TestClient(app) as client:
+        n = 2000
+        start = time.perf_counter()
+        for cid in ids[rng.integers(0, len(ids), n)]:
+            client.post(f"/courts/{cid}/checkin", params={"sport": "handball"})
+        print(f"http checkins/s            {n / (time.perf_counter() - start):>10.0f}")
+
+        alone = _nearest_latency(client, points)
+
+        stop = threading.Event()
+        sent = [0]
+
+        def _writer():
+            # Paced writer: check-ins in small bursts to hold roughly --rate per second overall
+            interval = 0.01
+            burst = max(1, int(args.rate * interval / args.threads))
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                for key in keys[rng.integers(0, len(keys), burst)]:
+                    store.checkin(key)
+                sent[0] += burst
+                time.sleep(max(0.0, interval - (time.perf_counter() - t0)))
+
+        writers = [threading.Thread(target=_writer, daemon=True) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for w in writers:
+            w.start()
+        loaded = _nearest_latency(client, points)
+        stop.set()
+        for w in writers:
+            w.join()
+        rate = sent[0] / (time.perf_counter() - start)
+
+    print(f"nearest ms alone           p50={alone['p50']:.2f} p99={alone['p99']:.2f}")
+    print(f"nearest ms + {rate:>6.0f} ci/s  p50={loaded['p50']:.2f} p99={loaded['p99']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
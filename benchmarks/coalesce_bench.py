@@ -0,0 +1,161 @@
+'''
+Benchmark for /nearest micro-batching (NEAREST_BATCH_WINDOW_MS).
+
+Two measurements:
+
+    work per lookup - server-side cost of answering N distance lookups one by
+                      one (query_k + row conversion, what each request does)
+                      versus as one coalesced batch of N
+    http            - closed-loop load on /nearest under uvicorn at several
+                      concurrency levels, coalescing off and with each
+                      --windows value: throughput and latency percentiles
+
+The server runs as a separate uvicorn process (one worker) so the load
+generator does not share its GIL; on a machine with few cores they still
+share CPU, so compare modes rather than reading absolute numbers.
+
+Usage:
+    python -m benchmarks.coalesce_bench [--concurrency 1,8,32,64] [--windows 1,2] [--seconds 5]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import free_port, percentiles
+
+SPORTS = ("handball", "tennis", "both")
+
+
+def _points(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([40.70 + rng.normal(0, 0.08, n), -73.95 + rng.normal(0, 0.08, n)])
+
+
+def _app(window_ms: float):
+    from app.settings import get_settings
+    from app.server import create_app
+
+    os.environ["NEAREST_BATCH_WINDOW_MS"] = str(window_ms)
+    get_settings.cache_clear()
+    return create_app()
+
+
+def _work_per_lookup(app, batch_sizes) -> None:
+    # A batch of one does exactly the work of an uncoalesced request
+    app.state.warmup.wait()
+    run_batch = app.state.nearest_coalescer.run_batch
+    items = [(lat, lon, 10) for lat, lon in _points(max(batch_sizes) * 20, seed=1)]
+
+    print(f"{'batch':>6} {'us/lookup':>10} {'speedup':>8}")
+    base = None
+    for size in [1] + batch_sizes:
+        n = len(items) // size * size
+        start = time.perf_counter()
+        for i in range(0, n, size):
+            run_batch("handball", items[i:i + size])
+        per = (time.perf_counter() - start) / n * 1e6
+        base = base or per
+        print(f"{size:>6} {per:>10.1f} {base / per:>8.2f}")
+
+
+def _serve(window_ms: float):
+    import httpx
+
+    port = free_port()
+    env = {**os.environ, "NEAREST_BATCH_WINDOW_MS": str(window_ms)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:create_app", "--factory", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base}/health").raise_for_status()
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+async def _get(reader, writer, host: str, path: str) -> int:
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+    await reader.readexactly(length)
+    return status
+
+
+async def _load(base: str, concurrency: int, seconds: float) -> dict:
+    # Bare keep-alive HTTP/1.1 over asyncio streams: an HTTP client library
+    # costs more CPU per request than the endpoint and would hide the difference
+    from urllib.parse import urlencode
+
+    host = base.split("//", 1)[1]
+    addr, port = host.split(":")
+    points = _points(5000, seed=2)
+    samples, stop = [], time.perf_counter() + seconds
+
+    async def _worker(w: int):
+        reader, writer = await asyncio.open_connection(addr, int(port))
+        i = w
+        try:
+            while time.perf_counter() < stop:
+                lat, lon = points[i % len(points)]
+                query = urlencode({"lat": f"{lat:.6f}", "lon": f"{lon:.6f}", "limit": 10, "sport": SPORTS[i % 3]})
+                t0 = time.perf_counter()
+                if await _get(reader, writer, host, f"/nearest?{query}") != 200:
+                    raise RuntimeError("request failed")
+                samples.append((time.perf_counter() - t0) * 1000)
+                i += concurrency
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"rps": len(samples) / elapsed, **percentiles(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--windows", default="1,2", help="coalescing windows in ms to compare against no coalescing")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-sizes", default="8,32,64")
+    args = parser.parse_args()
+
+    os.environ.setdefault("CHECKIN_SNAPSHOT_PATH", "")
+    os.environ.setdefault("INDEX_COMPACT_DELAY_SEC", "-1")
+    logging.disable(logging.INFO)
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    windows = [float(w) for w in args.windows.split(",")]
+
+    _work_per_lookup(_app(windows[0]), [int(b) for b in args.batch_sizes.split(",")])
+
+    print(f"\n{'mode':<12} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for window in [0.0] + windows:
+        proc, base = _serve(window)
+        label = "off" if not window else f"window {window:g}ms"
+        try:
+            for c in concurrency:
+                stats = asyncio.run(_load(base, c, args.seconds))
+                print(f"{label:<12} {c:>5} {stats['rps']:>8.0f} {stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['p99']:>8.2f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
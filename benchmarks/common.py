@@ -0,0 +1,85 @@
+'''
+Shared helpers for the benchmark scripts: loading the recorded agent corpus,
+serving an ASGI app on a local port from a background thread, and
+summarizing latency samples.
+'''
+
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Recorded agent queries, their tool calls and geocoder answers
+CORPUS = Path(__file__).resolve().parent / "agent_corpus.jsonl"
+
+
+def load_corpus(path: Path = CORPUS) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app: Any, port: int = 0, host: str = "127.0.0.1") -> Tuple[Any, str]:
+    '''
+    Run an ASGI app under uvicorn in a daemon thread.
+    Inputs:
+        app: ASGI app to serve.
+        port: int - Port to bind (0 picks a free one).
+        host: str - Interface to bind.
+    Returns:
+        tuple - (uvicorn.Server, base URL). Set server.should_exit = True to stop it.
+    '''
+
+    import uvicorn
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"server on port {port} failed to start")
+        time.sleep(0.01)
+    return server, f"http://{host}:{port}"
+
+
+def percentiles(samples_ms: Sequence[float]) -> Dict[str, float]:
+    '''
+    Summarize latency samples.
+    Inputs:
+        samples_ms: list - Latencies in milliseconds.
+    Returns:
+        dict - mean, p50, p95, p99 and max in milliseconds (zeros when empty).
+    '''
+
+    if not samples_ms:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    arr = np.asarray(samples_ms, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def format_row(label: str, stats: Dict[str, float], extra: str = "") -> str:
+    return (
+        f"{label:<28} p50={stats['p50']:>9.2f}ms p95={stats['p95']:>9.2f}ms "
+        f"p99={stats['p99']:>9.2f}ms max={stats['max']:>9.2f}ms {extra}"
+    )
+
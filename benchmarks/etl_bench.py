@@ -0,0 +1,145 @@
+'''
+Raw JSON -> clean CSV: the streaming, incremental pipeline (app/data_prep.py)
+against the scripts it replaced, on synthetic raw DPR files for both sports
+(--rows records each, raw keys as in the NYC Parks exports).
+
+Each measurement runs in a fresh subprocess so peak RSS (VmHWM, plus any
+worker processes) is its own. Reports
+wall time and peak RSS for:
+
+    legacy       - pd.read_json of the whole file, then to_csv, per sport
+    cold         - the pipeline with --force and --jobs 1
+    cold-jobs    - the same with one process per sport (--jobs 2)
+    no-op        - a rerun with nothing changed
+    touched      - a rerun after touching (same bytes, new mtime) one raw file
+    one-changed  - a rerun after one raw file changed
+
+and checks that the pipeline's CSVs hold the same rows as the legacy ones.
+
+Usage:
+    python -m benchmarks.etl_bench [--rows 1e6] [--chunk-rows 50000]
+'''
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.data_prep import SPORT_SCHEMAS, infer_borough, run_pipeline
+from benchmarks.synthetic import generate_courts
+
+ROOT = Path(__file__).resolve().parents[1]
+# Clean column -> raw DPR key, per sport
+RAW_KEYS = {
+    "handball": {"Court_Id": "Prop_ID", "Num_Of_Courts": "Num_of_Courts", "Lat": "lat", "Lon": "lon"},
+    "tennis": {"Court_Id": "Prop_ID", "Num_Of_Courts": "Courts", "Lat": "lat", "Lon": "lon"},
+}
+
+
+def write_raw(path: Path, rows: int, sport: str, seed: int) -> None:
+    '''A raw DPR-style JSON array (no Borough; ~1% of rows without coordinates).'''
+
+    df = generate_courts(rows, sport, seed).drop(columns="Borough").rename(columns=RAW_KEYS[sport])
+    missing = np.random.default_rng(seed).random(rows) < 0.01
+    df.loc[missing, "lat"] = np.nan
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("[")
+        for start in range(0, rows, 100_000):
+            text = df.iloc[start:start + 100_000].to_json(orient="records")[1:-1]
+            fh.write(("," if start else "") + text)
+        fh.write("]")
+
+
+def legacy(raw_dir: Path, out_dir: Path) -> None:
+    # The replaced data_prep.py / clean_data.py, one sport after the other
+    for sport, schema in SPORT_SCHEMAS.items():
+        df = pd.read_json(raw_dir / schema.raw)
+        df.columns = [c.strip().lower() for c in df.columns]
+        for col in ["lat", "lon"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        df = df.dropna(subset=["lat", "lon"]).copy()
+        if "borough" not in df.columns:
+            df["borough"] = df.get("prop_id", "").apply(infer_borough)
+        clean = df[[raw for raw, _ in schema.columns]].copy()
+        clean.columns = [col for _, col in schema.columns]
+        clean.to_csv(out_dir / schema.out, index=False)
+
+
+def child(mode: str, raw_dir: Path, out_dir: Path, chunk_rows: int) -> None:
+    start = time.perf_counter()
+    if mode == "legacy":
+        legacy(raw_dir, out_dir)
+        run = {}
+    else:
+        jobs = 2 if mode == "cold-jobs" else 1
+        run = run_pipeline(raw_dir=raw_dir, out_dir=out_dir, force=mode.startswith("cold"), jobs=jobs, chunk_rows=chunk_rows)["last_run"]
+    # VmHWM rather than ru_maxrss, which keeps the benchmark parent's peak across fork and exec
+    status = Path("/proc/self/status").read_text()
+    peak_kb = max(int(re.search(r"VmHWM:\s+(\d+)", status).group(1)), resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_kb / 1024, "built": run.get("built", list(SPORT_SCHEMAS))}))
+
+
+def measure(mode: str, raw_dir: Path, out_dir: Path, chunk_rows: int) -> dict:
+    cmd = [sys.executable, "-m", "benchmarks.etl_bench", "--child", mode, "--raw-dir", str(raw_dir), "--out-dir", str(out_dir), "--chunk-rows", str(chunk_rows)]
+    out = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=float, default=1e6, help="raw records per sport")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--raw-dir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.raw_dir, args.out_dir, args.chunk_rows)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir, legacy_dir, out_dir = (Path(tmp) / d for d in ("raw", "legacy", "out"))
+        for d in (raw_dir, legacy_dir, out_dir):
+            d.mkdir()
+        rows = int(args.rows)
+        for i, (sport, schema) in enumerate(SPORT_SCHEMAS.items()):
+            write_raw(raw_dir / schema.raw, rows, sport, args.seed + i)
+        raw_mb = sum(p.stat().st_size for p in raw_dir.iterdir()) / 1024 / 1024
+        print(f"raw input: {len(SPORT_SCHEMAS)} sports x {rows:,} records, {raw_mb:.0f} MB of JSON\n")
+
+        print(f"{'run':<12} {'seconds':>8} {'peak MB':>8}  rebuilt")
+        results = {"legacy": measure("legacy", raw_dir, legacy_dir, args.chunk_rows)}
+        for mode in ("cold", "cold-jobs", "no-op"):
+            results[mode] = measure(mode, raw_dir, out_dir, args.chunk_rows)
+        for schema in SPORT_SCHEMAS.values():
+            # The legacy scripts had no Info fields (app/court_info.py); compare their columns
+            old = pd.read_csv(legacy_dir / schema.out)
+            pd.testing.assert_frame_equal(old, pd.read_csv(out_dir / schema.out)[list(old.columns)], check_dtype=False)
+        first = raw_dir / next(iter(SPORT_SCHEMAS.values())).raw
+        first.touch()
+        results["touched"] = measure("touched", raw_dir, out_dir, args.chunk_rows)
+        with open(first, "r+b") as fh:
+            # Same length, different content: the last digit of the last lon
+            fh.seek(-3, 2)
+            last = fh.read(1)
+            fh.seek(-3, 2)
+            fh.write(b"1" if last != b"1" else b"2")
+        results["one-changed"] = measure("one-changed", raw_dir, out_dir, args.chunk_rows)
+        for mode, r in results.items():
+            print(f"{mode:<12} {r['seconds']:>8.2f} {r['peak_mb']:>8.0f}  {', '.join(r['built']) or '-'}")
+        print("\nsame rows as legacy: yes")
+
+
+if __name__ == "__main__":
+    main()
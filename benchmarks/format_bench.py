@@ -0,0 +1,116 @@
+'''
+Response encodings for bulk clients (app/response_formats.py): JSON through
+the pydantic models, MessagePack and Arrow IPC, for 10, 1k and 100k courts
+(synthetic rows, benchmarks/synthetic.py).
+
+The server side is an in-process FastAPI app with one route built like
+GET /courts (same models, negotiation and encoders), called directly over
+ASGI so no HTTP client work is counted. For each format and size it reports:
+
+    bytes     - response body size (and gzip -6 size)
+    server ms - route time: building the response and encoding it
+    client ms - decoding the body into a DataFrame (json.loads + DataFrame,
+                msgpack.unpackb + DataFrame, Arrow IPC read + to_pandas)
+    arrow ms  - Arrow only: reading the IPC stream into a pyarrow Table
+                without converting to pandas
+
+Usage:
+    python -m benchmarks.format_bench [--sizes 10,1000,100000] [--repeat 20]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import time
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Query, Request, Response
+
+from app.pydantic_models import Court, CourtsResp
+from app.response_formats import (
+    ARROW, JSON, MEDIA_TYPES, MSGPACK, available_formats, courts_table, decode_arrow, decode_msgpack, encode_table, negotiate,
+)
+from benchmarks.static_bench import call
+from benchmarks.synthetic import generate_courts
+
+
+def bench_app(table: pd.DataFrame) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/courts", response_model=CourtsResp)
+    def courts(request: Request, response: Response, limit: int = Query(10)):
+        page = table.iloc[:limit].reset_index(drop=True)
+        meta = {"count": len(page), "total": len(table), "offset": 0}
+        fmt = negotiate(request.headers.get("accept"))
+        if fmt != JSON:
+            return encode_table(fmt, page, meta)
+        return CourtsResp(results=[Court(**r) for r in page.to_dict("records")], **meta)
+
+    return app
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(samples))
+
+
+def decoder(fmt: str) -> Callable[[bytes], pd.DataFrame]:
+    if fmt == JSON:
+        return lambda body: pd.DataFrame(json.loads(body)["results"])
+    if fmt == MSGPACK:
+        return lambda body: decode_msgpack(body)[1]
+    return lambda body: decode_arrow(body)[1].to_pandas()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sizes: List[int] = [int(float(s)) for s in args.sizes.split(",")]
+    rows = generate_courts(max(sizes), "tennis", seed=0)
+    rows["distance_km"] = np.round(np.random.default_rng(1).random(len(rows)) * 20, 2)
+    app = bench_app(courts_table(rows, "tennis"))
+    formats = available_formats()
+    missing = [f for f in (MSGPACK, ARROW) if f not in formats]
+    if missing:
+        print(f"not installed, skipped: {', '.join(missing)}\n")
+
+    print(f"{'rows':>7} {'format':<8} {'bytes':>11} {'gzip':>11} {'server ms':>10} {'client ms':>10} {'arrow ms':>9}")
+    for n in sizes:
+        repeat = max(3, args.repeat if n < 50_000 else args.repeat // 5)
+        baseline = None
+        for fmt in formats:
+            path = f"/courts?limit={n}"
+            headers = {"accept": MEDIA_TYPES[fmt]}
+            status, resp_headers, body = asyncio.run(call(app, path, headers))
+            assert status == 200 and resp_headers["content-type"].startswith(MEDIA_TYPES[fmt]), (status, resp_headers)
+            server_ms = timed(lambda: asyncio.run(call(app, path, headers)), repeat)
+            decode = decoder(fmt)
+            frame = decode(body)
+            if baseline is None:
+                baseline = frame
+            else:
+                pd.testing.assert_frame_equal(baseline.dropna(axis=1, how="all"), frame, check_dtype=False)
+            client_ms = timed(lambda: decode(body), repeat)
+            arrow_ms = f"{timed(lambda: decode_arrow(body), repeat):>9.3f}" if fmt == ARROW else f"{'-':>9}"
+            print(
+                f"{n:>7} {fmt:<8} {len(body):>11,} {len(gzip.compress(body, 6)):>11,} "
+                f"{server_ms:>10.3f} {client_ms:>10.3f} {arrow_ms}"
+            )
+    print("\nall formats decode to the same rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+'''
+Failure drill for the geocoder circuit breaker, run against the local fake
+Nominatim (benchmarks/mock_nominatim.py).
+
+Phases:
+    healthy  - upstream answers normally; results are cached
+    outage   - upstream returns 503 for every call; the breaker should open
+               after a few failures and requests should fail fast with stale
+               cache entries or approximate local matches
+    slow     - upstream answers, but slower than the breaker's slow-call limit
+    recovery - upstream is healthy again; after the open period the breaker
+               probes (half-open) and closes
+
+For every phase it prints request latency percentiles, answer sources and
+the breaker state, and exits non-zero if the breaker did not behave.
+
+Usage:
+    python -m benchmarks.geocoder_drill [--requests 30]
+'''
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+from benchmarks import mock_nominatim
+from benchmarks.common import format_row, percentiles, serve_in_thread
+
+ADDRESSES = ["399 Park Ave", "Central Park, Manhattan", "1 Atlantic Ave, Brooklyn", "Haffen Park", "Queens Blvd"]
+
+OPEN_SEC = 2.0
+TIMEOUT_SEC = 1.0
+
+
+def _phase(client, label: str, requests: int, breaker) -> dict:
+    samples, sources, statuses = [], Counter(), Counter()
+    for i in range(requests):
+        start = time.perf_counter()
+        r = client.post("/geocodeForward", json={"address": ADDRESSES[i % len(ADDRESSES)]})
+        samples.append((time.perf_counter() - start) * 1000)
+        statuses[r.status_code] += 1
+        sources[r.json().get("source", "-") if r.status_code == 200 else "error"] += 1
+    stats = percentiles(samples)
+    print(format_row(label, stats, f"state={breaker.state:<9} sources={dict(sources)} status={dict(statuses)}"))
+    return {"latency": stats, "sources": sources, "state": breaker.state}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+
+    config = mock_nominatim.GeocoderConfig(latency_ms=20, jitter_ms=5)
+    nominatim_app = mock_nominatim.create_mock_app(config)
+    server, url = serve_in_thread(nominatim_app)
+
+    os.environ.update({
+        "GEOCODER_DOMAIN": url.split("://", 1)[1],
+        "GEOCODER_SCHEME": "http",
+        "GEOCODER_MIN_DELAY_SEC": "0",
+        "GEOCODER_TIMEOUT_SEC": str(TIMEOUT_SEC),
+        "GEOCODER_BREAKER_OPEN_SEC": str(OPEN_SEC),
+        "GEOCODE_CACHE_TTL_SEC": "0.5",
+    })
+    from fastapi.testclient import TestClient
+
+    import app.geocode as geocode
+    from app.server import create_app
+
+    breaker = geocode._forward_breaker
+    failures = []
+    try:
+        app = create_app()
+        app.state.warmup.wait()
+        with TestClient(app) as client:
+            _phase(client, "healthy", args.requests, breaker)
+            time.sleep(0.6)  # let cached answers go stale
+
+            config.down = True
+            outage = _phase(client, "outage", args.requests, breaker)
+            if outage["state"] != "open":
+                failures.append("breaker did not open during the outage")
+            if outage["latency"]["p50"] > 100:
+                failures.append("requests did not fail fast while the breaker was open")
+
+            config.down = False
+            config.latency_ms = TIMEOUT_SEC * 1000 * 0.8
+            time.sleep(OPEN_SEC)
+            slow = _phase(client, "slow", max(5, args.requests // 3), breaker)
+            if slow["state"] != "open":
+                failures.append("breaker did not re-open on slow probes")
+
+            config.latency_ms = 20
+            time.sleep(OPEN_SEC)
+            recovery = _phase(client, "recovery", args.requests, breaker)
+            if recovery["state"] != "closed":
+                failures.append("breaker did not close after recovery")
+    finally:
+        server.should_exit = True
+
+    print(f"\nupstream calls: {nominatim_app.state.calls}")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: breaker opened on errors and slow calls, failed fast with fallbacks, and closed on recovery")
+
+
+if __name__ == "__main__":
+    main()
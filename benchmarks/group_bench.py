@@ -0,0 +1,75 @@
+'''
+Benchmark for NearestIndex.query_group (POST /nearest/group).
+
+Compares the BallTree branch-and-bound used by query_group with scoring a
+full origins x courts distance matrix, for growing dataset sizes and group
+sizes, and checks that both return the same best scores. "group ms" includes
+building the result rows; "matrix ms" only scores.
+
+Usage:
+    python -m benchmarks.group_bench [--sizes 1e3,1e5,1e6] [--groups 2,12,48] [--k 5] [--objective sum|max]
+'''
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+from app.nearest import GROUP_OBJECTIVES, NearestIndex, _haversine_rad
+from benchmarks.synthetic import generate_courts
+
+
+def _full_matrix(index: NearestIndex, lats, lons, k: int, objective: str) -> np.ndarray:
+    origins = np.radians(np.column_stack([lats, lons]))
+    scores = np.empty(len(index.df))
+    step = max(1, (1 << 22) // len(origins))
+    for start in range(0, len(scores), step):
+        d = _haversine_rad(origins, index.coords_rad[start:start + step])
+        scores[start:start + step] = d.sum(axis=0) if objective == "sum" else d.max(axis=0)
+    return np.sort(np.partition(scores, k - 1)[:k]) * EARTH_RADIUS_KM
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1e3,1e5,1e6")
+    parser.add_argument("--groups", default="2,12,48", help="comma separated numbers of origins")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--objective", choices=GROUP_OBJECTIVES, default="sum")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'rows':>9} {'origins':>8} {'group ms':>10} {'matrix ms':>10} {'same':>5}")
+    for size in [int(float(s)) for s in args.sizes.split(",") if s.strip()]:
+        index = NearestIndex(generate_courts(size, seed=args.seed))
+        for n in [int(g) for g in args.groups.split(",") if g.strip()]:
+            # Friends spread over a few neighbourhoods around Midtown / Brooklyn
+            lats = 40.70 + rng.normal(0, 0.05, n)
+            lons = -73.95 + rng.normal(0, 0.05, n)
+            col = "total_km" if args.objective == "sum" else "max_km"
+
+            rows = index.query_group(lats, lons, k=args.k, objective=args.objective)
+            reference = _full_matrix(index, lats, lons, args.k, args.objective)
+            same = bool(np.allclose(rows[col].to_numpy(), np.round(reference, 2), atol=0.011))
+
+            group_ms = _median_ms(lambda: index.query_group(lats, lons, k=args.k, objective=args.objective), args.repeat)
+            matrix_ms = _median_ms(lambda: _full_matrix(index, lats, lons, args.k, args.objective), max(1, args.repeat // 2))
+            print(f"{size:>9} {n:>8} {group_ms:>10.2f} {matrix_ms:>10.2f} {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
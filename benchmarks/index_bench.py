@@ -0,0 +1,214 @@
+'''
+Micro-benchmarks for NearestIndex on synthetic datasets of growing size.
+
+For every dataset size and index engine we measure:
+
+    build_ms      - time to build the index from the DataFrame
+    build_mb      - peak Python-tracked memory during the build (tracemalloc)
+    single_us     - median latency of one k-NN query
+    batch_us      - per-query latency when querying a batch of points at once
+    materialize_us- cost of turning neighbour indices into result rows
+                    (DataFrame slice as in NearestIndex.query_k, and dicts)
+
+Engines compared side by side:
+
+    balltree - sklearn BallTree with the haversine metric (what NearestIndex uses)
+    kdtree3d - scipy cKDTree over unit-sphere xyz vectors; chord distance is
+               converted back to great-circle km, so results are identical
+    brute    - chunked numpy haversine scan with argpartition
+
+Usage:
+    python -m benchmarks.index_bench [--sizes 1e3,1e4,1e5,1e6] [--engines balltree,kdtree3d,brute] [--k 10] [--json OUT]
+'''
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from app.CONSTANTS import EARTH_RADIUS_KM
+from app.nearest import NearestIndex
+from benchmarks.synthetic import generate_courts
+
+
+class BallTreeEngine:
+    name = "balltree"
+
+    def __init__(self, df: pd.DataFrame):
+        self.index = NearestIndex(df)
+
+    def query(self, lat: np.ndarray, lon: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        dist, idx = self.index.tree.query(np.radians(np.column_stack([lat, lon])), k=k)
+        return dist * EARTH_RADIUS_KM, idx
+
+
+def _unit_xyz(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    la, lo = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)])
+
+
+class KDTree3DEngine:
+    name = "kdtree3d"
+
+    def __init__(self, df: pd.DataFrame):
+        self.tree = cKDTree(_unit_xyz(df["Lat"].to_numpy(float), df["Lon"].to_numpy(float)))
+
+    def query(self, lat, lon, k):
+        chord, idx = self.tree.query(_unit_xyz(np.asarray(lat, float), np.asarray(lon, float)), k=k)
+        chord = chord.reshape(len(lat), -1)
+        idx = idx.reshape(len(lat), -1)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1)), idx
+
+
+class BruteEngine:
+    name = "brute"
+    chunk = 1 << 20
+
+    def __init__(self, df: pd.DataFrame):
+        self.lat = np.radians(df["Lat"].to_numpy(float))
+        self.lon = np.radians(df["Lon"].to_numpy(float))
+        self.cos_lat = np.cos(self.lat)
+
+    def query(self, lat, lon, k):
+        out_d, out_i = [], []
+        for qlat, qlon in zip(np.radians(lat), np.radians(lon)):
+            best_d, best_i = np.empty(0), np.empty(0, dtype=np.int64)
+            for start in range(0, len(self.lat), self.chunk):
+                sl = slice(start, start + self.chunk)
+                a = np.sin((self.lat[sl] - qlat) / 2) ** 2 + np.cos(qlat) * self.cos_lat[sl] * np.sin((self.lon[sl] - qlon) / 2) ** 2
+                kk = min(k, len(a))
+                part = np.argpartition(a, kk - 1)[:kk]
+                best_d = np.concatenate([best_d, a[part]])
+                best_i = np.concatenate([best_i, part + start])
+            order = np.argsort(best_d)[:k]
+            out_d.append(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(best_d[order])))
+            out_i.append(best_i[order])
+        return np.array(out_d), np.array(out_i)
+
+
+ENGINES = {e.name: e for e in (BallTreeEngine, KDTree3DEngine, BruteEngine)}
+
+
+def _timed_build(cls, df: pd.DataFrame):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine = cls(df)
+    build_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, build_ms, peak / 2**20
+
+
+def _materialize_costs(df: pd.DataFrame, idx: np.ndarray, dist: np.ndarray, repeat: int) -> Dict[str, float]:
+    slice_t, dict_t = [], []
+    for i in range(min(repeat, len(idx))):
+        start = time.perf_counter()
+        rows = df.iloc[idx[i]].copy().reset_index(drop=True)
+        rows["distance_km"] = np.round(dist[i], 2)
+        slice_t.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rows.to_dict("records")
+        dict_t.append(time.perf_counter() - start)
+    return {
+        "dataframe_slice_us": round(statistics.median(slice_t) * 1e6, 1),
+        "to_dicts_us": round(statistics.median(dict_t) * 1e6, 1),
+    }
+
+
+def bench_size(rows: int, engines: List[str], k: int, queries: int, batch: int, seed: int) -> Dict[str, Dict[str, float]]:
+    df = generate_courts(rows, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    q = df.sample(n=max(queries, batch), replace=True, random_state=seed)
+    qlat = q["Lat"].to_numpy() + rng.normal(0, 0.005, len(q))
+    qlon = q["Lon"].to_numpy() + rng.normal(0, 0.005, len(q))
+
+    results: Dict[str, Dict[str, float]] = {}
+    reference = None
+    for name in engines:
+        engine, build_ms, build_mb = _timed_build(ENGINES[name], df)
+        # Brute force is O(n) per query; keep its single-query sample small on big data
+        n_single = queries if name != "brute" or rows <= 100_000 else max(5, queries // 20)
+        n_batch = batch if name != "brute" or rows <= 100_000 else max(5, batch // 20)
+
+        single = []
+        for i in range(n_single):
+            start = time.perf_counter()
+            engine.query(qlat[i:i + 1], qlon[i:i + 1], k)
+            single.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        dist, idx = engine.query(qlat[:n_batch], qlon[:n_batch], k)
+        batch_s = time.perf_counter() - start
+
+        if reference is None:
+            reference = dist
+        agree = float(np.mean(np.isclose(dist[:, -1], reference[: len(dist), -1], atol=1e-6)))
+
+        results[name] = {
+            "build_ms": round(build_ms, 2),
+            "build_mb": round(build_mb, 2),
+            "single_us": round(statistics.median(single) * 1e6, 1),
+            "batch_us": round(batch_s / n_batch * 1e6, 1),
+            "agrees_with_first_engine": round(agree, 4),
+            **_materialize_costs(df, idx, dist, repeat=50),
+        }
+        if name == "balltree":
+            # End-to-end cost of the current public API, per call
+            index = engine.index
+            t = []
+            for i in range(min(n_single, 100)):
+                start = time.perf_counter()
+                index.query_k(qlat[i], qlon[i], k=k)
+                t.append(time.perf_counter() - start)
+            results[name]["query_k_us"] = round(statistics.median(t) * 1e6, 1)
+        del engine
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1e3,1e4,1e5,1e6", help="comma separated dataset sizes, up to 1e7")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="single-query samples")
+    parser.add_argument("--batch", type=int, default=1000, help="points per batch query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        raise SystemExit(f"unknown engine(s): {', '.join(unknown)}; choose from {', '.join(ENGINES)}")
+
+    report = {}
+    header = f"{'rows':>9} {'engine':<9} {'build ms':>10} {'build MB':>9} {'single us':>10} {'batch us':>9} {'slice us':>9} {'dicts us':>9} {'agree':>6}"
+    print(header)
+    for size in [int(float(s)) for s in args.sizes.split(",") if s.strip()]:
+        report[size] = bench_size(size, engines, args.k, args.queries, args.batch, args.seed)
+        for name, r in report[size].items():
+            print(
+                f"{size:>9} {name:<9} {r['build_ms']:>10.1f} {r['build_mb']:>9.1f} {r['single_us']:>10.1f} "
+                f"{r['batch_us']:>9.1f} {r['dataframe_slice_us']:>9.1f} {r['to_dicts_us']:>9.1f} {r['agrees_with_first_engine']:>6.3f}"
+            )
+        if "balltree" in report[size]:
+            print(f"{'':>9} NearestIndex.query_k end-to-end: {report[size]['balltree']['query_k_us']:.1f} us")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Bandwidth and server work for live-location tracking: polling /nearest on
+every GPS fix (what app.js did) versus the /nearest/live WebSocket.
+
+Simulates a walk of --fixes GPS fixes one second apart at walking pace, with
+GPS jitter and pauses at crossings, and reports bytes sent to the client,
+nearest computations on the server and messages pushed.
+
+Usage:
+    python -m benchmarks.live_bench [--fixes 600] [--jitter-m 6] [--sport handball]
+'''
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import numpy as np
+
+M_PER_DEG_LAT = 111_320.0
+
+
+def _walk(fixes: int, jitter_m: float, seed: int = 0) -> np.ndarray:
+    '''1.4 m/s up Manhattan's avenues, stopping for ~30 s every ~2 minutes.'''
+
+    rng = np.random.default_rng(seed)
+    lat, lon = 40.7308, -73.9973
+    heading = np.radians(29.0)  # along the street grid
+    points = []
+    for i in range(fixes):
+        moving = (i % 150) < 120
+        if moving:
+            lat += 1.4 * np.cos(heading) / M_PER_DEG_LAT
+            lon += 1.4 * np.sin(heading) / (M_PER_DEG_LAT * np.cos(np.radians(lat)))
+        noise = rng.normal(0, jitter_m, 2)
+        points.append((lat + noise[0] / M_PER_DEG_LAT, lon + noise[1] / (M_PER_DEG_LAT * np.cos(np.radians(lat)))))
+    return np.array(points)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixes", type=int, default=600)
+    parser.add_argument("--jitter-m", type=float, default=6.0)
+    parser.add_argument("--sport", default="handball")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("CHECKIN_SNAPSHOT_PATH", "")
+    from fastapi.testclient import TestClient
+
+    from app.live_location import LIVE_UPDATES
+    from app.server import create_app
+
+    points = _walk(args.fixes, args.jitter_m)
+    client = TestClient(create_app())
+
+    poll_bytes = 0
+    for lat, lon in points:
+        r = client.get("/nearest", params={"lat": lat, "lon": lon, "limit": args.limit, "sport": args.sport})
+        poll_bytes += len(r.content)
+
+    before = {o: LIVE_UPDATES.value(outcome=o) for o in ("skipped", "unchanged", "diff")}
+    live_bytes, pushed = 0, 0
+    with client.websocket_connect("/nearest/live") as ws:
+        for i, (lat, lon) in enumerate(points):
+            msg = {"lat": lat, "lon": lon}
+            if not i:
+                msg.update(sport=args.sport, limit=args.limit)
+            ws.send_json(msg)
+        # Switching sport always answers with a reset, which marks the end of the walk's messages
+        ws.send_json({"lat": 0.0, "lon": 0.0, "sport": "tennis"})
+        while True:
+            text = ws.receive_text()
+            if '"reset": true' in text and pushed:
+                break
+            live_bytes += len(text)
+            pushed += 1
+    after = {o: LIVE_UPDATES.value(outcome=o) - before[o] for o in before}
+    computed = after["unchanged"] + after["diff"] - 1  # minus the closing sport switch
+
+    print(f"{'mode':<10} {'bytes':>10} {'computations':>13} {'messages':>9}")
+    print(f"{'polling':<10} {poll_bytes:>10} {len(points):>13} {len(points):>9}")
+    print(f"{'websocket':<10} {live_bytes:>10} {computed:>13.0f} {pushed:>9}")
+    print(f"\nskipped (moved < LIVE_MIN_MOVE_M): {after['skipped']:.0f}  recomputed without changes: {after['unchanged']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
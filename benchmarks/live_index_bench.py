@@ -0,0 +1,114 @@
+'''
+Benchmark for LiveIndex (admin edits on top of NearestIndex).
+
+For every dataset size it reports:
+
+    mutations/s - insert, update and close throughput on a large base
+    query_us    - median query_k latency with a growing number of pending edits
+                  (delta rows + tombstones), next to a plain NearestIndex over
+                  the same live courts
+    compact_ms  - time to fold the pending edits into a new base
+    same        - whether query_k and query_group match a freshly built
+                  NearestIndex over the live courts, checked in the clean,
+                  edited and compacted states
+
+Usage:
+    python -m benchmarks.live_index_bench [--sizes 1e3,1e5] [--pending 0,16,256,1024] [--k 10]
+'''
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.live_index import LiveIndex
+from app.nearest import NearestIndex
+from benchmarks.synthetic import generate_courts
+
+
+def _median_us(fn, points) -> float:
+    samples = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        fn(lat, lon)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def _points(rng, n: int) -> np.ndarray:
+    return np.column_stack([40.70 + rng.normal(0, 0.08, n), -73.95 + rng.normal(0, 0.08, n)])
+
+
+def _same(live: LiveIndex, rng, k: int) -> bool:
+    ref = NearestIndex(live.df)
+    for lat, lon in _points(rng, 25):
+        if not np.allclose(live.query_k(lat, lon, k)["distance_km"], ref.query_k(lat, lon, k)["distance_km"]):
+            return False
+        lats, lons = lat + rng.normal(0, 0.02, 5), lon + rng.normal(0, 0.02, 5)
+        if not np.allclose(live.query_group(lats, lons, k)["total_km"], ref.query_group(lats, lons, k)["total_km"]):
+            return False
+    return True
+
+
+def _edit(live: LiveIndex, ids, rng, n: int, offset: int) -> None:
+    '''Spread n edits evenly over close, update and insert.'''
+
+    for i in range(n):
+        cid = ids[offset + i]
+        op = i % 3
+        if op == 0:
+            live.close(cid)
+        elif op == 1:
+            live.update(cid, {"Lat": 40.70 + rng.normal(0, 0.05), "Lon": -73.95 + rng.normal(0, 0.05)})
+        else:
+            lat, lon = _points(rng, 1)[0]
+            live.insert({"Court_Id": f"N{offset + i}", "Name": f"New Court {offset + i}", "Lat": lat, "Lon": lon, "Num_Of_Courts": 1})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1e3,1e5")
+    parser.add_argument("--pending", default="0,16,256,1024", help="comma separated numbers of pending edits")
+    parser.add_argument("--mutations", type=int, default=600)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in [int(float(s)) for s in args.sizes.split(",") if s.strip()]:
+        df = generate_courts(size, seed=args.seed).drop_duplicates("Court_Id").reset_index(drop=True)
+        ids = df["Court_Id"].astype(str).to_numpy()[rng.permutation(len(df))]
+        print(f"\n{len(df)} courts")
+
+        live = LiveIndex(df, "bench", compact_delay_sec=-1)
+        n_mut = min(args.mutations, len(df) // 2)
+        start = time.perf_counter()
+        _edit(live, ids, rng, n_mut, 0)
+        elapsed = time.perf_counter() - start
+        print(f"  mutations/s {n_mut / elapsed:>10.0f}  ({n_mut} edits, {elapsed / n_mut * 1e6:.0f} us each)")
+
+        print(f"  {'pending':>8} {'live us':>9} {'plain us':>9} {'overhead':>9} {'compact ms':>11} {'same':>5}")
+        points = _points(rng, args.queries)
+        for pending in [int(p) for p in args.pending.split(",") if p.strip()]:
+            live = LiveIndex(df, "bench", compact_delay_sec=-1)
+            same = _same(live, rng, args.k)
+            _edit(live, ids, rng, min(pending, len(df) // 2), 0)
+            same = same and _same(live, rng, args.k)
+
+            plain = NearestIndex(live.df)
+            live_us = _median_us(lambda lat, lon: live.query_k(lat, lon, args.k), points)
+            plain_us = _median_us(lambda lat, lon: plain.query_k(lat, lon, args.k), points)
+
+            start = time.perf_counter()
+            live.compact()
+            compact_ms = (time.perf_counter() - start) * 1000
+            same = same and _same(live, rng, args.k)
+            print(f"  {pending:>8} {live_us:>9.1f} {plain_us:>9.1f} {live_us / plain_us:>8.2f}x {compact_ms:>11.1f} {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+'''
+HTTP load and regression benchmark for the API.
+
+Boots create_app() either in-process (httpx ASGI transport) or under uvicorn,
+with Nominatim and OpenAI replaced by the local mocks in this package, then
+runs scripted load profiles at a fixed concurrency:
+
+    nearest  - /nearest only, random points across NYC and sports
+    mixed    - map traffic: page + static assets, /nearest, forward and reverse geocoding
+    chat     - mostly /agent, with some /nearest alongside
+
+Results (throughput, latency percentiles overall and per endpoint) are
+written as JSON and can be compared against a stored baseline; the run fails
+when p95 latency rises or throughput falls by more than the threshold.
+
+Usage:
+    python -m benchmarks.load [--profiles nearest,mixed,chat] [--requests 500] [--concurrency 16]
+                              [--mode inprocess|uvicorn] [--json OUT]
+                              [--compare benchmarks/baseline.json] [--threshold 0.25] [--save-baseline PATH]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.common import CORPUS, load_corpus, percentiles, serve_in_thread
+from benchmarks import mock_nominatim, mock_openai
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# method, path, kwargs for httpx, label used in the per-endpoint report
+Request = Tuple[str, str, Dict[str, Any], str]
+
+SPORTS = ("handball", "tennis", "both")
+STREETS = ("Broadway", "Park Ave", "Atlantic Ave", "Grand Concourse", "Flatbush Ave", "Queens Blvd", "Richmond Ave")
+
+
+def _point(rng: random.Random) -> Tuple[float, float]:
+    return (
+        round(rng.uniform(mock_nominatim.LAT_MIN, mock_nominatim.LAT_MAX), 5),
+        round(rng.uniform(mock_nominatim.LON_MIN, mock_nominatim.LON_MAX), 5),
+    )
+
+
+def req_nearest(rng: random.Random) -> Request:
+    lat, lon = _point(rng)
+    params = {"lat": lat, "lon": lon, "limit": 10, "sport": rng.choice(SPORTS)}
+    return "GET", "/nearest", {"params": params}, "GET /nearest"
+
+
+def req_home(rng: random.Random) -> Request:
+    return "GET", "/", {}, "GET /"
+
+
+def req_static(rng: random.Random) -> Request:
+    return "GET", "/static/app.js", {}, "GET /static"
+
+
+def req_forward(rng: random.Random) -> Request:
+    address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}"
+    return "POST", "/geocodeForward", {"json": {"address": address}}, "POST /geocodeForward"
+
+
+def req_reverse(rng: random.Random) -> Request:
+    lat, lon = _point(rng)
+    return "POST", "/geocodeReverse", {"json": {"lat": lat, "lon": lon}}, "POST /geocodeReverse"
+
+
+def _req_agent(queries: List[str]) -> Callable[[random.Random], Request]:
+    def make(rng: random.Random) -> Request:
+        return "POST", "/agent", {"json": {"query": rng.choice(queries)}}, "POST /agent"
+    return make
+
+
+def build_profiles(corpus: List[Dict[str, Any]]) -> Dict[str, List[Tuple[float, Callable[[random.Random], Request]]]]:
+    agent = _req_agent([e["query"] for e in corpus])
+    return {
+        "nearest": [(1.0, req_nearest)],
+        "mixed": [(0.05, req_home), (0.10, req_static), (0.55, req_nearest), (0.20, req_forward), (0.10, req_reverse)],
+        "chat": [(0.7, agent), (0.3, req_nearest)],
+    }
+
+
+def _configure_env(nominatim_url: str, openai_url: str, keep_rate_limit: bool) -> None:
+    # Must run before app modules are imported: settings are cached on first use
+    os.environ["GEOCODER_DOMAIN"] = nominatim_url.split("://", 1)[1]
+    os.environ["GEOCODER_SCHEME"] = "http"
+    if not keep_rate_limit:
+        os.environ["GEOCODER_MIN_DELAY_SEC"] = "0"
+    os.environ["NYCPLACES_OPENAI_BASE_URL"] = f"{openai_url}/v1"
+    os.environ.setdefault("NYCPLACES_OPENAI_API_KEY", "offline-benchmark")
+
+
+async def _run_profile(
+    client: httpx.AsyncClient,
+    mix: List[Tuple[float, Callable[[random.Random], Request]]],
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    weights = [w for w, _ in mix]
+    plan = [rng.choices(mix, weights)[0][1](rng) for _ in range(requests)]
+    samples: List[Tuple[str, int, float]] = []
+    cursor = iter(plan)
+
+    async def worker():
+        for method, path, kwargs, label in cursor:
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kwargs)
+                status = r.status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.append((label, status, (time.perf_counter() - start) * 1000))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ok = [s for s in samples if 200 <= s[1] < 400]
+    endpoints = {}
+    for label in sorted({s[0] for s in samples}):
+        mine = [s for s in samples if s[0] == label]
+        endpoints[label] = {
+            "requests": len(mine),
+            "errors": sum(1 for s in mine if not 200 <= s[1] < 400),
+            "latency_ms": percentiles([s[2] for s in mine if 200 <= s[1] < 400]),
+        }
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency_ms": percentiles([s[2] for s in ok]),
+        "endpoints": endpoints,
+    }
+
+
+async def _run_all(app_or_url: Any, profiles, names, requests, concurrency, seed, timeout) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if isinstance(app_or_url, str):
+        client = httpx.AsyncClient(base_url=app_or_url, timeout=timeout, limits=limits)
+    else:
+        transport = httpx.ASGITransport(app=app_or_url)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout, limits=limits)
+
+    results = {}
+    async with client:
+        # Warm-up: first requests pay for lazy imports and caches
+        for _ in range(5):
+            await client.get("/nearest", params={"lat": 40.73, "lon": -73.99})
+        for name in names:
+            results[name] = await _run_profile(client, profiles[name], requests, concurrency, seed)
+    return results
+
+
+def run(
+    names: List[str],
+    requests: int = 500,
+    concurrency: int = 16,
+    mode: str = "inprocess",
+    seed: int = 1234,
+    keep_rate_limit: bool = False,
+    geocoder_latency_ms: float = 80.0,
+    model_latency_ms: float = 300.0,
+    timeout: float = 120.0,
+) -> Dict[str, Any]:
+    corpus = load_corpus(CORPUS)
+    profiles = build_profiles(corpus)
+    unknown = [n for n in names if n not in profiles]
+    if unknown:
+        raise SystemExit(f"unknown profile(s): {', '.join(unknown)}")
+
+    nominatim, nominatim_url = serve_in_thread(
+        mock_nominatim.create_mock_app(mock_nominatim.GeocoderConfig(latency_ms=geocoder_latency_ms))
+    )
+    model, model_url = serve_in_thread(
+        mock_openai.create_mock_app(corpus, mock_openai.MockConfig(latency_ms=model_latency_ms))
+    )
+    servers = [nominatim, model]
+    try:
+        _configure_env(nominatim_url, model_url, keep_rate_limit)
+        from app.server import create_app
+
+        app = create_app()
+        app.state.warmup.wait()
+        if mode == "uvicorn":
+            server, target = serve_in_thread(app)
+            servers.append(server)
+        else:
+            target = app
+        profile_results = asyncio.run(_run_all(target, profiles, names, requests, concurrency, seed, timeout))
+    finally:
+        for s in servers:
+            s.should_exit = True
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "mode": mode,
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed": seed,
+            "geocoder_latency_ms": geocoder_latency_ms,
+            "model_latency_ms": model_latency_ms,
+            "geocoder_rate_limited": keep_rate_limit,
+        },
+        "profiles": profile_results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    '''
+    Compare a run against a baseline.
+    Inputs:
+        current: dict - Report from run().
+        baseline: dict - Stored report.
+        threshold: float - Allowed relative change, e.g. 0.25 for 25%.
+    Returns:
+        list - Human readable regressions (empty when within threshold).
+    '''
+
+    regressions = []
+    for name, cur in current["profiles"].items():
+        base = baseline.get("profiles", {}).get(name)
+        if not base:
+            continue
+        p95, base_p95 = cur["latency_ms"]["p95"], base["latency_ms"]["p95"]
+        if base_p95 and p95 > base_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {base_p95:.2f}ms -> {p95:.2f}ms (+{(p95 / base_p95 - 1) * 100:.0f}%)")
+        rps, base_rps = cur["throughput_rps"], base["throughput_rps"]
+        if base_rps and rps < base_rps * (1 - threshold):
+            regressions.append(f"{name}: throughput {base_rps:.1f} -> {rps:.1f} req/s ({(rps / base_rps - 1) * 100:.0f}%)")
+        if cur["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {cur['errors']}")
+    return regressions
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    for name, p in report["profiles"].items():
+        lat = p["latency_ms"]
+        print(
+            f"[{name}] {p['throughput_rps']} req/s  errors={p['errors']}  "
+            f"p50={lat['p50']:.2f} p95={lat['p95']:.2f} p99={lat['p99']:.2f} ms"
+        )
+        for label, e in p["endpoints"].items():
+            el = e["latency_ms"]
+            print(f"    {label:<24} n={e['requests']:<5} err={e['errors']:<3} p50={el['p50']:.2f} p95={el['p95']:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default="nearest,mixed,chat")
+    parser.add_argument("--requests", type=int, default=500, help="requests per profile")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--keep-rate-limit", action="store_true", help="keep the 1 req/s geocoder rate limit")
+    parser.add_argument("--geocoder-latency-ms", type=float, default=80.0)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--json", type=Path, default=None, help="write the report to this file")
+    parser.add_argument(
+        "--compare", type=Path, nargs="?", const=BASELINE, default=None,
+        help=f"baseline report to compare against (default when given without a path: {BASELINE.name})",
+    )
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--save-baseline", type=Path, default=None)
+    args = parser.parse_args()
+
+    report = run(
+        [n.strip() for n in args.profiles.split(",") if n.strip()],
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mode=args.mode,
+        seed=args.seed,
+        keep_rate_limit=args.keep_rate_limit,
+        geocoder_latency_ms=args.geocoder_latency_ms,
+        model_latency_ms=args.model_latency_ms,
+    )
+    _print_report(report)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for r in regressions:
+                print(f"  {r}")
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.threshold:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+'''
+Logging cost on the request path: the old setup (logging.basicConfig, a
+StreamHandler formatting and writing on the calling thread) against the
+asynchronous pipeline in app/log_pipeline.py. Output goes to a temporary
+file; --sink-delay-ms makes every write that slow, like a stalled pipe or
+log shipper.
+
+    records      - caller time per logger.info call, and time until all
+                   records are written
+    exceptions   - caller time per logger.exception call during an upstream
+                   outage (same failure, --records times), and lines written:
+                   sync, async without dedupe, async with dedupe
+    /nearest     - median and p99 per request through the app over ASGI
+                   (no HTTP client), with no access log, a synchronous one,
+                   the async one and the async one sampled at 10%
+
+Usage:
+    python -m benchmarks.log_bench [--records 20000] [--requests 2000] [--sink-delay-ms 0]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+
+# Record defaults, restored for the synchronous baseline
+_RECORD_DEFAULTS = (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+
+
+class SlowFile(io.TextIOBase):
+    '''A text file whose writes each take delay_sec.'''
+
+    def __init__(self, path: str, delay_sec: float):
+        self.fh = open(path, "w", encoding="utf-8")
+        self.delay_sec = delay_sec
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        if self.delay_sec > 0:
+            time.sleep(self.delay_sec)
+        self.writes += 1
+        return self.fh.write(text)
+
+    def flush(self) -> None:
+        self.fh.flush()
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+def install(mode: str, sink: SlowFile, dedupe_window_sec: float = 60.0):
+    '''Make the root logger write to sink synchronously ("sync") or through a LogPipeline ("async").'''
+
+    from app.log_pipeline import LogPipeline, lean_records
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        if hasattr(handler, "_pipeline"):
+            handler._pipeline.stop()
+    root.setLevel(logging.INFO)
+    if mode == "sync":
+        logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing = _RECORD_DEFAULTS
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root.addHandler(handler)
+        return None
+    lean_records()
+    pipeline = LogPipeline(stream=sink, queue_size=100_000, dedupe_window_sec=dedupe_window_sec)
+    pipeline.handler._pipeline = pipeline
+    root.addHandler(pipeline.handler)
+    return pipeline
+
+
+def drain(pipeline) -> None:
+    if pipeline is not None:
+        pipeline.flush(timeout_sec=600)
+
+
+def bench_records(mode: str, n: int, sink: SlowFile) -> tuple:
+    pipeline = install(mode, sink)
+    log = logging.getLogger("app.bench")
+    start = time.perf_counter()
+    for i in range(n):
+        log.info("nearest request lat=%s lon=%s limit=%d", 40.7, -73.95, i)
+    caller = time.perf_counter() - start
+    drain(pipeline)
+    return caller / n * 1e6, (time.perf_counter() - start) * 1000
+
+
+def _fail():
+    raise TimeoutError("geocoder timed out")
+
+
+def bench_exceptions(mode: str, n: int, sink: SlowFile) -> tuple:
+    pipeline = install("sync" if mode == "sync" else "async", sink, dedupe_window_sec=60.0 if mode == "async+dedupe" else 0)
+    log = logging.getLogger("app.geocode")
+    before = sink.writes
+    start = time.perf_counter()
+    for i in range(n):
+        try:
+            _fail()
+        except TimeoutError:
+            log.exception("forward geocoder unavailable address=%s", i)
+    caller = time.perf_counter() - start
+    drain(pipeline)
+    return caller / n * 1e6, sink.writes - before
+
+
+def bench_requests(app, path: str, n: int) -> List[float]:
+    from benchmarks.static_bench import call
+
+    async def run() -> List[float]:
+        for _ in range(50):
+            await call(app, path, {})
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            status, _, _ = await call(app, path, {})
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert status == 200, status
+        return samples
+
+    return asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="time every log write takes")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["CHECKIN_SNAPSHOT_PATH"] = ""
+    os.environ["INDEX_COMPACT_DELAY_SEC"] = "-1"
+    os.environ["LOG_ACCESS"] = "0"
+    from app.log_pipeline import AccessLogMiddleware
+    from app.server import create_app
+
+    sink = SlowFile(os.path.join(tmp, "log.txt"), args.sink_delay_ms / 1000)
+    records = args.records if args.sink_delay_ms <= 0 else min(args.records, 2000)
+    print(f"sink delay {args.sink_delay_ms} ms per write\n")
+
+    print(f"{'records':<14} {'caller us/rec':>14} {'all written ms':>15}")
+    for mode in ("sync", "async"):
+        per, total = bench_records(mode, records, sink)
+        print(f"{mode:<14} {per:>14.2f} {total:>15.1f}")
+
+    print(f"\n{'exceptions':<14} {'caller us/rec':>14} {'lines written':>15}")
+    for mode in ("sync", "async", "async+dedupe"):
+        per, lines = bench_exceptions(mode, records, sink)
+        print(f"{mode:<14} {per:>14.2f} {lines:>15,}")
+
+    app = create_app()
+    app.state.warmup.wait()
+    path = "/nearest?lat=40.70&lon=-73.95&limit=10&sport=both"
+    variants: List[tuple] = [
+        ("no access log", "async", lambda: app),
+        ("sync", "sync", lambda: AccessLogMiddleware(app)),
+        ("async", "async", lambda: AccessLogMiddleware(app)),
+        ("async 10%", "async", lambda: AccessLogMiddleware(app, sample_rate=0.1)),
+    ]
+    n = args.requests if args.sink_delay_ms <= 0 else min(args.requests, 500)
+    print(f"\n{'/nearest':<14} {'p50 ms':>8} {'p99 ms':>8} {'lines':>7}")
+    for name, mode, build in variants:
+        pipeline = install(mode, sink)
+        wrapped: Callable = build()
+        before = sink.writes
+        samples = bench_requests(wrapped, path, n)
+        drain(pipeline)
+        print(f"{name:<14} {np.percentile(samples, 50):>8.3f} {np.percentile(samples, 99):>8.3f} {sink.writes - before:>7,}")
+    install("sync", sink)
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
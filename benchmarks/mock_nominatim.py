@@ -0,0 +1,124 @@
+'''
+Local stand-in for the Nominatim /search and /reverse endpoints.
+
+Answers are deterministic: a query string hashes to a point inside the NYC
+bounding box. Latency, error rate and outages can be set at start-up or
+changed at runtime through POST /_config, so the same server serves load
+benchmarks and failure drills.
+
+Usage:
+    python -m benchmarks.mock_nominatim [--port 8766] [--latency-ms 80]
+
+Then point the app at it:
+    GEOCODER_DOMAIN=127.0.0.1:8766 GEOCODER_SCHEME=http python run_server.py
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import random
+import threading
+from dataclasses import asdict, dataclass
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+# NYC bounding box used for synthetic answers
+LAT_MIN, LAT_MAX = 40.55, 40.90
+LON_MIN, LON_MAX = -74.15, -73.72
+
+
+@dataclass
+class GeocoderConfig:
+    '''
+    Behaviour of the fake geocoder.
+
+    latency_ms: base latency of every call
+    jitter_ms: uniform random latency added on top of latency_ms
+    error_rate: fraction of calls answered with HTTP 503
+    down: when True every call fails
+    '''
+    latency_ms: float = 80.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    down: bool = False
+
+
+def point_for(query: str):
+    '''
+    Map a query string to a stable point inside the NYC bounding box.
+    '''
+
+    h = hashlib.sha1(query.strip().lower().encode("utf-8")).digest()
+    fx = int.from_bytes(h[:4], "big") / 2**32
+    fy = int.from_bytes(h[4:8], "big") / 2**32
+    return round(LAT_MIN + fx * (LAT_MAX - LAT_MIN), 6), round(LON_MIN + fy * (LON_MAX - LON_MIN), 6)
+
+
+def create_mock_app(config: GeocoderConfig = None) -> FastAPI:
+    config = config or GeocoderConfig()
+    app = FastAPI(title="Mock Nominatim")
+    app.state.config = config
+    app.state.calls = {"search": 0, "reverse": 0, "errors": 0}
+    lock = threading.Lock()
+
+    async def _delay_or_fail(kind: str):
+        with lock:
+            app.state.calls[kind] += 1
+        await asyncio.sleep((config.latency_ms + random.uniform(0, config.jitter_ms)) / 1000)
+        if config.down or random.random() < config.error_rate:
+            with lock:
+                app.state.calls["errors"] += 1
+            return JSONResponse({"error": "Service unavailable"}, status_code=503)
+        return None
+
+    @app.get("/search")
+    async def search(q: str = Query(""), limit: int = 1):
+        failed = await _delay_or_fail("search")
+        if failed:
+            return failed
+        if "nowhere" in q.lower():
+            return []
+        lat, lon = point_for(q)
+        return [{"lat": str(lat), "lon": str(lon), "display_name": f"{q} (mock)", "place_id": abs(hash(q)) % 10**9}]
+
+    @app.get("/reverse")
+    async def reverse(lat: float, lon: float):
+        failed = await _delay_or_fail("reverse")
+        if failed:
+            return failed
+        return {"lat": str(lat), "lon": str(lon), "display_name": f"Mock place near {lat:.4f}, {lon:.4f}, New York"}
+
+    @app.post("/_config")
+    def set_config(update: dict):
+        for k, v in update.items():
+            if hasattr(config, k):
+                setattr(config, k, type(getattr(config, k))(v))
+        return asdict(config)
+
+    @app.get("/_stats")
+    def stats():
+        return dict(app.state.calls)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = GeocoderConfig(args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(create_mock_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+'''
+Local stand-in for the OpenAI Responses API.
+
+Implements just enough of POST /v1/responses for app.agent: the first call for
+a corpus query answers with the recorded tool calls, and once their outputs
+come back it answers with a text message. Latency and token usage are
+configurable, and every call is recorded so a benchmark can read model calls
+per query and tool time (the gap between issuing a function call and
+receiving its output) from GET /_stats.
+
+Usage:
+    python -m benchmarks.mock_openai [--port 8765] [--latency-ms 300] [--output-tokens 60]
+
+Then point the app at it:
+    NYCPLACES_OPENAI_BASE_URL=http://127.0.0.1:8765/v1 NYCPLACES_OPENAI_API_KEY=test python run_server.py
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+from app.tool_encoding import estimate_tokens
+from benchmarks.common import CORPUS, load_corpus
+
+
+@dataclass
+class MockConfig:
+    '''
+    Behaviour of the mock model.
+
+    latency_ms: base latency of every call
+    jitter_ms: uniform random latency added on top of latency_ms
+    ms_per_output_token: extra latency per generated token
+    output_tokens: size of the final text answer
+    max_concurrency: calls served at once (upstream capacity); further calls
+                     wait their turn. 0 means unlimited
+    '''
+    latency_ms: float = 300.0
+    jitter_ms: float = 50.0
+    ms_per_output_token: float = 0.0
+    output_tokens: int = 60
+    max_concurrency: int = 0
+
+
+@dataclass
+class MockStats:
+    calls: List[Dict[str, Any]] = field(default_factory=list)
+    issued: Dict[str, float] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"calls": list(self.calls)}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.issued.clear()
+
+
+def _rounds(entry: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+    if "rounds" in entry:
+        return entry["rounds"]
+    return [entry.get("tool_calls", [])]
+
+
+def _get(item: Any, key: str) -> Any:
+    return item.get(key) if isinstance(item, dict) else None
+
+
+def create_mock_app(corpus: List[Dict[str, Any]], config: Optional[MockConfig] = None) -> FastAPI:
+    '''
+    Build the mock Responses API app.
+    Inputs:
+        corpus: list - Corpus entries with "query" and "tool_calls" (or "rounds").
+        config: MockConfig - Latency and token settings.
+    Returns:
+        FastAPI - App exposing /v1/responses, /_stats and /_reset.
+    '''
+
+    config = config or MockConfig()
+    scripts = {e["query"]: _rounds(e) for e in corpus}
+    stats = MockStats()
+    ids = itertools.count(1)
+    app = FastAPI(title="Mock Responses API")
+    app.state.stats = stats
+    app.state.config = config
+    capacity = asyncio.Semaphore(config.max_concurrency) if config.max_concurrency > 0 else None
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        received = time.perf_counter()
+        body = await request.json()
+        items = body.get("input") or []
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+
+        query = next((_get(i, "content") for i in items if _get(i, "role") == "user"), "") or ""
+        calls_seen = sum(1 for i in items if _get(i, "type") == "function_call")
+
+        # Tool time: from the moment we issued a call id until its output arrived
+        tool_ms = 0.0
+        with stats.lock:
+            for i in items:
+                if _get(i, "type") == "function_call_output":
+                    issued = stats.issued.pop(i.get("call_id"), None)
+                    if issued is not None:
+                        tool_ms = max(tool_ms, (received - issued) * 1000)
+
+        # Pick the next scripted round, unless tools are disabled or the script is done
+        pending: List[Dict[str, Any]] = []
+        if body.get("tool_choice") != "none":
+            done = 0
+            for rnd in scripts.get(query, []):
+                if calls_seen <= done:
+                    pending = rnd
+                    break
+                done += len(rnd)
+
+        output: List[Dict[str, Any]] = []
+        out_tokens = 0
+        for call in pending:
+            n = next(ids)
+            output.append({
+                "type": "function_call",
+                "id": f"fc_{n}",
+                "call_id": f"call_{n}",
+                "name": call["name"],
+                "arguments": json.dumps(call["arguments"]),
+                "status": "completed",
+            })
+            out_tokens += estimate_tokens(output[-1]["arguments"])
+        if not output:
+            out_tokens = config.output_tokens
+            output.append({
+                "type": "message",
+                "id": f"msg_{next(ids)}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": ("lorem " * out_tokens).strip(), "annotations": []}],
+            })
+
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms) + out_tokens * config.ms_per_output_token
+        if capacity is None:
+            await asyncio.sleep(delay / 1000)
+        else:
+            async with capacity:
+                await asyncio.sleep(delay / 1000)
+
+        in_tokens = estimate_tokens(json.dumps(items)) + estimate_tokens(json.dumps(body.get("tools") or []))
+        sent = time.perf_counter()
+        with stats.lock:
+            for o in output:
+                if o["type"] == "function_call":
+                    stats.issued[o["call_id"]] = sent
+            stats.calls.append({
+                "query": query,
+                "input_tokens": in_tokens,
+                "output_tokens": out_tokens,
+                "tool_calls": len(pending),
+                "tool_ms": tool_ms,
+                "model_ms": (sent - received) * 1000,
+            })
+
+        return {
+            "id": f"resp_{next(ids)}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "mock"),
+            "status": "completed",
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": body.get("tool_choice", "auto"),
+            "tools": body.get("tools") or [],
+            "usage": {
+                "input_tokens": in_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": out_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": in_tokens + out_tokens,
+            },
+        }
+
+    @app.get("/_stats")
+    def get_stats():
+        return stats.snapshot()
+
+    @app.post("/_reset")
+    def reset():
+        stats.reset()
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=60)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.ms_per_output_token, args.output_tokens, args.max_concurrency)
+    uvicorn.run(create_mock_app(load_corpus(args.corpus), config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
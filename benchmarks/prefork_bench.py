@@ -0,0 +1,113 @@
+'''
+Startup time and memory per worker for 1..N workers, comparing:
+
+    prefork  - python run_server.py --workers N: data and indexes loaded
+               once in the parent, workers forked and sharing them
+               copy-on-write (app/prefork.py)
+    uvicorn  - uvicorn app.server:app --workers N: every worker process
+               imports the app and builds its own datasets and indexes
+
+For each run it reports the time until every worker has finished startup
+and, from /proc/<pid>/smaps_rollup, total PSS across all processes (the
+honest "how much RAM does this deployment use" number) and the average
+PSS and USS (private memory) per worker. Linux only.
+
+Usage:
+    python -m benchmarks.prefork_bench [--max-workers 4] [--modes prefork,uvicorn]
+'''
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from app.prefork import memory_report
+from benchmarks.common import free_port
+
+ROOT = Path(__file__).resolve().parents[1]
+READY_LINE = "Application startup complete."
+
+
+def _command(mode: str, workers: int, port: int) -> list:
+    if mode == "prefork":
+        return [sys.executable, "run_server.py", "--workers", str(workers)]
+    return [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port), "--workers", str(workers)]
+
+
+def _children(pid: int) -> list:
+    try:
+        return [int(p) for p in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+    except OSError:
+        return []
+
+
+def _run(mode: str, workers: int, timeout: float) -> dict:
+    port = free_port()
+    env = {**os.environ, "DEBUG": "0", "PORT": str(port), "CHECKIN_SNAPSHOT_PATH": "", "INDEX_COMPACT_DELAY_SEC": "-1"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        _command(mode, workers, port), cwd=ROOT, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    ready = threading.Event()
+    count = [0]
+
+    def _watch():
+        for line in proc.stdout:
+            if READY_LINE in line:
+                count[0] += 1
+                if count[0] >= workers:
+                    ready.set()
+
+    threading.Thread(target=_watch, daemon=True).start()
+    try:
+        if not ready.wait(timeout):
+            raise RuntimeError(f"{mode} with {workers} workers did not start within {timeout}s")
+        startup = time.perf_counter() - start
+        time.sleep(0.5)
+        report = memory_report([proc.pid, *_children(proc.pid)])
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    # uvicorn serves a single worker from the launched process itself
+    worker_rows = report[1:] or report
+    n = max(1, len(worker_rows))
+    return {
+        "startup_sec": startup,
+        "total_pss_mb": sum(r["pss_mb"] for r in report),
+        "worker_pss_mb": sum(r["pss_mb"] for r in worker_rows) / n,
+        "worker_uss_mb": sum(r["uss_mb"] for r in worker_rows) / n,
+        "worker_rss_mb": sum(r["rss_mb"] for r in worker_rows) / n,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--modes", default="prefork,uvicorn")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'workers':>7} {'startup s':>9} {'total PSS MB':>12} {'PSS/worker':>10} {'USS/worker':>10} {'RSS/worker':>10}")
+    for mode in args.modes.split(","):
+        for workers in range(1, args.max_workers + 1):
+            r = _run(mode, workers, args.timeout)
+            print(
+                f"{mode:<8} {workers:>7} {r['startup_sec']:>9.2f} {r['total_pss_mb']:>12.1f} "
+                f"{r['worker_pss_mb']:>10.1f} {r['worker_uss_mb']:>10.1f} {r['worker_rss_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+'''
+Region-sharded index (app/shards.py) against one in-memory index, on a
+synthetic worldwide dataset (benchmarks.synthetic.generate_cities: --rows
+courts over --cities Zipf-sized cities).
+
+Reports:
+    build   - partitioning and writing the shards, shard count and size
+    startup - time to the first answer: building one BallTree over every
+              court, versus reading the shard manifest and loading the shards
+              the first query touches
+    queries - latency percentiles for --queries lookups placed like users
+              (near a random court, so big cities get most traffic), shard
+              loads, cache hit rate, shards visited per query and the memory
+              held, for each --budgets-mb memory budget
+    exact   - results compared with the single index on a sample of queries
+              plus points on cell borders and the antimeridian
+
+Usage:
+    python -m benchmarks.shard_bench [--rows 2e6] [--cities 300] [--cell-deg 1.0] [--budgets-mb 4096,256,64] [--queries 5000]
+'''
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.nearest import NearestIndex
+from app.shards import ShardedIndex, _index_bytes, build_shards
+from benchmarks.common import percentiles
+from benchmarks.synthetic import generate_cities
+
+
+def _queries(df, n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(df), n)
+    lat = np.clip(df["Lat"].to_numpy()[pick] + rng.normal(0, 0.05, n), -89.9, 89.9)
+    lon = (df["Lon"].to_numpy()[pick] + rng.normal(0, 0.05, n) + 180.0) % 360.0 - 180.0
+    return np.column_stack([lat, lon])
+
+
+def _edge_points(cell_deg: float, n: int, seed: int) -> np.ndarray:
+    # On cell borders and either side of the antimeridian
+    rng = np.random.default_rng(seed)
+    lat = np.round(rng.uniform(-40, 55, n) / cell_deg) * cell_deg
+    lon = np.round(rng.uniform(-180, 180, n) / cell_deg) * cell_deg
+    extra = np.array([[10.0, 179.999], [10.0, -179.999], [-30.0, 180.0], [45.0, -180.0]])
+    return np.vstack([np.column_stack([lat, (lon + 180.0) % 360.0 - 180.0]), extra])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=float, default=2e6)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--cell-deg", type=float, default=1.0)
+    parser.add_argument("--budgets-mb", default="4096,256,64")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--check", type=int, default=500, help="queries compared with the single index")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = generate_cities(int(args.rows), args.cities, seed=args.seed)
+    print(f"generated {len(df):,} courts in {args.cities} cities in {time.perf_counter() - start:.1f}s")
+    points = _queries(df, args.queries, args.seed + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shard_dir = Path(tmp) / "shards"
+        start = time.perf_counter()
+        manifest = build_shards(df, shard_dir, args.cell_deg)
+        build_sec = time.perf_counter() - start
+        sizes = np.array([s["rows"] for s in manifest["shards"]])
+        disk_mb = sum(p.stat().st_size for p in shard_dir.iterdir()) / 1024 / 1024
+        print(
+            f"build: {len(sizes)} shards of {args.cell_deg} deg in {build_sec:.1f}s, {disk_mb:.0f} MB on disk, "
+            f"rows per shard median {int(np.median(sizes))} p99 {int(np.percentile(sizes, 99))} max {sizes.max()}"
+        )
+
+        start = time.perf_counter()
+        single = NearestIndex(df)
+        single.query_k(*points[0], k=args.k)
+        single_start = time.perf_counter() - start
+        single_mb = _index_bytes(single) / 1024 / 1024
+        del df
+
+        print(f"\n{'index':<18} {'first answer s':>14} {'p50 ms':>8} {'p99 ms':>8} {'loads':>6} {'hit %':>6} {'shards/q':>8} {'held MB':>8}")
+        samples = []
+        for lat, lon in points:
+            t0 = time.perf_counter()
+            single.query_k(lat, lon, k=args.k)
+            samples.append((time.perf_counter() - t0) * 1000)
+        p = percentiles(samples)
+        print(f"{'single':<18} {single_start:>14.2f} {p['p50']:>8.3f} {p['p99']:>8.3f} {'-':>6} {'-':>6} {'-':>8} {single_mb:>8.0f}")
+
+        check = np.vstack([points[: args.check], _edge_points(args.cell_deg, 200, args.seed + 2)])
+        for budget in (float(b) for b in args.budgets_mb.split(",")):
+            start = time.perf_counter()
+            sharded = ShardedIndex(shard_dir, budget, name=f"bench{budget:g}")
+            sharded.query_k(*points[0], k=args.k)
+            first = time.perf_counter() - start
+            before = sharded.status()
+            samples, peak = [], 0.0
+            for lat, lon in points:
+                t0 = time.perf_counter()
+                sharded.query_k(lat, lon, k=args.k)
+                samples.append((time.perf_counter() - t0) * 1000)
+                peak = max(peak, sharded.status()["loaded_mb"])
+            st = sharded.status()
+            # Every shard a query visits is one cache hit or load
+            visited = st["hits"] + st["loads"] - before["hits"] - before["loads"]
+            p = percentiles(samples)
+            hit_rate = st["hits"] / max(1, st["hits"] + st["loads"]) * 100
+            print(
+                f"{f'sharded {budget:g} MB':<18} {first:>14.2f} {p['p50']:>8.3f} {p['p99']:>8.3f} {st['loads']:>6} "
+                f"{hit_rate:>6.1f} {visited / len(points):>8.2f} {peak:>8.0f}"
+            )
+
+            mismatches = 0
+            for lat, lon in check:
+                a = sharded.query_k(lat, lon, k=args.k)["distance_km"].to_numpy()
+                b = single.query_k(lat, lon, k=args.k)["distance_km"].to_numpy()
+                mismatches += int(len(a) != len(b) or not np.allclose(a, b, atol=0.011))
+            if mismatches:
+                print(f"  MISMATCH: {mismatches} of {len(check)} checked queries differ from the single index")
+        print(f"\nexact: sharded results compared with the single index on {len(check)} queries per budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+'''
+Cold-start benchmark and startup budget check.
+
+1. Import profile: runs `python -X importtime -c "import app.server"` in a
+   fresh interpreter and lists the modules that dominate import time
+   (cumulative, top-level packages and app modules).
+2. Serve timings: starts uvicorn on app.server:app --runs times per warm-up
+   mode and measures, from process launch,
+       listening - first HTTP answer from /health (the port is open)
+       ready     - /health answers 200 (court data loaded)
+       first     - first /nearest result
+   STARTUP_WARMUP=background (the default) is compared with eager, which
+   loads everything before the server starts listening.
+
+Exits with status 1 when the median background-mode "listening" time
+exceeds --budget-sec (default $STARTUP_BUDGET_SEC or 3.0), or "ready"
+exceeds --ready-budget-sec when given. Budgets are machine-specific.
+
+Usage:
+    python -m benchmarks.startup_bench [--runs 3] [--budget-sec 3.0] [--ready-budget-sec 6.0] [--top 15]
+'''
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import free_port
+
+ROOT = Path(__file__).resolve().parents[1]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(**extra) -> dict:
+    return {**os.environ, "CHECKIN_SNAPSHOT_PATH": "", "INDEX_COMPACT_DELAY_SEC": "-1", **extra}
+
+
+def import_profile(top: int) -> list:
+    '''
+    Returns:
+        list of (module, cumulative_sec) - The slowest top-level packages and
+        app modules, and the total as ("total", sec).
+    '''
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.server"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    cumulative = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if not m:
+            continue
+        cum_us, depth, name = int(m.group(2)), len(m.group(3)) // 2, m.group(4)
+        if name == "app.server":
+            total = cum_us
+        # Direct imports of the interpreter or of app modules, grouped by package
+        elif depth <= 1 or name.startswith("app."):
+            key = name if name.startswith("app.") else name.split(".")[0]
+            cumulative[key] = max(cumulative[key], cum_us)
+    rows = sorted(cumulative.items(), key=lambda kv: -kv[1])[:top]
+    return [(name, us / 1e6) for name, us in rows] + [("total", total / 1e6)]
+
+
+def serve_timings(mode: str, timeout: float = 120.0) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(STARTUP_WARMUP=mode), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    out = {}
+    try:
+        with httpx.Client(base_url=base, timeout=30) as client:
+            deadline = start + timeout
+            while "ready" not in out:
+                if time.perf_counter() > deadline or proc.poll() is not None:
+                    raise RuntimeError(f"server in {mode} mode did not become ready")
+                try:
+                    r = client.get("/health")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                out.setdefault("listening", time.perf_counter() - start)
+                if r.status_code == 200:
+                    out["ready"] = time.perf_counter() - start
+                else:
+                    time.sleep(0.005)
+            client.get("/nearest", params={"lat": 40.7, "lon": -73.95}).raise_for_status()
+            out["first"] = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-sec", type=float, default=float(os.getenv("STARTUP_BUDGET_SEC", "3.0")))
+    parser.add_argument("--ready-budget-sec", type=float, default=None)
+    args = parser.parse_args()
+
+    print("import app.server (cumulative, fresh interpreter)")
+    for name, sec in import_profile(args.top):
+        print(f"  {name:<28} {sec * 1000:>8.1f} ms")
+
+    print(f"\n{'mode':<11} {'listening s':>11} {'ready s':>8} {'first s':>8}   (median of {args.runs})")
+    medians = {}
+    for mode in ("background", "eager"):
+        runs = [serve_timings(mode) for _ in range(args.runs)]
+        medians[mode] = {k: statistics.median(r[k] for r in runs) for k in ("listening", "ready", "first")}
+        m = medians[mode]
+        print(f"{mode:<11} {m['listening']:>11.2f} {m['ready']:>8.2f} {m['first']:>8.2f}")
+
+    failures = []
+    listening = medians["background"]["listening"]
+    if listening > args.budget_sec:
+        failures.append(f"cold start {listening:.2f}s exceeds budget {args.budget_sec:.2f}s")
+    ready = medians["background"]["ready"]
+    if args.ready_budget_sec is not None and ready > args.ready_budget_sec:
+        failures.append(f"time to ready {ready:.2f}s exceeds budget {args.ready_budget_sec:.2f}s")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"\nOK: cold start {listening:.2f}s within budget {args.budget_sec:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+'''
+Page-load bytes and server CPU for the map page and its script, comparing:
+
+    plain          - StaticFiles + FileResponse, as before app.static_assets:
+                     uncompressed bodies, ETag but no Cache-Control
+    gzip-middleware - the same behind Starlette's GZipMiddleware, which
+                     compresses every response again
+    precompressed  - app.static_assets: fingerprinted names, gzip/brotli
+                     chosen from Accept-Encoding, immutable caching
+
+A visit is GET / then every /static script the page references. The first
+visit starts with an empty cache. On a repeat visit the simulated browser
+reuses responses marked immutable without a request and revalidates
+everything else with If-None-Match, which is what browsers do for no-cache
+and, at best, for responses without caching headers.
+
+Server CPU is process time per request, with the ASGI apps called directly
+in-process so that no HTTP client work is counted.
+
+Usage:
+    python -m benchmarks.static_bench [--requests 2000] [--accept-encoding "gzip, deflate, br"]
+'''
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.staticfiles import StaticFiles
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse
+
+from app.settings import get_settings
+from app.static_assets import StaticAssets, build_assets, write_build
+
+SCRIPT = re.compile(rb'src="(/static/[^"]+)"')
+
+
+def plain_app(src_dir: Path, gzip_middleware: bool = False) -> FastAPI:
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory=str(src_dir)), name="static")
+
+    @app.get("/")
+    def home():
+        return FileResponse(str(src_dir / "index.html"))
+
+    if gzip_middleware:
+        app.add_middleware(GZipMiddleware, minimum_size=500)
+    return app
+
+
+def precompressed_app(src_dir: Path, build_dir: Path) -> FastAPI:
+    app = FastAPI()
+    assets = StaticAssets(src_dir, build_dir)
+
+    def _static(request: Request, name: str):
+        resp = assets.response(name, request.headers.get("accept-encoding", ""), request.headers.get("if-none-match", ""))
+        if resp is None:
+            raise HTTPException(status_code=404)
+        return resp
+
+    @app.get("/")
+    async def home(request: Request):
+        return _static(request, "index.html")
+
+    @app.get("/static/{name:path}")
+    async def static_file(request: Request, name: str):
+        return _static(request, name)
+
+    return app
+
+
+async def call(app, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+    '''Drive one GET through an ASGI app and return (status, headers, body).'''
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    out = {"status": 0, "headers": {}, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            out["status"] = message["status"]
+            out["headers"] = {k.decode().lower(): v.decode() for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            out["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return out["status"], out["headers"], out["body"]
+
+
+async def visit(app, accept: str, cache: Dict[str, dict]) -> Tuple[int, int]:
+    '''
+    One page load through a simulated browser cache.
+    Returns:
+        (requests, body bytes transferred)
+    '''
+
+    requests, transferred = 0, 0
+
+    async def fetch(path: str) -> bytes:
+        nonlocal requests, transferred
+        cached = cache.get(path)
+        if cached and "immutable" in cached["headers"].get("cache-control", ""):
+            return cached["body"]
+        headers = {"accept-encoding": accept}
+        if cached and "etag" in cached["headers"]:
+            headers["if-none-match"] = cached["headers"]["etag"]
+        status, resp_headers, body = await call(app, path, headers)
+        requests += 1
+        transferred += len(body)
+        if status == 304:
+            return cached["body"]
+        if status != 200:
+            raise RuntimeError(f"GET {path} answered {status}")
+        page = body
+        if resp_headers.get("content-encoding") == "gzip":
+            page = gzip.decompress(body)
+        elif resp_headers.get("content-encoding") == "br":
+            import brotli  # only sent when the server has it
+
+            page = brotli.decompress(body)
+        cache[path] = {"headers": resp_headers, "body": page}
+        return page
+
+    page = await fetch("/")
+    for script in SCRIPT.findall(page):
+        await fetch(script.decode())
+    return requests, transferred
+
+
+async def cpu_per_request(app, paths: List[str], accept: str, n: int) -> float:
+    for path in paths:
+        await call(app, path, {"accept-encoding": accept})
+    start = time.process_time()
+    for i in range(n):
+        await call(app, paths[i % len(paths)], {"accept-encoding": accept})
+    return (time.process_time() - start) / n * 1e6
+
+
+async def run(args) -> None:
+    src = get_settings().static_dir
+    with tempfile.TemporaryDirectory() as tmp:
+        build_dir = Path(tmp) / "static"
+        write_build(build_assets(src), build_dir)
+        apps = {
+            "plain": plain_app(src),
+            "gzip-middleware": plain_app(src, gzip_middleware=True),
+            "precompressed": precompressed_app(src, build_dir),
+        }
+
+        print(f"Accept-Encoding: {args.accept_encoding!r}\n")
+        print(f"{'mode':<16} {'first visit':>20} {'repeat visit':>20} {'CPU us/request':>15}")
+        for mode, app in apps.items():
+            cache: Dict[str, dict] = {}
+            first = await visit(app, args.accept_encoding, cache)
+            repeat = await visit(app, args.accept_encoding, cache)
+            paths = ["/"] + [p.decode() for p in SCRIPT.findall(cache["/"]["body"])]
+            cpu_us = await cpu_per_request(app, paths, args.accept_encoding, args.requests)
+            print(
+                f"{mode:<16} {f'{first[1]:,} B / {first[0]} req':>20} "
+                f"{f'{repeat[1]:,} B / {repeat[0]} req':>20} {cpu_us:>15.0f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mode for the CPU measurement")
+    parser.add_argument("--accept-encoding", default="gzip, deflate, br")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+'''
+Synthetic court datasets with the real schema, from 1e3 to 1e7 rows.
+
+Points are drawn from a mixture of Gaussian clusters around each borough
+centre (clipped to the NYC bounding box) so density looks like the real data
+rather than a uniform square. Everything is vectorized, so 1e7 rows take
+seconds; writing them out as CSV takes much longer.
+
+generate_cities() spreads courts over many cities around the world instead
+(Zipf-sized, some straddling the antimeridian), for the region-sharded index.
+
+Usage:
+    python -m benchmarks.synthetic --rows 100000 [--sport handball|tennis] [--seed 0] --out data/synthetic.csv
+    python -m benchmarks.synthetic --rows 2e6 --cities 300 --out data/synthetic_cities.csv
+'''
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.mock_nominatim import LAT_MAX, LAT_MIN, LON_MAX, LON_MIN
+
+# (prefix, borough, centre lat, centre lon, spread in degrees, share of courts)
+BOROUGHS = (
+    ("X", "Bronx", 40.8448, -73.8648, 0.035, 0.22),
+    ("B", "Brooklyn", 40.6782, -73.9442, 0.045, 0.30),
+    ("M", "Manhattan", 40.7831, -73.9712, 0.030, 0.18),
+    ("Q", "Queens", 40.7282, -73.7949, 0.060, 0.22),
+    ("R", "Staten Island", 40.5795, -74.1502, 0.040, 0.08),
+)
+
+NAME_WORDS = np.array(["Park", "Playground", "Field", "Courts", "Square", "Garden", "Oval", "Recreation Center"])
+STREET_WORDS = np.array(["Ave", "St", "Blvd", "Pl", "Rd"])
+
+
+def generate_courts(rows: int, sport: str = "handball", seed: int = 0) -> pd.DataFrame:
+    '''
+    Generate a synthetic courts dataset.
+    Inputs:
+        rows: int - Number of courts.
+        sport: str - "handball" or "tennis"; tennis adds its extra columns.
+        seed: int - Random seed, so runs are reproducible.
+    Returns:
+        pd.DataFrame - Columns matching data/<sport>_courts_clean.csv.
+    '''
+
+    rng = np.random.default_rng(seed)
+    shares = np.array([b[5] for b in BOROUGHS])
+    boro = rng.choice(len(BOROUGHS), size=rows, p=shares / shares.sum())
+
+    centres = np.array([[b[2], b[3]] for b in BOROUGHS])
+    spread = np.array([b[4] for b in BOROUGHS])
+    lat = centres[boro, 0] + rng.normal(0, 1, rows) * spread[boro]
+    lon = centres[boro, 1] + rng.normal(0, 1, rows) * spread[boro] * 1.3
+    lat = np.round(np.clip(lat, LAT_MIN, LAT_MAX), 4)
+    lon = np.round(np.clip(lon, LON_MIN, LON_MAX), 4)
+
+    prefixes = np.array([b[0] for b in BOROUGHS])
+    names = np.array([b[1] for b in BOROUGHS])
+    serial = np.char.zfill(np.arange(rows).astype(str), len(str(rows)))
+
+    df = pd.DataFrame({
+        "Court_Id": np.char.add(prefixes[boro], serial),
+        "Name": np.char.add(np.char.add("Synthetic ", serial), np.char.add(" ", NAME_WORDS[rng.integers(0, len(NAME_WORDS), rows)])),
+        "Borough": names[boro],
+        "Location": np.char.add(np.char.add(rng.integers(1, 250, rows).astype(str), " "), STREET_WORDS[rng.integers(0, len(STREET_WORDS), rows)]),
+        "Num_Of_Courts": rng.integers(1, 9, rows),
+    })
+    if sport == "tennis":
+        df["Indoor_Outdoor"] = np.where(rng.random(rows) < 0.1, "Indoor", "Outdoor")
+        df["Tennis_Type"] = np.where(rng.random(rows) < 0.8, "Hard", "Clay")
+        df["Accessible"] = np.where(rng.random(rows) < 0.6, "Y", "N")
+        df["Info"] = np.where(rng.random(rows) < 0.5, "Lessons Offered", "")
+    df["Lat"] = lat
+    df["Lon"] = lon
+    return df
+
+
+def generate_cities(rows: int, cities: int = 300, sport: str = "handball", seed: int = 0) -> pd.DataFrame:
+    '''
+    Generate courts spread over many cities.
+    Inputs:
+        rows: int - Number of courts.
+        cities: int - Number of cities; sizes follow a Zipf law, so a few
+                      large cities hold most courts.
+        sport: str - As for generate_courts.
+        seed: int - Random seed.
+    Returns:
+        pd.DataFrame - generate_courts columns, with Borough holding the
+        city name and Court_Id prefixed by the city number.
+    '''
+
+    rng = np.random.default_rng(seed + 1)
+    df = generate_courts(rows, sport, seed)
+    # City centres over the inhabited latitudes; a few pinned to the antimeridian
+    centre_lat = rng.uniform(-45.0, 60.0, cities)
+    centre_lon = rng.uniform(-180.0, 180.0, cities)
+    centre_lon[: max(1, cities // 100)] = 179.95
+    shares = 1.0 / np.arange(1, cities + 1)
+    city = rng.choice(cities, size=rows, p=shares / shares.sum())
+    # Bigger cities spread wider (0.05 to ~0.3 degrees)
+    spread = 0.05 + 0.25 * (shares / shares[0]) ** 0.5
+    lat = np.clip(centre_lat[city] + rng.normal(0, 1, rows) * spread[city], -89.9, 89.9)
+    lon = centre_lon[city] + rng.normal(0, 1, rows) * spread[city] / np.cos(np.radians(centre_lat[city]))
+    lon = (lon + 180.0) % 360.0 - 180.0
+
+    city_names = np.char.add("City ", np.arange(cities).astype(str))
+    df["Court_Id"] = np.char.add(np.char.add(np.char.zfill(city.astype(str), 4), "-"), df["Court_Id"].to_numpy().astype(str))
+    df["Borough"] = city_names[city]
+    df["Lat"] = np.round(lat, 5)
+    df["Lon"] = np.round(lon, 5)
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=float, default=1e5, help="number of courts (1e3 .. 1e7)")
+    parser.add_argument("--sport", choices=("handball", "tennis"), default="handball")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cities", type=int, default=0, help="spread courts over this many cities worldwide")
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+
+    if args.cities:
+        df = generate_cities(int(args.rows), args.cities, args.sport, args.seed)
+    else:
+        df = generate_courts(int(args.rows), args.sport, args.seed)
+    df.to_csv(args.out, index=False)
+    print(f"wrote {len(df)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
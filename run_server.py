@@ -1,26 +1,70 @@
 # run_server.py
 """
-Helper script to run the FastAPI app locally.
+Helper script to run the FastAPI app.
+
+With DEBUG on and a single worker it runs uvicorn with auto-reload for local
+development. Otherwise it starts the pre-fork launcher (app/prefork.py):
+data and indexes are loaded once and shared copy-on-write by WEB_WORKERS
+worker processes.
 
 Usage:
-    python run_server.py
+    python run_server.py [--workers N]
 """
 
+import argparse
+import logging
+
 import uvicorn
 from app.settings import get_settings
 
 
+def _load_app():
+    # Imported here so the launcher can disable the GC before the app is built
+    from app.server import app
+
+    # Workers must fork from a fully loaded parent to share its memory
+    app.state.warmup.wait()
+    return app
+
+
 def main():
     """
-    Launch the FastAPI app with uvicorn, using settings from environment variables.
+    Launch the FastAPI app, using settings from environment variables.
     """
     settings = get_settings()
-    uvicorn.run(
-        "app.server:app",
+    parser = argparse.ArgumentParser(description="Run the NYC courts finder API.")
+    parser.add_argument("--workers", type=int, default=settings.web_workers, help="worker processes (WEB_WORKERS)")
+    args = parser.parse_args()
+
+    if settings.debug and args.workers <= 1:
+        uvicorn.run(
+            "app.server:app",
+            host=settings.host,
+            port=settings.port,
+            reload=settings.debug,
+            # The app writes its own structured access log (LOG_ACCESS)
+            access_log=not settings.log_access,
+        )
+        return
+
+    from app.prefork import Prefork
+
+    logging.basicConfig(level=logging.INFO)
+    if args.workers > 1:
+        logging.getLogger(__name__).warning(
+            "%d workers: check-ins, admin index edits and snapshot versions are per worker; "
+            "only read-only deployments should run more than one", args.workers,
+        )
+    Prefork(
+        _load_app,
+        workers=args.workers,
         host=settings.host,
         port=settings.port,
-        reload=settings.debug,
-    )
+        max_requests=settings.worker_max_requests,
+        max_requests_jitter=settings.worker_max_requests_jitter,
+        graceful_timeout_sec=settings.graceful_timeout_sec,
+        access_log=not settings.log_access,
+    ).run()
 
 
 if __name__ == "__main__":
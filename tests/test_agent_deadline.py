@@ -0,0 +1,50 @@
+'''
+POST /agent answers within AGENT_DEADLINE_SEC even when the model is slower.
+'''
+
+from __future__ import annotations
+
+import dataclasses
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import agent
+from app.settings import get_settings
+from benchmarks.common import CORPUS, load_corpus, serve_in_thread
+from benchmarks.mock_openai import MockConfig, create_mock_app
+
+DEADLINE_SEC = 0.5
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    from app import log_pipeline
+    from app.server import create_app
+
+    # Every model call takes longer than the whole deadline
+    server, url = serve_in_thread(create_mock_app(load_corpus(CORPUS), MockConfig(latency_ms=2000, jitter_ms=0)))
+    monkeypatch.setenv("NYCPLACES_OPENAI_BASE_URL", f"{url}/v1")
+    monkeypatch.setenv("NYCPLACES_OPENAI_API_KEY", "offline-test")
+    settings = dataclasses.replace(get_settings(), agent_deadline_sec=DEADLINE_SEC)
+    monkeypatch.setattr(agent, "get_settings", lambda: settings)
+    app = create_app()
+    app.state.warmup.wait()
+    try:
+        with TestClient(app) as c:
+            yield c
+    finally:
+        server.should_exit = True
+        # The pipeline writes to the stream pytest captured for this test
+        log_pipeline.shutdown()
+
+
+def test_slow_model_does_not_outlive_deadline(client):
+    start = time.monotonic()
+    resp = client.post("/agent", json={"query": "How many tennis courts are there in NYC?"})
+    elapsed = time.monotonic() - start
+
+    assert resp.status_code in (503, 504)
+    # One attempt with the remaining deadline; SDK retries would take 3x as long
+    assert elapsed < DEADLINE_SEC + 0.5
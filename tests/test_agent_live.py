@@ -0,0 +1,75 @@
+'''
+The agent tools answer from the app's live court indexes, so admin edits
+reach /agent without a restart.
+'''
+
+from __future__ import annotations
+
+import dataclasses
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admin, agent
+from app.settings import get_settings
+
+TOKEN = "test-admin-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+LAT, LON = 40.73, -73.99
+
+
+@pytest.fixture(scope="module")
+def app():
+    from app import log_pipeline
+    from app.server import create_app
+
+    app = create_app()
+    app.state.warmup.wait()
+    yield app
+    # The pipeline writes to the stream pytest captured for this module
+    log_pipeline.shutdown()
+
+
+@pytest.fixture()
+def client(app, monkeypatch):
+    settings = dataclasses.replace(get_settings(), admin_token=TOKEN)
+    monkeypatch.setattr(admin, "get_settings", lambda: settings)
+    with TestClient(app) as c:
+        yield c
+
+
+def _keys(result):
+    return {(r["Name"], r["Lat"], r["Lon"]) for r in result["results"]}
+
+
+def test_closed_court_leaves_agent_tools(app, client):
+    indexes = agent._indexes(app)
+    nearest = agent.tool_nearest_courts(LAT, LON, limit=3, sport="tennis", indexes=indexes)
+    court = nearest["results"][0]
+    rows = indexes["tennis"].query_k(court["Lat"], court["Lon"], k=1)
+    court_id = rows["Court_Id"].iloc[0]
+    key = (court["Name"], court["Lat"], court["Lon"])
+    assert key in _keys(agent.tool_search_courts(court["Name"], limit=25, sport="tennis", indexes=indexes))
+
+    assert client.delete(f"/admin/courts/tennis/{court_id}", headers=AUTH).status_code == 200
+    try:
+        assert key not in _keys(agent.tool_nearest_courts(LAT, LON, limit=3, sport="both", indexes=indexes))
+        assert key not in _keys(agent.tool_search_courts(court["Name"], limit=25, sport="tennis", indexes=indexes))
+        points = [{"lat": court["Lat"], "lon": court["Lon"]}, {"lat": LAT, "lon": LON}]
+        group = agent.tool_group_meeting_point(points=points, limit=5, sport="tennis", indexes=indexes)
+        assert key not in _keys(group)
+    finally:
+        client.post(f"/admin/courts/tennis/{court_id}/restore", headers=AUTH)
+    assert key in _keys(agent.tool_nearest_courts(LAT, LON, limit=3, sport="tennis", indexes=indexes))
+
+
+def test_added_court_reaches_agent_tools(app, client):
+    court = {"Court_Id": "T-TEST-1", "Name": "Agent Test Court", "Borough": "Manhattan", "Lat": LAT, "Lon": LON, "Num_Of_Courts": 2}
+    assert client.post("/admin/courts/tennis", json=court, headers=AUTH).status_code == 201
+    try:
+        indexes = agent._indexes(app)
+        nearest = agent.tool_nearest_courts(LAT, LON, limit=1, sport="tennis", indexes=indexes)
+        assert nearest["results"][0]["Name"] == "Agent Test Court"
+        assert agent.tool_search_courts("agent test", sport="tennis", indexes=indexes)["count"] == 1
+    finally:
+        client.delete("/admin/courts/tennis/T-TEST-1", headers=AUTH)
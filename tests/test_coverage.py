@@ -0,0 +1,40 @@
+'''
+/analytics/coverage snaps cell_m to a fixed set of sizes before the cache.
+'''
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.coverage import CELL_SIZES_M, snap_cell_m
+
+
+@pytest.fixture(scope="module")
+def app():
+    from app import log_pipeline
+    from app.server import create_app
+
+    app = create_app()
+    app.state.warmup.wait()
+    yield app
+    # The pipeline writes to the stream pytest captured for this module
+    log_pipeline.shutdown()
+
+
+def test_snap_cell_m():
+    assert [snap_cell_m(m) for m in (25, 30, 70, 80, 100.0001, 4000)] == [25, 25, 50, 100, 100, 5000]
+    assert all(snap_cell_m(m) == m for m in CELL_SIZES_M)
+
+
+def test_nearby_cell_sizes_share_one_result(app):
+    with TestClient(app) as client:
+        specs = []
+        for cell_m in (2400, 2500.0001, 2600):
+            resp = client.get(f"/analytics/coverage?sport=tennis&cell_m={cell_m}&format=binary")
+            assert resp.status_code == 200
+            specs.append(json.loads(resp.headers["X-Coverage-Grid"]))
+    assert [spec["cell_m"] for spec in specs] == [2500.0] * 3
+    assert [key for key in app.state.coverage._results if key[0] == "tennis"] == [("tennis", 2500.0)]
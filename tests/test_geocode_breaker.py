@@ -0,0 +1,65 @@
+'''
+The geocoder circuit breaker against the local fake Nominatim
+(benchmarks/mock_nominatim.py).
+'''
+
+from __future__ import annotations
+
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import geocode
+from app.circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from benchmarks import mock_nominatim
+from benchmarks.common import serve_in_thread
+
+# The limiter spaces calls MIN_DELAY_SEC apart, so 8 concurrent callers queue
+# for up to 7 * MIN_DELAY_SEC, well past the slow-call limit (TIMEOUT_SEC / 2)
+MIN_DELAY_SEC = 0.3
+TIMEOUT_SEC = 0.5
+
+
+@pytest.fixture()
+def nominatim(monkeypatch):
+    config = mock_nominatim.GeocoderConfig(latency_ms=50, jitter_ms=0)
+    server, url = serve_in_thread(mock_nominatim.create_mock_app(config))
+    settings = dataclasses.replace(
+        geocode._settings,
+        geocoder_domain=url.split("://", 1)[1],
+        geocoder_scheme="http",
+        geocoder_min_delay_sec=MIN_DELAY_SEC,
+        geocoder_timeout_sec=TIMEOUT_SEC,
+        geocoder_max_retries=0,
+    )
+    monkeypatch.setattr(geocode, "_settings", settings)
+    breaker = CircuitBreaker("test_forward", slow_call_sec=TIMEOUT_SEC / 2, open_sec=30.0)
+    monkeypatch.setattr(geocode, "_forward_breaker", breaker)
+    geocode.geocoder_clients.cache_clear()
+    # Built once up front, as the startup warm-up does, so every caller shares one limiter
+    geocode.geocoder_clients()
+    try:
+        yield config, breaker
+    finally:
+        server.should_exit = True
+        geocode.geocoder_clients.cache_clear()
+
+
+def test_rate_limit_wait_does_not_open_breaker(nominatim):
+    _, breaker = nominatim
+    addresses = [f"{100 + i} Concurrent St, Brooklyn" for i in range(8)]
+    with ThreadPoolExecutor(len(addresses)) as pool:
+        results = list(pool.map(geocode.geocode_forward, addresses))
+
+    assert [r["source"] for r in results] == ["nominatim"] * len(addresses)
+    assert breaker.state == CLOSED
+    assert geocode.geocode_forward("1 After The Burst Ave, Queens")["source"] == "nominatim"
+
+
+def test_outage_opens_breaker(nominatim):
+    config, breaker = nominatim
+    config.down = True
+    for i in range(breaker.min_calls):
+        assert geocode.geocode_forward(f"{i} Outage Rd, Bronx")["source"] == "approximate"
+    assert breaker.state == OPEN
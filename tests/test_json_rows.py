@@ -0,0 +1,83 @@
+'''
+JSON court rows carry only the fields that are set.
+'''
+
+from __future__ import annotations
+
+import dataclasses
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import geocode
+from benchmarks import mock_nominatim
+from benchmarks.common import serve_in_thread
+
+
+@pytest.fixture(scope="module")
+def client():
+    from app import log_pipeline
+    from app.server import create_app
+
+    app = create_app()
+    app.state.warmup.wait()
+    with TestClient(app) as c:
+        yield c
+    # The pipeline writes to the stream pytest captured for this module
+    log_pipeline.shutdown()
+
+
+def _nulls(rows):
+    return [key for row in rows for key, value in row.items() if value is None]
+
+
+@pytest.mark.parametrize("url", [
+    "/nearest?lat=40.73&lon=-73.99&limit=10&sport=both",
+    "/nearest?lat=40.73&lon=-73.99&limit=10&sport=tennis&rank=walking&crowding=true",
+    "/courts?limit=50",
+    "/courts?sport=tennis&limit=50",
+])
+def test_rows_have_no_null_keys(client, url):
+    body = client.get(url).json()
+    assert body["count"] > 0
+    assert _nulls(body["results"]) == []
+
+
+def test_handball_rows_omit_tennis_fields(client):
+    row = client.get("/nearest?lat=40.73&lon=-73.99&limit=1").json()["results"][0]
+    assert {"Walking_Km", "Crowding", "Crowding_Level", "Lessons", "Booking_Url"}.isdisjoint(row)
+
+
+def test_neighbors_and_group_have_no_null_keys(client):
+    court_id = client.get("/courts?limit=1").json()["results"][0]["Court_Id"]
+    body = client.get(f"/courts/{court_id}/neighbors").json()
+    assert _nulls([body["court"]] + body["results"]) == []
+    body = client.post("/nearest/group", json={"origins": [{"lat": 40.73, "lon": -73.99}], "limit": 5}).json()
+    assert _nulls(body["results"]) == []
+
+
+@pytest.fixture()
+def nominatim(monkeypatch):
+    server, url = serve_in_thread(mock_nominatim.create_mock_app(mock_nominatim.GeocoderConfig(latency_ms=1, jitter_ms=0)))
+    settings = dataclasses.replace(
+        geocode._settings, geocoder_domain=url.split("://", 1)[1], geocoder_scheme="http", geocoder_min_delay_sec=0.0,
+    )
+    monkeypatch.setattr(geocode, "_settings", settings)
+    geocode.geocoder_clients.cache_clear()
+    try:
+        yield
+    finally:
+        server.should_exit = True
+        geocode.geocoder_clients.cache_clear()
+
+
+@pytest.mark.parametrize("sport", ["both", "tennis"])
+def test_geocode_batch_rows_have_no_null_keys(client, nominatim, sport):
+    addresses = [f"{n} Json Rows St, Brooklyn ({sport})" for n in range(3)]
+    resp = client.post("/geocode/batch", json={"addresses": addresses, "nearest": 5, "sport": sport})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[-1]["resolved"] == len(addresses)
+    courts = [court for line in lines[:-1] for court in line["nearest"]]
+    assert courts
+    assert _nulls(courts) == []